@@ -29,5 +29,23 @@ DEFAULT_METHODS = ["market_cap"]
 DEFAULT_REBALANCE_FREQUENCIES = ["quarterly"]
 DEFAULT_INITIAL_INVESTMENT = 10000
 
+# Capped weighting defaults ("capped_<method>" without explicit limits)
+DEFAULT_MAX_TOKEN_WEIGHT = 0.25  # No token above 25% of the volatile portion
+DEFAULT_MIN_TOKEN_WEIGHT = 0.0  # No floor
+
 # Rebalancing configuration
 DEFAULT_SWAP_FEE = 0.01  # 1% swap fee for simulating exchange trading costs
+DEFAULT_IMPACT_COEFFICIENT = 0.05  # Impact cost of trading a full day's volume
+DEFAULT_IMPACT_EXPONENT = 0.5  # Square-root market impact
+REBALANCE_INTERVAL_DAYS = {
+    "monthly": 30,  # Rebalance once at least 30 days have passed
+    "quarterly": 120,  # Rebalance once at least 120 days have passed
+    "yearly": 365,  # Rebalance once at least 365 days have passed
+}
+
+# Fear and greed rule defaults (contrarian: buy crypto in fear, take profits in greed)
+DEFAULT_FEAR_THRESHOLD = 25  # Index values at or below count as extreme fear
+DEFAULT_GREED_THRESHOLD = 76  # Index values at or above count as extreme greed
+DEFAULT_SENTIMENT_STEP = 0.1  # Stablecoin allocation change per adjustment
+DEFAULT_MIN_STABLECOIN_ALLOCATION = 0.01
+DEFAULT_MAX_STABLECOIN_ALLOCATION = 0.99
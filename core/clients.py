@@ -0,0 +1,316 @@
+"""
+Client account functions for the indexfund package.
+
+Client accounts all hold the same index product and differ only in when they
+enter and in the cash they put in or take out. The product is therefore
+simulated once, as a net asset value per unit, and every account is one lane
+of unit holdings: a contribution buys units and a withdrawal redeems them at
+the unit value of its bar. Between cash flows an account's units do not
+change, so a whole client book costs one strategy simulation plus one
+vectorized update per bar that has cash flows, and money-weighted returns are
+solved for all accounts at once.
+"""
+
+import numpy as np
+
+from config import DEFAULT_SWAP_FEE
+from core.context import build_market_context
+from core.montecarlo import summarize_distribution
+from core.simulation import calculate_historical_index_prices_batch
+from core.staking import MILLISECONDS_PER_DAY
+
+MILLISECONDS_PER_YEAR = 365 * MILLISECONDS_PER_DAY
+
+# Bracket of the annual log growth searched for money-weighted returns
+MONEY_WEIGHTED_BRACKET = (-50.0, 50.0)
+MONEY_WEIGHTED_ITERATIONS = 100
+
+
+# --- Cash Flows ---
+
+
+def _schedule_cash_flows(
+    timestamps,
+    entry_bars,
+    initial_investments,
+    contributions,
+    contribution_events,
+    cash_flows,
+):
+    """
+    Collect every account's cash flows as (account, bar, amount) arrays.
+
+    Flows of an account on the same bar are summed, and the result is sorted
+    by bar, then account.
+    """
+    accounts = len(entry_bars)
+    flow_accounts = [np.arange(accounts)]
+    flow_bars = [entry_bars]
+    flow_amounts = [initial_investments]
+
+    # Recurring contributions on every scheduled bar after the entry bar
+    if contributions is not None:
+        amounts = np.broadcast_to(np.asarray(contributions, dtype=float), (accounts,))
+        account, event = np.nonzero(
+            contribution_events[np.newaxis, :] > entry_bars[:, np.newaxis]
+        )
+        flow_accounts.append(account)
+        flow_bars.append(contribution_events[event])
+        flow_amounts.append(amounts[account])
+
+    # One-off flows, booked on the first bar at or after their timestamp
+    if cash_flows is not None:
+        cash_flows = np.asarray(cash_flows, dtype=float).reshape(-1, 3)
+        account = cash_flows[:, 0].astype(np.int64)
+        if np.any((account < 0) | (account >= accounts)):
+            raise ValueError("Cash flows refer to unknown accounts")
+        bars = np.searchsorted(
+            timestamps, cash_flows[:, 1].astype(np.int64), side="left"
+        )
+        if np.any(bars < entry_bars[account]) or np.any(bars >= len(timestamps)):
+            raise ValueError("Cash flows fall outside their account's timeline")
+        flow_accounts.append(account)
+        flow_bars.append(bars)
+        flow_amounts.append(cash_flows[:, 2])
+
+    keys = np.concatenate(flow_bars) * accounts + np.concatenate(flow_accounts)
+    keys, inverse = np.unique(keys, return_inverse=True)
+    amounts = np.bincount(inverse, weights=np.concatenate(flow_amounts))
+    return keys % accounts, keys // accounts, amounts
+
+
+def _apply_cash_flows(unit_values, flow_accounts, flow_bars, amounts, accounts):
+    """
+    Trade units for the cash flows, bar by bar and vectorized over accounts.
+
+    Withdrawals larger than an account's holdings redeem all of its units.
+
+    Returns:
+        tuple: (units, unit_changes, settled) with the final units per account,
+               and the units bought (or redeemed) and cash settled per flow
+    """
+    units = np.zeros(accounts)
+    unit_changes = np.zeros(len(amounts))
+    bounds = np.flatnonzero(np.diff(flow_bars)) + 1
+    for flows in np.split(np.arange(len(amounts)), bounds):
+        if not len(flows):
+            continue
+        account = flow_accounts[flows]
+        unit_value = unit_values[flow_bars[flows[0]]]
+        held = units[account]
+        units[account] = np.maximum(held + amounts[flows] / unit_value, 0.0)
+        unit_changes[flows] = units[account] - held
+    settled = unit_changes * unit_values[flow_bars]
+    return units, unit_changes, settled
+
+
+def money_weighted_returns(flow_accounts, flow_years, amounts, final_values):
+    """
+    Annualized money-weighted returns (internal rates of return) of accounts.
+
+    Solves ``sum(amount * (1 + r) ** years) == final_value`` for each account
+    by bisection, where ``years`` is the time from each flow to the valuation
+    date. All accounts are solved together.
+
+    Args:
+        flow_accounts (numpy.ndarray): Account index of each cash flow
+        flow_years (numpy.ndarray): Years from each cash flow to the valuation date
+        amounts (numpy.ndarray): Cash paid in (positive) or taken out (negative)
+        final_values (numpy.ndarray): Value of each account at the valuation date
+
+    Returns:
+        numpy.ndarray: Annual rate per account; NaN where no rate in the search
+                       bracket balances the flows (e.g. an account entering on
+                       the valuation date)
+    """
+    final_values = np.asarray(final_values, dtype=float)
+    accounts = len(final_values)
+    paid = amounts != 0
+    flow_accounts, flow_years, amounts = (
+        flow_accounts[paid],
+        flow_years[paid],
+        amounts[paid],
+    )
+
+    def surplus(growth):
+        with np.errstate(over="ignore", invalid="ignore"):
+            compounded = amounts * np.exp(growth[flow_accounts] * flow_years)
+        return np.bincount(flow_accounts, compounded, accounts) - final_values
+
+    low = np.full(accounts, MONEY_WEIGHTED_BRACKET[0])
+    high = np.full(accounts, MONEY_WEIGHTED_BRACKET[1])
+    low_surplus = surplus(low)
+    solvable = np.sign(low_surplus) * np.sign(surplus(high)) < 0
+
+    for _ in range(MONEY_WEIGHTED_ITERATIONS):
+        middle = (low + high) / 2
+        middle_surplus = surplus(middle)
+        same_side = np.sign(middle_surplus) == np.sign(low_surplus)
+        low = np.where(same_side, middle, low)
+        low_surplus = np.where(same_side, middle_surplus, low_surplus)
+        high = np.where(same_side, high, middle)
+
+    return np.where(solvable, np.expm1((low + high) / 2), np.nan)
+
+
+# --- Client Book ---
+
+
+def simulate_client_accounts(
+    historical_data,
+    method,
+    entry_timestamps,
+    initial_investments,
+    rebalance_frequency="none",
+    apply_staking=True,
+    stablecoin_allocation=0.5,
+    fear_greed_data=None,
+    swap_fee=DEFAULT_SWAP_FEE,
+    start_date=None,
+    contributions=None,
+    contribution_frequency="monthly",
+    cash_flows=None,
+    keep_nav=False,
+    yield_curves=None,
+):
+    """
+    Simulate many client accounts holding the same index product.
+
+    The product runs from the first bar (at or after ``start_date``) with the
+    given strategy settings, and its value per unit is 1.0 on that bar.
+    Accounts enter on the first bar at or after their entry timestamp, and
+    every cash flow trades units at the unit value of its bar without further
+    costs; flows of an account on the same bar are netted first. Recurring
+    contributions are paid on every bar of ``contribution_frequency``'s
+    schedule after an account's entry bar; negative contributions are
+    recurring withdrawals.
+
+    Args:
+        historical_data (dict, MarketPanel or MarketContext): Dictionary containing
+                              historical price and market cap data
+                              Format: {"token": [[timestamp, price, market_cap], ...]},
+                              or an already built panel or context
+        method (str): Weighting method ("market_cap", "sqrt_market_cap")
+        entry_timestamps (numpy.ndarray): Entry timestamp of each account in milliseconds
+        initial_investments (float or numpy.ndarray): Initial investment per account
+        rebalance_frequency (str): Rebalancing frequency of the product
+        apply_staking (bool): Whether to apply staking rewards
+        stablecoin_allocation (float): Stablecoin allocation of the product (0.0-1.0)
+        fear_greed_data (list): List of [timestamp, value, value_classification] entries
+        swap_fee (float): Fee percentage charged on the product's rebalancing swaps
+        start_date (datetime or str): Optional inception date of the product
+                                      (format: "YYYY-MM-DD")
+        contributions (float or numpy.ndarray, optional): Recurring contribution
+                                                          per account
+        contribution_frequency (str): Schedule of recurring contributions (any
+                                      rebalancing frequency, e.g. "month_start")
+        cash_flows (list, optional): One-off flows as [account, timestamp, amount]
+                                     entries; negative amounts are withdrawals
+        keep_nav (bool): Whether to return every account's value on every bar
+        yield_curves (YieldCurves, optional): Time-varying staking APRs used
+                                              instead of STAKING_CONFIG
+
+    Returns:
+        dict: "timestamps" and "unit_values" of the product (bars,), one array
+              (accounts,) per account summary ("entry_timestamps", "units",
+              "final_value", "contributions", "withdrawals", "profit",
+              "time_weighted_return", "money_weighted_return"), and "nav"
+              (accounts x bars, NaN before entry) if ``keep_nav`` is set
+    """
+    context = build_market_context(
+        historical_data, start_date=start_date, fear_greed_data=fear_greed_data
+    )
+    if not len(context):
+        raise ValueError("No market data to simulate client accounts on")
+
+    # --- Index Product ---
+    timestamps, values, _ = calculate_historical_index_prices_batch(
+        context,
+        method,
+        [stablecoin_allocation],
+        rebalance_frequency=rebalance_frequency,
+        apply_staking=apply_staking,
+        fear_greed_data=fear_greed_data,
+        swap_fee=swap_fee,
+        yield_curves=yield_curves,
+    )
+    unit_values = values[0] / values[0, 0]
+
+    # --- Cash Flows ---
+    entry_bars = np.searchsorted(
+        timestamps, np.asarray(entry_timestamps, dtype=np.int64), side="left"
+    )
+    if np.any(entry_bars >= len(timestamps)):
+        raise ValueError("Accounts cannot enter after the last bar")
+    accounts = len(entry_bars)
+    initial_investments = np.broadcast_to(
+        np.asarray(initial_investments, dtype=float), (accounts,)
+    )
+    contribution_events = None
+    if contributions is not None:
+        contribution_events = context.rebalance_events(contribution_frequency)[0]
+    flow_accounts, flow_bars, amounts = _schedule_cash_flows(
+        timestamps,
+        entry_bars,
+        initial_investments,
+        contributions,
+        contribution_events,
+        cash_flows,
+    )
+    units, unit_changes, settled = _apply_cash_flows(
+        unit_values, flow_accounts, flow_bars, amounts, accounts
+    )
+
+    # --- Account Summaries ---
+    final_value = units * unit_values[-1]
+    paid_in = np.bincount(flow_accounts, np.maximum(settled, 0.0), accounts)
+    paid_out = np.bincount(flow_accounts, np.maximum(-settled, 0.0), accounts)
+    flow_years = (timestamps[-1] - timestamps[flow_bars]) / MILLISECONDS_PER_YEAR
+    results = {
+        "timestamps": timestamps,
+        "unit_values": unit_values,
+        "entry_timestamps": timestamps[entry_bars],
+        "units": units,
+        "final_value": final_value,
+        "contributions": paid_in,
+        "withdrawals": paid_out,
+        "profit": final_value + paid_out - paid_in,
+        "time_weighted_return": unit_values[-1] / unit_values[entry_bars] - 1,
+        "money_weighted_return": money_weighted_returns(
+            flow_accounts, flow_years, settled, final_value
+        ),
+    }
+
+    if keep_nav:
+        held_units = np.zeros((accounts, len(timestamps)))
+        held_units[flow_accounts, flow_bars] = unit_changes
+        np.cumsum(held_units, axis=1, out=held_units)
+        nav = held_units * unit_values
+        nav[np.arange(len(timestamps)) < entry_bars[:, np.newaxis]] = np.nan
+        results["nav"] = nav
+
+    return results
+
+
+def summarize_client_accounts(results):
+    """
+    Summarize a client book simulated by simulate_client_accounts.
+
+    Args:
+        results (dict): Output of simulate_client_accounts
+
+    Returns:
+        dict: Number of accounts, total assets, contributions and withdrawals,
+              and the distribution of money-weighted returns
+    """
+    summary = {
+        "accounts": len(results["units"]),
+        "assets": float(np.sum(results["final_value"])),
+        "contributions": float(np.sum(results["contributions"])),
+        "withdrawals": float(np.sum(results["withdrawals"])),
+    }
+    returns = results["money_weighted_return"]
+    returns = returns[~np.isnan(returns)]
+    if len(returns):
+        summary["money_weighted_return"] = summarize_distribution(returns)
+    return summary
@@ -0,0 +1,236 @@
+"""
+Market context functions for the indexfund package.
+
+A MarketContext holds everything about the market that the strategies of a
+run share: the market panel, weight matrices per weighting method, rebalance
+schedules per frequency and the fear and greed series aligned with the
+timeline. It is built once per run and passed to every simulation in place
+of the historical data, so preparing one more strategy costs a few cache
+lookups instead of rebuilding the panel and realigning every series.
+"""
+
+from datetime import datetime
+
+import numpy as np
+
+from core.panel import (
+    MarketPanel,
+    _prepare_fear_greed_data,
+    align_fear_greed_data,
+    build_market_panel,
+    slice_market_panel,
+)
+from core.schedule import continue_rebalance_events
+from core.weighting import calculate_weight_matrix
+
+
+class MarketContext:
+    """
+    Prepared market data shared by every strategy of a run.
+
+    Weight matrices, schedules and start-date slices are computed on first
+    use and kept for the lifetime of the context; returned arrays are
+    read-only.
+
+    Attributes:
+        panel (MarketPanel): Market data of the run
+        fear_greed_data (list): Fear and greed entries the context was built
+                                with (None without sentiment data)
+        fear_greed_map (dict): The entries keyed by timestamp (None without data)
+        fear_greed_values (numpy.ndarray): Index value per bar (NaN without data)
+        fear_greed_classes (numpy.ndarray): FEAR_GREED_* code per bar
+    """
+
+    __slots__ = (
+        "panel",
+        "fear_greed_data",
+        "fear_greed_map",
+        "fear_greed_values",
+        "fear_greed_classes",
+        "_weights",
+        "_schedules",
+        "_slices",
+        "_parent",
+        "_rows",
+    )
+
+    def __init__(self, panel, fear_greed_data=None):
+        self.panel = panel
+        self.fear_greed_data = fear_greed_data or None
+        self.fear_greed_map = _prepare_fear_greed_data(fear_greed_data)
+        self.fear_greed_values, self.fear_greed_classes = align_fear_greed_data(
+            panel.timestamps, fear_greed_data
+        )
+        self.fear_greed_values.setflags(write=False)
+        self.fear_greed_classes.setflags(write=False)
+        self._weights = {}
+        self._schedules = {}
+        self._slices = {}
+        self._parent = None
+        self._rows = slice(None)
+
+    def __len__(self):
+        return len(self.panel)
+
+    def __repr__(self):
+        return (
+            f"MarketContext(tokens={self.panel.tokens!r}, bars={len(self.panel)}, "
+            f"fear_greed={self.fear_greed_data is not None})"
+        )
+
+    @property
+    def timestamps(self):
+        """Timeline of the context's panel."""
+        return self.panel.timestamps
+
+    def weight_matrix(self, method):
+        """
+        Index weights of every bar for a weighting method.
+
+        Args:
+            method (str): Weighting method ("market_cap", "sqrt_market_cap", ...)
+
+        Returns:
+            numpy.ndarray: (time x tokens) weights, as from calculate_weight_matrix
+        """
+        weights = self._weights.get(method)
+        if weights is None and self._parent is not None:
+            # Rows are normalized independently, so a slice's weights are rows
+            # of the full matrix
+            weights = self._parent.weight_matrix(method)[self._rows]
+            self._weights[method] = weights
+        elif weights is None:
+            panel = self.panel
+            weights = calculate_weight_matrix(
+                panel.market_caps,
+                method,
+                listed=panel.listed,
+                fingerprint=panel.fingerprint,
+            )
+            self._weights[method] = weights
+        return weights
+
+    def rebalance_events(self, frequency):
+        """
+        Rebalance schedule of the whole timeline for a frequency.
+
+        Args:
+            frequency (str): Rebalancing frequency (see continue_rebalance_events)
+
+        Returns:
+            tuple: (events, anchor, floor) as returned by continue_rebalance_events
+                   for the whole timeline
+        """
+        schedule = self._schedules.get(frequency)
+        if schedule is None:
+            events, anchor, floor = continue_rebalance_events(
+                self.panel.timestamps, frequency
+            )
+            events.setflags(write=False)
+            schedule = self._schedules[frequency] = (events, anchor, floor)
+        return schedule
+
+    def rebalance_schedule(self, frequency):
+        """
+        Boolean rebalance mask of the whole timeline for a frequency.
+
+        Args:
+            frequency (str): Rebalancing frequency (see continue_rebalance_events)
+
+        Returns:
+            numpy.ndarray: Boolean array, True where a rebalance occurs
+        """
+        schedule = np.zeros(len(self.panel), dtype=bool)
+        schedule[self.rebalance_events(frequency)[0]] = True
+        return schedule
+
+    def fear_greed(self, fear_greed_data):
+        """
+        Aligned fear and greed series for a run.
+
+        Args:
+            fear_greed_data (list or None): The run's fear and greed entries; the
+                                            context's own entries cost nothing
+
+        Returns:
+            tuple: (values, classifications) as returned by align_fear_greed_data
+        """
+        if fear_greed_data and fear_greed_data is self.fear_greed_data:
+            return self.fear_greed_values, self.fear_greed_classes
+        return align_fear_greed_data(self.panel.timestamps, fear_greed_data)
+
+    def since(self, start_date):
+        """
+        Return the context from a start date on.
+
+        The slice shares the panel's memory and takes its weight matrices from
+        this context, and is kept so that every strategy with the same start
+        date uses the same slice.
+
+        Args:
+            start_date (datetime or str): Start date (format: "YYYY-MM-DD"),
+                                          or None for the whole context
+
+        Returns:
+            MarketContext: Context over the bars at or after ``start_date``
+        """
+        if not start_date:
+            return self
+        if isinstance(start_date, str):
+            start_date = datetime.strptime(start_date, "%Y-%m-%d")
+        start = int(
+            np.searchsorted(
+                self.panel.timestamps, int(start_date.timestamp() * 1000), side="left"
+            )
+        )
+        if start == 0:
+            return self
+
+        context = self._slices.get(start)
+        if context is None:
+            rows = slice(start, None)
+            context = MarketContext(slice_market_panel(self.panel, start))
+            context.fear_greed_data = self.fear_greed_data
+            context.fear_greed_map = self.fear_greed_map
+            context.fear_greed_values = self.fear_greed_values[rows]
+            context.fear_greed_classes = self.fear_greed_classes[rows]
+            context._parent = self
+            context._rows = rows
+            self._slices[start] = context
+        return context
+
+
+def build_market_context(
+    historical_data,
+    start_date=None,
+    fear_greed_data=None,
+    volume_data=None,
+    dtype=np.float64,
+):
+    """
+    Prepare the market data of a run once for every strategy.
+
+    Args:
+        historical_data (dict, MarketPanel or MarketContext): Dictionary containing
+                              historical price and market cap data
+                              Format: {"token": [[timestamp, price, market_cap], ...]},
+                              or an already built panel or context
+        start_date (datetime or str): Optional start date (format: "YYYY-MM-DD")
+        fear_greed_data (list): List of [timestamp, value, value_classification] entries
+                                (ignored when ``historical_data`` is a context)
+        volume_data (dict, optional): Traded volumes for transaction cost models
+                                      Format: {"token": [[timestamp, volume], ...]}
+        dtype (numpy.dtype): Floating-point type of the panel's prices and market caps
+
+    Returns:
+        MarketContext: Context over the bars at or after ``start_date``
+    """
+    if isinstance(historical_data, MarketContext):
+        return historical_data.since(start_date)
+
+    panel = historical_data
+    if not isinstance(panel, MarketPanel):
+        panel = build_market_panel(
+            historical_data or {}, dtype=dtype, volume_data=volume_data
+        )
+    return MarketContext(panel, fear_greed_data).since(start_date)
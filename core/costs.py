@@ -0,0 +1,127 @@
+"""
+Transaction cost functions for the indexfund package.
+
+A CostModel prices every swap as a per-token fee rate plus a market impact
+term that grows with the trade's share of the token's traded volume at that
+bar, ``impact_coefficient * (trade_usd / volume) ** impact_exponent`` (the
+square-root law by default). Rebalance kernels accept a cost function bound to
+one bar in place of a flat fee rate and evaluate it once per rebalance on the
+planned trade of every token and lane.
+"""
+
+import functools
+
+import numpy as np
+
+from config import (
+    DEFAULT_IMPACT_COEFFICIENT,
+    DEFAULT_IMPACT_EXPONENT,
+    DEFAULT_SWAP_FEE,
+)
+
+
+class CostModel:
+    """
+    Per-token fee tiers plus a volume-driven market impact term.
+
+    Args:
+        default_fee (float): Fee rate for tokens without a tier
+        fee_tiers (dict, optional): Fee rate per token symbol
+        impact_coefficient (float): Impact cost rate of a trade equal to the
+            bar's traded volume (0 disables market impact)
+        impact_exponent (float): Exponent applied to the trade's share of volume
+    """
+
+    __slots__ = ("default_fee", "fee_tiers", "impact_coefficient", "impact_exponent")
+
+    def __init__(
+        self,
+        default_fee=DEFAULT_SWAP_FEE,
+        fee_tiers=None,
+        impact_coefficient=DEFAULT_IMPACT_COEFFICIENT,
+        impact_exponent=DEFAULT_IMPACT_EXPONENT,
+    ):
+        fee_tiers = dict(fee_tiers or {})
+        for rate in [default_fee, *fee_tiers.values()]:
+            if not 0.0 <= rate < 1.0:
+                raise ValueError(f"Fee rates must be in [0, 1), got {rate!r}")
+        if impact_coefficient < 0:
+            raise ValueError("Impact coefficient cannot be negative")
+        if impact_exponent <= 0:
+            raise ValueError("Impact exponent must be positive")
+        self.default_fee = default_fee
+        self.fee_tiers = fee_tiers
+        self.impact_coefficient = impact_coefficient
+        self.impact_exponent = impact_exponent
+
+    def __repr__(self):
+        return (
+            f"CostModel(default_fee={self.default_fee!r}, fee_tiers={self.fee_tiers!r}, "
+            f"impact_coefficient={self.impact_coefficient!r}, "
+            f"impact_exponent={self.impact_exponent!r})"
+        )
+
+
+def token_fee_rates(cost_model, tokens):
+    """
+    Look up the fee tier of each token.
+
+    Args:
+        cost_model (CostModel): Cost model
+        tokens (list): Token symbols, in column order
+
+    Returns:
+        numpy.ndarray: Fee rate per token
+    """
+    return np.array(
+        [cost_model.fee_tiers.get(token, cost_model.default_fee) for token in tokens],
+        dtype=float,
+    )
+
+
+def swap_cost_rates(cost_model, fee_rates, volumes, trade_usd):
+    """
+    Calculate the cost rate of each planned trade.
+
+    Tokens without a positive traded volume (missing data) are charged their
+    fee rate only. Rates are capped at 1 so a swap never costs more than its
+    size.
+
+    Args:
+        cost_model (CostModel): Cost model
+        fee_rates (numpy.ndarray): Fee rate per token
+        volumes (numpy.ndarray, optional): Traded USD volume per token at the bar
+        trade_usd (numpy.ndarray): Planned USD trade per token, with any
+                                   number of leading lane dimensions
+
+    Returns:
+        numpy.ndarray: Cost rate per trade, shaped like ``trade_usd``
+    """
+    trade_usd = np.asarray(trade_usd, dtype=float)
+    if volumes is None or cost_model.impact_coefficient == 0:
+        return np.broadcast_to(fee_rates, trade_usd.shape)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        participation = np.where(volumes > 0, trade_usd / volumes, 0.0)
+    impact = cost_model.impact_coefficient * np.power(
+        np.where(np.isfinite(participation), participation, 0.0),
+        cost_model.impact_exponent,
+    )
+    return np.minimum(fee_rates + impact, 1.0)
+
+
+def bind_swap_costs(cost_model, fee_rates, volumes=None):
+    """
+    Bind a cost model to the fee rates and volumes of one bar.
+
+    The result can be passed as ``swap_fee_rate`` to the rebalance functions.
+
+    Args:
+        cost_model (CostModel): Cost model
+        fee_rates (numpy.ndarray): Fee rate per token (see token_fee_rates)
+        volumes (numpy.ndarray, optional): Traded USD volume per token at the bar
+
+    Returns:
+        callable: Function mapping planned USD trades to cost rates
+    """
+    return functools.partial(swap_cost_rates, cost_model, fee_rates, volumes)
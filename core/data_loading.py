@@ -5,8 +5,10 @@ Contains functions for loading and preprocessing historical crypto data.
 
 import csv
 import json
-from datetime import datetime
+import os
+from datetime import datetime, timezone
 
+from core.staking import YieldCurves
 from utils.utils import validate_data_length_consistency
 
 
@@ -87,6 +89,130 @@ def load_historical_data(tokens, data_dir="./"):
     return historical_data
 
 
+def load_token_volumes(token_filename):
+    """
+    Load historical traded volume for a token from a CSV file.
+
+    Args:
+        token_filename (str): Path to the CSV file containing token data
+
+    Returns:
+        list: List of [timestamp, volume] entries, sorted by timestamp
+        None: If there was an error loading the file
+    """
+    try:
+        with open(token_filename, "r", encoding="utf-8-sig") as f:
+            reader = csv.DictReader(f, delimiter=";")
+            volume_data = []
+
+            for row in reader:
+                dt = datetime.fromisoformat(row["timeOpen"].replace("Z", "+00:00"))
+                timestamp = int(dt.timestamp() * 1000)  # Convert to milliseconds
+                volume_data.append([timestamp, float(row["volume"])])
+
+            volume_data.sort(key=lambda x: x[0])
+            return volume_data
+
+    except FileNotFoundError:
+        print(f"Warning: {token_filename} not found")
+    except KeyError as e:
+        print(f"Warning: Missing key {e} in {token_filename}")
+    except Exception as e:
+        print(f"Warning: Error processing {token_filename}: {e}")
+
+    return None
+
+
+def load_volume_data(tokens, data_dir="./"):
+    """
+    Load historical traded volumes for multiple tokens from CSV files.
+
+    Args:
+        tokens (list): List of token symbols to load volumes for
+        data_dir (str): Directory containing the CSV files (default: current directory)
+
+    Returns:
+        dict: Dictionary mapping token symbols to [timestamp, volume] entries
+    """
+    volume_data = {}
+
+    for token in tokens:
+        token_volumes = load_token_volumes(f"{data_dir}/{token}.csv")
+        if token_volumes:
+            volume_data[token] = token_volumes
+
+    return volume_data
+
+
+def load_yield_curve(curve_filename):
+    """
+    Load a staking APR time series from a CSV file.
+
+    The file has "date" and "apr" columns; dates are ISO dates or datetimes
+    (UTC unless they carry an offset) and APRs are decimals (0.04 for 4%).
+
+    Args:
+        curve_filename (str): Path to the CSV file containing the APR series
+
+    Returns:
+        list: List of [timestamp, apr] entries, sorted by timestamp
+        None: If there was an error loading the file
+    """
+    try:
+        with open(curve_filename, "r", encoding="utf-8-sig") as f:
+            reader = csv.DictReader(f)
+            curve = []
+
+            for row in reader:
+                dt = datetime.fromisoformat(row["date"].replace("Z", "+00:00"))
+                if dt.tzinfo is None:
+                    dt = dt.replace(tzinfo=timezone.utc)
+                timestamp = int(dt.timestamp() * 1000)  # Convert to milliseconds
+                curve.append([timestamp, float(row["apr"])])
+
+            curve.sort(key=lambda x: x[0])
+            return curve
+
+    except FileNotFoundError:
+        print(f"Warning: {curve_filename} not found")
+    except KeyError as e:
+        print(f"Warning: Missing key {e} in {curve_filename}")
+    except Exception as e:
+        print(f"Warning: Error processing {curve_filename}: {e}")
+
+    return None
+
+
+def load_yield_curves(symbols, data_dir="./", staking_config=None):
+    """
+    Load staking APR series and build their cumulative accrual index.
+
+    Symbols without a file in ``data_dir`` keep their constant APR.
+
+    Args:
+        symbols (list): Asset symbols to load curves for (may include "stablecoin")
+        data_dir (str): Directory containing one "<symbol>.csv" file per curve
+        staking_config (dict, optional): Constant APR per symbol for symbols
+                                         without a curve (default: STAKING_CONFIG)
+
+    Returns:
+        YieldCurves: Curves ready for the simulation functions
+    """
+    curves = {}
+
+    for symbol in symbols:
+        file_path = f"{data_dir}/{symbol}.csv"
+        if not os.path.exists(file_path):
+            continue
+        curve = load_yield_curve(file_path)
+        if curve:
+            curves[symbol] = curve
+        else:
+            print(f"Warning: Could not load yield curve for {symbol}")
+
+    return YieldCurves(curves, staking_config)
+
+
 def filter_data_by_start_date(historical_data, start_timestamp):
     """
     Filter historical data to only include data points after the start timestamp.
@@ -0,0 +1,160 @@
+"""
+Drift-band rebalancing functions for the indexfund package.
+
+A drift band triggers a rebalance as soon as a token's weight within the
+volatile portion, or the stablecoin share of the whole portfolio, moves too
+far from its target. Between rebalances holdings only change through staking,
+so the bar at which a band is first breached can be found for a whole block
+of bars at once instead of checking every token on every bar.
+"""
+
+import numpy as np
+
+# Number of bars examined by the first drift scan; later scans double in size
+_INITIAL_SCAN_WINDOW = 32
+
+
+class DriftBand:
+    """
+    Thresholds for drift-triggered rebalancing.
+
+    Args:
+        token_band (float, optional): Maximum deviation of a token's weight from
+            its target weight (None disables token drift checks)
+        relative (bool): Interpret ``token_band`` relative to the target weight
+            (0.2 allows a 10% target to move between 8% and 12%) instead of in
+            absolute weight points
+        allocation_band (float, optional): Maximum deviation of the stablecoin
+            share from the target allocation (None disables the check)
+    """
+
+    __slots__ = ("token_band", "relative", "allocation_band")
+
+    def __init__(self, token_band=None, relative=False, allocation_band=None):
+        self.token_band = token_band
+        self.relative = relative
+        self.allocation_band = allocation_band
+
+    def __repr__(self):
+        return (
+            f"DriftBand(token_band={self.token_band!r}, relative={self.relative!r}, "
+            f"allocation_band={self.allocation_band!r})"
+        )
+
+
+def drift_breaches(
+    token_values, stablecoin_values, target_weights, target_allocation, band
+):
+    """
+    Check drift bands for a block of portfolio valuations.
+
+    Args:
+        token_values (numpy.ndarray): (bars x tokens) USD values, NaN where unpriced
+        stablecoin_values (numpy.ndarray): Stablecoin USD value per bar
+        target_weights (numpy.ndarray): Target weight per token within the volatile portion
+        target_allocation (float): Target stablecoin allocation (0.0-1.0)
+        band (DriftBand): Drift thresholds
+
+    Returns:
+        tuple: (token_breach, allocation_breach) boolean arrays, one entry per bar
+    """
+    priced = ~np.isnan(token_values)
+    volatile_values = np.sum(token_values, axis=-1, where=priced)
+
+    token_breach = np.zeros(len(token_values), dtype=bool)
+    if band.token_band is not None:
+        with np.errstate(divide="ignore", invalid="ignore"):
+            weights = token_values / volatile_values[:, np.newaxis]
+        tolerance = band.token_band
+        if band.relative:
+            tolerance = band.token_band * target_weights
+        deviation = np.abs(weights - target_weights) > tolerance
+        token_breach = np.any(deviation & priced, axis=-1) & (volatile_values > 0)
+
+    allocation_breach = np.zeros(len(token_values), dtype=bool)
+    if band.allocation_band is not None:
+        total_values = volatile_values + stablecoin_values
+        with np.errstate(divide="ignore", invalid="ignore"):
+            shares = stablecoin_values / total_values
+        allocation_breach = (
+            np.abs(shares - target_allocation) > band.allocation_band
+        ) & (total_values > 0)
+
+    return token_breach, allocation_breach
+
+
+def find_drift_trigger(
+    quantities,
+    stablecoin_quantity,
+    prices,
+    token_growth,
+    stablecoin_growth,
+    target_weights,
+    target_allocation,
+    band,
+):
+    """
+    Find the first upcoming bar at which holdings breach a drift band.
+
+    Holdings are carried forward with the per-bar staking growth exactly as
+    the simulation applies it (a running product), so the bar found here is
+    the bar at which a bar-by-bar check would fire. Bars are examined in
+    blocks of growing size, so the cost is proportional to the distance to
+    the trigger rather than to the remaining timeline.
+
+    Args:
+        quantities (numpy.ndarray): Current token quantities
+        stablecoin_quantity (float): Current stablecoin quantity
+        prices (numpy.ndarray): (bars x tokens) prices of the upcoming bars
+        token_growth (numpy.ndarray, optional): (bars x tokens) staking multipliers
+                                                applied at each upcoming bar
+        stablecoin_growth (numpy.ndarray, optional): Stablecoin multiplier per upcoming bar
+        target_weights (numpy.ndarray): Target weight per token
+        target_allocation (float): Target stablecoin allocation (0.0-1.0)
+        band (DriftBand): Drift thresholds
+
+    Returns:
+        tuple: (offset, token_breach, allocation_breach) for the first breaching
+               bar, or None if no upcoming bar breaches the band
+    """
+    start = 0
+    window = _INITIAL_SCAN_WINDOW
+    quantities = np.asarray(quantities, dtype=float)
+    stablecoin_quantity = np.float64(stablecoin_quantity)
+
+    while start < len(prices):
+        stop = min(start + window, len(prices))
+
+        if token_growth is None:
+            quantity_path = np.broadcast_to(quantities, (stop - start, len(quantities)))
+            stablecoin_path = np.full(stop - start, stablecoin_quantity)
+        else:
+            quantity_path = np.cumprod(
+                np.vstack([quantities, token_growth[start:stop]]), axis=0
+            )[1:]
+            stablecoin_path = np.cumprod(
+                np.concatenate([[stablecoin_quantity], stablecoin_growth[start:stop]])
+            )[1:]
+            quantities = quantity_path[-1]
+            stablecoin_quantity = stablecoin_path[-1]
+
+        token_breach, allocation_breach = drift_breaches(
+            quantity_path * prices[start:stop],
+            stablecoin_path,
+            target_weights,
+            target_allocation,
+            band,
+        )
+        breached = np.flatnonzero(token_breach | allocation_breach)
+        if len(breached):
+            first = breached[0]
+            return (
+                start + int(first),
+                bool(token_breach[first]),
+                bool(allocation_breach[first]),
+            )
+
+        start = stop
+        window *= 2
+
+    return None
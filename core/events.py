@@ -0,0 +1,321 @@
+"""
+Simulation event log for the indexfund package.
+
+Portfolio functions record typed events (initialization, rebalances, sentiment
+adjustments, run summaries) into columnar NumPy buffers instead of printing
+formatted strings. Formatting only happens when an event is echoed, written to
+a JSONL sink, or rendered on request, and events above the log's verbosity are
+dropped before any work is done.
+"""
+
+import json
+from datetime import datetime
+
+import numpy as np
+
+# Verbosity levels
+SILENT = 0  # Record nothing
+SUMMARY = 1  # Portfolio initialization and end-of-run summaries
+DETAIL = 2  # Every rebalance and allocation change
+
+# Event types
+PORTFOLIO_INITIALIZED = 1
+TOKEN_REBALANCE = 2
+STABLECOIN_REBALANCE = 3
+SENTIMENT_ADJUSTMENT = 4
+SIMULATION_COMPLETE = 5
+
+# Per-bar flags reported by streaming simulations
+EVENT_FLAG_REBALANCE = 1
+EVENT_FLAG_SENTIMENT = 2
+EVENT_FLAG_DRIFT = 4
+
+EVENT_NAMES = {
+    PORTFOLIO_INITIALIZED: "portfolio_initialized",
+    TOKEN_REBALANCE: "token_rebalance",
+    STABLECOIN_REBALANCE: "stablecoin_rebalance",
+    SENTIMENT_ADJUSTMENT: "sentiment_adjustment",
+    SIMULATION_COMPLETE: "simulation_complete",
+}
+
+EVENT_LEVELS = {
+    PORTFOLIO_INITIALIZED: SUMMARY,
+    TOKEN_REBALANCE: DETAIL,
+    STABLECOIN_REBALANCE: DETAIL,
+    SENTIMENT_ADJUSTMENT: DETAIL,
+    SIMULATION_COMPLETE: SUMMARY,
+}
+
+# Names of the numeric fields carried by each event type, in column order
+EVENT_FIELDS = {
+    PORTFOLIO_INITIALIZED: (
+        "initial_value",
+        "stablecoin_usd",
+        "volatile_usd",
+        "stablecoin_allocation",
+    ),
+    TOKEN_REBALANCE: ("volatile_value", "fees_paid", "swap_fee_rate"),
+    STABLECOIN_REBALANCE: ("new_allocation", "adjustment", "fees_paid"),
+    SENTIMENT_ADJUSTMENT: ("previous_allocation", "new_allocation"),
+    SIMULATION_COMPLETE: (
+        "initial_allocation",
+        "final_stablecoin_pct",
+        "initial_value",
+        "final_value",
+        "total_return",
+        "annualized_roi",
+        "max_drawdown",
+        "rebalance_count",
+        "total_fees_paid",
+        "fear_greed_rebalance_count",
+    ),
+}
+
+FIELD_COUNT = max(len(fields) for fields in EVENT_FIELDS.values())
+
+
+class EventLog:
+    """
+    Columnar, growable buffer of simulation events.
+
+    Args:
+        verbosity (int): Highest event level to record (SILENT, SUMMARY or DETAIL)
+        echo (bool): Print each recorded event as text
+        sink (str or file, optional): JSONL file path or handle for recorded events
+        retain (bool): Keep recorded events in memory for later rendering
+        capacity (int): Initial buffer capacity, grown by doubling
+    """
+
+    __slots__ = (
+        "verbosity",
+        "echo",
+        "sink",
+        "retain",
+        "size",
+        "kinds",
+        "timestamps",
+        "values",
+        "labels",
+        "_owns_sink",
+    )
+
+    def __init__(
+        self, verbosity=DETAIL, echo=False, sink=None, retain=True, capacity=256
+    ):
+        self.verbosity = verbosity
+        self.echo = echo
+        self.retain = retain
+        self._owns_sink = isinstance(sink, str)
+        self.sink = open(sink, "a", encoding="utf-8") if self._owns_sink else sink
+        self.size = 0
+        self.kinds = np.zeros(capacity, dtype=np.int8)
+        self.timestamps = np.zeros(capacity, dtype=np.int64)
+        self.values = np.full((capacity, FIELD_COUNT), np.nan)
+        self.labels = np.empty(capacity, dtype=object)
+
+    def enabled(self, kind):
+        """Return True if events of this type are recorded."""
+        return EVENT_LEVELS[kind] <= self.verbosity
+
+    def record(self, kind, timestamp, *values, label=None):
+        """
+        Record an event.
+
+        Args:
+            kind (int): Event type constant
+            timestamp (int): Event timestamp in milliseconds (0 if not applicable)
+            *values (float): Numeric fields, in EVENT_FIELDS order
+            label (object, optional): Non-numeric detail (e.g. method name)
+        """
+        if EVENT_LEVELS[kind] > self.verbosity:
+            return
+
+        if self.retain:
+            if self.size == len(self.kinds):
+                self._grow()
+            row = self.size
+            self.kinds[row] = kind
+            self.timestamps[row] = timestamp
+            self.values[row, : len(values)] = values
+            self.labels[row] = label
+            self.size += 1
+
+        if self.echo:
+            print(render_event(kind, timestamp, values, label))
+        if self.sink is not None:
+            self.sink.write(json.dumps(event_to_dict(kind, timestamp, values, label)))
+            self.sink.write("\n")
+
+    def _grow(self):
+        """Double the capacity of every column."""
+        capacity = 2 * len(self.kinds)
+        self.kinds = np.resize(self.kinds, capacity)
+        self.timestamps = np.resize(self.timestamps, capacity)
+        values = np.full((capacity, FIELD_COUNT), np.nan)
+        values[: self.size] = self.values[: self.size]
+        self.values = values
+        labels = np.empty(capacity, dtype=object)
+        labels[: self.size] = self.labels[: self.size]
+        self.labels = labels
+
+    def events(self, kind=None):
+        """
+        Return recorded events as column arrays.
+
+        Args:
+            kind (int, optional): Only return events of this type
+
+        Returns:
+            dict: "kind", "timestamp", "label" arrays and one array per field name
+                  (field names are only included when ``kind`` is given)
+        """
+        rows = slice(0, self.size)
+        if kind is not None:
+            rows = np.flatnonzero(self.kinds[: self.size] == kind)
+
+        columns = {
+            "kind": self.kinds[rows],
+            "timestamp": self.timestamps[rows],
+            "label": self.labels[rows],
+        }
+        if kind is not None:
+            for column, field in enumerate(EVENT_FIELDS[kind]):
+                columns[field] = self.values[rows, column]
+        return columns
+
+    def count(self, kind):
+        """Return the number of recorded events of a type."""
+        return int(np.count_nonzero(self.kinds[: self.size] == kind))
+
+    def render(self):
+        """Return all recorded events as text lines."""
+        lines = []
+        for row in range(self.size):
+            kind = int(self.kinds[row])
+            values = self.values[row, : len(EVENT_FIELDS[kind])]
+            lines.append(
+                render_event(kind, self.timestamps[row], values, self.labels[row])
+            )
+        return lines
+
+    def clear(self):
+        """Forget all recorded events."""
+        self.size = 0
+        self.labels[:] = None
+
+    def close(self):
+        """Close the JSONL sink if this log opened it."""
+        if self._owns_sink and self.sink is not None:
+            self.sink.close()
+            self.sink = None
+
+
+def event_to_dict(kind, timestamp, values, label=None):
+    """Convert an event to a JSON-serializable dictionary."""
+    event = {"event": EVENT_NAMES[kind], "timestamp": int(timestamp)}
+    event.update(
+        {field: float(value) for field, value in zip(EVENT_FIELDS[kind], values)}
+    )
+    if label is not None:
+        event["label"] = label if isinstance(label, str) else list(label)
+    return event
+
+
+def _date(timestamp):
+    """Format a millisecond timestamp as a date."""
+    return datetime.fromtimestamp(timestamp / 1000).date()
+
+
+def render_event(kind, timestamp, values, label=None):
+    """
+    Format an event as the text the simulation used to print.
+
+    Args:
+        kind (int): Event type constant
+        timestamp (int): Event timestamp in milliseconds
+        values (sequence): Numeric fields, in EVENT_FIELDS order
+        label (object, optional): Non-numeric detail recorded with the event
+
+    Returns:
+        str: Human-readable (possibly multi-line) description
+    """
+    fields = dict(zip(EVENT_FIELDS[kind], values))
+
+    if kind == PORTFOLIO_INITIALIZED:
+        allocation = fields["stablecoin_allocation"]
+        return "\n".join(
+            [
+                f"Initialized portfolio with {fields['initial_value']:.2f} USD",
+                f"  Stablecoin: {fields['stablecoin_usd']:.2f} USD ({allocation*100:.1f}%)",
+                f"  Volatile assets: {fields['volatile_usd']:.2f} USD ({(1 - allocation)*100:.1f}%)",
+                f"Portfolio initialized with {allocation*100:.1f}% stablecoin allocation",
+            ]
+        )
+
+    if kind == TOKEN_REBALANCE:
+        lines = [
+            f"Rebalancing portfolio: volatile assets worth ${fields['volatile_value']:.2f} at {_date(timestamp)}"
+        ]
+        if fields["fees_paid"] > 0:
+            lines.append(
+                f"Paid ${fields['fees_paid']:.2f} in swap fees ({fields['swap_fee_rate']*100:.2f}% fee rate)"
+            )
+        return "\n".join(lines)
+
+    if kind == STABLECOIN_REBALANCE:
+        action = "Increased" if fields["adjustment"] > 0 else "Decreased"
+        return (
+            f"{action} stablecoin allocation to {fields['new_allocation']:.2f} "
+            + f"(adjusted by ${abs(fields['adjustment']):.2f}, paid ${fields['fees_paid']:.2f} in fees)"
+        )
+
+    if kind == SENTIMENT_ADJUSTMENT:
+        increased = fields["new_allocation"] > fields["previous_allocation"]
+        action = "Increased" if increased else "Decreased"
+        return f"Contrarian strategy: {action} stablecoin to {fields['new_allocation']:.2f} due to {label} at {_date(timestamp)}"
+
+    if kind == SIMULATION_COMPLETE:
+        method, rebalance_frequency = label
+        initial_allocation = fields["initial_allocation"]
+        final_stablecoin_pct = fields["final_stablecoin_pct"]
+        lines = [
+            f"Simulation complete: {method} with {rebalance_frequency} rebalancing",
+            f"  Initial allocation: {initial_allocation*100:.1f}% stablecoin, {(1-initial_allocation)*100:.1f}% crypto",
+            f"  Final allocation: {final_stablecoin_pct:.1f}% stablecoin, {100 - final_stablecoin_pct:.1f}% crypto",
+            f"  Initial value: ${fields['initial_value']:.2f}",
+            f"  Final value: ${fields['final_value']:.2f}",
+            f"  Return: {fields['total_return']:.2f}%",
+            f"  Annualized ROI: {fields['annualized_roi']:.2f}%",
+            f"  Max Drawdown: {fields['max_drawdown']:.2f}%",
+            f"  Rebalances performed: {int(fields['rebalance_count'])}",
+            f"  Total fees paid: ${fields['total_fees_paid']:.2f}",
+        ]
+        if not np.isnan(fields["fear_greed_rebalance_count"]):
+            lines.append(
+                f"  Fear & Greed adjustments: {int(fields['fear_greed_rebalance_count'])}"
+            )
+        return "\n".join(lines)
+
+    raise ValueError(f"Unknown event type: {kind}")
+
+
+# Log used when callers do not pass one: prints events like the CLI always has
+_default_event_log = EventLog(verbosity=DETAIL, echo=True, retain=False)
+
+
+def get_default_event_log():
+    """Return the event log used by portfolio functions when none is given."""
+    return _default_event_log
+
+
+def set_default_event_log(event_log):
+    """
+    Replace the default event log (e.g. with ``EventLog(SILENT)`` for sweeps).
+
+    Returns:
+        EventLog: The previous default log
+    """
+    global _default_event_log
+    previous = _default_event_log
+    _default_event_log = event_log
+    return previous
@@ -0,0 +1,260 @@
+"""
+Holdings history for the indexfund package.
+
+Between rebalances a portfolio's token and stablecoin quantities only change
+through staking, which compounds at known rates. A HoldingsHistory therefore
+stores quantity vectors only at event points (the first bar, rebalances,
+reconstitutions, sentiment shifts) together with the timeline and the staking
+rates, and reconstructs the full (time x tokens) quantity or value matrix on
+demand from the accrual index. Storage grows with the number of events rather
+than the number of bars, so it can stay on for every run of a sweep.
+"""
+
+import numpy as np
+
+from core.staking import YieldCurves, build_accrual_index, build_staking_index
+
+
+class HoldingsHistory:
+    """
+    Sparse record of quantities at event points.
+
+    Quantities may carry leading lane dimensions (one portfolio per lane in
+    batched simulations); every snapshot of a history has the same shape.
+
+    Attributes:
+        symbols (list): Token symbols, in column order
+        aprs (numpy.ndarray): Staking APR per token followed by the stablecoin
+                              (zeros when staking is off)
+        yield_curves (YieldCurves): Time-varying staking APRs used instead of
+                                    ``aprs`` (or None)
+        size (int): Number of bars recorded
+        event_count (int): Number of snapshots recorded
+    """
+
+    __slots__ = (
+        "symbols",
+        "aprs",
+        "yield_curves",
+        "size",
+        "event_count",
+        "_timestamps",
+        "_event_rows",
+        "_event_quantities",
+        "_event_stablecoin",
+    )
+
+    def __init__(self):
+        self.symbols = None
+        self.aprs = None
+        self.yield_curves = None
+        self.size = 0
+        self.event_count = 0
+        self._timestamps = np.zeros(0, dtype=np.int64)
+        self._event_rows = np.zeros(0, dtype=np.int64)
+        self._event_quantities = None
+        self._event_stablecoin = None
+
+    def __len__(self):
+        return self.size
+
+    def start(self, symbols, aprs, yield_curves=None):
+        """
+        Set the token columns and staking rates before the first bar.
+
+        Args:
+            symbols (list): Token symbols, in column order
+            aprs (numpy.ndarray): Staking APR per token followed by the stablecoin
+            yield_curves (YieldCurves, optional): Time-varying APRs that replace
+                                                  ``aprs`` when reconstructing
+        """
+        self.symbols = list(symbols)
+        self.aprs = np.asarray(aprs, dtype=float)
+        self.yield_curves = yield_curves
+
+    def extend(self, timestamps):
+        """
+        Append bars to the timeline.
+
+        Args:
+            timestamps (numpy.ndarray): New timestamps in milliseconds, in order
+
+        Returns:
+            int: Row of the first new bar
+        """
+        first = self.size
+        end = first + len(timestamps)
+        if end > len(self._timestamps):
+            self._timestamps = _grown(self._timestamps, end)
+        self._timestamps[first:end] = timestamps
+        self.size = end
+        return first
+
+    def snapshot(self, row, quantities, stablecoin_quantity):
+        """
+        Record the quantities held after all trades at a bar.
+
+        A second snapshot at the same row replaces the first.
+
+        Args:
+            row (int): Bar row in the timeline
+            quantities (numpy.ndarray): Token quantities, (tokens,) or (lanes x tokens)
+            stablecoin_quantity (float or numpy.ndarray): Stablecoin quantity (per lane)
+        """
+        if self._event_quantities is None:
+            self._event_quantities = np.zeros((8,) + np.shape(quantities))
+            self._event_stablecoin = np.zeros((8,) + np.shape(stablecoin_quantity))
+            self._event_rows = np.zeros(8, dtype=np.int64)
+
+        position = self.event_count
+        if position and self._event_rows[position - 1] == row:
+            position -= 1
+        elif position == len(self._event_rows):
+            self._event_rows = _grown(self._event_rows, position + 1)
+            self._event_quantities = _grown(self._event_quantities, position + 1)
+            self._event_stablecoin = _grown(self._event_stablecoin, position + 1)
+
+        self._event_rows[position] = row
+        self._event_quantities[position] = quantities
+        self._event_stablecoin[position] = stablecoin_quantity
+        self.event_count = position + 1
+
+    @property
+    def timestamps(self):
+        """Timestamps of every recorded bar."""
+        return self._timestamps[: self.size]
+
+    @property
+    def event_rows(self):
+        """Bar rows of the recorded snapshots."""
+        return self._event_rows[: self.event_count]
+
+    def quantities(self, start=0, end=None, lane=None):
+        """
+        Reconstruct quantities for a range of bars.
+
+        Args:
+            start (int): First bar row
+            end (int, optional): Row after the last bar (default: all bars)
+            lane (int, optional): Only reconstruct this lane of a batched history
+
+        Returns:
+            tuple: (token_quantities, stablecoin_quantities) with shapes
+                   (time x [lanes x] tokens) and (time [x lanes])
+        """
+        end = self.size if end is None else end
+        rows = np.arange(start, end)
+        events = np.searchsorted(self.event_rows, rows, side="right") - 1
+        if len(rows) and events[0] < 0:
+            raise ValueError("No holdings recorded before the requested bars")
+
+        token_quantities = self._event_quantities[: self.event_count]
+        stablecoin_quantities = self._event_stablecoin[: self.event_count]
+        if lane is not None:
+            token_quantities = token_quantities[:, lane]
+            stablecoin_quantities = stablecoin_quantities[:, lane]
+
+        # Growth since each bar's snapshot, from the staking accrual index
+        first_event_row = self.event_rows[events[0]] if len(rows) else start
+        window = self.timestamps[first_event_row:end]
+        if self.yield_curves is None:
+            index = build_accrual_index(window, self.aprs)
+        else:
+            index = build_staking_index(
+                window, self.symbols + ["stablecoin"], self.yield_curves
+            )
+        growth = (
+            index[rows - first_event_row]
+            / index[self.event_rows[events] - first_event_row]
+        )
+
+        token_growth = growth[:, :-1].reshape(
+            (len(rows),) + (1,) * (token_quantities.ndim - 2) + (-1,)
+        )
+        stablecoin_growth = growth[:, -1].reshape(
+            (len(rows),) + (1,) * (stablecoin_quantities.ndim - 1)
+        )
+        return (
+            token_quantities[events] * token_growth,
+            stablecoin_quantities[events] * stablecoin_growth,
+        )
+
+    def values(self, panel, start=0, end=None, lane=None):
+        """
+        Reconstruct USD values for a range of bars.
+
+        Args:
+            panel (MarketPanel): Market data covering the recorded bars
+            start (int): First bar row
+            end (int, optional): Row after the last bar (default: all bars)
+            lane (int, optional): Only reconstruct this lane of a batched history
+
+        Returns:
+            tuple: (token_values, stablecoin_values) shaped like ``quantities``;
+                   tokens without a price at a bar are valued at 0
+        """
+        token_quantities, stablecoin_quantities = self.quantities(start, end, lane)
+        rows = np.searchsorted(panel.timestamps, self.timestamps[start:end])
+        columns = {token: column for column, token in enumerate(panel.tokens)}
+        prices = np.full((len(rows), len(self.symbols)), np.nan)
+        for position, token in enumerate(self.symbols):
+            if token in columns:
+                prices[:, position] = panel.prices[rows, columns[token]]
+
+        prices = prices.reshape(
+            (len(rows),) + (1,) * (token_quantities.ndim - 2) + (-1,)
+        )
+        return (
+            np.where(np.isnan(prices), 0.0, token_quantities * prices),
+            stablecoin_quantities,
+        )
+
+    def to_dict(self):
+        """Return the stored arrays, e.g. for saving with NumPy."""
+        arrays = {
+            "symbols": np.array(self.symbols, dtype=str),
+            "aprs": self.aprs,
+            "timestamps": self.timestamps,
+            "event_rows": self.event_rows,
+            "event_quantities": self._event_quantities[: self.event_count],
+            "event_stablecoin": self._event_stablecoin[: self.event_count],
+        }
+        if self.yield_curves is not None:
+            for key, value in self.yield_curves.to_dict().items():
+                arrays[f"curve_{key}"] = value
+        return arrays
+
+    @classmethod
+    def from_dict(cls, arrays):
+        """Rebuild a history from the arrays returned by to_dict."""
+        yield_curves = None
+        if "curve_symbols" in arrays:
+            yield_curves = YieldCurves.from_dict(
+                {
+                    key.removeprefix("curve_"): value
+                    for key, value in arrays.items()
+                    if key.startswith("curve_")
+                }
+            )
+        history = cls()
+        history.start(
+            [str(symbol) for symbol in arrays["symbols"]], arrays["aprs"], yield_curves
+        )
+        history.extend(arrays["timestamps"])
+        for row, quantities, stablecoin_quantity in zip(
+            arrays["event_rows"].tolist(),
+            arrays["event_quantities"],
+            arrays["event_stablecoin"],
+        ):
+            history.snapshot(row, quantities, stablecoin_quantity)
+        return history
+
+
+def _grown(array, required):
+    """Return a copy of ``array`` with its first axis doubled until it fits."""
+    capacity = max(len(array), 8)
+    while capacity < required:
+        capacity *= 2
+    grown = np.zeros((capacity,) + array.shape[1:], dtype=array.dtype)
+    grown[: len(array)] = array
+    return grown
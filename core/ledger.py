@@ -0,0 +1,387 @@
+"""
+Trade ledger for the indexfund package.
+
+Every swap made by a simulation (token, side, quantity, notional, fee and the
+reason it happened) is appended to preallocated NumPy column buffers that
+grow by doubling, so recording stays cheap inside large sweeps. One ledger
+can hold many runs, told apart by a run id, and exports to NPZ, CSV or SQLite
+for turnover and cost attribution without re-simulating or parsing logs.
+"""
+
+import csv
+import sqlite3
+
+import numpy as np
+
+# Trade sides
+SIDE_BUY = 1
+SIDE_SELL = -1
+
+# Trade reasons
+REASON_PERIODIC = 1  # Scheduled token rebalance
+REASON_SENTIMENT = 2  # Fear and greed allocation shift
+REASON_DRIFT = 3  # Drift-band rebalance
+REASON_RECONSTITUTION = 4  # Token entering or leaving the index
+
+REASON_NAMES = {
+    REASON_PERIODIC: "periodic",
+    REASON_SENTIMENT: "sentiment",
+    REASON_DRIFT: "drift",
+    REASON_RECONSTITUTION: "reconstitution",
+}
+
+# Column names and types of a ledger, in export order
+LEDGER_COLUMNS = {
+    "run": np.int32,
+    "timestamp": np.int64,
+    "token": np.int32,
+    "side": np.int8,
+    "quantity": np.float64,
+    "notional": np.float64,
+    "fee": np.float64,
+    "reason": np.int8,
+}
+
+
+class TradeLedger:
+    """
+    Columnar, growable record of individual swaps.
+
+    Tokens are stored as ids into ``symbols`` and runs as ids into
+    ``run_labels``, so every column is a plain numeric array.
+
+    Args:
+        capacity (int): Initial buffer capacity, grown by doubling
+    """
+
+    __slots__ = ("size", "columns", "symbols", "run_labels", "_token_ids")
+
+    def __init__(self, capacity=1024):
+        self.size = 0
+        self.columns = {
+            name: np.zeros(capacity, dtype=dtype)
+            for name, dtype in LEDGER_COLUMNS.items()
+        }
+        self.symbols = []
+        self.run_labels = []
+        self._token_ids = {}
+
+    def __len__(self):
+        return self.size
+
+    def token_ids(self, symbols):
+        """
+        Map token symbols to ledger token ids, registering new symbols.
+
+        Args:
+            symbols (list): Token symbols
+
+        Returns:
+            numpy.ndarray: Ledger token id per symbol
+        """
+        for symbol in symbols:
+            if symbol not in self._token_ids:
+                self._token_ids[symbol] = len(self.symbols)
+                self.symbols.append(symbol)
+        return np.array([self._token_ids[symbol] for symbol in symbols], dtype=np.int32)
+
+    def new_runs(self, count=1, labels=None):
+        """
+        Allocate ids for new runs.
+
+        Args:
+            count (int): Number of runs
+            labels (list, optional): Label per run (default: the run id)
+
+        Returns:
+            numpy.ndarray: Run ids
+        """
+        first = len(self.run_labels)
+        runs = np.arange(first, first + count, dtype=np.int32)
+        self.run_labels.extend(
+            [str(run) for run in runs.tolist()] if labels is None else labels
+        )
+        return runs
+
+    def append(self, **values):
+        """
+        Append a block of trades.
+
+        Args:
+            **values: One scalar or array per LEDGER_COLUMNS entry; scalars are
+                      broadcast to the length of the array arguments
+        """
+        count = max(np.size(value) for value in values.values())
+        if not count:
+            return
+        end = self.size + count
+        if end > len(self.columns["run"]):
+            self._grow(end)
+        rows = slice(self.size, end)
+        for name in LEDGER_COLUMNS:
+            self.columns[name][rows] = values[name]
+        self.size = end
+
+    def _grow(self, required):
+        """Double the capacity of every column until ``required`` rows fit."""
+        capacity = max(len(self.columns["run"]), 1)
+        while capacity < required:
+            capacity *= 2
+        for name, column in self.columns.items():
+            grown = np.zeros(capacity, dtype=column.dtype)
+            grown[: self.size] = column[: self.size]
+            self.columns[name] = grown
+
+    def trades(self):
+        """
+        Return the recorded trades as column arrays.
+
+        Returns:
+            dict: One array per LEDGER_COLUMNS entry (views into the buffers)
+        """
+        return {name: column[: self.size] for name, column in self.columns.items()}
+
+    def clear(self):
+        """Forget all trades, runs and symbols."""
+        self.size = 0
+        self.symbols = []
+        self.run_labels = []
+        self._token_ids = {}
+
+
+def record_quantity_changes(
+    ledger, runs, timestamp, token_ids, before, after, prices, token_fees, reasons
+):
+    """
+    Record the trades implied by a rebalance, vectorized over lanes and tokens.
+
+    Tokens without a price at the rebalance are not traded and not recorded.
+
+    Args:
+        ledger (TradeLedger): Ledger receiving the trades
+        runs (int or numpy.ndarray): Run id, or one per lane
+        timestamp (int): Timestamp of the rebalance in milliseconds
+        token_ids (numpy.ndarray): Ledger token id per column
+        before (numpy.ndarray): Quantities before the rebalance, (tokens,) or
+                                (lanes x tokens)
+        after (numpy.ndarray): Quantities after the rebalance
+        prices (numpy.ndarray): Token prices, (tokens,) or (lanes x tokens)
+        token_fees (numpy.ndarray): Fee paid per token, shaped like ``before``
+        reasons (int or numpy.ndarray): REASON_* code, or one per token
+    """
+    columns = len(token_ids)
+    before = np.reshape(before, (-1, columns))
+    change = np.reshape(after, (-1, columns)) - before
+    prices = np.broadcast_to(prices, before.shape)
+    lanes, positions = np.nonzero((change != 0) & (prices > 0))
+    if not len(lanes):
+        return
+
+    quantity = np.abs(change[lanes, positions])
+    ledger.append(
+        run=np.broadcast_to(runs, len(before))[lanes],
+        timestamp=timestamp,
+        token=token_ids[positions],
+        side=np.where(change[lanes, positions] > 0, SIDE_BUY, SIDE_SELL),
+        quantity=quantity,
+        notional=quantity * prices[lanes, positions],
+        fee=np.reshape(token_fees, before.shape)[lanes, positions],
+        reason=np.broadcast_to(reasons, before.shape)[lanes, positions],
+    )
+
+
+def membership_reasons(previous_weights, target_weights, reason):
+    """
+    Attribute trades of tokens entering or leaving the index to reconstitution.
+
+    Args:
+        previous_weights (numpy.ndarray): Target weights before the rebalance
+        target_weights (numpy.ndarray): New target weights
+        reason (int): REASON_* code of all other trades
+
+    Returns:
+        numpy.ndarray: REASON_* code per token
+    """
+    changed = (previous_weights > 0) != (target_weights > 0)
+    return np.where(changed, REASON_RECONSTITUTION, reason).astype(np.int8)
+
+
+def merge_trade_ledgers(ledgers):
+    """
+    Combine ledgers into one, renumbering runs and tokens.
+
+    Args:
+        ledgers (iterable): TradeLedger instances
+
+    Returns:
+        TradeLedger: Ledger holding every run of the inputs, in order
+    """
+    ledgers = list(ledgers)
+    merged = TradeLedger(max(sum(len(ledger) for ledger in ledgers), 1))
+    for ledger in ledgers:
+        tokens = merged.token_ids(ledger.symbols)
+        runs = merged.new_runs(len(ledger.run_labels), ledger.run_labels)
+        trades = ledger.trades()
+        merged.append(
+            **{
+                **trades,
+                "run": runs[trades["run"]],
+                "token": tokens[trades["token"]],
+            }
+        )
+    return merged
+
+
+# ------------------------------------------------------------------------------
+# Attribution
+# ------------------------------------------------------------------------------
+
+
+def attribute_costs(ledger, by="token"):
+    """
+    Aggregate trade count, turnover and fees by one ledger column.
+
+    Args:
+        ledger (TradeLedger): Recorded trades
+        by (str): Grouping column ("run", "token", "side" or "reason")
+
+    Returns:
+        dict: Group name -> {"trades", "notional", "fees"}
+    """
+    trades = ledger.trades()
+    keys, groups = np.unique(trades[by], return_inverse=True)
+    counts = np.bincount(groups, minlength=len(keys))
+    notional = np.bincount(groups, trades["notional"], minlength=len(keys))
+    fees = np.bincount(groups, trades["fee"], minlength=len(keys))
+
+    names = {
+        "run": lambda key: ledger.run_labels[key],
+        "token": lambda key: ledger.symbols[key],
+        "side": lambda key: "buy" if key == SIDE_BUY else "sell",
+        "reason": lambda key: REASON_NAMES[key],
+    }[by]
+    return {
+        names(key): {
+            "trades": int(count),
+            "notional": float(turnover),
+            "fees": float(fee),
+        }
+        for key, count, turnover, fee in zip(
+            keys.tolist(), counts.tolist(), notional.tolist(), fees.tolist()
+        )
+    }
+
+
+def run_turnover(ledger):
+    """
+    Total traded notional and fees per run.
+
+    Args:
+        ledger (TradeLedger): Recorded trades
+
+    Returns:
+        tuple: (notional, fees) arrays indexed by run id
+    """
+    trades = ledger.trades()
+    runs = len(ledger.run_labels)
+    return (
+        np.bincount(trades["run"], trades["notional"], minlength=runs),
+        np.bincount(trades["run"], trades["fee"], minlength=runs),
+    )
+
+
+# ------------------------------------------------------------------------------
+# Export
+# ------------------------------------------------------------------------------
+
+
+def save_trade_ledger(ledger, path):
+    """
+    Save a ledger as a compressed NumPy archive.
+
+    Args:
+        ledger (TradeLedger): Ledger to save
+        path (str or file): Destination (".npz" is appended to names without it)
+    """
+    np.savez_compressed(
+        path,
+        symbols=np.array(ledger.symbols, dtype=str),
+        run_labels=np.array(ledger.run_labels, dtype=str),
+        **ledger.trades(),
+    )
+
+
+def load_trade_ledger(path):
+    """
+    Load a ledger saved with save_trade_ledger.
+
+    Args:
+        path (str or file): Archive written by save_trade_ledger
+
+    Returns:
+        TradeLedger: Restored ledger
+    """
+    with np.load(path, allow_pickle=False) as archive:
+        ledger = TradeLedger(max(len(archive["run"]), 1))
+        ledger.token_ids(archive["symbols"].tolist())
+        ledger.run_labels = archive["run_labels"].tolist()
+        ledger.append(**{name: archive[name] for name in LEDGER_COLUMNS})
+    return ledger
+
+
+def _named_rows(ledger):
+    """Yield trades as rows with symbols, run labels and reason names."""
+    trades = ledger.trades()
+    symbols = ledger.symbols
+    for run, timestamp, token, side, quantity, notional, fee, reason in zip(
+        *(trades[name].tolist() for name in LEDGER_COLUMNS)
+    ):
+        yield (
+            ledger.run_labels[run],
+            timestamp,
+            symbols[token],
+            "buy" if side == SIDE_BUY else "sell",
+            quantity,
+            notional,
+            fee,
+            REASON_NAMES[reason],
+        )
+
+
+def export_trade_ledger_csv(ledger, path):
+    """
+    Write a ledger as a CSV table with readable token, side and reason values.
+
+    Args:
+        ledger (TradeLedger): Ledger to export
+        path (str): Destination CSV file
+    """
+    with open(path, "w", newline="", encoding="utf-8") as csv_file:
+        writer = csv.writer(csv_file)
+        writer.writerow(LEDGER_COLUMNS)
+        writer.writerows(_named_rows(ledger))
+
+
+def export_trade_ledger_sqlite(ledger, path, table="trades"):
+    """
+    Append a ledger to a SQLite table, creating it if needed.
+
+    Args:
+        ledger (TradeLedger): Ledger to export
+        path (str): SQLite database file
+        table (str): Table name (a plain identifier such as "trades")
+    """
+    if not table.isidentifier():
+        raise ValueError(f"Invalid table name: {table!r}")
+
+    with sqlite3.connect(path) as connection:
+        connection.execute(
+            f"CREATE TABLE IF NOT EXISTS {table} (run TEXT, timestamp INTEGER, "
+            "token TEXT, side TEXT, quantity REAL, notional REAL, fee REAL, "
+            "reason TEXT)"
+        )
+        connection.executemany(
+            f"INSERT INTO {table} VALUES (?, ?, ?, ?, ?, ?, ?, ?)", _named_rows(ledger)
+        )
+    # The connection's context manager only commits, so close it explicitly
+    connection.close()
@@ -7,6 +7,11 @@ import numpy as np
 
 from config import RISK_FREE_RATE, TRADING_DAYS_PER_YEAR
 
+# Daily volatility below which a portfolio's returns only vary by rounding
+# (e.g. a portfolio held entirely in stablecoin); its Sharpe and Sortino
+# ratios are reported as 0.0 rather than as amplified rounding noise
+MIN_DAILY_VOLATILITY = 1e-6
+
 
 def calculate_returns(prices):
     """
@@ -174,13 +179,18 @@ def calculate_portfolio_metrics(value_history, risk_free_rate=0.05):
     # Calculate Sharpe ratio
     daily_rf_rate = (1 + risk_free_rate) ** (1 / 252) - 1
     excess_returns = returns - daily_rf_rate
-    sharpe_ratio = np.sqrt(252) * np.mean(excess_returns) / np.std(returns)
+    sharpe_ratio = (
+        0.0
+        if daily_volatility < MIN_DAILY_VOLATILITY
+        else np.sqrt(252) * np.mean(excess_returns) / daily_volatility
+    )
 
     # Calculate Sortino ratio (using only negative returns)
     downside_returns = returns[returns < 0]
     sortino_ratio = (
         np.sqrt(252) * np.mean(excess_returns) / np.std(downside_returns)
         if len(downside_returns) > 0
+        and np.std(downside_returns) >= MIN_DAILY_VOLATILITY
         else 0
     )
 
@@ -224,3 +234,232 @@ def calculate_annualized_ROI(initial_value, final_value, days):
     apr = ((1 + total_return) ** (1 / years) - 1) * 100
 
     return apr
+
+
+def calculate_portfolio_metrics_batch(values, risk_free_rate=0.05):
+    """
+    Calculate portfolio metrics for many value series at once.
+
+    Vectorized counterpart of calculate_portfolio_metrics: every metric is
+    computed along the last axis, so a (lanes x time) matrix yields one value
+    per lane.
+
+    Args:
+        values (numpy.ndarray): Portfolio values with time on the last axis
+        risk_free_rate (float): Annual risk-free rate
+
+    Returns:
+        dict: Dictionary of metric arrays, one entry per lane
+    """
+    values = np.asarray(values, dtype=float)
+
+    # Calculate daily returns
+    returns = np.diff(values, axis=-1) / values[..., :-1]
+
+    # Calculate max drawdown
+    rolling_max = np.maximum.accumulate(values, axis=-1)
+    max_drawdown = np.min((values - rolling_max) / rolling_max, axis=-1) * 100
+
+    # Calculate volatility (annualized)
+    daily_volatility = np.std(returns, axis=-1)
+    annual_volatility = daily_volatility * np.sqrt(252) * 100
+
+    # Calculate Sharpe ratio
+    daily_rf_rate = (1 + risk_free_rate) ** (1 / 252) - 1
+    mean_excess_returns = np.mean(returns - daily_rf_rate, axis=-1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        sharpe_ratio = np.where(
+            daily_volatility < MIN_DAILY_VOLATILITY,
+            0.0,
+            np.sqrt(252) * mean_excess_returns / daily_volatility,
+        )
+
+    # Calculate Sortino ratio (using only negative returns)
+    downside = returns < 0
+    downside_count = np.sum(downside, axis=-1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        downside_mean = np.sum(returns, axis=-1, where=downside) / downside_count
+        downside_deviation = np.sqrt(
+            np.sum(
+                (returns - downside_mean[..., np.newaxis]) ** 2,
+                axis=-1,
+                where=downside,
+            )
+            / downside_count
+        )
+        sortino_ratio = np.where(
+            (downside_count > 0) & (downside_deviation >= MIN_DAILY_VOLATILITY),
+            np.sqrt(252) * mean_excess_returns / downside_deviation,
+            0.0,
+        )
+
+    # Calculate total return
+    initial_value = values[..., 0]
+    final_value = values[..., -1]
+    total_return = ((final_value - initial_value) / initial_value) * 100
+    years = values.shape[-1] / 365.0
+    with np.errstate(divide="ignore", invalid="ignore"):
+        annualized_roi = np.where(
+            initial_value > 0,
+            ((1 + (final_value - initial_value) / initial_value) ** (1 / years) - 1)
+            * 100,
+            0.0,
+        )
+
+    return {
+        "max_drawdown": max_drawdown,
+        "volatility": annual_volatility,
+        "sharpe_ratio": sharpe_ratio,
+        "sortino_ratio": sortino_ratio,
+        "total_return": total_return,
+        "initial_value": initial_value,
+        "final_value": final_value,
+        "annualized_roi": annualized_roi,
+    }
+
+
+class RunningPortfolioMetrics:
+    """
+    Portfolio metrics maintained incrementally as values arrive.
+
+    Keeps the running peak, maximum drawdown and Welford mean and squared
+    deviation accumulators of the returns, so extending a series by ``k``
+    values costs O(k). Returns are folded in strictly one at a time, so
+    feeding a series in any number of pieces gives exactly the same
+    accumulators as feeding it at once, and the volatility-based metrics agree
+    with calculate_portfolio_metrics to floating-point rounding.
+    """
+
+    __slots__ = (
+        "risk_free_rate",
+        "count",
+        "initial_value",
+        "final_value",
+        "peak",
+        "max_drawdown",
+        "return_mean",
+        "return_m2",
+        "downside_count",
+        "downside_mean",
+        "downside_m2",
+    )
+
+    def __init__(self, risk_free_rate=0.05):
+        self.risk_free_rate = risk_free_rate
+        self.count = 0
+        self.initial_value = np.nan
+        self.final_value = np.nan
+        self.peak = -np.inf
+        self.max_drawdown = np.inf
+        self.return_mean = 0.0
+        self.return_m2 = 0.0
+        self.downside_count = 0
+        self.downside_mean = 0.0
+        self.downside_m2 = 0.0
+
+    @staticmethod
+    def _welford(count, mean, m2, samples):
+        """Fold samples into Welford accumulators, strictly left to right."""
+        for sample in samples.tolist():
+            count += 1
+            delta = sample - mean
+            mean += delta / count
+            m2 += delta * (sample - mean)
+        return mean, m2
+
+    def update(self, values):
+        """
+        Extend the series with new values.
+
+        Args:
+            values (numpy.ndarray): New portfolio values, in time order
+        """
+        values = np.asarray(values, dtype=float)
+        if not len(values):
+            return
+
+        if self.count:
+            series = np.concatenate([[self.final_value], values])
+        else:
+            series = values
+            self.initial_value = float(values[0])
+
+        # Drawdowns against the running peak, seeded with the previous peak
+        rolling_max = np.maximum.accumulate(np.maximum(values, self.peak))
+        drawdowns = (values - rolling_max) / rolling_max
+        self.max_drawdown = min(self.max_drawdown, float(np.min(drawdowns)) * 100)
+        self.peak = float(rolling_max[-1])
+
+        returns = np.diff(series) / series[:-1]
+        downside_returns = returns[returns < 0]
+        self.return_mean, self.return_m2 = self._welford(
+            max(self.count - 1, 0), self.return_mean, self.return_m2, returns
+        )
+        self.downside_mean, self.downside_m2 = self._welford(
+            self.downside_count, self.downside_mean, self.downside_m2, downside_returns
+        )
+        self.downside_count += len(downside_returns)
+
+        self.count += len(values)
+        self.final_value = float(values[-1])
+
+    def metrics(self):
+        """
+        Return the current metrics.
+
+        Returns:
+            dict: The same keys as calculate_portfolio_metrics
+        """
+        returns_count = self.count - 1
+        with np.errstate(divide="ignore", invalid="ignore"):
+            if returns_count > 0:
+                mean_return = self.return_mean
+                daily_volatility = np.sqrt(self.return_m2 / returns_count)
+            else:
+                mean_return = daily_volatility = np.nan
+
+            daily_rf_rate = (1 + self.risk_free_rate) ** (1 / 252) - 1
+            mean_excess_return = mean_return - daily_rf_rate
+            sharpe_ratio = (
+                0.0
+                if daily_volatility < MIN_DAILY_VOLATILITY
+                else np.sqrt(252) * mean_excess_return / np.float64(daily_volatility)
+            )
+
+            sortino_ratio = 0
+            if self.downside_count > 0:
+                downside_deviation = np.sqrt(self.downside_m2 / self.downside_count)
+                if downside_deviation >= MIN_DAILY_VOLATILITY:
+                    sortino_ratio = (
+                        np.sqrt(252)
+                        * mean_excess_return
+                        / np.float64(downside_deviation)
+                    )
+
+        total_return = (
+            (self.final_value - self.initial_value) / self.initial_value
+        ) * 100
+        return {
+            "max_drawdown": self.max_drawdown,
+            "volatility": daily_volatility * np.sqrt(252) * 100,
+            "sharpe_ratio": sharpe_ratio,
+            "sortino_ratio": sortino_ratio,
+            "total_return": total_return,
+            "initial_value": self.initial_value,
+            "final_value": self.final_value,
+            "annualized_roi": calculate_annualized_ROI(
+                self.initial_value, self.final_value, self.count
+            ),
+        }
+
+    def to_dict(self):
+        """Return the accumulators as plain numbers (for checkpoints)."""
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    @classmethod
+    def from_dict(cls, accumulators):
+        """Restore metrics saved with to_dict."""
+        running = cls()
+        for name in cls.__slots__:
+            setattr(running, name, accumulators[name])
+        return running
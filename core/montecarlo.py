@@ -0,0 +1,335 @@
+"""
+Monte Carlo simulation functions for the indexfund package.
+
+Synthetic market histories are drawn with a stationary block bootstrap of the
+historical per-bar returns. Whole return rows are resampled, so every path
+keeps the cross-sectional correlation between tokens (and between each
+token's price and market cap), and random block lengths keep short-range
+autocorrelation. The index strategy then runs on all paths of a chunk at once
+as a (paths x time x tokens) computation, and only per-path metrics are kept.
+"""
+
+import numpy as np
+
+from config import DEFAULT_SWAP_FEE, STAKING_CONFIG
+from core.context import MarketContext
+from core.metrics import calculate_portfolio_metrics_batch
+from core.panel import MarketPanel, build_market_panel
+from core.portfolio import _preprocess_historical_data, rebalance_token_quantities
+from core.schedule import compile_rebalance_schedule, rebalance_event_indices
+from core.staking import build_staking_accrual
+from core.weighting import calculate_weight_matrix
+
+# Metrics reported for every simulated path
+MONTE_CARLO_METRICS = (
+    "final_value",
+    "total_return",
+    "annualized_roi",
+    "max_drawdown",
+    "volatility",
+    "sharpe_ratio",
+    "sortino_ratio",
+    "total_fees_paid",
+)
+
+
+def historical_log_returns(panel):
+    """
+    Extract the return rows resampled by the bootstrap.
+
+    Only tokens priced at the first bar are used (the tokens a simulation
+    would hold), and bars where any of them lacks a price or market cap on
+    either side of the step are dropped.
+
+    Args:
+        panel (MarketPanel): Historical market data
+
+    Returns:
+        tuple: (held, price_returns, cap_returns) where held are the panel
+               columns used and the returns are (steps x tokens) log returns
+    """
+    held = np.flatnonzero(panel.prices[0] > 0)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        price_returns = np.diff(np.log(panel.prices[:, held]), axis=0)
+        cap_returns = np.diff(np.log(panel.market_caps[:, held]), axis=0)
+
+    usable = np.all(np.isfinite(price_returns) & np.isfinite(cap_returns), axis=1)
+    return held, price_returns[usable], cap_returns[usable]
+
+
+def stationary_bootstrap_indices(
+    sample_size, paths, length, mean_block_length, rng=None
+):
+    """
+    Draw stationary block bootstrap indices (Politis and Romano).
+
+    Each path starts at a random observation and continues with the next one
+    (wrapping around) until a new block starts, which happens with
+    probability ``1 / mean_block_length`` at every step.
+
+    Args:
+        sample_size (int): Number of observations to resample
+        paths (int): Number of paths
+        length (int): Observations per path
+        mean_block_length (float): Expected block length (1 is the iid bootstrap)
+        rng (numpy.random.Generator, optional): Random number generator
+
+    Returns:
+        numpy.ndarray: (paths x length) int64 observation indices
+    """
+    if sample_size < 1:
+        raise ValueError("Bootstrap needs at least one observation")
+    if mean_block_length < 1:
+        raise ValueError("Mean block length must be at least 1")
+    rng = np.random.default_rng(rng)
+
+    starts = rng.integers(0, sample_size, size=(paths, length))
+    new_block = rng.random((paths, length)) < 1.0 / mean_block_length
+    new_block[:, 0] = True
+
+    # Position of each step within its block, from the most recent block start
+    steps = np.arange(length)
+    block_start = np.maximum.accumulate(np.where(new_block, steps, 0), axis=1)
+    offset = steps - block_start
+    first = np.take_along_axis(starts, block_start, axis=1)
+    return (first + offset) % sample_size
+
+
+def bootstrap_market_paths(
+    panel, paths, length, mean_block_length=20, rng=None, dtype=np.float64
+):
+    """
+    Generate synthetic price and market cap paths from a panel.
+
+    Args:
+        panel (MarketPanel): Historical market data
+        paths (int): Number of paths
+        length (int): Bars per path, including the starting bar
+        mean_block_length (float): Expected bootstrap block length in bars
+        rng (numpy.random.Generator, optional): Random number generator
+        dtype (numpy.dtype): Floating-point type of the generated paths
+
+    Returns:
+        tuple: (held, prices, market_caps) where held are the panel columns
+               and prices and market_caps are (paths x length x tokens) arrays
+               starting from the panel's first bar
+    """
+    held, price_returns, cap_returns = historical_log_returns(panel)
+    indices = stationary_bootstrap_indices(
+        len(price_returns), paths, length - 1, mean_block_length, rng
+    )
+
+    def compound(start, returns):
+        log_path = np.zeros((paths, length, len(held)))
+        np.cumsum(returns[indices], axis=1, out=log_path[:, 1:])
+        return (start * np.exp(log_path)).astype(dtype, copy=False)
+
+    return (
+        held,
+        compound(panel.prices[0, held], price_returns),
+        compound(panel.market_caps[0, held], cap_returns),
+    )
+
+
+def simulate_index_paths(
+    timestamps,
+    prices,
+    market_caps,
+    tokens,
+    method,
+    rebalance_frequency="none",
+    apply_staking=True,
+    stablecoin_allocation=0.5,
+    swap_fee=DEFAULT_SWAP_FEE,
+    initial_value=100.0,
+    yield_curves=None,
+):
+    """
+    Run the index strategy on many market paths at once.
+
+    Follows the rules of calculate_historical_index_prices_batch with one lane
+    per path: holdings only change at rebalance events, and every path's
+    values over a segment between events are computed in one step. Holdings
+    and values use the floating-point type of ``prices``.
+
+    Args:
+        timestamps (numpy.ndarray): Timeline shared by every path, in milliseconds
+        prices (numpy.ndarray): (paths x time x tokens) prices
+        market_caps (numpy.ndarray): (paths x time x tokens) market caps
+        tokens (list): Token symbols, in column order
+        method (str): Weighting method ("market_cap", "sqrt_market_cap")
+        rebalance_frequency (str): Rebalancing frequency ("none", "monthly", "quarterly", "yearly")
+        apply_staking (bool): Whether to apply staking rewards
+        stablecoin_allocation (float): Stablecoin allocation (0.0-1.0)
+        swap_fee (float): Fee percentage charged on token swaps during rebalancing
+        initial_value (float): Starting portfolio value
+        yield_curves (YieldCurves, optional): Time-varying staking APRs used
+                                              instead of STAKING_CONFIG
+
+    Returns:
+        tuple: (values, total_fees_paid) with a (paths x time) value matrix
+               and the fees paid per path
+    """
+    paths = len(prices)
+    dtype = prices.dtype
+    events = rebalance_event_indices(timestamps, rebalance_frequency)
+    boundaries = np.union1d(events, [0, len(timestamps)])
+    weight_rows = np.union1d(events, [0])
+    weights = calculate_weight_matrix(market_caps[:, weight_rows], method).astype(
+        dtype, copy=False
+    )
+    rebalance_schedule = compile_rebalance_schedule(timestamps, rebalance_frequency)
+
+    if apply_staking:
+        token_accrual, stablecoin_accrual = build_staking_accrual(
+            timestamps, tokens, yield_curves or STAKING_CONFIG
+        )
+        token_accrual = token_accrual.astype(dtype, copy=False)
+        stablecoin_accrual = stablecoin_accrual.astype(dtype, copy=False)
+    else:
+        token_accrual = np.ones((len(timestamps), len(tokens)), dtype=dtype)
+        stablecoin_accrual = np.ones(len(timestamps), dtype=dtype)
+
+    # Holdings in base units (quantity / accrual index), as in the batch engine
+    volatile_usd = initial_value * (1.0 - stablecoin_allocation)
+    base_quantities = volatile_usd * weights[:, 0] / prices[:, 0]
+    base_stablecoin = initial_value * stablecoin_allocation
+    total_fees_paid = np.zeros(paths)
+    values = np.empty((paths, len(timestamps)), dtype=dtype)
+
+    for start, end in zip(boundaries[:-1], boundaries[1:]):
+        if rebalance_schedule[start]:
+            quantities = base_quantities * token_accrual[start]
+            _, fees = rebalance_token_quantities(
+                quantities,
+                prices[:, start],
+                weights[:, np.searchsorted(weight_rows, start)],
+                swap_fee,
+            )
+            total_fees_paid += fees
+            base_quantities = quantities / token_accrual[start]
+
+        values[:, start:end] = (
+            np.einsum(
+                "pn,ptn->pt",
+                base_quantities,
+                prices[:, start:end] * token_accrual[start:end],
+            )
+            + base_stablecoin * stablecoin_accrual[start:end]
+        )
+
+    return values, total_fees_paid
+
+
+def run_monte_carlo(
+    historical_data,
+    method,
+    paths=1000,
+    length=None,
+    rebalance_frequency="none",
+    apply_staking=True,
+    stablecoin_allocation=0.5,
+    swap_fee=DEFAULT_SWAP_FEE,
+    start_date=None,
+    mean_block_length=20,
+    chunk_size=256,
+    seed=None,
+    dtype=np.float64,
+    yield_curves=None,
+):
+    """
+    Estimate the distribution of strategy outcomes over bootstrapped markets.
+
+    Paths are generated and simulated in chunks of ``chunk_size``, so memory
+    is bounded by one chunk's (paths x time x tokens) arrays regardless of the
+    number of paths. Synthetic paths reuse the historical bar spacing and
+    start from the first historical bar. Fear and greed adjustments are not
+    simulated because there is no synthetic sentiment series.
+
+    Args:
+        historical_data (dict, MarketPanel or MarketContext): Dictionary containing
+                              historical price and market cap data
+                              Format: {"token": [[timestamp, price, market_cap], ...]},
+                              or an already built panel (``start_date`` is then ignored)
+                              or context
+        method (str): Weighting method ("market_cap", "sqrt_market_cap")
+        paths (int): Number of synthetic paths
+        length (int, optional): Bars per path (default: length of the history)
+        rebalance_frequency (str): Rebalancing frequency ("none", "monthly", "quarterly", "yearly")
+        apply_staking (bool): Whether to apply staking rewards
+        stablecoin_allocation (float): Stablecoin allocation (0.0-1.0)
+        swap_fee (float): Fee percentage charged on token swaps during rebalancing
+        start_date (datetime or str): Optional start date of the resampled history
+        mean_block_length (float): Expected bootstrap block length in bars
+        chunk_size (int): Paths simulated together
+        seed (int, optional): Seed for reproducible paths
+        dtype (numpy.dtype): Floating-point type of paths and simulation state
+                             (float32 fits twice the paths per chunk)
+        yield_curves (YieldCurves, optional): Time-varying staking APRs used
+                                              instead of STAKING_CONFIG
+
+    Returns:
+        dict: One array per MONTE_CARLO_METRICS entry with a value per path
+    """
+    panel = historical_data
+    if isinstance(panel, MarketContext):
+        panel = panel.since(start_date).panel
+    elif not isinstance(panel, MarketPanel):
+        panel = build_market_panel(
+            _preprocess_historical_data(historical_data, start_date)
+        )
+    if len(panel) < 2:
+        raise ValueError("Monte Carlo simulation needs at least two bars of data")
+
+    if length is None:
+        length = len(panel)
+    step = int(np.median(np.diff(panel.timestamps)))
+    timestamps = panel.timestamps[0] + step * np.arange(length, dtype=np.int64)
+
+    rng = np.random.default_rng(seed)
+    results = {name: np.empty(paths) for name in MONTE_CARLO_METRICS}
+    for first in range(0, paths, chunk_size):
+        chunk = slice(first, min(first + chunk_size, paths))
+        count = chunk.stop - first
+        held, prices, market_caps = bootstrap_market_paths(
+            panel, count, length, mean_block_length, rng, dtype
+        )
+        values, fees = simulate_index_paths(
+            timestamps,
+            prices,
+            market_caps,
+            [panel.tokens[column] for column in held],
+            method,
+            rebalance_frequency,
+            apply_staking,
+            stablecoin_allocation,
+            swap_fee,
+            yield_curves=yield_curves,
+        )
+
+        metrics = calculate_portfolio_metrics_batch(values)
+        metrics["final_value"] = values[:, -1]
+        metrics["total_fees_paid"] = fees
+        for name in MONTE_CARLO_METRICS:
+            results[name][chunk] = metrics[name]
+
+    return results
+
+
+def summarize_distribution(samples, percentiles=(5, 25, 50, 75, 95)):
+    """
+    Summarize a Monte Carlo metric distribution.
+
+    Args:
+        samples (numpy.ndarray): One value per path
+        percentiles (tuple): Percentiles to report
+
+    Returns:
+        dict: Mean, standard deviation and the requested percentiles
+              (keyed "p5", "p50", ...)
+    """
+    samples = np.asarray(samples, dtype=float)
+    summary = {"mean": float(np.mean(samples)), "std": float(np.std(samples))}
+    for percentile, value in zip(percentiles, np.percentile(samples, percentiles)):
+        summary[f"p{percentile}"] = float(value)
+    return summary
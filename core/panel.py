@@ -0,0 +1,265 @@
+"""
+Market panel functions for the indexfund package.
+Contains the array representation of historical data used by vectorized engines.
+"""
+
+import hashlib
+
+import numpy as np
+
+# Sentiment classification codes used in aligned fear and greed arrays
+FEAR_GREED_MISSING = 0
+FEAR_GREED_EXTREME_FEAR = 1
+FEAR_GREED_EXTREME_GREED = 2
+FEAR_GREED_OTHER = 3
+
+_FEAR_GREED_CODES = {
+    "Extreme Fear": FEAR_GREED_EXTREME_FEAR,
+    "Extreme Greed": FEAR_GREED_EXTREME_GREED,
+}
+
+
+class MarketPanel:
+    """
+    Historical token data as aligned (time x tokens) arrays.
+
+    Attributes:
+        tokens (list): Token symbols, in column order
+        timestamps (numpy.ndarray): Sorted int64 timestamps in milliseconds
+        prices (numpy.ndarray): Prices, NaN where a token has no data point
+        market_caps (numpy.ndarray): Market caps, NaN where a token has no data point
+        listed (numpy.ndarray): Boolean mask of tokens with data at each timestamp
+        fingerprint (str): Content hash identifying the panel in caches
+        volumes (numpy.ndarray): Traded USD volumes, NaN where unknown
+                                 (None when no volume data was supplied)
+    """
+
+    __slots__ = (
+        "tokens",
+        "timestamps",
+        "prices",
+        "market_caps",
+        "listed",
+        "fingerprint",
+        "volumes",
+    )
+
+    def __init__(self, tokens, timestamps, prices, market_caps, volumes=None):
+        self.tokens = list(tokens)
+        self.timestamps = timestamps
+        self.prices = prices
+        self.market_caps = market_caps
+        self.listed = ~np.isnan(market_caps)
+        self.fingerprint = _hash_arrays(
+            ",".join(self.tokens).encode(), timestamps, prices, market_caps
+        )
+        self.volumes = volumes
+
+    def __len__(self):
+        return len(self.timestamps)
+
+
+def _hash_arrays(*parts):
+    """Hash bytes and arrays into a short hex digest."""
+    digest = hashlib.blake2b(digest_size=16)
+    for part in parts:
+        digest.update(part if isinstance(part, bytes) else part.tobytes())
+    return digest.hexdigest()
+
+
+def timeline_fingerprint(timestamps):
+    """
+    Return a content hash for a timeline, used as a cache key.
+
+    Args:
+        timestamps (numpy.ndarray): Timestamps in milliseconds
+
+    Returns:
+        str: Hex digest of the timeline
+    """
+    return _hash_arrays(np.ascontiguousarray(timestamps, dtype=np.int64))
+
+
+def build_market_panel(
+    historical_data, exclude=("stablecoin",), dtype=np.float64, volume_data=None
+):
+    """
+    Convert historical token data into a MarketPanel.
+
+    Volumes only feed transaction cost models and are not part of the
+    panel's fingerprint.
+
+    Args:
+        historical_data (dict): Dictionary mapping token symbols to lists of
+                                [timestamp, price, market_cap] entries
+        exclude (tuple): Token symbols to leave out of the panel
+        dtype (numpy.dtype): Floating-point type of prices and market caps
+                             (float32 halves the memory of large panels)
+        volume_data (dict, optional): Dictionary mapping token symbols to lists
+                                      of [timestamp, volume] entries
+
+    Returns:
+        MarketPanel: Panel over the union of all token timestamps
+    """
+    tokens = [token for token in historical_data if token not in exclude]
+    series = [np.asarray(historical_data[token], dtype=float) for token in tokens]
+    series = [data.reshape(-1, 3) for data in series]
+
+    timestamps = np.unique(
+        np.concatenate([data[:, 0] for data in series]) if series else []
+    ).astype(np.int64)
+
+    prices = np.full((len(timestamps), len(tokens)), np.nan, dtype=dtype)
+    market_caps = np.full((len(timestamps), len(tokens)), np.nan, dtype=dtype)
+    for column, data in enumerate(series):
+        rows = np.searchsorted(timestamps, data[:, 0].astype(np.int64))
+        prices[rows, column] = data[:, 1]
+        market_caps[rows, column] = data[:, 2]
+
+    volumes = None
+    if volume_data is not None:
+        volumes = align_volume_data(timestamps, tokens, volume_data)
+
+    return MarketPanel(tokens, timestamps, prices, market_caps, volumes)
+
+
+def align_volume_data(timestamps, tokens, volume_data):
+    """
+    Align traded volumes with a panel timeline.
+
+    Args:
+        timestamps (numpy.ndarray): Panel timestamps in milliseconds
+        tokens (list): Token symbols, in column order
+        volume_data (dict): Dictionary mapping token symbols to lists of
+                            [timestamp, volume] entries
+
+    Returns:
+        numpy.ndarray: (time x tokens) volumes, NaN where a token has no entry
+    """
+    volumes = np.full((len(timestamps), len(tokens)), np.nan)
+    for column, token in enumerate(tokens):
+        data = np.asarray(volume_data.get(token, []), dtype=float).reshape(-1, 2)
+        rows = np.searchsorted(timestamps, data[:, 0].astype(np.int64))
+        found = rows < len(timestamps)
+        found[found] = timestamps[rows[found]] == data[found, 0]
+        volumes[rows[found], column] = data[found, 1]
+    return volumes
+
+
+def iterate_panel_chunks(panel, chunk_size):
+    """
+    Split a panel into consecutive row blocks.
+
+    Blocks share memory with the panel's arrays (which may be memory-mapped),
+    so only one block's derived data is materialized at a time.
+
+    Args:
+        panel (MarketPanel): Panel to split
+        chunk_size (int): Number of timestamps per block
+
+    Yields:
+        MarketPanel: Panels over consecutive slices of the timeline
+    """
+    for start in range(0, len(panel), chunk_size):
+        yield slice_market_panel(panel, start, start + chunk_size)
+
+
+def slice_market_panel(panel, start, end=None):
+    """
+    Return the panel over a range of rows, sharing memory with ``panel``.
+
+    Args:
+        panel (MarketPanel): Panel to slice
+        start (int): First row
+        end (int, optional): Row after the last (default: through the last row)
+
+    Returns:
+        MarketPanel: Panel over ``timestamps[start:end]``
+    """
+    rows = slice(start, end)
+    return MarketPanel(
+        panel.tokens,
+        panel.timestamps[rows],
+        panel.prices[rows],
+        panel.market_caps[rows],
+        None if panel.volumes is None else panel.volumes[rows],
+    )
+
+
+def _prepare_fear_greed_data(fear_greed_data):
+    """
+    Transform fear and greed data into a lookup map.
+
+    Args:
+        fear_greed_data (list or None): List of [timestamp, value, classification] entries
+
+    Returns:
+        dict or None: Mapping of timestamps to fear/greed data
+    """
+    if not fear_greed_data:
+        return None
+
+    return {
+        entry[0]: {"value": entry[1], "classification": entry[2]}
+        for entry in fear_greed_data
+    }
+
+
+def align_fear_greed_data(timestamps, fear_greed_data):
+    """
+    Align fear and greed entries with a panel timeline.
+
+    Args:
+        timestamps (numpy.ndarray): Panel timestamps in milliseconds
+        fear_greed_data (list or None): List of [timestamp, value, classification] entries
+
+    Returns:
+        tuple: (values, classifications) arrays over the timeline, where values
+               are NaN and classifications are FEAR_GREED_MISSING without data
+    """
+    values = np.full(len(timestamps), np.nan)
+    classifications = np.full(len(timestamps), FEAR_GREED_MISSING, dtype=np.int8)
+    if not fear_greed_data:
+        return values, classifications
+
+    for timestamp, value, classification in fear_greed_data:
+        row = np.searchsorted(timestamps, timestamp)
+        if row < len(timestamps) and timestamps[row] == timestamp:
+            values[row] = value
+            classifications[row] = _FEAR_GREED_CODES.get(
+                classification, FEAR_GREED_OTHER
+            )
+
+    return values, classifications
+
+
+def align_fear_greed_map(timestamps, fear_greed_map):
+    """
+    Align a fear and greed lookup map with a block of timestamps.
+
+    Unlike align_fear_greed_data this only looks up the given timestamps, so
+    aligning a short block costs nothing for the rest of a long series.
+
+    Args:
+        timestamps (numpy.ndarray): Panel timestamps in milliseconds
+        fear_greed_map (dict or None): Entries keyed by timestamp, as built by
+                                       _prepare_fear_greed_data
+
+    Returns:
+        tuple: (values, classifications) arrays over the timestamps, as
+               returned by align_fear_greed_data
+    """
+    values = np.full(len(timestamps), np.nan)
+    classifications = np.full(len(timestamps), FEAR_GREED_MISSING, dtype=np.int8)
+    if not fear_greed_map:
+        return values, classifications
+
+    for row, timestamp in enumerate(timestamps.tolist()):
+        entry = fear_greed_map.get(timestamp)
+        if entry:
+            values[row] = entry["value"]
+            classifications[row] = _FEAR_GREED_CODES.get(
+                entry["classification"], FEAR_GREED_OTHER
+            )
+
+    return values, classifications
@@ -12,18 +12,336 @@ The module implements a contrarian investment strategy that adjusts allocation
 between crypto assets and stablecoins based on market sentiment.
 """
 
+from collections.abc import MutableMapping
 from datetime import datetime
 
-from config import DEFAULT_SWAP_FEE, STAKING_CONFIG
-from core.data_loading import extract_current_data
-from core.metrics import calculate_portfolio_metrics
-from core.weighting import calculate_index_weights
+import numpy as np
+
+from config import DEFAULT_SWAP_FEE, REBALANCE_INTERVAL_DAYS, STAKING_CONFIG
+from core.context import MarketContext
+from core.costs import bind_swap_costs, token_fee_rates
+from core.drift import find_drift_trigger
+from core.events import (
+    EVENT_FLAG_DRIFT,
+    EVENT_FLAG_REBALANCE,
+    EVENT_FLAG_SENTIMENT,
+    PORTFOLIO_INITIALIZED,
+    SENTIMENT_ADJUSTMENT,
+    SIMULATION_COMPLETE,
+    STABLECOIN_REBALANCE,
+    TOKEN_REBALANCE,
+    get_default_event_log,
+)
+from core.ledger import (
+    REASON_DRIFT,
+    REASON_PERIODIC,
+    REASON_SENTIMENT,
+    membership_reasons,
+    record_quantity_changes,
+)
+from core.metrics import RunningPortfolioMetrics, calculate_portfolio_metrics
+from core.panel import (
+    _prepare_fear_greed_data,
+    align_fear_greed_map,
+    build_market_panel,
+)
+from core.schedule import continue_rebalance_events
+from core.sentiment import (
+    SENTIMENT_FREQUENCIES,
+    SIGNAL_LABELS,
+    SIGNAL_NONE,
+    compile_allocation_path,
+    sentiment_evaluation_rows,
+    sentiment_signals,
+    step_allocations,
+)
+from core.staking import build_staking_growth, staking_rates
+from core.universe import select_constituents
+from core.weighting import calculate_weight_matrix
 
 # ------------------------------------------------------------------------------
 # Portfolio Data Structure
 # ------------------------------------------------------------------------------
 
 
+class _TokenView(MutableMapping):
+    """Dict-style view of a single token's position inside a Portfolio."""
+
+    __slots__ = ("_portfolio", "_symbol")
+
+    _FIELDS = {
+        "quantity": "quantities",
+        "usd_value": "usd_values",
+        "target_weight": "target_weights",
+    }
+
+    def __init__(self, portfolio, symbol):
+        self._portfolio = portfolio
+        self._symbol = symbol
+
+    def __getitem__(self, key):
+        position = self._portfolio.positions[self._symbol]
+        return float(getattr(self._portfolio, self._FIELDS[key])[position])
+
+    def __setitem__(self, key, value):
+        position = self._portfolio.positions[self._symbol]
+        getattr(self._portfolio, self._FIELDS[key])[position] = value
+
+    def __delitem__(self, key):
+        raise TypeError("Token position fields cannot be deleted")
+
+    def __iter__(self):
+        return iter(self._FIELDS)
+
+    def __len__(self):
+        return len(self._FIELDS)
+
+    def __repr__(self):
+        return repr(dict(self))
+
+
+class _TokensView(MutableMapping):
+    """Dict-style view of all token positions, keyed by token symbol."""
+
+    __slots__ = ("_portfolio",)
+
+    def __init__(self, portfolio):
+        self._portfolio = portfolio
+
+    def __getitem__(self, symbol):
+        if symbol not in self._portfolio.positions:
+            raise KeyError(symbol)
+        return _TokenView(self._portfolio, symbol)
+
+    def __setitem__(self, symbol, data):
+        self._portfolio.set_token(symbol, data)
+
+    def __delitem__(self, symbol):
+        self._portfolio.remove_token(symbol)
+
+    def __contains__(self, symbol):
+        return symbol in self._portfolio.positions
+
+    def __iter__(self):
+        return iter(self._portfolio.symbols)
+
+    def __len__(self):
+        return len(self._portfolio.symbols)
+
+    def __repr__(self):
+        return repr({symbol: dict(data) for symbol, data in self.items()})
+
+
+class _StablecoinView(MutableMapping):
+    """Dict-style view of the stablecoin position inside a Portfolio."""
+
+    __slots__ = ("_portfolio",)
+
+    _FIELDS = {
+        "quantity": "stablecoin_quantity",
+        "usd_value": "stablecoin_usd_value",
+        "target_allocation": "target_allocation",
+    }
+
+    def __init__(self, portfolio):
+        self._portfolio = portfolio
+
+    def __getitem__(self, key):
+        return getattr(self._portfolio, self._FIELDS[key])
+
+    def __setitem__(self, key, value):
+        setattr(self._portfolio, self._FIELDS[key], value)
+
+    def __delitem__(self, key):
+        raise TypeError("Stablecoin fields cannot be deleted")
+
+    def __iter__(self):
+        return iter(self._FIELDS)
+
+    def __len__(self):
+        return len(self._FIELDS)
+
+    def __repr__(self):
+        return repr(dict(self))
+
+
+class Portfolio(MutableMapping):
+    """
+    Array-backed portfolio state.
+
+    Token quantities, USD values and target weights are kept in NumPy vectors
+    indexed by token position (see ``symbols``/``positions``), so valuation,
+    staking and rebalancing are a handful of array operations per step.
+
+    The class also behaves like the nested dict returned by earlier versions of
+    ``create_portfolio_structure``: ``portfolio["tokens"][token]["quantity"]``,
+    ``portfolio["stablecoin"]["target_allocation"]`` and friends read and write
+    straight through to the underlying arrays.
+    """
+
+    __slots__ = (
+        "symbols",
+        "positions",
+        "quantities",
+        "usd_values",
+        "target_weights",
+        "stablecoin_quantity",
+        "stablecoin_usd_value",
+        "target_allocation",
+        "volatile_allocation",
+        "total_usd_value",
+        "fees_paid",
+        "metadata",
+        "_staking_source",
+        "_staking_rates",
+    )
+
+    _KEYS = (
+        "tokens",
+        "stablecoin",
+        "volatile_allocation",
+        "total_usd_value",
+        "metadata",
+        "fees_paid",
+    )
+
+    def __init__(self, start_timestamp=None, stablecoin_allocation=0.5):
+        self.set_tokens({})
+        self.stablecoin_quantity = 0.0
+        self.stablecoin_usd_value = 0.0
+        self.target_allocation = stablecoin_allocation
+        self.volatile_allocation = 1.0 - stablecoin_allocation
+        self.total_usd_value = 0.0
+        self.fees_paid = 0.0
+        self.metadata = {
+            "last_timestamp": start_timestamp,
+            "last_rebalance_date": None,
+            "last_allocation_rebalance_date": None,
+        }
+
+    # --- Array access -------------------------------------------------------
+
+    def set_tokens(self, tokens):
+        """
+        Replace all token positions.
+
+        Args:
+            tokens (dict): Mapping of token symbol to a dict with "quantity",
+                           "usd_value" and "target_weight" entries
+        """
+        self.symbols = list(tokens)
+        self.positions = {symbol: i for i, symbol in enumerate(self.symbols)}
+        self.quantities = np.array(
+            [data.get("quantity", 0.0) for data in tokens.values()], dtype=float
+        )
+        self.usd_values = np.array(
+            [data.get("usd_value", 0.0) for data in tokens.values()], dtype=float
+        )
+        self.target_weights = np.array(
+            [data.get("target_weight", 0.0) for data in tokens.values()], dtype=float
+        )
+        self._staking_source = None
+        self._staking_rates = None
+
+    def set_token(self, symbol, data):
+        """Add a token position, or overwrite an existing one."""
+        tokens = {s: dict(self["tokens"][s]) for s in self.symbols}
+        tokens[symbol] = dict(data)
+        self.set_tokens(tokens)
+
+    def remove_token(self, symbol):
+        """Remove a token position."""
+        tokens = {s: dict(self["tokens"][s]) for s in self.symbols if s != symbol}
+        if len(tokens) == len(self.symbols):
+            raise KeyError(symbol)
+        self.set_tokens(tokens)
+
+    def price_vector(self, token_prices):
+        """
+        Align token prices with the portfolio's token positions.
+
+        Args:
+            token_prices (dict or numpy.ndarray): Prices keyed by symbol, or a
+                vector already aligned with ``symbols``
+
+        Returns:
+            numpy.ndarray: Price per position, NaN where no price is available
+        """
+        if isinstance(token_prices, np.ndarray):
+            return token_prices
+        return np.array(
+            [token_prices.get(symbol, np.nan) for symbol in self.symbols], dtype=float
+        )
+
+    def staking_rates(self, staking_config):
+        """
+        Return the staking APR for each token position.
+
+        The vector is cached per configuration object, so repeated calls with
+        the same ``staking_config`` cost a single identity check.
+        """
+        if self._staking_source is not staking_config:
+            self._staking_rates = np.array(
+                [staking_config.get(symbol, 0.0) for symbol in self.symbols],
+                dtype=float,
+            )
+            self._staking_source = staking_config
+        return self._staking_rates
+
+    def volatile_value(self):
+        """Return the current USD value of all token positions."""
+        return float(self.usd_values.sum())
+
+    # --- Dict compatibility -------------------------------------------------
+
+    def __getitem__(self, key):
+        if key == "tokens":
+            return _TokensView(self)
+        if key == "stablecoin":
+            return _StablecoinView(self)
+        if key in self._KEYS:
+            return getattr(self, key)
+        raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        if key == "tokens":
+            self.set_tokens(value)
+        elif key == "stablecoin":
+            stablecoin = _StablecoinView(self)
+            for field, field_value in value.items():
+                stablecoin[field] = field_value
+        elif key in self._KEYS:
+            setattr(self, key, value)
+        else:
+            raise KeyError(key)
+
+    def __delitem__(self, key):
+        raise TypeError("Portfolio keys cannot be deleted")
+
+    def __contains__(self, key):
+        return key in self._KEYS
+
+    def __iter__(self):
+        return iter(self._KEYS)
+
+    def __len__(self):
+        return len(self._KEYS)
+
+    def __repr__(self):
+        return f"Portfolio({self.to_dict()!r})"
+
+    def to_dict(self):
+        """Return a plain nested-dict copy of the portfolio."""
+        return {
+            "tokens": {s: dict(data) for s, data in self["tokens"].items()},
+            "stablecoin": dict(self["stablecoin"]),
+            "volatile_allocation": self.volatile_allocation,
+            "total_usd_value": self.total_usd_value,
+            "metadata": dict(self.metadata),
+            "fees_paid": self.fees_paid,
+        }
+
+
 def create_portfolio_structure(start_timestamp, stablecoin_allocation=0.5):
     """
     Create a new portfolio data structure with clear separation of units.
@@ -33,72 +351,66 @@ def create_portfolio_structure(start_timestamp, stablecoin_allocation=0.5):
         stablecoin_allocation (float): Target percentage of portfolio to allocate to stablecoin
 
     Returns:
-        dict: A structured portfolio with separate tracking for quantities, values, and allocations
-    """
-    return {
-        "tokens": {},  # Will contain per-token data
-        "stablecoin": {
-            "quantity": 0.0,  # Amount of stablecoin
-            "usd_value": 0.0,  # Current USD value of stablecoin
-            "target_allocation": stablecoin_allocation,  # Target % of total portfolio
-        },
-        "volatile_allocation": 1.0
-        - stablecoin_allocation,  # % allocated to volatile assets
-        "total_usd_value": 0.0,  # Total portfolio value in USD
-        "metadata": {
-            "last_timestamp": start_timestamp,
-            "last_rebalance_date": None,
-            "last_allocation_rebalance_date": None,
-        },
-    }
+        Portfolio: An array-backed portfolio with separate tracking for quantities,
+                   values, and allocations (also usable as a nested dict)
+    """
+    return Portfolio(start_timestamp, stablecoin_allocation)
 
 
-def initialize_portfolio(portfolio, token_weights, initial_usd_value, token_prices):
+def initialize_portfolio(
+    portfolio, token_weights, initial_usd_value, token_prices, event_log=None
+):
     """
     Initialize a portfolio with token quantities, USD values, and target weights.
 
     Args:
-        portfolio (dict): Portfolio structure to initialize
+        portfolio (Portfolio): Portfolio structure to initialize
         token_weights (dict): Weights for each token within the volatile portion
         initial_usd_value (float): Initial portfolio value in USD
         token_prices (dict): Current token prices in USD
+        event_log (EventLog, optional): Log receiving the initialization event
 
     Returns:
-        dict: Initialized portfolio
+        Portfolio: Initialized portfolio
     """
     # Calculate allocations
-    stablecoin_allocation = portfolio["stablecoin"]["target_allocation"]
-    volatile_allocation = portfolio["volatile_allocation"]
+    stablecoin_allocation = portfolio.target_allocation
+    volatile_allocation = portfolio.volatile_allocation
 
     # Calculate USD values
     stablecoin_usd = initial_usd_value * stablecoin_allocation
     volatile_usd = initial_usd_value * volatile_allocation
 
     # Initialize stablecoin (quantity equals USD value for stablecoin)
-    portfolio["stablecoin"]["quantity"] = stablecoin_usd
-    portfolio["stablecoin"]["usd_value"] = stablecoin_usd
-
-    # Initialize tokens
-    portfolio["tokens"] = {}
+    portfolio.stablecoin_quantity = stablecoin_usd
+    portfolio.stablecoin_usd_value = stablecoin_usd
 
+    # Initialize tokens that have a usable price
+    tokens = {}
     for token, weight in token_weights.items():
         if token in token_prices and token_prices[token] > 0:
             token_usd_value = volatile_usd * weight
-            token_quantity = token_usd_value / token_prices[token]
-
-            portfolio["tokens"][token] = {
-                "quantity": token_quantity,  # Amount of tokens
-                "usd_value": token_usd_value,  # Current USD value
-                "target_weight": weight,  # Target weight within volatile portion
+            tokens[token] = {
+                "quantity": token_usd_value / token_prices[token],
+                "usd_value": token_usd_value,
+                "target_weight": weight,
             }
+    portfolio.set_tokens(tokens)
 
     # Set total portfolio value
-    portfolio["total_usd_value"] = initial_usd_value
-
-    # Print summary of initialized portfolio
-    print(f"Initialized portfolio with {initial_usd_value:.2f} USD")
-    print(f"  Stablecoin: {stablecoin_usd:.2f} USD ({stablecoin_allocation*100:.1f}%)")
-    print(f"  Volatile assets: {volatile_usd:.2f} USD ({volatile_allocation*100:.1f}%)")
+    portfolio.total_usd_value = initial_usd_value
+
+    # Record summary of initialized portfolio
+    if event_log is None:
+        event_log = get_default_event_log()
+    event_log.record(
+        PORTFOLIO_INITIALIZED,
+        portfolio.metadata["last_timestamp"] or 0,
+        initial_usd_value,
+        stablecoin_usd,
+        volatile_usd,
+        stablecoin_allocation,
+    )
 
     return portfolio
 
@@ -109,27 +421,26 @@ def update_portfolio_values(portfolio, token_prices):
     Only changes USD values, not quantities.
 
     Args:
-        portfolio (dict): Portfolio structure
-        token_prices (dict): Current token prices in USD
+        portfolio (Portfolio): Portfolio structure
+        token_prices (dict or numpy.ndarray): Current token prices in USD
 
     Returns:
-        dict: Updated portfolio with new USD values
+        Portfolio: Updated portfolio with new USD values
     """
-    volatile_usd_total = 0.0
+    prices = portfolio.price_vector(token_prices)
+    priced = ~np.isnan(prices)
 
-    # Update token USD values
-    for token, data in portfolio["tokens"].items():
-        if token in token_prices:
-            # Calculate new USD value based on quantity and current price
-            data["usd_value"] = data["quantity"] * token_prices[token]
-            volatile_usd_total += data["usd_value"]
+    # Tokens without a current price keep their last USD value but are not counted
+    token_values = portfolio.quantities * prices
+    np.copyto(portfolio.usd_values, token_values, where=priced)
+    volatile_usd_total = float(np.sum(token_values, where=priced))
 
     # Stablecoin value equals its quantity (assuming $1 price)
-    stablecoin_usd = portfolio["stablecoin"]["quantity"]
-    portfolio["stablecoin"]["usd_value"] = stablecoin_usd
+    stablecoin_usd = portfolio.stablecoin_quantity
+    portfolio.stablecoin_usd_value = stablecoin_usd
 
     # Update total portfolio value
-    portfolio["total_usd_value"] = volatile_usd_total + stablecoin_usd
+    portfolio.total_usd_value = volatile_usd_total + stablecoin_usd
 
     return portfolio
 
@@ -139,18 +450,12 @@ def calculate_portfolio_total_value(portfolio):
     Calculate the total portfolio value in USD.
 
     Args:
-        portfolio (dict): Portfolio structure
+        portfolio (Portfolio): Portfolio structure
 
     Returns:
         float: Total portfolio value in USD
     """
-    # Sum token values
-    token_value = sum(data["usd_value"] for data in portfolio["tokens"].values())
-
-    # Add stablecoin value
-    total_value = token_value + portfolio["stablecoin"]["usd_value"]
-
-    return total_value
+    return portfolio.volatile_value() + portfolio.stablecoin_usd_value
 
 
 # ------------------------------------------------------------------------------
@@ -158,176 +463,772 @@ def calculate_portfolio_total_value(portfolio):
 # ------------------------------------------------------------------------------
 
 
-def calculate_historical_index_prices(
-    historical_data,
+class SimulationState:
+    """
+    Everything needed to continue a historical simulation from where it stopped.
+
+    Holds the strategy configuration, the portfolio, the rebalance schedule
+    position, running totals and the value history. Processing the same bars
+    from a restored state gives exactly the results of an uninterrupted run.
+
+    Attributes:
+        method (str): Weighting method ("market_cap", "sqrt_market_cap")
+        rebalance_frequency (str): Rebalancing frequency
+        apply_staking (bool): Whether staking rewards are applied
+        swap_fee (float): Fee percentage charged on swaps
+        stablecoin_allocation (float): Initial stablecoin allocation
+        initial_value (float): Initial portfolio value in USD
+        portfolio (Portfolio): Current holdings
+        last_timestamp (int): Timestamp of the last processed bar (None before the first)
+        rebalance_anchor (int): Wall-clock milliseconds of the last rebalance
+        wall_clock_floor (int): Largest wall-clock milliseconds processed so far
+        rebalance_count (int): Periodic rebalances performed
+        fear_greed_rebalance_count (int): Sentiment adjustments performed
+        total_fees_paid (float): Swap fees paid so far
+        fear_greed_enabled (bool): Whether fear and greed data has been supplied
+        drift_band (DriftBand): Thresholds for drift-triggered rebalancing (or None)
+        drift_rebalance_count (int): Drift-triggered rebalances performed
+        universe (UniverseRule): Top-N reconstitution rule (or None to hold every token)
+        cost_model (CostModel): Transaction cost model used instead of ``swap_fee`` (or None)
+        holdings (HoldingsHistory): Sparse holdings history being recorded (or None)
+        sentiment_rule (SentimentRule): Numeric fear and greed rule (or None to
+                                        classify by the index's labels)
+        sentiment_frequency (str): Cadence at which sentiment is evaluated
+                                   (see sentiment_evaluation_rows)
+        sentiment_level (float): Smoothed fear and greed value after the last
+                                 processed bar (None without smoothing)
+        last_sentiment_adjustment (float): Timestamp of the last sentiment
+                                           adjustment (None before the first)
+        last_sentiment_signal (int): Sentiment signal of the last processed bar
+        yield_curves (YieldCurves): Time-varying staking APRs (or None for the
+                                    constant rates of STAKING_CONFIG)
+        history (list): [timestamp, total_value] pairs for every processed bar
+                        (only kept when ``keep_history`` is True)
+        keep_history (bool): Whether to keep the full value history
+        running_metrics (RunningPortfolioMetrics): Metrics updated with every bar
+    """
+
+    __slots__ = (
+        "method",
+        "rebalance_frequency",
+        "apply_staking",
+        "swap_fee",
+        "stablecoin_allocation",
+        "initial_value",
+        "portfolio",
+        "last_timestamp",
+        "rebalance_anchor",
+        "wall_clock_floor",
+        "rebalance_count",
+        "fear_greed_rebalance_count",
+        "total_fees_paid",
+        "fear_greed_enabled",
+        "drift_band",
+        "drift_rebalance_count",
+        "universe",
+        "cost_model",
+        "holdings",
+        "sentiment_rule",
+        "sentiment_frequency",
+        "sentiment_level",
+        "last_sentiment_adjustment",
+        "last_sentiment_signal",
+        "yield_curves",
+        "history",
+        "keep_history",
+        "running_metrics",
+    )
+
+    def __init__(
+        self,
+        portfolio,
+        method,
+        rebalance_frequency="none",
+        apply_staking=True,
+        stablecoin_allocation=0.5,
+        swap_fee=DEFAULT_SWAP_FEE,
+        initial_value=100.0,
+        keep_history=True,
+        drift_band=None,
+        universe=None,
+        cost_model=None,
+        sentiment_rule=None,
+        sentiment_frequency="rebalance",
+        yield_curves=None,
+    ):
+        self.method = method
+        self.rebalance_frequency = rebalance_frequency
+        self.apply_staking = apply_staking
+        self.swap_fee = swap_fee
+        self.stablecoin_allocation = stablecoin_allocation
+        self.initial_value = initial_value
+        self.portfolio = portfolio
+        self.last_timestamp = None
+        self.rebalance_anchor = None
+        self.wall_clock_floor = None
+        self.rebalance_count = 0
+        self.fear_greed_rebalance_count = 0
+        self.total_fees_paid = 0.0
+        self.fear_greed_enabled = False
+        self.drift_band = drift_band
+        self.drift_rebalance_count = 0
+        self.universe = universe
+        self.cost_model = cost_model
+        self.holdings = None
+        self.sentiment_rule = sentiment_rule
+        self.sentiment_frequency = sentiment_frequency
+        self.sentiment_level = None
+        self.last_sentiment_adjustment = None
+        self.last_sentiment_signal = SIGNAL_NONE
+        self.yield_curves = yield_curves
+        self.history = []
+        self.keep_history = keep_history
+        self.running_metrics = RunningPortfolioMetrics()
+
+
+def create_simulation_state(
+    panel,
     method,
     rebalance_frequency="none",
     apply_staking=True,
-    start_date=None,
-    stablecoin_allocation=0.5,  # Default to 50% in stablecoin
-    fear_greed_data=None,  # Optional fear and greed index data
-    swap_fee=DEFAULT_SWAP_FEE,  # Fee for swaps during rebalancing
+    stablecoin_allocation=0.5,
+    swap_fee=DEFAULT_SWAP_FEE,
+    event_log=None,
+    keep_history=True,
+    drift_band=None,
+    universe=None,
+    cost_model=None,
+    holdings_history=None,
+    sentiment_rule=None,
+    sentiment_frequency="rebalance",
+    yield_curves=None,
 ):
     """
-    Calculate historical index prices using different weighting methods and options.
-    Allows for a fixed percentage allocation to stablecoin.
+    Create a simulation state with a portfolio initialized at the panel's first bar.
 
     Args:
-        historical_data (dict): Dictionary containing historical price and market cap data
-                              Format: {"token": [[timestamp, price, market_cap], ...]}
+        panel (MarketPanel or MarketContext): Market data whose first row sets
+                                              the initial holdings
         method (str): Weighting method ("market_cap", "sqrt_market_cap")
         rebalance_frequency (str): Rebalancing frequency ("none", "monthly", "quarterly", "yearly")
         apply_staking (bool): Whether to apply staking rewards
-        start_date (datetime or str): Optional start date for analysis (format: "YYYY-MM-DD")
         stablecoin_allocation (float): Percentage of total portfolio to allocate to stablecoin (0.0-1.0)
-        fear_greed_data (list): List of [timestamp, value, value_classification] entries for fear and greed index
         swap_fee (float): Fee percentage charged on token swaps during rebalancing
+        event_log (EventLog, optional): Log receiving the initialization event
+        keep_history (bool): Keep the full value history. Its memory grows with
+                             every bar and summarize_simulation then costs
+                             O(total bars) per call; long-running streams
+                             should pass False, so that advancing costs
+                             O(new bars) and summarizing O(1)
+        drift_band (DriftBand, optional): Also rebalance when holdings drift out of band
+        universe (UniverseRule, optional): Hold only the top-N tokens by market cap,
+                                           reconstituted at every token rebalance
+        cost_model (CostModel, optional): Price swaps with per-token fees and market
+                                          impact from the panel's volumes instead of
+                                          the flat ``swap_fee``
+        holdings_history (HoldingsHistory, optional): Empty history that records the
+                                                      holdings at every event point
+        sentiment_rule (SentimentRule, optional): Numeric fear and greed rule used
+                                                  instead of the index's labels
+        sentiment_frequency (str): When sentiment is evaluated ("rebalance",
+                                   "daily", "weekly" or "crossing")
+        yield_curves (YieldCurves, optional): Time-varying staking APRs used
+                                              instead of STAKING_CONFIG
 
     Returns:
-        tuple: (price_history, metrics) where:
-            - price_history is a list of [timestamp, price] pairs
-            - metrics is a dictionary of performance metrics
+        SimulationState: State ready to process the panel from its first bar
     """
-    # --- Data Preparation ---
-    processed_data = _preprocess_historical_data(historical_data, start_date)
-    if not processed_data:
-        return [], {}
+    if sentiment_frequency not in SENTIMENT_FREQUENCIES:
+        raise ValueError(f"Unknown sentiment frequency: {sentiment_frequency}")
+
+    context = panel if isinstance(panel, MarketContext) else MarketContext(panel)
+    panel = context.panel
+    listed = panel.listed[0]
+    if universe is None:
+        weights = context.weight_matrix(method)[0]
+    else:
+        constituents = select_constituents(
+            panel.market_caps[0], listed & (panel.prices[0] > 0), None, universe
+        )
+        weights = calculate_weight_matrix(
+            panel.market_caps[:1], method, listed=constituents[np.newaxis]
+        )[0]
+    initial_weights = {
+        token: weight
+        for token, weight, is_listed in zip(panel.tokens, weights, listed)
+        if is_listed
+    }
+    initial_prices = {
+        token: price
+        for token, price, is_listed in zip(panel.tokens, panel.prices[0], listed)
+        if is_listed
+    }
 
-    # Get only the index tokens (exclude stablecoin)
-    index_data = {k: v for k, v in processed_data.items() if k != "stablecoin"}
+    state = SimulationState(
+        create_portfolio_structure(int(panel.timestamps[0]), stablecoin_allocation),
+        method,
+        rebalance_frequency,
+        apply_staking,
+        stablecoin_allocation,
+        swap_fee,
+        keep_history=keep_history,
+        drift_band=drift_band,
+        universe=universe,
+        cost_model=cost_model,
+        sentiment_rule=sentiment_rule,
+        sentiment_frequency=sentiment_frequency,
+        yield_curves=yield_curves,
+    )
+    initialize_portfolio(
+        state.portfolio, initial_weights, state.initial_value, initial_prices, event_log
+    )
 
-    # Get sorted timestamps for analysis
-    timestamps = _extract_sorted_timestamps(processed_data)
-    if not timestamps:
-        return [], {}
+    # Every token of the panel is a candidate that may enter at a later rebalance
+    if universe is not None:
+        portfolio = state.portfolio
+        portfolio.set_tokens(
+            {
+                token: (
+                    dict(portfolio["tokens"][token])
+                    if token in portfolio.positions
+                    else {}
+                )
+                for token in panel.tokens
+            }
+        )
 
-    # Process fear and greed data if provided
-    fear_greed_map = _prepare_fear_greed_data(fear_greed_data)
+    if holdings_history is not None:
+        symbols = state.portfolio.symbols
+        aprs = np.zeros(len(symbols) + 1)
+        if apply_staking:
+            aprs = staking_rates(
+                symbols + ["stablecoin"], yield_curves or STAKING_CONFIG
+            )
+        holdings_history.start(symbols, aprs, yield_curves if apply_staking else None)
+        state.holdings = holdings_history
+    return state
+
+
+def advance_simulation(
+    state,
+    panel,
+    fear_greed_map=None,
+    event_log=None,
+    with_flags=False,
+    trade_ledger=None,
+    run=0,
+):
+    """
+    Process the panel bars that come after the state's last processed bar.
 
-    # --- Portfolio Initialization ---
-    portfolio = create_portfolio_structure(timestamps[0], stablecoin_allocation)
-    initial_value = 100.0  # Start with $100 for simplicity
+    Args:
+        state (SimulationState): State to advance, updated in place
+        panel (MarketPanel or MarketContext): Market data; bars at or before
+            ``state.last_timestamp`` are skipped. A context supplies its
+            precomputed weights, schedule and aligned sentiment.
+        fear_greed_map (dict, optional): Fear and greed entries keyed by timestamp
+        event_log (EventLog, optional): Log receiving rebalance events
+        with_flags (bool): Also return EVENT_FLAG_* bits for every new bar
+        trade_ledger (TradeLedger, optional): Ledger receiving every swap
+        run (int): Ledger run id of this simulation
 
-    # --- Backtest Simulation ---
-    result = []
-    is_initialized = False
+    Returns:
+        list: [timestamp, total_value] pairs for the newly processed bars, or a
+              (pairs, flags) tuple when ``with_flags`` is True
+    """
+    if event_log is None:
+        event_log = get_default_event_log()
+    if fear_greed_map:
+        state.fear_greed_enabled = True
+
+    context = None
+    if isinstance(panel, MarketContext):
+        context, panel = panel, panel.panel
 
-    # Summary statistics to track
-    rebalance_count = 0
-    fear_greed_rebalance_count = 0
-    total_fees_paid = 0.0
+    start = 0
+    if state.last_timestamp is not None:
+        start = int(
+            np.searchsorted(panel.timestamps, state.last_timestamp, side="right")
+        )
+    timestamps = panel.timestamps[start:]
+    if not len(timestamps):
+        return ([], np.zeros(0, dtype=np.int8)) if with_flags else []
 
-    for timestamp in timestamps:
-        current_date = datetime.fromtimestamp(timestamp / 1000)
+    portfolio = state.portfolio
+    swap_fee = state.swap_fee
+    cost_model = state.cost_model
 
-        # Get market data at current timestamp
-        current_market_caps, current_prices = extract_current_data(
-            index_data, timestamp
+    # Rebalance events of this block (the context's schedule from the first bar)
+    if context is not None and state.last_timestamp is None:
+        schedule = context.rebalance_events(state.rebalance_frequency)
+    else:
+        schedule = continue_rebalance_events(
+            timestamps,
+            state.rebalance_frequency,
+            state.rebalance_anchor,
+            state.wall_clock_floor,
         )
+    events, state.rebalance_anchor, state.wall_clock_floor = schedule
+    rebalance_schedule = np.zeros(len(timestamps), dtype=bool)
+    rebalance_schedule[events] = True
+
+    # Prices and listing flags aligned with the portfolio's token positions;
+    # held tokens without data in this panel are treated as unlisted
+    panel_columns = {token: column for column, token in enumerate(panel.tokens)}
+    held_columns = np.array(
+        [panel_columns.get(token, -1) for token in portfolio.symbols], dtype=np.intp
+    )
+    missing = held_columns < 0
+    held_prices = panel.prices[start:, held_columns]
+    held_prices[:, missing] = np.nan
+    held_listed = panel.listed[start:, held_columns]
+    held_listed[:, missing] = False
+
+    # Index weights for the whole panel (cached), only needed when rebalancing;
+    # reconstituted indexes weight the constituents chosen at each rebalance
+    drift_band = state.drift_band
+    universe = state.universe
+    if universe is not None:
+        held_caps = panel.market_caps[start:, held_columns]
+        held_caps[:, missing] = np.nan
+    elif len(events) or drift_band is not None:
+        if context is None:
+            weight_matrix = calculate_weight_matrix(
+                panel.market_caps,
+                state.method,
+                listed=panel.listed,
+                fingerprint=panel.fingerprint,
+            )
+        else:
+            weight_matrix = context.weight_matrix(state.method)
+        held_weights = weight_matrix[start:, held_columns]
+
+    def index_weights(row):
+        """Target weights for a token rebalance at ``row``."""
+        if universe is None:
+            row_weights = held_weights[row]
+        else:
+            constituents = select_constituents(
+                held_caps[row],
+                held_listed[row] & (held_prices[row] > 0),
+                portfolio.target_weights > 0,
+                universe,
+            )
+            row_weights = calculate_weight_matrix(
+                held_caps[row][np.newaxis],
+                state.method,
+                listed=constituents[np.newaxis],
+            )[0]
+
+        # Unlisted tokens keep their previous target weight
+        return np.where(held_listed[row], row_weights, portfolio.target_weights)
+
+    # Swap costs: the flat fee, or the cost model bound to each bar's volumes
+    if cost_model is not None:
+        fee_rates = token_fee_rates(cost_model, portfolio.symbols)
+        held_volumes = None
+        if panel.volumes is not None:
+            held_volumes = panel.volumes[start:, held_columns]
+            held_volumes[:, missing] = np.nan
+
+    def swap_costs(row):
+        """Fee rate or cost function for swaps at ``row``."""
+        if cost_model is None:
+            return swap_fee
+        return bind_swap_costs(
+            cost_model, fee_rates, None if held_volumes is None else held_volumes[row]
+        )
+
+    # Staking growth applied at each bar: the step from the previously processed
+    # bar, or no growth at the very first bar of a simulation
+    token_growth = stablecoin_growth = None
+    if state.apply_staking:
+        growth_timestamps = timestamps
+        if state.last_timestamp is not None:
+            growth_timestamps = np.concatenate([[state.last_timestamp], timestamps])
+        growth = build_staking_growth(
+            growth_timestamps,
+            portfolio.symbols + ["stablecoin"],
+            state.yield_curves or STAKING_CONFIG,
+        )
+        if state.last_timestamp is None:
+            growth = np.vstack([np.ones(growth.shape[1]), growth])
+        token_growth = growth[:, :-1]
+        stablecoin_growth = growth[:, -1]
+        stablecoin_growth_values = stablecoin_growth.tolist()
+
+    def next_drift_row(row):
+        """First bar after ``row`` at which the current holdings breach the band."""
+        upcoming = row + 1
+        trigger = find_drift_trigger(
+            portfolio.quantities,
+            portfolio.stablecoin_quantity,
+            held_prices[upcoming:],
+            None if token_growth is None else token_growth[upcoming:],
+            None if stablecoin_growth is None else stablecoin_growth[upcoming:],
+            portfolio.target_weights,
+            portfolio.target_allocation,
+            drift_band,
+        )
+        if trigger is None:
+            return -1, False, False
+        offset, token_breach, allocation_breach = trigger
+        return upcoming + offset, token_breach, allocation_breach
 
-        # Calculate index fund weights based on market caps
-        current_weights = calculate_index_weights(current_market_caps, method)
+    drift_row = -1
+    if drift_band is not None:
+        drift_row, token_drift, allocation_drift = next_drift_row(-1)
 
-        # Initialize positions if this is the first timestamp
-        if not is_initialized:
-            portfolio = initialize_portfolio(
-                portfolio, current_weights, initial_value, current_prices
+    # Sentiment adjustments of this block, precomputed from the aligned series
+    sentiment_changes = {}
+    if fear_greed_map:
+        if context is not None and fear_greed_map is context.fear_greed_map:
+            sentiment_values = context.fear_greed_values[start:]
+            sentiment_classes = context.fear_greed_classes[start:]
+        else:
+            sentiment_values, sentiment_classes = align_fear_greed_map(
+                timestamps, fear_greed_map
             )
-            is_initialized = True
-            print(
-                f"Portfolio initialized with {stablecoin_allocation*100:.1f}% stablecoin allocation"
+        signals, state.sentiment_level = sentiment_signals(
+            sentiment_values,
+            sentiment_classes,
+            state.sentiment_rule,
+            state.sentiment_level,
+        )
+        evaluation_rows, state.last_sentiment_signal = sentiment_evaluation_rows(
+            timestamps,
+            signals,
+            state.sentiment_frequency,
+            events,
+            state.last_timestamp,
+            state.last_sentiment_signal,
+        )
+        change_rows, path, last_adjustment = compile_allocation_path(
+            timestamps,
+            signals,
+            evaluation_rows,
+            portfolio.target_allocation,
+            state.sentiment_rule,
+            state.last_sentiment_adjustment,
+        )
+        if np.isfinite(last_adjustment):
+            state.last_sentiment_adjustment = float(last_adjustment)
+        sentiment_changes = {
+            row: (allocation, int(signals[row]))
+            for row, allocation in zip(change_rows.tolist(), path.tolist())
+        }
+
+    # Holdings are recorded at the first bar and after every trade
+    holdings = state.holdings
+    if holdings is not None:
+        holdings_row = holdings.extend(timestamps)
+        if not holdings.event_count:
+            holdings.snapshot(
+                holdings_row, portfolio.quantities, portfolio.stablecoin_quantity
             )
 
-        # Apply staking rewards if enabled (do this before rebalancing)
-        if apply_staking:
-            apply_staking_to_portfolio(portfolio, timestamp)
+    result = []
+    sentiment_rows = []
+    drift_rows = []
+    for row, timestamp in enumerate(timestamps.tolist()):
+        prices = held_prices[row]
+        rebalanced = False
 
-        # Get fear and greed data for this timestamp if available
-        current_fear_greed = fear_greed_map.get(timestamp) if fear_greed_map else None
+        # Apply staking rewards if enabled (do this before rebalancing)
+        if token_growth is not None:
+            portfolio.quantities *= token_growth[row]
+            portfolio.stablecoin_quantity *= stablecoin_growth_values[row]
 
         # Periodic rebalancing based on frequency
-        if should_rebalance(
-            current_date,
-            portfolio["metadata"]["last_rebalance_date"],
-            rebalance_frequency,
-        ):
+        if rebalance_schedule[row]:
             portfolio, fees_paid = rebalance_portfolio_tokens(
-                portfolio, current_weights, current_prices, timestamp, swap_fee
+                portfolio,
+                index_weights(row),
+                prices,
+                timestamp,
+                swap_costs(row),
+                event_log,
+                trade_ledger,
+                run,
+                REASON_PERIODIC,
             )
-            total_fees_paid += fees_paid
+            state.total_fees_paid += fees_paid
 
             # Update rebalance date
-            portfolio["metadata"]["last_rebalance_date"] = current_date
-            rebalance_count += 1
-
-            # After rebalancing tokens, we might also need to rebalance stablecoin allocation
-            # based on fear and greed if available
-            if current_fear_greed:
-                fear_greed_adjusted, fg_fees = process_fear_greed_rebalancing(
-                    portfolio, current_fear_greed, current_prices, timestamp, swap_fee
+            portfolio.metadata["last_rebalance_date"] = datetime.fromtimestamp(
+                timestamp / 1000
+            )
+            state.rebalance_count += 1
+            rebalanced = True
+
+        # Threshold rebalancing when holdings drift out of their bands
+        elif row == drift_row:
+            if token_drift:
+                portfolio, fees_paid = rebalance_portfolio_tokens(
+                    portfolio,
+                    index_weights(row),
+                    prices,
+                    timestamp,
+                    swap_costs(row),
+                    event_log,
+                    trade_ledger,
+                    run,
+                    REASON_DRIFT,
+                )
+                state.total_fees_paid += fees_paid
+            if allocation_drift:
+                portfolio, fees_paid = rebalance_stablecoin_allocation(
+                    portfolio,
+                    portfolio.target_allocation,
+                    prices,
+                    swap_costs(row),
+                    event_log,
+                    timestamp,
+                    trade_ledger,
+                    run,
+                    REASON_DRIFT,
                 )
-                if fear_greed_adjusted:
-                    fear_greed_rebalance_count += 1
-                    total_fees_paid += fg_fees
+                state.total_fees_paid += fees_paid
+            state.drift_rebalance_count += 1
+            drift_rows.append(row)
+            rebalanced = True
+
+        # Move the stablecoin allocation where the precomputed sentiment path
+        # changes it (after any token rebalance of the same bar)
+        if row in sentiment_changes:
+            new_allocation, signal = sentiment_changes[row]
+            fg_fees = apply_sentiment_allocation(
+                portfolio,
+                new_allocation,
+                signal,
+                prices,
+                timestamp,
+                swap_costs(row),
+                event_log,
+                trade_ledger,
+                run,
+            )
+            state.fear_greed_rebalance_count += 1
+            state.total_fees_paid += fg_fees
+            sentiment_rows.append(row)
+            rebalanced = True
+
+        if drift_band is not None and rebalanced:
+            drift_row, token_drift, allocation_drift = next_drift_row(row)
+        if holdings is not None and rebalanced:
+            holdings.snapshot(
+                holdings_row + row, portfolio.quantities, portfolio.stablecoin_quantity
+            )
 
         # Update portfolio values with current prices
-        update_portfolio_values(portfolio, current_prices)
+        update_portfolio_values(portfolio, prices)
 
         # Store result
-        result.append([timestamp, portfolio["total_usd_value"]])
+        result.append([timestamp, portfolio.total_usd_value])
 
         # Update timestamp for next iteration
-        portfolio["metadata"]["last_timestamp"] = timestamp
+        portfolio.metadata["last_timestamp"] = timestamp
 
-    # Calculate performance metrics
-    metrics = calculate_portfolio_metrics(result)
+    state.last_timestamp = timestamp
+    state.running_metrics.update([value for _, value in result])
+    if state.keep_history:
+        state.history.extend(result)
+
+    if with_flags:
+        flags = rebalance_schedule.astype(np.int8) * EVENT_FLAG_REBALANCE
+        flags[sentiment_rows] |= EVENT_FLAG_SENTIMENT
+        flags[drift_rows] |= EVENT_FLAG_DRIFT
+        return result, flags
+    return result
+
+
+def summarize_simulation(state, event_log=None):
+    """
+    Calculate performance metrics for everything a state has processed.
+
+    Metrics come from the value history when the state keeps it, which costs
+    O(total bars) per call, and from the running accumulators otherwise, which
+    costs O(1) and agrees with the history-based metrics to rounding.
+
+    Args:
+        state (SimulationState): Simulation state
+        event_log (EventLog, optional): Log receiving the summary event
+
+    Returns:
+        dict: Performance metrics plus rebalancing and allocation statistics
+    """
+    portfolio = state.portfolio
+
+    # Calculate performance metrics from the full history when it is kept
+    if state.keep_history:
+        metrics = calculate_portfolio_metrics(state.history)
+    else:
+        metrics = state.running_metrics.metrics()
 
     # Add additional information to metrics
-    metrics["stablecoin_allocation"] = stablecoin_allocation
-    metrics["rebalance_frequency"] = rebalance_frequency
-    metrics["rebalance_count"] = rebalance_count
-    metrics["fear_greed_rebalance_count"] = fear_greed_rebalance_count
-    metrics["total_fees_paid"] = total_fees_paid
+    metrics["stablecoin_allocation"] = state.stablecoin_allocation
+    metrics["rebalance_frequency"] = state.rebalance_frequency
+    metrics["rebalance_count"] = state.rebalance_count
+    metrics["fear_greed_rebalance_count"] = state.fear_greed_rebalance_count
+    metrics["total_fees_paid"] = state.total_fees_paid
+    if state.drift_band is not None:
+        metrics["drift_rebalance_count"] = state.drift_rebalance_count
 
     # Final portfolio composition
-    stablecoin_pct = (
-        portfolio["stablecoin"]["usd_value"] / portfolio["total_usd_value"] * 100
-    )
+    stablecoin_pct = portfolio.stablecoin_usd_value / portfolio.total_usd_value * 100
     volatile_pct = 100 - stablecoin_pct
 
     metrics["final_stablecoin_pct"] = stablecoin_pct
     metrics["final_volatile_pct"] = volatile_pct
 
     # Token weights within volatile portion
-    if portfolio["total_usd_value"] > 0:
-        token_values = {}
-        for token, data in portfolio["tokens"].items():
-            token_pct = (data["usd_value"] / portfolio["total_usd_value"]) * 100
-            token_values[token] = {
-                "usd_value": data["usd_value"],
-                "percentage": token_pct,
-            }
-        metrics["token_values"] = token_values
+    if portfolio.total_usd_value > 0:
+        token_pcts = portfolio.usd_values / portfolio.total_usd_value * 100
+        metrics["token_values"] = {
+            token: {"usd_value": float(usd_value), "percentage": float(token_pct)}
+            for token, usd_value, token_pct in zip(
+                portfolio.symbols, portfolio.usd_values, token_pcts
+            )
+        }
+
+    # Record summary statistics (rendered only if the log echoes or is rendered)
+    if event_log is None:
+        event_log = get_default_event_log()
+    event_log.record(
+        SIMULATION_COMPLETE,
+        state.last_timestamp,
+        state.stablecoin_allocation,
+        stablecoin_pct,
+        state.initial_value,
+        portfolio.total_usd_value,
+        metrics["total_return"],
+        metrics["annualized_roi"],
+        metrics["max_drawdown"],
+        state.rebalance_count,
+        state.total_fees_paid,
+        state.fear_greed_rebalance_count if state.fear_greed_enabled else np.nan,
+        label=(state.method, state.rebalance_frequency),
+    )
+
+    return metrics
+
+
+def calculate_historical_index_prices(
+    historical_data,
+    method,
+    rebalance_frequency="none",
+    apply_staking=True,
+    start_date=None,
+    stablecoin_allocation=0.5,  # Default to 50% in stablecoin
+    fear_greed_data=None,  # Optional fear and greed index data
+    swap_fee=DEFAULT_SWAP_FEE,  # Fee for swaps during rebalancing
+    event_log=None,  # Optional EventLog (default: print events)
+    drift_band=None,  # Optional DriftBand for threshold rebalancing
+    universe=None,  # Optional UniverseRule for top-N reconstitution
+    cost_model=None,  # Optional CostModel replacing the flat swap fee
+    volume_data=None,  # Optional volumes driving the cost model's market impact
+    trade_ledger=None,  # Optional TradeLedger receiving every swap
+    holdings_history=None,  # Optional HoldingsHistory receiving event holdings
+    sentiment_rule=None,  # Optional SentimentRule driven by the numeric index value
+    sentiment_frequency="rebalance",  # Cadence of sentiment evaluation
+    yield_curves=None,  # Optional YieldCurves with time-varying staking APRs
+):
+    """
+    Calculate historical index prices using different weighting methods and options.
+    Allows for a fixed percentage allocation to stablecoin.
 
-    # Print summary statistics
-    print(f"Simulation complete: {method} with {rebalance_frequency} rebalancing")
-    print(
-        f"  Initial allocation: {stablecoin_allocation*100:.1f}% stablecoin, {(1-stablecoin_allocation)*100:.1f}% crypto"
+    Args:
+        historical_data (dict or MarketContext): Dictionary containing historical price and market cap data
+                              Format: {"token": [[timestamp, price, market_cap], ...]},
+                              or a context shared by the strategies of a run
+                              (``volume_data`` is then ignored)
+        method (str): Weighting method ("market_cap", "sqrt_market_cap")
+        rebalance_frequency (str): Rebalancing frequency ("none", "monthly", "quarterly", "yearly")
+        apply_staking (bool): Whether to apply staking rewards
+        start_date (datetime or str): Optional start date for analysis (format: "YYYY-MM-DD")
+        stablecoin_allocation (float): Percentage of total portfolio to allocate to stablecoin (0.0-1.0)
+        fear_greed_data (list): List of [timestamp, value, value_classification] entries for fear and greed index
+        swap_fee (float): Fee percentage charged on token swaps during rebalancing
+        event_log (EventLog, optional): Log receiving rebalance and summary events
+        drift_band (DriftBand, optional): Also rebalance whenever a token weight or the
+                                          stablecoin share drifts out of its band
+        universe (UniverseRule, optional): Hold only the top-N tokens by market cap,
+                                           reconstituted at every token rebalance
+        cost_model (CostModel, optional): Price swaps with per-token fees and market
+                                          impact instead of the flat ``swap_fee``
+        volume_data (dict, optional): Traded volumes for the cost model
+                                      Format: {"token": [[timestamp, volume], ...]}
+        trade_ledger (TradeLedger, optional): Ledger receiving every swap of
+                                              this run (under a new run id)
+        holdings_history (HoldingsHistory, optional): Empty history that records the
+                                                      holdings at every event point
+        sentiment_rule (SentimentRule, optional): Numeric fear and greed rule used
+                                                  instead of the index's labels
+        sentiment_frequency (str): When sentiment is evaluated: "rebalance" (only
+                                   at periodic rebalances), "daily", "weekly" or
+                                   "crossing" (when the signal turns to fear or greed)
+        yield_curves (YieldCurves, optional): Time-varying staking APRs used
+                                              instead of STAKING_CONFIG
+
+    Returns:
+        tuple: (price_history, metrics) where:
+            - price_history is a list of [timestamp, price] pairs
+            - metrics is a dictionary of performance metrics
+    """
+    # --- Data Preparation ---
+    if isinstance(historical_data, MarketContext):
+        context = historical_data.since(start_date)
+    else:
+        processed_data = _preprocess_historical_data(historical_data, start_date)
+        if not processed_data:
+            return [], {}
+
+        # Arrange the index tokens (excluding stablecoin) as time x token arrays
+        context = MarketContext(
+            build_market_panel(processed_data, volume_data=volume_data),
+            fear_greed_data,
+        )
+    if not len(context):
+        return [], {}
+
+    # Process fear and greed data if provided (the context's own is prepared)
+    fear_greed_map = context.fear_greed_map
+    if fear_greed_data is not context.fear_greed_data:
+        fear_greed_map = _prepare_fear_greed_data(fear_greed_data)
+
+    if event_log is None:
+        event_log = get_default_event_log()
+
+    # --- Portfolio Initialization ---
+    state = create_simulation_state(
+        context,
+        method,
+        rebalance_frequency,
+        apply_staking,
+        stablecoin_allocation,
+        swap_fee,
+        event_log,
+        drift_band=drift_band,
+        universe=universe,
+        cost_model=cost_model,
+        holdings_history=holdings_history,
+        sentiment_rule=sentiment_rule,
+        sentiment_frequency=sentiment_frequency,
+        yield_curves=yield_curves,
     )
-    print(
-        f"  Final allocation: {stablecoin_pct:.1f}% stablecoin, {volatile_pct:.1f}% crypto"
+
+    # --- Backtest Simulation ---
+    run = 0 if trade_ledger is None else int(trade_ledger.new_runs()[0])
+    result = advance_simulation(
+        state,
+        context,
+        fear_greed_map,
+        event_log,
+        trade_ledger=trade_ledger,
+        run=run,
     )
-    print(f"  Initial value: ${initial_value:.2f}")
-    print(f"  Final value: ${portfolio['total_usd_value']:.2f}")
-    print(f"  Return: {metrics['total_return']:.2f}%")
-    print(f"  Annualized ROI: {metrics['annualized_roi']:.2f}%")
-    print(f"  Max Drawdown: {metrics['max_drawdown']:.2f}%")
-    print(f"  Rebalances performed: {rebalance_count}")
-    print(f"  Total fees paid: ${total_fees_paid:.2f}")
-    if fear_greed_map:
-        print(f"  Fear & Greed adjustments: {fear_greed_rebalance_count}")
 
-    return result, metrics
+    return result, summarize_simulation(state, event_log)
 
 
 # ------------------------------------------------------------------------------
@@ -340,12 +1241,12 @@ def calculate_staking_rewards(amount, apr, days):
     Calculate staking rewards with daily compounding.
 
     Args:
-        amount (float): Initial token amount
-        apr (float): Annual percentage rate (as decimal)
+        amount (float or numpy.ndarray): Initial token amount(s)
+        apr (float or numpy.ndarray): Annual percentage rate(s) (as decimal)
         days (float): Number of days to calculate rewards for
 
     Returns:
-        float: Rewards earned over the specified period
+        float or numpy.ndarray: Rewards earned over the specified period
     """
 
     daily_rate = apr / 365
@@ -358,32 +1259,29 @@ def apply_staking_to_portfolio(portfolio, current_timestamp):
     Updates token quantities but not USD values.
 
     Args:
-        portfolio (dict): Portfolio data structure
+        portfolio (Portfolio): Portfolio data structure
         current_timestamp (int): Current timestamp in milliseconds
     """
     # Calculate days since last update
-    days = (current_timestamp - portfolio["metadata"]["last_timestamp"]) / (
+    days = (current_timestamp - portfolio.metadata["last_timestamp"]) / (
         1000 * 60 * 60 * 24
     )
 
     if days <= 0:
         return
 
-    # Apply staking to each token
-    for token, data in portfolio["tokens"].items():
-        if token in STAKING_CONFIG and STAKING_CONFIG[token] > 0:
-            reward_quantity = calculate_staking_rewards(
-                data["quantity"], STAKING_CONFIG[token], days
-            )
-            # Add rewards to quantity (auto-compound)
-            data["quantity"] += reward_quantity
+    # Apply staking to every token at once (tokens without staking have a 0% APR)
+    quantities = portfolio.quantities
+    quantities += calculate_staking_rewards(
+        quantities, portfolio.staking_rates(STAKING_CONFIG), days
+    )
 
     # Apply staking to stablecoin if configured
     if "stablecoin" in STAKING_CONFIG and STAKING_CONFIG["stablecoin"] > 0:
         stablecoin_reward = calculate_staking_rewards(
-            portfolio["stablecoin"]["quantity"], STAKING_CONFIG["stablecoin"], days
+            portfolio.stablecoin_quantity, STAKING_CONFIG["stablecoin"], days
         )
-        portfolio["stablecoin"]["quantity"] += stablecoin_reward
+        portfolio.stablecoin_quantity += stablecoin_reward
 
 
 # ------------------------------------------------------------------------------
@@ -395,6 +1293,10 @@ def should_rebalance(current_date, last_rebalance_date, frequency):
     """
     Determine if rebalancing should occur based on the frequency.
 
+    Simulations use the equivalent precomputed schedule from
+    core.schedule.compile_rebalance_schedule instead of calling this per step.
+    Calendar schedules ("quarter_end", ...) are only available there.
+
     Args:
         current_date (datetime): Current date
         last_rebalance_date (datetime): Last rebalance date
@@ -409,183 +1311,334 @@ def should_rebalance(current_date, last_rebalance_date, frequency):
     if last_rebalance_date is None:
         return True
 
-    # Calculate days elapsed since last rebalance
+    interval_days = REBALANCE_INTERVAL_DAYS.get(frequency)
+    if interval_days is None:
+        return False
+
+    # Rebalance if at least the frequency's interval has passed
     days_elapsed = (current_date - last_rebalance_date).days
+    return days_elapsed >= interval_days
+
+
+def planned_token_trades(quantities, prices, target_weights):
+    """
+    USD trade per token needed to reach target weights, before fees.
+
+    Args:
+        quantities (numpy.ndarray): Token quantities, with optional lane dimensions
+        prices (numpy.ndarray): Token prices (NaN where unavailable)
+        target_weights (numpy.ndarray): Target weights within the volatile portion
+
+    Returns:
+        numpy.ndarray: Absolute USD trade per token (NaN where unpriced)
+    """
+    current_values = quantities * prices
+    volatile_value = np.sum(current_values, axis=-1, where=~np.isnan(prices))
+    return np.abs(volatile_value[..., np.newaxis] * target_weights - current_values)
+
+
+def rebalance_token_quantities(
+    quantities, prices, target_weights, swap_fee_rate, token_fees=None
+):
+    """
+    Rebalance token quantities to target weights, in place.
+
+    Works on a single portfolio (``quantities`` of shape ``(tokens,)``) or on a
+    batch of portfolios with any number of leading lane dimensions. Each swap's
+    fee is deducted from the volatile value before the next token's target is
+    computed, so the loop runs over token positions while every operation inside
+    it is vectorized across lanes.
+
+    Args:
+        quantities (numpy.ndarray): Token quantities, modified in place
+        prices (numpy.ndarray): Token prices (NaN where unavailable)
+        target_weights (numpy.ndarray): Target weights within the volatile portion
+        swap_fee_rate (float, numpy.ndarray or callable): Fee percentage charged
+            on swaps, per token when an array, or a cost function (see
+            core.costs.bind_swap_costs) evaluated on the planned trades
+        token_fees (numpy.ndarray, optional): Receives the fee paid per token,
+                                              shaped like ``quantities``
+
+    Returns:
+        tuple: (volatile_value, fees) before fees, per lane
+    """
+    if callable(swap_fee_rate):
+        swap_fee_rate = swap_fee_rate(
+            planned_token_trades(quantities, prices, target_weights)
+        )
+    priced = ~np.isnan(prices)
+    current_values = quantities * prices
+    volatile_value = np.sum(current_values, axis=-1, where=priced)
+    remaining_value = np.array(volatile_value, dtype=float)
+    fees = np.zeros_like(remaining_value)
+    tradable = np.broadcast_to(prices > 0, quantities.shape)
+    prices = np.broadcast_to(prices, quantities.shape)
+    target_weights = np.broadcast_to(target_weights, quantities.shape)
+    fee_rates = np.broadcast_to(swap_fee_rate, quantities.shape)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for position in range(quantities.shape[-1]):
+            can_trade = tradable[..., position]
+            target_usd = remaining_value * target_weights[..., position]
+            swap_volume = np.abs(target_usd - current_values[..., position])
+            swap_fee = np.where(can_trade, swap_volume * fee_rates[..., position], 0.0)
+            # A full exit cannot leave a negative position; its fee comes out
+            # of the value left for the remaining tokens
+            quantities[..., position] = np.where(
+                can_trade & (swap_volume > 0),
+                np.maximum(target_usd - swap_fee, 0.0) / prices[..., position],
+                quantities[..., position],
+            )
+            fees += swap_fee
+            remaining_value -= swap_fee
+            if token_fees is not None:
+                token_fees[..., position] = swap_fee
+
+    return volatile_value, fees
+
+
+def rebalance_stablecoin_quantities(
+    quantities,
+    stablecoin_quantity,
+    prices,
+    new_allocation,
+    swap_fee_rate,
+    token_fees=None,
+):
+    """
+    Shift value between stablecoin and tokens to hit a new stablecoin allocation.
+
+    Token quantities are scaled in place; like ``rebalance_token_quantities`` this
+    accepts leading lane dimensions.
+
+    Args:
+        quantities (numpy.ndarray): Token quantities, modified in place
+        stablecoin_quantity (float or numpy.ndarray): Current stablecoin quantity
+        prices (numpy.ndarray): Token prices (NaN where unavailable)
+        new_allocation (float or numpy.ndarray): Target stablecoin allocation
+        swap_fee_rate (float, numpy.ndarray or callable): Fee percentage charged
+            on swaps, per token when an array, or a cost function evaluated on
+            each token's share of the swap
+        token_fees (numpy.ndarray, optional): Receives the fee attributed to each
+                                              token, shaped like ``quantities``
+
+    Returns:
+        tuple: (new_stablecoin_quantity, stablecoin_adjustment, fees)
+    """
+    priced = ~np.isnan(prices)
+    volatile_value = np.sum(quantities * prices, axis=-1, where=priced)
+    total_value = volatile_value + stablecoin_quantity
+
+    # Calculate target values based on new allocation
+    target_stablecoin_value = total_value * new_allocation
+    target_volatile_value = total_value * (1 - new_allocation)
+
+    # Calculate fee only on the amount being swapped
+    stablecoin_adjustment = target_stablecoin_value - stablecoin_quantity
+    swap_volume = np.abs(stablecoin_adjustment)
+    flat_fee = np.ndim(swap_fee_rate) == 0 and not callable(swap_fee_rate)
+    if flat_fee:
+        fees = swap_volume * swap_fee_rate
+    if not flat_fee or token_fees is not None:
+        # Tokens are bought or sold in proportion to their current value
+        with np.errstate(divide="ignore", invalid="ignore"):
+            shares = np.where(
+                priced, quantities * prices / volatile_value[..., np.newaxis], 0.0
+            )
+        token_trades = swap_volume[..., np.newaxis] * np.nan_to_num(shares)
+        if callable(swap_fee_rate):
+            swap_fee_rate = swap_fee_rate(token_trades)
+        trade_fees = token_trades * swap_fee_rate
+        if not flat_fee:
+            fees = np.sum(trade_fees, axis=-1)
+        if token_fees is not None:
+            token_fees[...] = trade_fees
+
+    # Apply the adjustment; the fee always comes out of the volatile side
+    swapped = swap_volume > 0
+    new_stablecoin_quantity = np.where(
+        swapped, stablecoin_quantity + stablecoin_adjustment, stablecoin_quantity
+    )
+    target_volatile_value = np.where(
+        swapped, total_value - new_stablecoin_quantity - fees, target_volatile_value
+    )
 
-    if frequency == "monthly":
-        # Rebalance if at least 30 days have passed
-        return days_elapsed >= 30
-    elif frequency == "quarterly":
-        # Rebalance if at least 120 days have passed
-        return days_elapsed >= 120
-    elif frequency == "yearly":
-        # Rebalance if at least 365 days have passed
-        return days_elapsed >= 365
+    # Scale all token quantities to match target volatile value
+    with np.errstate(divide="ignore", invalid="ignore"):
+        scaling_factor = np.where(
+            volatile_value > 0, target_volatile_value / volatile_value, 1.0
+        )
+    quantities *= scaling_factor[..., np.newaxis]
 
-    return False
+    return new_stablecoin_quantity, stablecoin_adjustment, fees
 
 
 def rebalance_portfolio_tokens(
-    portfolio, target_weights, token_prices, timestamp, swap_fee_rate=DEFAULT_SWAP_FEE
+    portfolio,
+    target_weights,
+    token_prices,
+    timestamp,
+    swap_fee_rate=DEFAULT_SWAP_FEE,
+    event_log=None,
+    trade_ledger=None,
+    run=0,
+    reason=REASON_PERIODIC,
 ):
     """
     Rebalance the token portion of the portfolio to match target weights.
     Updates token quantities but not USD values.
 
     Args:
-        portfolio (dict): Portfolio data structure
-        target_weights (dict): Target weights for each token
-        token_prices (dict): Current token prices
+        portfolio (Portfolio): Portfolio data structure
+        target_weights (dict or numpy.ndarray): Target weights for each token
+        token_prices (dict or numpy.ndarray): Current token prices
         timestamp (int): Current timestamp in milliseconds
-        swap_fee (float): Fee percentage charged on token swaps (default: 1%)
+        swap_fee (float or callable): Fee percentage charged on token swaps (default: 1%),
+                                      or a bound cost function (see core.costs)
+        event_log (EventLog, optional): Log receiving the rebalance event
+        trade_ledger (TradeLedger, optional): Ledger receiving every swap
+        run (int): Ledger run id of this portfolio
+        reason (int): Ledger REASON_* code (trades of tokens entering or leaving
+                      the index are recorded as reconstitution)
 
     Returns:
         tuple: (updated_portfolio, total_fees_paid)
     """
-    # Calculate the current USD value of all volatile assets
-    current_volatile_value = sum(
-        data["quantity"] * token_prices.get(token, 0)
-        for token, data in portfolio["tokens"].items()
-        if token in token_prices
-    )
-
-    # Log rebalancing action
-    print(
-        f"Rebalancing portfolio: volatile assets worth ${current_volatile_value:.2f} at {datetime.fromtimestamp(timestamp / 1000).date()}"
-    )
-
-    # Calculate current token values and weights
-    current_values = {}
-    current_weights = {}
-    for token, data in portfolio["tokens"].items():
-        if token in token_prices and token_prices[token] > 0:
-            current_values[token] = data["quantity"] * token_prices[token]
-            current_weights[token] = (
-                current_values[token] / current_volatile_value
-                if current_volatile_value > 0
-                else 0
-            )
+    prices = portfolio.price_vector(token_prices)
+    if trade_ledger is not None:
+        previous_weights = portfolio.target_weights.copy()
+        previous_quantities = portfolio.quantities.copy()
+        token_fees = np.zeros_like(previous_quantities)
 
     # Update each token's target weight in the portfolio
-    for token, weight in target_weights.items():
-        if token in portfolio["tokens"]:
-            portfolio["tokens"][token]["target_weight"] = weight
-
-    # Track total fees
-    total_fees = 0.0
+    if isinstance(target_weights, np.ndarray):
+        portfolio.target_weights[:] = target_weights
+    else:
+        for token, weight in target_weights.items():
+            if token in portfolio.positions:
+                portfolio.target_weights[portfolio.positions[token]] = weight
+
+    # Per-token costs are logged as the rate paid on the total traded value
+    fee_rate = swap_fee_rate
+    per_token = callable(swap_fee_rate) or np.ndim(swap_fee_rate) > 0
+    if per_token:
+        traded = np.nansum(
+            planned_token_trades(portfolio.quantities, prices, portfolio.target_weights)
+        )
 
-    # Calculate new quantities and fees
-    for token, data in portfolio["tokens"].items():
-        if token in token_prices and token_prices[token] > 0:
-            # Calculate target USD value based on weight
-            target_usd = current_volatile_value * data["target_weight"]
-            current_usd = current_values.get(token, 0)
-
-            # Calculate the amount being swapped (bought or sold)
-            swap_volume = abs(target_usd - current_usd)
-
-            # Calculate fee for this swap
-            swap_fee = swap_volume * swap_fee_rate
-
-            # Only apply fee to the portion being changed
-            if swap_volume > 0:
-                total_fees += swap_fee
-
-                # Calculate new quantity after fees
-                effective_target_usd = target_usd - swap_fee
-                new_quantity = effective_target_usd / token_prices[token]
-                data["quantity"] = new_quantity
-                # Update current volatile value to account for this swap's fee
-                current_volatile_value -= swap_fee
-    # Log fee information
-    if total_fees > 0:
-        print(
-            f"Paid ${total_fees:.2f} in swap fees ({swap_fee_rate*100:.2f}% fee rate)"
+    current_volatile_value, fees = rebalance_token_quantities(
+        portfolio.quantities,
+        prices,
+        portfolio.target_weights,
+        swap_fee_rate,
+        None if trade_ledger is None else token_fees,
+    )
+    total_fees = float(fees)
+    if per_token:
+        fee_rate = total_fees / traded if traded > 0 else 0.0
+
+    if trade_ledger is not None:
+        record_quantity_changes(
+            trade_ledger,
+            run,
+            timestamp,
+            trade_ledger.token_ids(portfolio.symbols),
+            previous_quantities,
+            portfolio.quantities,
+            prices,
+            token_fees,
+            membership_reasons(previous_weights, portfolio.target_weights, reason),
         )
 
-    if "fees_paid" not in portfolio:
-        portfolio["fees_paid"] = 0.0
+    # Log rebalancing action and fees
+    if event_log is None:
+        event_log = get_default_event_log()
+    event_log.record(
+        TOKEN_REBALANCE, timestamp, current_volatile_value, total_fees, fee_rate
+    )
 
-    portfolio["fees_paid"] += total_fees
+    portfolio.fees_paid += total_fees
 
     return portfolio, total_fees
 
 
 def rebalance_stablecoin_allocation(
-    portfolio, new_allocation, token_prices, swap_fee_rate=DEFAULT_SWAP_FEE
+    portfolio,
+    new_allocation,
+    token_prices,
+    swap_fee_rate=DEFAULT_SWAP_FEE,
+    event_log=None,
+    timestamp=0,
+    trade_ledger=None,
+    run=0,
+    reason=REASON_SENTIMENT,
 ):
     """
     Rebalance the allocation between stablecoin and volatile assets.
     Updates quantities but not USD values.
 
     Args:
-        portfolio (dict): Portfolio data structure
+        portfolio (Portfolio): Portfolio data structure
         new_allocation (float): New target stablecoin allocation (0.0-1.0)
-        token_prices (dict): Current token prices
-        swap_fee (float): Fee percentage charged on token swaps (default: 1%)
+        token_prices (dict or numpy.ndarray): Current token prices
+        swap_fee (float or callable): Fee percentage charged on token swaps (default: 1%),
+                                      or a bound cost function (see core.costs)
+        event_log (EventLog, optional): Log receiving the rebalance event
+        timestamp (int): Timestamp recorded with the event (default: 0)
+        trade_ledger (TradeLedger, optional): Ledger receiving every swap
+        run (int): Ledger run id of this portfolio
+        reason (int): Ledger REASON_* code of the swaps
 
     Returns:
         tuple: (updated_portfolio, total_fees_paid)
     """
-    # Calculate current values
-    volatile_value = sum(
-        data["quantity"] * token_prices.get(token, 0)
-        for token, data in portfolio["tokens"].items()
-        if token in token_prices
+    prices = portfolio.price_vector(token_prices)
+    token_fees = None
+    if trade_ledger is not None:
+        previous_quantities = portfolio.quantities.copy()
+        token_fees = np.zeros_like(previous_quantities)
+
+    stablecoin_quantity, stablecoin_adjustment, fees = rebalance_stablecoin_quantities(
+        portfolio.quantities,
+        portfolio.stablecoin_quantity,
+        prices,
+        new_allocation,
+        swap_fee_rate,
+        token_fees,
     )
-    stablecoin_value = portfolio["stablecoin"]["quantity"]
-    total_value = volatile_value + stablecoin_value
-
-    # Calculate target values based on new allocation
-    target_stablecoin_value = total_value * new_allocation
-    target_volatile_value = total_value * (1 - new_allocation)
-
-    # Calculate the amount being swapped
-    stablecoin_adjustment = target_stablecoin_value - stablecoin_value
-    swap_volume = abs(stablecoin_adjustment)
-
-    # Calculate fee only on the amount being swapped
-    swap_fee = swap_volume * swap_fee_rate
-    total_fees = swap_fee if swap_volume > 0 else 0.0
-
-    # Apply the adjustment after fees
-    if swap_volume > 0:
-        # Always reduce the amount we receive by the fee
-        effective_stablecoin_adjustment = stablecoin_adjustment
-        portfolio["stablecoin"]["quantity"] = (
-            stablecoin_value + effective_stablecoin_adjustment
-        )
-        target_volatile_value = (
-            total_value
-            - (stablecoin_value + effective_stablecoin_adjustment)
-            - swap_fee
-        )
+    stablecoin_adjustment = float(stablecoin_adjustment)
+    total_fees = float(fees)
+    portfolio.stablecoin_quantity = float(stablecoin_quantity)
 
     # Update target allocation
-    portfolio["stablecoin"]["target_allocation"] = new_allocation
-    portfolio["volatile_allocation"] = 1.0 - new_allocation
-
-    # If volatile value is zero, we can't adjust token quantities proportionally
-    if volatile_value <= 0:
-        return portfolio, total_fees
-
-    # Scale all token quantities to match target volatile value
-    scaling_factor = target_volatile_value / volatile_value
-
-    for token_data in portfolio["tokens"].values():
-        token_data["quantity"] *= scaling_factor
+    portfolio.target_allocation = new_allocation
+    portfolio.volatile_allocation = 1.0 - new_allocation
+
+    if trade_ledger is not None:
+        record_quantity_changes(
+            trade_ledger,
+            run,
+            timestamp,
+            trade_ledger.token_ids(portfolio.symbols),
+            previous_quantities,
+            portfolio.quantities,
+            prices,
+            token_fees,
+            reason,
+        )
 
     # Log the rebalancing action
-    action = "Increased" if stablecoin_adjustment > 0 else "Decreased"
-    print(
-        f"{action} stablecoin allocation to {new_allocation:.2f} "
-        + f"(adjusted by ${abs(stablecoin_adjustment):.2f}, paid ${total_fees:.2f} in fees)"
+    if event_log is None:
+        event_log = get_default_event_log()
+    event_log.record(
+        STABLECOIN_REBALANCE,
+        timestamp,
+        new_allocation,
+        stablecoin_adjustment,
+        total_fees,
     )
 
-    if "fees_paid" not in portfolio:
-        portfolio["fees_paid"] = 0.0
-
-    portfolio["fees_paid"] += total_fees
+    portfolio.fees_paid += total_fees
 
     return portfolio, total_fees
 
@@ -595,19 +1648,87 @@ def rebalance_stablecoin_allocation(
 # ------------------------------------------------------------------------------
 
 
+def apply_sentiment_allocation(
+    portfolio,
+    new_allocation,
+    signal,
+    token_prices,
+    timestamp,
+    swap_fee=DEFAULT_SWAP_FEE,
+    event_log=None,
+    trade_ledger=None,
+    run=0,
+):
+    """
+    Move the stablecoin allocation to the target set by a sentiment signal.
+
+    Args:
+        portfolio (Portfolio): Portfolio data structure
+        new_allocation (float): New target stablecoin allocation (0.0-1.0)
+        signal (int): SIGNAL_* code that caused the change
+        token_prices (dict or numpy.ndarray): Current token prices
+        timestamp (int): Current timestamp for logging
+        swap_fee (float or callable): Fee percentage charged on token swaps, or a
+                                      bound cost function (see core.costs)
+        event_log (EventLog, optional): Log receiving the allocation change events
+        trade_ledger (TradeLedger, optional): Ledger receiving every swap
+        run (int): Ledger run id of this portfolio
+
+    Returns:
+        float: Fees paid during rebalancing
+    """
+    if event_log is None:
+        event_log = get_default_event_log()
+    event_log.record(
+        SENTIMENT_ADJUSTMENT,
+        timestamp,
+        portfolio.target_allocation,
+        new_allocation,
+        label=SIGNAL_LABELS[signal],
+    )
+
+    _, fees_paid = rebalance_stablecoin_allocation(
+        portfolio,
+        new_allocation,
+        token_prices,
+        swap_fee,
+        event_log,
+        timestamp,
+        trade_ledger,
+        run,
+    )
+    return fees_paid
+
+
 def process_fear_greed_rebalancing(
-    portfolio, fear_greed_data, token_prices, timestamp, swap_fee=DEFAULT_SWAP_FEE
+    portfolio,
+    fear_greed_data,
+    token_prices,
+    timestamp,
+    swap_fee=DEFAULT_SWAP_FEE,
+    event_log=None,
+    trade_ledger=None,
+    run=0,
+    sentiment_rule=None,
 ):
     """
     Process rebalancing based on fear and greed index data.
     Uses a contrarian approach - more crypto in fear, more stablecoin in greed.
 
+    Simulations precompute these adjustments for all bars with
+    compile_allocation_path; this applies the same rule to a single entry.
+
     Args:
         portfolio (dict): Portfolio data structure
         fear_greed_data (dict): Fear and greed data for the current timestamp
         token_prices (dict): Current token prices
         timestamp (int): Current timestamp for logging
         swap_fee (float): Fee percentage charged on token swaps
+        event_log (EventLog, optional): Log receiving the allocation change events
+        trade_ledger (TradeLedger, optional): Ledger receiving every swap
+        run (int): Ledger run id of this portfolio
+        sentiment_rule (SentimentRule, optional): Numeric rule used instead of
+                                                  the entry's classification
 
     Returns:
         tuple: (rebalanced, fees_paid) where:
@@ -617,74 +1738,32 @@ def process_fear_greed_rebalancing(
     if not fear_greed_data:
         return False, 0.0
 
-    # Define allocation limits and adjustment size
-    STABLECOIN_MIN_ALLOCATION = 0.01
-    STABLECOIN_MAX_ALLOCATION = 0.99
-    ADJUSTMENT_SIZE = 0.1
-
-    # Get current stablecoin allocation
-    base_allocation = portfolio["stablecoin"]["target_allocation"]
-
-    # Default to no change
-    new_allocation = base_allocation
-
-    # Get sentiment classification
-    classification = fear_greed_data["classification"]
-
-    # Apply contrarian strategy based on market sentiment
-    reason = None
-
-    if classification == "Extreme Fear":
-        # During extreme fear: reduce stablecoin (buy more crypto)
-        new_allocation = max(
-            base_allocation - ADJUSTMENT_SIZE, STABLECOIN_MIN_ALLOCATION
-        )
-        reason = "Extreme Fear (buying opportunity)"
-    elif classification == "Extreme Greed":
-        # During extreme greed: increase stablecoin (take profits)
-        new_allocation = min(
-            base_allocation + ADJUSTMENT_SIZE, STABLECOIN_MAX_ALLOCATION
-        )
-        reason = "Extreme Greed (taking profits)"
+    values, classifications = align_fear_greed_map(
+        np.array([timestamp]), {timestamp: fear_greed_data}
+    )
+    signals, _ = sentiment_signals(values, classifications, sentiment_rule)
+    signal = int(signals[0])
 
     # If no change needed, return early
+    base_allocation = portfolio.target_allocation
+    new_allocation = float(step_allocations(base_allocation, signal, sentiment_rule))
     if new_allocation == base_allocation:
         return False, 0.0
 
-    # Log the allocation change
-    date_str = datetime.fromtimestamp(timestamp / 1000).date()
-    action = "Increased" if new_allocation > base_allocation else "Decreased"
-    print(
-        f"Contrarian strategy: {action} stablecoin to {new_allocation:.2f} due to {reason} at {date_str}"
+    fees_paid = apply_sentiment_allocation(
+        portfolio,
+        new_allocation,
+        signal,
+        token_prices,
+        timestamp,
+        swap_fee,
+        event_log,
+        trade_ledger,
+        run,
     )
-
-    # Apply the new allocation
-    portfolio, fees_paid = rebalance_stablecoin_allocation(
-        portfolio, new_allocation, token_prices, swap_fee
-    )
-
     return True, fees_paid
 
 
-def _prepare_fear_greed_data(fear_greed_data):
-    """
-    Transform fear and greed data into a lookup map.
-
-    Args:
-        fear_greed_data (list or None): List of [timestamp, value, classification] entries
-
-    Returns:
-        dict or None: Mapping of timestamps to fear/greed data
-    """
-    if not fear_greed_data:
-        return None
-
-    return {
-        entry[0]: {"value": entry[1], "classification": entry[2]}
-        for entry in fear_greed_data
-    }
-
-
 # ------------------------------------------------------------------------------
 # Data Processing and Validation
 # ------------------------------------------------------------------------------
@@ -0,0 +1,268 @@
+"""
+Rolling-entry analysis functions for the indexfund package.
+
+Evaluates a strategy for every possible entry date instead of a single one.
+The market panel, index weights, staking accrual and fear and greed series
+are prepared once for the whole timeline, and all entries of a chunk are
+simulated together as lanes of one pass over the bars: each lane starts at
+its own entry bar and follows its own rebalance schedule, exactly as a run
+with that ``start_date`` would. Outcomes are then measured over fixed holding
+horizons so entries can be compared like for like.
+"""
+
+import numpy as np
+
+from config import DEFAULT_SWAP_FEE, STAKING_CONFIG
+from core.context import MarketContext
+from core.metrics import calculate_portfolio_metrics_batch
+from core.montecarlo import summarize_distribution
+from core.panel import FEAR_GREED_MISSING, MarketPanel, build_market_panel
+from core.portfolio import _preprocess_historical_data, rebalance_token_quantities
+from core.schedule import rebalance_successors
+from core.simulation import apply_fear_greed_adjustment
+from core.staking import build_staking_accrual
+
+# Metrics reported per entry and holding horizon
+ROLLING_METRICS = (
+    "total_return",
+    "annualized_roi",
+    "max_drawdown",
+    "volatility",
+    "sharpe_ratio",
+    "sortino_ratio",
+)
+
+
+def _simulate_entries(
+    panel,
+    starts,
+    weight_matrix,
+    token_accrual,
+    stablecoin_accrual,
+    fear_greed_classes,
+    successors,
+    stablecoin_allocation,
+    swap_fee,
+    initial_value=100.0,
+):
+    """
+    Simulate one lane per entry bar over the rest of the timeline.
+
+    Returns:
+        numpy.ndarray: (entries x bars) values from the first entry bar on,
+                       NaN before each lane's own entry
+    """
+    first = starts[0]
+    bars = len(panel) - first
+    lanes = len(starts)
+    prices = panel.prices
+    accrued_prices = np.where(np.isnan(prices), 0.0, token_accrual * prices)
+    volatile_usd = initial_value * (1.0 - stablecoin_allocation)
+
+    # Rebalance schedule of each entry, chained from its own first bar
+    schedule = np.zeros((lanes, bars), dtype=bool)
+    if successors is not None:
+        entry_next, following = successors
+        schedule[np.arange(lanes), starts - first] = True
+        lane, current = np.arange(lanes), entry_next[starts]
+        while len(lane):
+            pending = current < len(panel)
+            lane, current = lane[pending], current[pending]
+            schedule[lane, current - first] = True
+            current = following[current]
+
+    base_quantities = np.zeros((lanes, len(panel.tokens)))
+    base_stablecoin = np.zeros(lanes)
+    target_allocations = np.full(lanes, float(stablecoin_allocation))
+    held = np.zeros((lanes, len(panel.tokens)), dtype=bool)
+    values = np.full((lanes, bars), np.nan)
+    entry_bounds = np.searchsorted(starts, np.arange(first, len(panel) + 1))
+
+    for offset in range(bars):
+        row = first + offset
+        current_prices = prices[row]
+
+        # Enter new lanes with the tokens priced at their first bar
+        entering = slice(entry_bounds[offset], entry_bounds[offset + 1])
+        if entering.start < entering.stop:
+            held[entering] = current_prices > 0
+            weights = np.where(held[entering], weight_matrix[row], 0.0)
+            with np.errstate(invalid="ignore"):
+                quantities = np.where(
+                    held[entering],
+                    volatile_usd * weights / current_prices,
+                    0.0,
+                )
+            base_quantities[entering] = quantities / token_accrual[row]
+            base_stablecoin[entering] = (
+                initial_value * stablecoin_allocation / stablecoin_accrual[row]
+            )
+
+        due = np.flatnonzero(schedule[:, offset])
+        if len(due):
+            quantities = base_quantities[due] * token_accrual[row]
+            stablecoin_quantities = base_stablecoin[due] * stablecoin_accrual[row]
+            rebalance_token_quantities(
+                quantities,
+                current_prices,
+                np.where(held[due], weight_matrix[row], 0.0),
+                swap_fee,
+            )
+
+            # Sentiment adjustments ride along with periodic rebalances
+            if fear_greed_classes[row] != FEAR_GREED_MISSING:
+                lane_targets = target_allocations[due]
+                apply_fear_greed_adjustment(
+                    quantities,
+                    stablecoin_quantities,
+                    lane_targets,
+                    fear_greed_classes[row],
+                    current_prices,
+                    swap_fee,
+                )
+                target_allocations[due] = lane_targets
+
+            base_quantities[due] = quantities / token_accrual[row]
+            base_stablecoin[due] = stablecoin_quantities / stablecoin_accrual[row]
+
+        values[:, offset] = (
+            base_quantities @ accrued_prices[row]
+            + base_stablecoin * stablecoin_accrual[row]
+        )
+
+    values[np.arange(bars) < (starts - first)[:, np.newaxis]] = np.nan
+    return values
+
+
+def run_rolling_entry_analysis(
+    historical_data,
+    method,
+    rebalance_frequency="none",
+    apply_staking=True,
+    stablecoin_allocation=0.5,
+    fear_greed_data=None,
+    swap_fee=DEFAULT_SWAP_FEE,
+    start_date=None,
+    horizons=(90, 180, 365),
+    step=1,
+    chunk_size=256,
+    yield_curves=None,
+):
+    """
+    Evaluate a strategy for every entry bar and holding horizon.
+
+    Entries are taken every ``step`` bars for as long as at least the shortest
+    horizon remains. For each entry and horizon the portfolio is held for
+    ``horizon`` bars after entry; metrics are NaN where the data ends before
+    the horizon does.
+
+    Args:
+        historical_data (dict, MarketPanel or MarketContext): Dictionary containing
+                              historical price and market cap data
+                              Format: {"token": [[timestamp, price, market_cap], ...]},
+                              or an already built panel (``start_date`` is then ignored)
+                              or context
+        method (str): Weighting method ("market_cap", "sqrt_market_cap")
+        rebalance_frequency (str): Rebalancing frequency ("none", "monthly", "quarterly", "yearly")
+        apply_staking (bool): Whether to apply staking rewards
+        stablecoin_allocation (float): Stablecoin allocation (0.0-1.0)
+        fear_greed_data (list): List of [timestamp, value, value_classification] entries
+        swap_fee (float): Fee percentage charged on token swaps during rebalancing
+        start_date (datetime or str): Optional earliest entry date (format: "YYYY-MM-DD")
+        horizons (tuple): Holding periods in bars
+        step (int): Evaluate every ``step``-th entry bar
+        chunk_size (int): Entries simulated together
+        yield_curves (YieldCurves, optional): Time-varying staking APRs used
+                                              instead of STAKING_CONFIG
+
+    Returns:
+        dict: "entry_timestamps" (entries,), "horizons" (horizons,), and one
+              (entries x horizons) array per ROLLING_METRICS entry
+    """
+    if isinstance(historical_data, MarketContext):
+        context = historical_data.since(start_date)
+    elif isinstance(historical_data, MarketPanel):
+        context = MarketContext(historical_data)
+    else:
+        context = MarketContext(
+            build_market_panel(_preprocess_historical_data(historical_data, start_date))
+        )
+    panel = context.panel
+
+    horizons = np.asarray(horizons, dtype=np.int64)
+    starts = np.arange(0, max(len(panel) - int(horizons.min()), 0), step)
+    results = {
+        "entry_timestamps": panel.timestamps[starts],
+        "horizons": horizons,
+    }
+    for name in ROLLING_METRICS:
+        results[name] = np.full((len(starts), len(horizons)), np.nan)
+    if not len(starts):
+        return results
+
+    # --- Shared Preparation ---
+    weight_matrix = context.weight_matrix(method)
+    if apply_staking:
+        token_accrual, stablecoin_accrual = build_staking_accrual(
+            panel.timestamps, panel.tokens, yield_curves or STAKING_CONFIG
+        )
+    else:
+        token_accrual = np.ones(panel.prices.shape)
+        stablecoin_accrual = np.ones(len(panel))
+    _, fear_greed_classes = context.fear_greed(fear_greed_data)
+    successors = rebalance_successors(panel.timestamps, rebalance_frequency)
+
+    # --- Batched Entries ---
+    for chunk_start in range(0, len(starts), chunk_size):
+        chunk = slice(chunk_start, chunk_start + chunk_size)
+        chunk_starts = starts[chunk]
+        values = _simulate_entries(
+            panel,
+            chunk_starts,
+            weight_matrix,
+            token_accrual,
+            stablecoin_accrual,
+            fear_greed_classes,
+            successors,
+            stablecoin_allocation,
+            swap_fee,
+        )
+
+        # Holding windows of equal length are measured together
+        lane_offsets = chunk_starts - chunk_starts[0]
+        for column, horizon in enumerate(horizons.tolist()):
+            complete = np.flatnonzero(chunk_starts + horizon < len(panel))
+            if not len(complete):
+                continue
+            window = lane_offsets[complete, np.newaxis] + np.arange(horizon + 1)
+            metrics = calculate_portfolio_metrics_batch(
+                np.take_along_axis(values[complete], window, axis=1)
+            )
+            for name in ROLLING_METRICS:
+                results[name][chunk_start + complete, column] = metrics[name]
+
+    return results
+
+
+def summarize_rolling_entries(results, metric="total_return"):
+    """
+    Summarize the distribution of a metric across entry dates per horizon.
+
+    Args:
+        results (dict): Output of run_rolling_entry_analysis
+        metric (str): Metric to summarize
+
+    Returns:
+        dict: Horizon (bars) -> distribution summary with the number of entries
+    """
+    summaries = {}
+    for column, horizon in enumerate(results["horizons"].tolist()):
+        samples = results[metric][:, column]
+        samples = samples[~np.isnan(samples)]
+        if not len(samples):
+            continue
+        summaries[horizon] = {
+            "entries": len(samples),
+            **summarize_distribution(samples),
+        }
+    return summaries
@@ -0,0 +1,388 @@
+"""
+Rebalance schedule functions for the indexfund package.
+Compiles rebalancing frequencies into event arrays over a panel's time axis.
+
+Besides the interval frequencies of REBALANCE_INTERVAL_DAYS ("monthly" means
+30 days after the previous rebalance), a frequency can name a calendar
+schedule that stays anchored to the calendar:
+
+    month_end, month_start, quarter_end, quarter_start, year_end, year_start
+    weekday:fri, weekday:mon,thu
+    dates:2021-03-19,2021-06-18
+
+optionally followed by an offset in calendar ("d") or business ("b") days,
+e.g. "quarter_end-2b" or "month_start+14d". A calendar schedule rebalances
+at the first bar on or after each target UTC day. Target days are generated
+with NumPy calendar arithmetic on the int64 time axis.
+"""
+
+import re
+import time
+from collections import OrderedDict
+from datetime import datetime
+from functools import lru_cache
+
+import numpy as np
+
+from config import REBALANCE_INTERVAL_DAYS
+from core.panel import timeline_fingerprint
+
+MILLISECONDS_PER_DAY = 1000 * 60 * 60 * 24
+
+# Compiled schedules shared by every strategy on the same timeline
+_SCHEDULE_CACHE = OrderedDict()
+_SCHEDULE_CACHE_SIZE = 256
+
+# Calendar anchors: (months per period, whether the target is the period's end)
+CALENDAR_ANCHORS = {
+    "month_start": (1, False),
+    "month_end": (1, True),
+    "quarter_start": (3, False),
+    "quarter_end": (3, True),
+    "year_start": (12, False),
+    "year_end": (12, True),
+}
+
+WEEKDAY_NAMES = ("mon", "tue", "wed", "thu", "fri", "sat", "sun")
+
+_CALENDAR_OFFSET = re.compile(r"([+-]\d+)([db])$")
+
+
+class CalendarRule:
+    """
+    Parsed calendar schedule.
+
+    Args:
+        anchor (str): A CALENDAR_ANCHORS name, "weekday" or "dates"
+        weekdays (tuple): Weekday numbers (Monday is 0) for "weekday" anchors
+        dates (numpy.ndarray): Target days (datetime64[D]) for "dates" anchors
+        offset (int): Days added to every target
+        business_days (bool): Count the offset in business days (Monday to Friday)
+    """
+
+    __slots__ = ("anchor", "weekdays", "dates", "offset", "business_days")
+
+    def __init__(self, anchor, weekdays=(), dates=None, offset=0, business_days=False):
+        if anchor not in CALENDAR_ANCHORS and anchor not in ("weekday", "dates"):
+            raise ValueError(f"Unknown calendar anchor: {anchor}")
+        if anchor == "weekday" and not weekdays:
+            raise ValueError("Weekday schedules need at least one weekday")
+        if anchor == "dates" and (dates is None or not len(dates)):
+            raise ValueError("Date schedules need at least one date")
+        self.anchor = anchor
+        self.weekdays = tuple(weekdays)
+        self.dates = None if dates is None else np.unique(dates)
+        self.offset = offset
+        self.business_days = business_days
+
+    def __repr__(self):
+        return (
+            f"CalendarRule(anchor={self.anchor!r}, weekdays={self.weekdays!r}, "
+            f"dates={self.dates!r}, offset={self.offset!r}, "
+            f"business_days={self.business_days!r})"
+        )
+
+
+@lru_cache(maxsize=None)
+def parse_calendar_frequency(frequency):
+    """
+    Parse a calendar schedule frequency.
+
+    Args:
+        frequency (str): Rebalancing frequency, e.g. "quarter_end-2b"
+
+    Returns:
+        CalendarRule: Parsed schedule, or None if ``frequency`` does not name
+                      a calendar schedule
+    """
+    offset, business_days = 0, False
+    match = _CALENDAR_OFFSET.search(frequency)
+    if match:
+        offset, business_days = int(match.group(1)), match.group(2) == "b"
+        frequency = frequency[: match.start()]
+
+    anchor, _, arguments = frequency.partition(":")
+    if anchor in CALENDAR_ANCHORS and not arguments:
+        return CalendarRule(anchor, offset=offset, business_days=business_days)
+    if anchor == "weekday":
+        names = arguments.split(",")
+        unknown = set(names) - set(WEEKDAY_NAMES)
+        if unknown:
+            raise ValueError(f"Unknown weekdays in {frequency!r}: {sorted(unknown)}")
+        weekdays = sorted({WEEKDAY_NAMES.index(name) for name in names})
+        return CalendarRule(
+            anchor, weekdays, offset=offset, business_days=business_days
+        )
+    if anchor == "dates":
+        dates = np.array(arguments.split(","), dtype="datetime64[D]")
+        return CalendarRule(
+            anchor, dates=dates, offset=offset, business_days=business_days
+        )
+    return None
+
+
+def calendar_target_days(rule, first_day, last_day):
+    """
+    Generate a calendar schedule's target days around a range of days.
+
+    Args:
+        rule (CalendarRule): Calendar schedule
+        first_day (int): First day of the range (days since 1970-01-01)
+        last_day (int): Last day of the range (days since 1970-01-01)
+
+    Returns:
+        numpy.ndarray: Sorted int64 target days covering at least the range
+    """
+    # Targets just outside the range may be shifted into it by the offset
+    margin = 2 * abs(rule.offset) + 7
+    first_day, last_day = first_day - margin, last_day + margin
+    roll = "forward"
+
+    if rule.anchor in CALENDAR_ANCHORS:
+        months_per_period, period_end = CALENDAR_ANCHORS[rule.anchor]
+        days = np.array([first_day, last_day], dtype="datetime64[D]")
+        first_month, last_month = days.astype("datetime64[M]").astype(np.int64)
+        # Month 0 is January 1970, so periods start at multiples of their length
+        months = np.arange(
+            first_month - first_month % months_per_period,
+            last_month + 1,
+            months_per_period,
+        )
+        if period_end:
+            months = months + months_per_period
+            roll = "backward"
+        targets = months.astype("datetime64[M]").astype("datetime64[D]")
+        if period_end:
+            targets = targets - 1
+    elif rule.anchor == "weekday":
+        days = np.arange(first_day, last_day + 1)
+        # Day 0 (1970-01-01) is a Thursday (weekday 3)
+        targets = days[np.isin((days + 3) % 7, rule.weekdays)].astype("datetime64[D]")
+    else:
+        targets = rule.dates
+
+    if rule.business_days:
+        targets = np.busday_offset(targets, rule.offset, roll=roll)
+    else:
+        targets = targets + rule.offset
+    return np.unique(targets.astype(np.int64))
+
+
+def _continue_calendar_events(timestamps, rule, anchor, floor):
+    """continue_rebalance_events for calendar schedules."""
+    days = timestamps // MILLISECONDS_PER_DAY
+    previous_day = None if floor is None else floor // MILLISECONDS_PER_DAY
+    targets = calendar_target_days(
+        rule, days[0] if previous_day is None else previous_day, days[-1]
+    )
+
+    # A bar rebalances when a target day falls after the previous bar's day
+    # and on or before its own
+    reached = np.searchsorted(targets, days, side="right")
+    if previous_day is None:
+        earlier = np.concatenate([reached[:1], reached[:-1]])
+    else:
+        earlier = np.concatenate(
+            [[np.searchsorted(targets, previous_day, side="right")], reached[:-1]]
+        )
+    events = np.flatnonzero(reached > earlier)
+    if anchor is None:
+        events = np.union1d([0], events)
+    if len(events):
+        anchor = int(timestamps[events[-1]])
+    return events.astype(np.int64), anchor, int(timestamps[-1])
+
+
+def _wall_clock_milliseconds(timestamps):
+    """
+    Convert timestamps to local wall-clock milliseconds.
+
+    should_rebalance compares naive local datetimes, so day counts follow the
+    local clock. Without daylight saving the offset is constant and the
+    timestamps can be used directly.
+    """
+    timestamps = np.asarray(timestamps, dtype=np.int64)
+    if not time.daylight:
+        return timestamps
+
+    offsets = np.array(
+        [
+            datetime.fromtimestamp(ts / 1000).astimezone().utcoffset().total_seconds()
+            for ts in timestamps.tolist()
+        ]
+    )
+    return timestamps + (offsets * 1000).astype(np.int64)
+
+
+def continue_rebalance_events(timestamps, frequency, anchor=None, floor=None):
+    """
+    Find rebalance indices in a block of timestamps following earlier blocks.
+
+    Interval frequencies are compiled with the same semantics as
+    should_rebalance, calendar schedules by their target days. Compiling a
+    timeline in pieces (carrying ``anchor`` and ``floor`` forward) yields
+    exactly the events of compiling it in one go.
+
+    Args:
+        timestamps (numpy.ndarray): Sorted timestamps in milliseconds
+        frequency (str): Rebalancing frequency ("none", "monthly", "quarterly",
+                         "yearly" or a calendar schedule such as "quarter_end")
+        anchor (int, optional): Wall-clock milliseconds of the last rebalance
+                                (None if no rebalance has happened yet)
+        floor (int, optional): Largest wall-clock milliseconds seen so far
+                               (the last timestamp for calendar schedules)
+
+    Returns:
+        tuple: (events, anchor, floor) with the indices into ``timestamps`` and
+               the values to pass when compiling the next block
+    """
+    events = np.array([], dtype=np.int64)
+    if frequency == "none" or not len(timestamps):
+        return events, anchor, floor
+
+    rule = parse_calendar_frequency(frequency)
+    if rule is not None:
+        return _continue_calendar_events(
+            np.asarray(timestamps, dtype=np.int64), rule, anchor, floor
+        )
+
+    wall_clock = _wall_clock_milliseconds(timestamps)
+    if floor is not None:
+        wall_clock = np.maximum(wall_clock, floor)
+    wall_clock = np.maximum.accumulate(wall_clock)
+    floor = int(wall_clock[-1])
+
+    # The first timestamp always rebalances; unknown frequencies never repeat
+    interval_days = REBALANCE_INTERVAL_DAYS.get(frequency)
+    if anchor is None:
+        events = [0]
+        anchor = int(wall_clock[0])
+    elif interval_days is None:
+        return events, anchor, floor
+    else:
+        events = []
+
+    if interval_days is not None:
+        # days_elapsed >= interval  <=>  elapsed milliseconds >= interval * one day
+        interval = interval_days * MILLISECONDS_PER_DAY
+        start = events[-1] + 1 if events else 0
+        while True:
+            following = start + np.searchsorted(
+                wall_clock[start:], anchor + interval, side="left"
+            )
+            if following >= len(timestamps):
+                break
+            events.append(int(following))
+            anchor = int(wall_clock[following])
+            start = following + 1
+
+    return np.array(events, dtype=np.int64), anchor, floor
+
+
+def _compile_event_indices(timestamps, frequency):
+    """Find the rebalance indices of a whole timeline."""
+    return continue_rebalance_events(timestamps, frequency)[0]
+
+
+def rebalance_event_indices(timestamps, frequency):
+    """
+    Compile a rebalancing frequency into the indices where rebalances occur.
+
+    Schedules are cached per (timeline, frequency) and shared between callers,
+    so the returned array is read-only.
+
+    Args:
+        timestamps (numpy.ndarray): Sorted timestamps in milliseconds
+        frequency (str): Rebalancing frequency ("none", "monthly", "quarterly",
+                         "yearly" or a calendar schedule such as "quarter_end")
+
+    Returns:
+        numpy.ndarray: Sorted int64 indices into ``timestamps``
+    """
+    timestamps = np.asarray(timestamps, dtype=np.int64)
+    key = (timeline_fingerprint(timestamps), frequency)
+
+    events = _SCHEDULE_CACHE.get(key)
+    if events is None:
+        events = _compile_event_indices(timestamps, frequency)
+        events.setflags(write=False)
+        _SCHEDULE_CACHE[key] = events
+        if len(_SCHEDULE_CACHE) > _SCHEDULE_CACHE_SIZE:
+            _SCHEDULE_CACHE.popitem(last=False)
+    else:
+        _SCHEDULE_CACHE.move_to_end(key)
+
+    return events
+
+
+def rebalance_successors(timestamps, frequency):
+    """
+    Compile where the next rebalance falls after each bar of a timeline.
+
+    A run entering at bar ``i`` rebalances there and next at
+    ``entry_next[i]``; after a rebalance at bar ``j`` the following one is at
+    ``following[j]`` (``len(timestamps)`` when there is none). Chaining them
+    from any entry bar yields exactly the events of compiling
+    ``timestamps[i:]`` on its own, but the timeline is converted to
+    wall-clock time only once for all entries.
+
+    Args:
+        timestamps (numpy.ndarray): Sorted timestamps in milliseconds
+        frequency (str): Rebalancing frequency ("none", "monthly", "quarterly",
+                         "yearly" or a calendar schedule such as "quarter_end")
+
+    Returns:
+        tuple: (entry_next, following) int64 arrays over ``timestamps``, or
+               None if the frequency never rebalances
+    """
+    timestamps = np.asarray(timestamps, dtype=np.int64)
+    if frequency == "none":
+        return None
+    bars = len(timestamps)
+
+    rule = parse_calendar_frequency(frequency)
+    if rule is not None:
+        # Bars where a target day falls after the previous bar's day
+        days = timestamps // MILLISECONDS_PER_DAY
+        if bars:
+            targets = calendar_target_days(rule, days[0], days[-1])
+            reached = np.searchsorted(targets, days, side="right")
+            changes = np.flatnonzero(reached[1:] > reached[:-1]) + 1
+        else:
+            changes = np.array([], dtype=np.int64)
+        changes = np.append(changes, bars)
+        following = changes[np.searchsorted(changes, np.arange(bars), side="right")]
+        return following, following
+
+    interval_days = REBALANCE_INTERVAL_DAYS.get(frequency)
+    if interval_days is None:
+        following = np.full(bars, bars, dtype=np.int64)
+        return following, following
+
+    # A later entry's running maximum of the wall clock only differs from the
+    # timeline's within a daylight saving fall-back hour, which is over long
+    # before an interval has passed, so only its entry anchor needs the raw
+    # wall-clock time
+    wall_clock = _wall_clock_milliseconds(timestamps)
+    running = np.maximum.accumulate(wall_clock)
+    interval = interval_days * MILLISECONDS_PER_DAY
+    entry_next = np.searchsorted(running, wall_clock + interval, side="left")
+    following = np.searchsorted(running, running + interval, side="left")
+    return entry_next.astype(np.int64), following.astype(np.int64)
+
+
+def compile_rebalance_schedule(timestamps, frequency):
+    """
+    Compile a rebalancing frequency into a boolean mask over the timeline.
+
+    Args:
+        timestamps (numpy.ndarray): Sorted timestamps in milliseconds
+        frequency (str): Rebalancing frequency ("none", "monthly", "quarterly",
+                         "yearly" or a calendar schedule such as "quarter_end")
+
+    Returns:
+        numpy.ndarray: Boolean array, True where a rebalance occurs
+    """
+    schedule = np.zeros(len(timestamps), dtype=bool)
+    schedule[rebalance_event_indices(timestamps, frequency)] = True
+    return schedule
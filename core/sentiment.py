@@ -0,0 +1,287 @@
+"""
+Fear and greed rule engine for the indexfund package.
+
+A SentimentRule turns the fear and greed index into contrarian stablecoin
+allocation changes: extreme fear lowers the stablecoin allocation (buying
+crypto), extreme greed raises it (taking profits). The rule is applied to the
+whole aligned sentiment series before a simulation starts, producing the bars
+at which allocations change and the allocation each lane moves to, so the
+simulation itself only trades at those bars and sentiment parameters can be
+swept without evaluating the rule inside every simulation step.
+
+Sentiment is evaluated on its own cadence: at periodic rebalances (the
+default), on every day or the first bar of every week, or only where the
+signal crosses into fear or greed. The evaluated bars are found from the
+int64 time axis and the signal array, never by stepping through the bars.
+"""
+
+import numpy as np
+
+from config import (
+    DEFAULT_FEAR_THRESHOLD,
+    DEFAULT_GREED_THRESHOLD,
+    DEFAULT_MAX_STABLECOIN_ALLOCATION,
+    DEFAULT_MIN_STABLECOIN_ALLOCATION,
+    DEFAULT_SENTIMENT_STEP,
+)
+from core.panel import FEAR_GREED_EXTREME_FEAR, FEAR_GREED_EXTREME_GREED
+from core.schedule import MILLISECONDS_PER_DAY
+
+# Allocation signals: the direction in which the stablecoin allocation moves
+SIGNAL_FEAR = -1
+SIGNAL_NONE = 0
+SIGNAL_GREED = 1
+
+# Sentiment evaluation cadences
+SENTIMENT_FREQUENCIES = ("rebalance", "daily", "weekly", "crossing")
+
+SIGNAL_LABELS = {
+    SIGNAL_FEAR: "Extreme Fear (buying opportunity)",
+    SIGNAL_GREED: "Extreme Greed (taking profits)",
+}
+
+
+class SentimentRule:
+    """
+    Numeric fear and greed rule.
+
+    Without a rule, simulations classify sentiment by the index's own
+    "Extreme Fear" and "Extreme Greed" labels with the default step and bounds.
+
+    Args:
+        fear_threshold (float): Index values at or below this are extreme fear
+        greed_threshold (float): Index values at or above this are extreme greed
+        step (float): Stablecoin allocation change per adjustment
+        min_allocation (float): Lowest stablecoin allocation fear can reach
+        max_allocation (float): Highest stablecoin allocation greed can reach
+        cooldown_days (float): Minimum days between two adjustments of a portfolio
+        smoothing (int, optional): Span of an exponential moving average applied
+            to the index values before thresholding (None uses raw values)
+    """
+
+    __slots__ = (
+        "fear_threshold",
+        "greed_threshold",
+        "step",
+        "min_allocation",
+        "max_allocation",
+        "cooldown_days",
+        "smoothing",
+    )
+
+    def __init__(
+        self,
+        fear_threshold=DEFAULT_FEAR_THRESHOLD,
+        greed_threshold=DEFAULT_GREED_THRESHOLD,
+        step=DEFAULT_SENTIMENT_STEP,
+        min_allocation=DEFAULT_MIN_STABLECOIN_ALLOCATION,
+        max_allocation=DEFAULT_MAX_STABLECOIN_ALLOCATION,
+        cooldown_days=0,
+        smoothing=None,
+    ):
+        if fear_threshold >= greed_threshold:
+            raise ValueError("Fear threshold must be below the greed threshold")
+        if step <= 0:
+            raise ValueError("Sentiment step must be positive")
+        if not 0.0 <= min_allocation <= max_allocation <= 1.0:
+            raise ValueError("Allocation bounds must satisfy 0 <= min <= max <= 1")
+        if cooldown_days < 0:
+            raise ValueError("Cooldown cannot be negative")
+        if smoothing is not None and smoothing < 1:
+            raise ValueError("Smoothing span must be at least 1")
+        self.fear_threshold = fear_threshold
+        self.greed_threshold = greed_threshold
+        self.step = step
+        self.min_allocation = min_allocation
+        self.max_allocation = max_allocation
+        self.cooldown_days = cooldown_days
+        self.smoothing = smoothing
+
+    def __repr__(self):
+        return (
+            f"SentimentRule(fear_threshold={self.fear_threshold!r}, "
+            f"greed_threshold={self.greed_threshold!r}, step={self.step!r}, "
+            f"min_allocation={self.min_allocation!r}, "
+            f"max_allocation={self.max_allocation!r}, "
+            f"cooldown_days={self.cooldown_days!r}, smoothing={self.smoothing!r})"
+        )
+
+
+# Parameters used when sentiment is classified by the index's labels
+DEFAULT_SENTIMENT_RULE = SentimentRule()
+
+
+def smooth_sentiment(values, span, level=None):
+    """
+    Exponential moving average of index values, skipping bars without data.
+
+    Args:
+        values (numpy.ndarray): Index value per bar (NaN without data)
+        span (int): EMA span in observations
+        level (float, optional): Average carried over from earlier bars
+
+    Returns:
+        tuple: (smoothed, level) where smoothed is NaN where ``values`` is and
+               level is the average after the last observation
+    """
+    alpha = 2.0 / (span + 1.0)
+    smoothed = np.full(len(values), np.nan)
+    observed = np.flatnonzero(~np.isnan(values))
+    averages = []
+    for value in values[observed].tolist():
+        level = value if level is None else level + alpha * (value - level)
+        averages.append(level)
+    smoothed[observed] = averages
+    return smoothed, level
+
+
+def sentiment_signals(values, classifications, rule=None, level=None):
+    """
+    Classify every bar of an aligned sentiment series.
+
+    Args:
+        values (numpy.ndarray): Index value per bar (NaN without data)
+        classifications (numpy.ndarray): FEAR_GREED_* code per bar
+        rule (SentimentRule, optional): Numeric rule (default: classify by label)
+        level (float, optional): Smoothing average carried over from earlier bars
+
+    Returns:
+        tuple: (signals, level) with a SIGNAL_* code per bar and the smoothing
+               average to pass when classifying the following bars
+    """
+    signals = np.zeros(len(classifications), dtype=np.int8)
+    if rule is None:
+        signals[classifications == FEAR_GREED_EXTREME_FEAR] = SIGNAL_FEAR
+        signals[classifications == FEAR_GREED_EXTREME_GREED] = SIGNAL_GREED
+        return signals, level
+
+    if rule.smoothing is not None:
+        values, level = smooth_sentiment(values, rule.smoothing, level)
+    with np.errstate(invalid="ignore"):
+        signals[values <= rule.fear_threshold] = SIGNAL_FEAR
+        signals[values >= rule.greed_threshold] = SIGNAL_GREED
+    return signals, level
+
+
+def sentiment_evaluation_rows(
+    timestamps,
+    signals,
+    frequency,
+    rebalance_rows,
+    previous_timestamp=None,
+    previous_signal=SIGNAL_NONE,
+):
+    """
+    Find the bars at which sentiment is evaluated.
+
+    Args:
+        timestamps (numpy.ndarray): Timestamps in milliseconds
+        signals (numpy.ndarray): SIGNAL_* code per bar
+        frequency (str): Evaluation cadence: "rebalance" (at periodic rebalances),
+                         "daily" (first bar of each UTC day), "weekly" (first bar
+                         of each Monday-based UTC week) or "crossing" (bars whose
+                         signal is fear or greed and differs from the bar before)
+        rebalance_rows (numpy.ndarray): Periodic rebalance bars
+        previous_timestamp (int, optional): Timestamp of the bar before the first
+                                            (None at the start of a simulation)
+        previous_signal (int): Signal of the bar before the first
+
+    Returns:
+        tuple: (rows, last_signal) with the sorted evaluation bars and the signal
+               to pass as ``previous_signal`` for the following bars
+    """
+    last_signal = int(signals[-1]) if len(signals) else previous_signal
+    timestamps = np.asarray(timestamps, dtype=np.int64)
+
+    if frequency == "rebalance":
+        rows = np.asarray(rebalance_rows, dtype=np.int64)
+    elif frequency in ("daily", "weekly"):
+        periods = timestamps // MILLISECONDS_PER_DAY
+        previous = None
+        if previous_timestamp is not None:
+            previous = previous_timestamp // MILLISECONDS_PER_DAY
+        if frequency == "weekly":
+            # Day 0 (1970-01-01) is a Thursday; shift so weeks start on Monday
+            periods = (periods + 3) // 7
+            previous = None if previous is None else (previous + 3) // 7
+        earlier = np.concatenate([[-1 if previous is None else previous], periods[:-1]])
+        rows = np.flatnonzero(periods != earlier)
+    elif frequency == "crossing":
+        earlier = np.concatenate([[previous_signal], signals[:-1]])
+        rows = np.flatnonzero((signals != earlier) & (signals != SIGNAL_NONE))
+    else:
+        raise ValueError(f"Unknown sentiment frequency: {frequency}")
+
+    return rows, last_signal
+
+
+def step_allocations(allocations, signal, rule=None):
+    """
+    Apply one sentiment adjustment to stablecoin allocations.
+
+    Args:
+        allocations (float or numpy.ndarray): Current target allocation(s)
+        signal (int): SIGNAL_* code
+        rule (SentimentRule, optional): Step size and bounds (default rule if None)
+
+    Returns:
+        float or numpy.ndarray: New target allocation(s)
+    """
+    rule = rule or DEFAULT_SENTIMENT_RULE
+    if signal == SIGNAL_FEAR:
+        return np.maximum(allocations - rule.step, rule.min_allocation)
+    if signal == SIGNAL_GREED:
+        return np.minimum(allocations + rule.step, rule.max_allocation)
+    return allocations
+
+
+def compile_allocation_path(
+    timestamps, signals, rows, allocations, rule=None, last_adjustment=None
+):
+    """
+    Scan the sentiment signals at the evaluated bars into allocation changes.
+
+    Only bars with a signal are visited, so the cost is proportional to the
+    number of fear and greed extremes rather than the number of bars.
+
+    Args:
+        timestamps (numpy.ndarray): Timestamps in milliseconds
+        signals (numpy.ndarray): SIGNAL_* code per bar
+        rows (numpy.ndarray): Sorted bars at which sentiment is evaluated
+        allocations (float or numpy.ndarray): Target allocation per lane before
+                                              the first bar
+        rule (SentimentRule, optional): Step, bounds and cooldown (default rule if None)
+        last_adjustment (float or numpy.ndarray, optional): Timestamp of each
+            lane's previous adjustment (None if there was none)
+
+    Returns:
+        tuple: (change_rows, path, last_adjustment) where change_rows are the
+               bars at which at least one lane changes allocation, path holds
+               every lane's target allocation after each of those bars, and
+               last_adjustment is the value to pass for the following bars
+    """
+    rule = rule or DEFAULT_SENTIMENT_RULE
+    current = np.array(allocations, copy=True)
+    if last_adjustment is None:
+        last_adjustment = np.full(current.shape, -np.inf)
+    last_adjustment = np.array(last_adjustment, dtype=np.float64)
+    cooldown = rule.cooldown_days * MILLISECONDS_PER_DAY
+
+    rows = np.asarray(rows, dtype=np.int64)
+    candidates = rows[signals[rows] != SIGNAL_NONE]
+    change_rows = []
+    path = []
+    for row in candidates.tolist():
+        stepped = step_allocations(current, signals[row], rule)
+        changed = stepped != current
+        if cooldown:
+            changed &= timestamps[row] - last_adjustment >= cooldown
+        if not changed.any():
+            continue
+        current = np.where(changed, stepped, current).astype(current.dtype)
+        last_adjustment = np.where(changed, float(timestamps[row]), last_adjustment)
+        change_rows.append(row)
+        path.append(current)
+
+    path = np.array(path, dtype=current.dtype).reshape((-1,) + current.shape)
+    return np.array(change_rows, dtype=np.int64), path, last_adjustment
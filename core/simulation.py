@@ -0,0 +1,407 @@
+"""
+Batched portfolio simulation for the indexfund package.
+
+Runs the same index strategy for many portfolios ("lanes") in one pass over
+the market data. Portfolio state carries a leading lane dimension and is only
+touched at rebalance events: between events, holdings grow with the staking
+accrual index, so every lane's values over a segment are one matrix product.
+Data access and weight computations are shared by every lane.
+
+Lane state and values can be held in float32 (``dtype=np.float32``) to halve
+the working set of large batches. Rebalance arithmetic keeps float64
+intermediates, so the reduced precision only affects stored holdings and
+valuations; core.precision documents the resulting error bounds and checks
+runs against the float64 reference.
+"""
+
+import numpy as np
+
+from config import DEFAULT_SWAP_FEE, STAKING_CONFIG
+from core.context import MarketContext
+from core.costs import bind_swap_costs, token_fee_rates
+from core.ledger import (
+    REASON_PERIODIC,
+    REASON_SENTIMENT,
+    membership_reasons,
+    record_quantity_changes,
+)
+from core.metrics import calculate_portfolio_metrics_batch
+from core.panel import MarketPanel, build_market_panel
+from core.portfolio import (
+    _preprocess_historical_data,
+    rebalance_stablecoin_quantities,
+    rebalance_token_quantities,
+)
+from core.sentiment import (
+    compile_allocation_path,
+    sentiment_evaluation_rows,
+    sentiment_signals,
+    step_allocations,
+)
+from core.staking import build_staking_accrual, staking_rates
+
+
+def apply_allocation_changes(
+    quantities,
+    stablecoin_quantities,
+    target_allocations,
+    new_allocations,
+    prices,
+    swap_fee,
+    token_fees=None,
+):
+    """
+    Move every lane's stablecoin allocation to a new target, in place.
+
+    Lanes whose new target equals their current one are not traded.
+
+    Args:
+        quantities (numpy.ndarray): (lanes x tokens) token quantities
+        stablecoin_quantities (numpy.ndarray): Stablecoin quantity per lane
+        target_allocations (numpy.ndarray): Target stablecoin allocation per lane
+        new_allocations (numpy.ndarray): New target stablecoin allocation per lane
+        prices (numpy.ndarray): Current token prices
+        swap_fee (float or callable): Fee percentage charged on swaps, or a bound
+                                      cost function (see core.costs)
+        token_fees (numpy.ndarray, optional): (lanes x tokens) array receiving the
+                                              fee attributed to each token
+
+    Returns:
+        tuple: (adjusted, fees) boolean mask and fees paid per lane
+    """
+    adjusted = new_allocations != target_allocations
+    fees = np.zeros(len(target_allocations))
+    if not adjusted.any():
+        return adjusted, fees
+
+    lanes = np.flatnonzero(adjusted)
+    lane_quantities = quantities[lanes]
+    lane_prices = prices[lanes] if prices.ndim > 1 else prices
+    lane_token_fees = None if token_fees is None else np.zeros(lane_quantities.shape)
+    new_stablecoin, _, lane_fees = rebalance_stablecoin_quantities(
+        lane_quantities,
+        stablecoin_quantities[lanes],
+        lane_prices,
+        new_allocations[lanes],
+        swap_fee,
+        lane_token_fees,
+    )
+    if token_fees is not None:
+        token_fees[lanes] = lane_token_fees
+    quantities[lanes] = lane_quantities
+    stablecoin_quantities[lanes] = new_stablecoin
+    target_allocations[lanes] = new_allocations[lanes]
+    fees[lanes] = lane_fees
+
+    return adjusted, fees
+
+
+def apply_fear_greed_adjustment(
+    quantities,
+    stablecoin_quantities,
+    target_allocations,
+    classification,
+    prices,
+    swap_fee,
+    token_fees=None,
+):
+    """
+    Apply the contrarian fear and greed rule to every lane, in place.
+
+    Lanes whose allocation would move beyond the configured bounds keep their
+    current allocation and are not traded.
+
+    Args:
+        quantities (numpy.ndarray): (lanes x tokens) token quantities
+        stablecoin_quantities (numpy.ndarray): Stablecoin quantity per lane
+        target_allocations (numpy.ndarray): Target stablecoin allocation per lane
+        classification (int): Fear and greed classification code
+        prices (numpy.ndarray): Current token prices
+        swap_fee (float or callable): Fee percentage charged on swaps, or a bound
+                                      cost function (see core.costs)
+        token_fees (numpy.ndarray, optional): (lanes x tokens) array receiving the
+                                              fee attributed to each token
+
+    Returns:
+        tuple: (adjusted, fees) boolean mask and fees paid per lane
+    """
+    signals, _ = sentiment_signals(np.full(1, np.nan), np.array([classification]))
+    return apply_allocation_changes(
+        quantities,
+        stablecoin_quantities,
+        target_allocations,
+        step_allocations(target_allocations, signals[0]),
+        prices,
+        swap_fee,
+        token_fees,
+    )
+
+
+def calculate_historical_index_prices_batch(
+    historical_data,
+    method,
+    stablecoin_allocations,
+    rebalance_frequency="none",
+    apply_staking=True,
+    start_date=None,
+    fear_greed_data=None,
+    swap_fee=DEFAULT_SWAP_FEE,
+    dtype=None,
+    cost_model=None,
+    volume_data=None,
+    trade_ledger=None,
+    holdings_history=None,
+    sentiment_rule=None,
+    sentiment_frequency="rebalance",
+    yield_curves=None,
+):
+    """
+    Simulate an index strategy for several stablecoin allocations at once.
+
+    Each allocation is one lane and follows exactly the rules of
+    calculate_historical_index_prices: staking before rebalancing, periodic
+    token rebalancing, and fear and greed adjustments applied per lane.
+
+    Args:
+        historical_data (dict, MarketPanel or MarketContext): Dictionary containing historical price and market cap data
+                              Format: {"token": [[timestamp, price, market_cap], ...]},
+                              an already built panel (``start_date`` is then ignored)
+                              or a context shared by the strategies of a run
+        method (str): Weighting method ("market_cap", "sqrt_market_cap")
+        stablecoin_allocations (list or numpy.ndarray): Stablecoin allocation per lane (0.0-1.0)
+        rebalance_frequency (str): Rebalancing frequency ("none", "monthly", "quarterly", "yearly")
+        apply_staking (bool): Whether to apply staking rewards
+        start_date (datetime or str): Optional start date for analysis (format: "YYYY-MM-DD")
+        fear_greed_data (list): List of [timestamp, value, value_classification] entries
+        swap_fee (float): Fee percentage charged on token swaps during rebalancing
+        dtype (numpy.dtype, optional): Floating-point type of lane state and values
+                                       (default: the panel's dtype)
+        cost_model (CostModel, optional): Price swaps with per-token fees and market
+                                          impact from the panel's volumes instead of
+                                          the flat ``swap_fee``
+        volume_data (dict, optional): Traded volumes used when building the panel
+                                      Format: {"token": [[timestamp, volume], ...]}
+        trade_ledger (TradeLedger, optional): Ledger receiving every swap, with one
+                                              new run id per lane
+        holdings_history (HoldingsHistory, optional): Empty history that records
+                                                      every lane's holdings at the
+                                                      first bar and each rebalance
+        sentiment_rule (SentimentRule, optional): Numeric fear and greed rule used
+                                                  instead of the index's labels
+        sentiment_frequency (str): When sentiment is evaluated ("rebalance",
+                                   "daily", "weekly" or "crossing")
+        yield_curves (YieldCurves, optional): Time-varying staking APRs used
+                                              instead of STAKING_CONFIG
+
+    Returns:
+        tuple: (timestamps, values, metrics) where:
+            - timestamps is an array of timestamps in milliseconds
+            - values is an (allocations x time) matrix of portfolio values
+            - metrics is a dictionary of per-lane metric arrays
+    """
+    # --- Data Preparation ---
+    if isinstance(historical_data, MarketContext):
+        context = historical_data.since(start_date)
+    elif isinstance(historical_data, MarketPanel):
+        context = MarketContext(historical_data)
+    else:
+        processed_data = _preprocess_historical_data(historical_data, start_date)
+        if not processed_data:
+            return (
+                np.array([], dtype=np.int64),
+                np.empty((len(stablecoin_allocations), 0)),
+                {},
+            )
+        context = MarketContext(
+            build_market_panel(
+                processed_data, dtype=dtype or np.float64, volume_data=volume_data
+            )
+        )
+
+    panel = context.panel
+    if dtype is None:
+        dtype = panel.prices.dtype
+    allocations = np.atleast_1d(np.asarray(stablecoin_allocations, dtype=dtype))
+
+    timestamps = panel.timestamps
+    if not len(timestamps):
+        return timestamps, np.empty((len(allocations), 0)), {}
+
+    rebalance_schedule = context.rebalance_schedule(rebalance_frequency)
+    events = context.rebalance_events(rebalance_frequency)[0]
+
+    # --- Portfolio Initialization ---
+    # Only tokens with a usable price at the first timestamp are ever held
+    initial_value = 100.0
+    first_prices = panel.prices[0]
+    held = np.flatnonzero(first_prices > 0)
+    prices = panel.prices[:, held].astype(dtype, copy=False)
+    weight_matrix = context.weight_matrix(method).astype(dtype, copy=False)
+    initial_weights = weight_matrix[0, held]
+
+    stablecoin_quantities = initial_value * allocations
+    volatile_usd = initial_value * (1.0 - allocations)
+    quantities = (volatile_usd[:, np.newaxis] * initial_weights) / prices[0]
+
+    # Every lane's sentiment adjustments, scanned once before the simulation
+    fear_greed_values, fear_greed_classes = context.fear_greed(fear_greed_data)
+    signals, _ = sentiment_signals(
+        fear_greed_values, fear_greed_classes, sentiment_rule
+    )
+    evaluation_rows, _ = sentiment_evaluation_rows(
+        timestamps, signals, sentiment_frequency, events
+    )
+    change_rows, allocation_path, _ = compile_allocation_path(
+        timestamps, signals, evaluation_rows, allocations, sentiment_rule
+    )
+    sentiment_changes = dict(zip(change_rows.tolist(), allocation_path))
+    target_allocations = allocations.copy()
+
+    # Staking growth between any two rows is a ratio of accrual index entries
+    if apply_staking:
+        token_accrual, stablecoin_accrual = build_staking_accrual(
+            timestamps,
+            [panel.tokens[column] for column in held],
+            yield_curves or STAKING_CONFIG,
+        )
+        token_accrual = token_accrual.astype(dtype, copy=False)
+        stablecoin_accrual = stablecoin_accrual.astype(dtype, copy=False)
+    else:
+        token_accrual = np.ones(prices.shape, dtype=dtype)
+        stablecoin_accrual = np.ones(len(timestamps), dtype=dtype)
+
+    # Swap costs are evaluated for every lane and token of a rebalance at once
+    if cost_model is not None:
+        fee_rates = token_fee_rates(
+            cost_model, [panel.tokens[column] for column in held]
+        )
+        volumes = None if panel.volumes is None else panel.volumes[:, held]
+
+    if holdings_history is not None:
+        symbols = [panel.tokens[column] for column in held]
+        aprs = np.zeros(len(symbols) + 1)
+        if apply_staking:
+            aprs = staking_rates(
+                symbols + ["stablecoin"], yield_curves or STAKING_CONFIG
+            )
+        holdings_history.start(symbols, aprs, yield_curves if apply_staking else None)
+        holdings_history.extend(timestamps)
+        holdings_history.snapshot(0, quantities, stablecoin_quantities)
+
+    if trade_ledger is not None:
+        runs = trade_ledger.new_runs(len(allocations))
+        token_ids = trade_ledger.token_ids([panel.tokens[column] for column in held])
+        previous_weights = initial_weights
+
+    # Staked value of one base unit per token; missing prices contribute nothing
+    accrued_prices = np.where(np.isnan(prices), 0.0, token_accrual * prices)
+
+    # --- Backtest Simulation ---
+    # Holdings are kept in base units (quantity / accrual index) and only change
+    # at rebalance and sentiment events; values in between are one matrix
+    # product per segment
+    lanes = len(allocations)
+    values = np.empty((lanes, len(timestamps)), dtype=dtype)
+    fear_greed_rebalance_count = np.zeros(lanes, dtype=np.int64)
+    total_fees_paid = np.zeros(lanes)
+    base_quantities = quantities / token_accrual[0]
+    base_stablecoin = stablecoin_quantities / stablecoin_accrual[0]
+
+    boundaries = np.union1d(np.union1d(events, change_rows), [0, len(timestamps)])
+
+    for start, end in zip(boundaries[:-1], boundaries[1:]):
+        row = start
+        trading = rebalance_schedule[row] or row in sentiment_changes
+        if trading:
+            current_prices = prices[row]
+            quantities = base_quantities * token_accrual[row]
+            stablecoin_quantities = base_stablecoin * stablecoin_accrual[row]
+            swap_costs = swap_fee
+            if cost_model is not None:
+                swap_costs = bind_swap_costs(
+                    cost_model, fee_rates, None if volumes is None else volumes[row]
+                )
+
+        if rebalance_schedule[row]:
+            row_weights = weight_matrix[row, held]
+            if trade_ledger is not None:
+                before = quantities.copy()
+                token_fees = np.zeros(quantities.shape)
+
+            _, fees = rebalance_token_quantities(
+                quantities,
+                current_prices,
+                row_weights,
+                swap_costs,
+                None if trade_ledger is None else token_fees,
+            )
+            total_fees_paid += fees
+            if trade_ledger is not None:
+                record_quantity_changes(
+                    trade_ledger,
+                    runs,
+                    timestamps[row],
+                    token_ids,
+                    before,
+                    quantities,
+                    current_prices,
+                    token_fees,
+                    membership_reasons(previous_weights, row_weights, REASON_PERIODIC),
+                )
+                previous_weights = row_weights
+
+        # Sentiment adjustments follow any token rebalance of the same bar
+        if row in sentiment_changes:
+            if trade_ledger is not None:
+                before = quantities.copy()
+                token_fees = np.zeros(quantities.shape)
+            adjusted, fees = apply_allocation_changes(
+                quantities,
+                stablecoin_quantities,
+                target_allocations,
+                sentiment_changes[row],
+                current_prices,
+                swap_costs,
+                None if trade_ledger is None else token_fees,
+            )
+            fear_greed_rebalance_count += adjusted
+            total_fees_paid += fees
+            if trade_ledger is not None:
+                record_quantity_changes(
+                    trade_ledger,
+                    runs,
+                    timestamps[row],
+                    token_ids,
+                    before,
+                    quantities,
+                    current_prices,
+                    token_fees,
+                    REASON_SENTIMENT,
+                )
+
+        if trading:
+            base_quantities = quantities / token_accrual[row]
+            base_stablecoin = stablecoin_quantities / stablecoin_accrual[row]
+            if holdings_history is not None:
+                holdings_history.snapshot(row, quantities, stablecoin_quantities)
+
+        # Value every lane over the segment at once
+        values[:, start:end] = (
+            base_quantities @ accrued_prices[start:end].T
+            + base_stablecoin[:, np.newaxis] * stablecoin_accrual[start:end]
+        )
+
+    stablecoin_quantities = base_stablecoin * stablecoin_accrual[-1]
+    rebalance_count = len(events)
+
+    # --- Per-lane Metrics ---
+    metrics = calculate_portfolio_metrics_batch(values)
+    metrics["stablecoin_allocation"] = allocations
+    metrics["rebalance_frequency"] = rebalance_frequency
+    metrics["rebalance_count"] = np.full(lanes, rebalance_count)
+    metrics["fear_greed_rebalance_count"] = fear_greed_rebalance_count
+    metrics["total_fees_paid"] = total_fees_paid
+    metrics["final_stablecoin_pct"] = stablecoin_quantities / values[:, -1] * 100
+    metrics["final_volatile_pct"] = 100 - metrics["final_stablecoin_pct"]
+
+    return timestamps, values, metrics
@@ -0,0 +1,333 @@
+"""
+Staking accrual functions for the indexfund package.
+
+Staking rewards compound daily, so the growth of any staked holding between
+two timestamps depends only on the APRs in effect over that interval. This
+module turns APRs into cumulative growth-factor ("accrual index") arrays over a
+timeline: a holding of ``q`` at index ``i`` is worth
+``q * index[j] / index[i]`` tokens at index ``j``.
+
+APRs are either constants (a staking config such as STAKING_CONFIG) or
+YieldCurves: piecewise-constant APR series per asset whose cumulative log
+accrual is computed once when the curves are built, so the growth between
+any two timestamps is one lookup into each curve. Accrual is measured from
+each curve's own first rate change, never from the timeline being simulated,
+so the growth of a bar does not depend on the block of bars it is computed
+in. Every simulation mode gets its growth factors and accrual indexes through
+the same functions.
+"""
+
+import numpy as np
+
+from config import STAKING_CONFIG
+
+MILLISECONDS_PER_DAY = 1000 * 60 * 60 * 24
+
+
+class YieldCurves:
+    """
+    Time-varying staking APRs with a precomputed cumulative accrual.
+
+    Each curve is a step function: an APR applies from its timestamp until the
+    next one, and the first APR also applies before its timestamp. Symbols
+    without a curve earn their constant APR from ``staking_config``.
+
+    Args:
+        curves (dict): Rate changes per symbol
+                       Format: {"symbol": [[timestamp, apr], ...]}
+        staking_config (dict, optional): Constant APR per symbol for symbols
+                                         without a curve (default: STAKING_CONFIG)
+    """
+
+    __slots__ = ("staking_config", "_times", "_aprs", "_rates", "_log_index")
+
+    def __init__(self, curves, staking_config=None):
+        self.staking_config = dict(
+            STAKING_CONFIG if staking_config is None else staking_config
+        )
+        self._times = {}
+        self._aprs = {}
+        self._rates = {}
+        self._log_index = {}
+        for symbol, points in curves.items():
+            points = np.asarray(points, dtype=float).reshape(-1, 2)
+            times = points[:, 0].astype(np.int64)
+            aprs = points[:, 1]
+            if not len(times):
+                raise ValueError(f"Yield curve for {symbol} is empty")
+            if np.any(np.diff(times) <= 0):
+                raise ValueError(f"Yield curve for {symbol} is not strictly increasing")
+            if np.any(aprs < 0) or np.any(np.isnan(aprs)):
+                raise ValueError(f"Yield curve for {symbol} has invalid APRs")
+
+            # Log growth per millisecond, accumulated up to every rate change
+            rates = np.log1p(aprs / 365) / MILLISECONDS_PER_DAY
+            log_index = np.zeros(len(times))
+            np.cumsum(rates[:-1] * np.diff(times), out=log_index[1:])
+            self._times[symbol] = times
+            self._aprs[symbol] = aprs
+            self._rates[symbol] = rates
+            self._log_index[symbol] = log_index
+
+    def __repr__(self):
+        return f"YieldCurves(symbols={self.symbols!r})"
+
+    @property
+    def symbols(self):
+        """Symbols with a time-varying curve."""
+        return list(self._times)
+
+    def _curve_log_accrual(self, symbol, timestamps):
+        """Log growth of a curve's symbol since the curve's first rate change."""
+        times = self._times[symbol]
+        segment = np.maximum(np.searchsorted(times, timestamps, side="right") - 1, 0)
+        return (
+            self._log_index[symbol][segment]
+            + (timestamps - times[segment]) * self._rates[symbol][segment]
+        )
+
+    def log_accrual(self, timestamps, symbols):
+        """
+        Cumulative log growth at each timestamp, relative to the first.
+
+        Args:
+            timestamps (numpy.ndarray): Sorted timestamps in milliseconds
+            symbols (list): Asset symbols (may include "stablecoin")
+
+        Returns:
+            numpy.ndarray: (time x assets) log growth, 0.0 at the first timestamp
+        """
+        timestamps = np.asarray(timestamps, dtype=np.int64)
+        elapsed = (timestamps - timestamps[:1]).astype(float)
+        log_growth = np.empty((len(timestamps), len(symbols)))
+        for column, symbol in enumerate(symbols):
+            if symbol in self._times:
+                log_growth[:, column] = self._curve_log_accrual(symbol, timestamps)
+                continue
+            rate = np.log1p(self.staking_config.get(symbol, 0.0) / 365)
+            log_growth[:, column] = elapsed * (rate / MILLISECONDS_PER_DAY)
+        return log_growth - log_growth[:1]
+
+    def interval_log_growth(self, timestamps, symbols):
+        """
+        Log growth over each interval between consecutive timestamps.
+
+        Each interval's growth depends only on its two timestamps, so growth
+        computed for a timeline in pieces is identical to growth computed in
+        one go. Symbols without a curve grow exactly as in build_growth_factors.
+
+        Args:
+            timestamps (numpy.ndarray): Sorted timestamps in milliseconds
+            symbols (list): Asset symbols (may include "stablecoin")
+
+        Returns:
+            numpy.ndarray: ((time - 1) x assets) log growth, where row ``k``
+                           covers ``timestamps[k]`` to ``timestamps[k + 1]``
+        """
+        timestamps = np.asarray(timestamps, dtype=np.int64)
+        days = np.diff(timestamps) / MILLISECONDS_PER_DAY
+        log_growth = days[:, np.newaxis] * np.log1p(staking_rates(symbols, self) / 365)
+        for column, symbol in enumerate(symbols):
+            if symbol in self._times:
+                log_growth[:, column] = np.diff(
+                    self._curve_log_accrual(symbol, timestamps)
+                )
+        return log_growth
+
+    def rates(self, timestamps, symbols):
+        """
+        APR in effect at each timestamp.
+
+        Args:
+            timestamps (numpy.ndarray): Timestamps in milliseconds
+            symbols (list): Asset symbols (may include "stablecoin")
+
+        Returns:
+            numpy.ndarray: (time x assets) APRs as decimals
+        """
+        timestamps = np.asarray(timestamps, dtype=np.int64)
+        aprs = np.empty((len(timestamps), len(symbols)))
+        for column, symbol in enumerate(symbols):
+            times = self._times.get(symbol)
+            if times is None:
+                aprs[:, column] = self.staking_config.get(symbol, 0.0)
+                continue
+            segment = np.maximum(
+                np.searchsorted(times, timestamps, side="right") - 1, 0
+            )
+            aprs[:, column] = self._aprs[symbol][segment]
+        return aprs
+
+    def to_dict(self):
+        """Return the curves as arrays, e.g. for saving with NumPy."""
+        symbols = self.symbols
+        times = [self._times[symbol] for symbol in symbols]
+        aprs = [self._aprs[symbol] for symbol in symbols]
+        return {
+            "symbols": np.array(symbols, dtype=str),
+            "lengths": np.array([len(curve) for curve in times], dtype=np.int64),
+            "times": np.concatenate(times) if times else np.zeros(0, dtype=np.int64),
+            "aprs": np.concatenate(aprs) if aprs else np.zeros(0),
+            "config_symbols": np.array(list(self.staking_config), dtype=str),
+            "config_aprs": np.array(list(self.staking_config.values()), dtype=float),
+        }
+
+    @classmethod
+    def from_dict(cls, arrays):
+        """Rebuild curves from the arrays returned by to_dict."""
+        bounds = np.cumsum(arrays["lengths"])[:-1]
+        curves = {
+            str(symbol): np.column_stack([times, aprs])
+            for symbol, times, aprs in zip(
+                arrays["symbols"],
+                np.split(arrays["times"], bounds),
+                np.split(arrays["aprs"], bounds),
+            )
+        }
+        staking_config = dict(
+            zip(arrays["config_symbols"].tolist(), arrays["config_aprs"].tolist())
+        )
+        return cls(curves, staking_config)
+
+
+def staking_rates(symbols, staking_config=None):
+    """
+    Look up the staking APR for each symbol.
+
+    Args:
+        symbols (list): Token symbols (may include "stablecoin")
+        staking_config (dict, optional): APR per symbol (default: STAKING_CONFIG)
+
+    Returns:
+        numpy.ndarray: APR per symbol, 0.0 where staking is not configured
+    """
+    if staking_config is None:
+        staking_config = STAKING_CONFIG
+    if isinstance(staking_config, YieldCurves):
+        staking_config = staking_config.staking_config
+    return np.array([staking_config.get(symbol, 0.0) for symbol in symbols])
+
+
+def build_accrual_index(timestamps, aprs):
+    """
+    Build cumulative daily-compounding growth factors over a timeline.
+
+    The APR in effect at index ``k - 1`` applies to the interval ending at
+    ``k``, matching ``calculate_staking_rewards`` applied step by step.
+
+    Args:
+        timestamps (numpy.ndarray): Sorted timestamps in milliseconds
+        aprs (numpy.ndarray): APRs as decimals; shape (assets,) for constant
+                              rates or (time x assets) for time-varying rates
+
+    Returns:
+        numpy.ndarray: (time x assets) growth factors, 1.0 at the first timestamp
+    """
+    timestamps = np.asarray(timestamps, dtype=np.int64)
+    aprs = np.asarray(aprs, dtype=float)
+    days = np.diff(timestamps) / MILLISECONDS_PER_DAY
+
+    if aprs.ndim == 1:
+        interval_aprs = np.broadcast_to(aprs, (len(days), len(aprs)))
+    else:
+        interval_aprs = aprs[:-1]
+
+    # Accumulate in log space: exp(sum(days * log(1 + apr / 365)))
+    log_growth = days[:, np.newaxis] * np.log1p(interval_aprs / 365)
+    index = np.ones((len(timestamps), interval_aprs.shape[-1]))
+    np.exp(np.cumsum(log_growth, axis=0), out=index[1:])
+    return index
+
+
+def build_growth_factors(timestamps, aprs):
+    """
+    Build per-interval daily-compounding growth factors over a timeline.
+
+    Each factor depends only on its own interval, so factors computed for a
+    timeline in pieces are identical to those computed in one go.
+
+    Args:
+        timestamps (numpy.ndarray): Sorted timestamps in milliseconds
+        aprs (numpy.ndarray): APRs as decimals, shape (assets,)
+
+    Returns:
+        numpy.ndarray: ((time - 1) x assets) quantity multipliers, where row
+                       ``k`` grows holdings from ``timestamps[k]`` to ``timestamps[k + 1]``
+    """
+    days = np.diff(np.asarray(timestamps, dtype=np.int64)) / MILLISECONDS_PER_DAY
+    return np.exp(days[:, np.newaxis] * np.log1p(np.asarray(aprs) / 365))
+
+
+def build_staking_index(timestamps, symbols, staking_config=None):
+    """
+    Build accrual indexes from constant APRs or yield curves.
+
+    Args:
+        timestamps (numpy.ndarray): Sorted timestamps in milliseconds
+        symbols (list): Asset symbols (may include "stablecoin")
+        staking_config (dict or YieldCurves, optional): APR per symbol, or
+            time-varying curves (default: STAKING_CONFIG)
+
+    Returns:
+        numpy.ndarray: (time x assets) growth factors, 1.0 at the first timestamp
+    """
+    if isinstance(staking_config, YieldCurves):
+        if not len(timestamps):
+            return np.ones((0, len(symbols)))
+        return np.exp(staking_config.log_accrual(timestamps, symbols))
+    return build_accrual_index(timestamps, staking_rates(symbols, staking_config))
+
+
+def build_staking_growth(timestamps, symbols, staking_config=None):
+    """
+    Build per-interval growth factors from constant APRs or yield curves.
+
+    Args:
+        timestamps (numpy.ndarray): Sorted timestamps in milliseconds
+        symbols (list): Asset symbols (may include "stablecoin")
+        staking_config (dict or YieldCurves, optional): APR per symbol, or
+            time-varying curves (default: STAKING_CONFIG)
+
+    Returns:
+        numpy.ndarray: ((time - 1) x assets) quantity multipliers, as returned
+                       by build_growth_factors
+    """
+    if isinstance(staking_config, YieldCurves):
+        if not len(timestamps):
+            return np.ones((0, len(symbols)))
+        return np.exp(staking_config.interval_log_growth(timestamps, symbols))
+    return build_growth_factors(timestamps, staking_rates(symbols, staking_config))
+
+
+def build_staking_accrual(timestamps, tokens, staking_config=None):
+    """
+    Build accrual indexes for index tokens and the stablecoin.
+
+    Args:
+        timestamps (numpy.ndarray): Sorted timestamps in milliseconds
+        tokens (list): Token symbols, in column order
+        staking_config (dict or YieldCurves, optional): APR per symbol, or
+            time-varying curves (default: STAKING_CONFIG)
+
+    Returns:
+        tuple: (token_index, stablecoin_index) with shapes (time x tokens) and (time,)
+    """
+    index = build_staking_index(
+        timestamps, list(tokens) + ["stablecoin"], staking_config
+    )
+    return index[:, :-1], index[:, -1]
+
+
+def accrued_growth(index, start, end):
+    """
+    Growth factor of a staked holding between two timeline indices.
+
+    Args:
+        index (numpy.ndarray): Accrual index from build_accrual_index
+        start (int or numpy.ndarray): Start index (or indices)
+        end (int or numpy.ndarray): End index (or indices)
+
+    Returns:
+        numpy.ndarray: Quantity multiplier(s) from ``start`` to ``end``
+    """
+    return index[end] / index[start]
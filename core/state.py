@@ -0,0 +1,344 @@
+"""
+Simulation state persistence and incremental updates for the indexfund package.
+
+A SimulationState can be checkpointed to a compressed NumPy archive at any
+bar and restored later; continuing a restored state over the remaining data
+gives bit-for-bit the results of an uninterrupted run. ``advance`` extends a
+live state with new bars only, so daily updates cost O(new bars), and
+``stream_simulation`` does the same for market data arriving from an iterator.
+"""
+
+from datetime import datetime
+
+import numpy as np
+
+from core.costs import CostModel
+from core.drift import DriftBand
+from core.holdings import HoldingsHistory
+from core.metrics import RunningPortfolioMetrics
+from core.panel import MarketPanel, build_market_panel
+from core.portfolio import (
+    Portfolio,
+    SimulationState,
+    _prepare_fear_greed_data,
+    _preprocess_historical_data,
+    advance_simulation,
+    summarize_simulation,
+)
+from core.sentiment import SentimentRule
+from core.staking import YieldCurves
+from core.universe import UniverseRule
+
+STATE_FORMAT_VERSION = 10
+
+_PORTFOLIO_SCALARS = (
+    "stablecoin_quantity",
+    "stablecoin_usd_value",
+    "target_allocation",
+    "volatile_allocation",
+    "total_usd_value",
+    "fees_paid",
+)
+
+_STATE_SCALARS = (
+    "apply_staking",
+    "swap_fee",
+    "stablecoin_allocation",
+    "initial_value",
+    "rebalance_count",
+    "fear_greed_rebalance_count",
+    "total_fees_paid",
+    "fear_greed_enabled",
+    "keep_history",
+    "drift_rebalance_count",
+    "last_sentiment_signal",
+)
+
+_STATE_OPTIONAL_INTS = ("last_timestamp", "rebalance_anchor", "wall_clock_floor")
+
+_STATE_OPTIONAL_FLOATS = ("sentiment_level", "last_sentiment_adjustment")
+
+_METADATA_DATES = ("last_rebalance_date", "last_allocation_rebalance_date")
+
+
+def _optional(value, dtype):
+    """Store None as an empty array and anything else as a one-element array."""
+    return np.array([] if value is None else [value], dtype=dtype)
+
+
+def _from_optional(array, convert):
+    """Inverse of _optional."""
+    return convert(array[0]) if len(array) else None
+
+
+def save_simulation_state(state, path):
+    """
+    Save a simulation state as a compressed NumPy archive.
+
+    Args:
+        state (SimulationState): State to save
+        path (str or file): Destination (".npz" is appended to names without it)
+    """
+    portfolio = state.portfolio
+    arrays = {
+        "version": np.array(STATE_FORMAT_VERSION),
+        "method": np.array(state.method),
+        "rebalance_frequency": np.array(state.rebalance_frequency),
+        "sentiment_frequency": np.array(state.sentiment_frequency),
+        "symbols": np.array(portfolio.symbols, dtype=str),
+        "quantities": portfolio.quantities,
+        "usd_values": portfolio.usd_values,
+        "target_weights": portfolio.target_weights,
+        "history_timestamps": np.array(
+            [timestamp for timestamp, _ in state.history], dtype=np.int64
+        ),
+        "history_values": np.array(
+            [value for _, value in state.history], dtype=np.float64
+        ),
+    }
+    for name in _PORTFOLIO_SCALARS:
+        arrays[f"portfolio_{name}"] = np.array(getattr(portfolio, name))
+    for name in _STATE_SCALARS:
+        arrays[name] = np.array(getattr(state, name))
+    for name in _STATE_OPTIONAL_INTS:
+        arrays[name] = _optional(getattr(state, name), np.int64)
+    for name in _STATE_OPTIONAL_FLOATS:
+        arrays[name] = _optional(getattr(state, name), np.float64)
+    for name in _METADATA_DATES:
+        date = portfolio.metadata.get(name)
+        arrays[name] = _optional(date and date.timestamp(), np.float64)
+    for name, value in state.running_metrics.to_dict().items():
+        arrays[f"metrics_{name}"] = np.array(value)
+
+    band = state.drift_band
+    arrays["drift_enabled"] = np.array(band is not None)
+    if band is not None:
+        arrays["drift_token_band"] = _optional(band.token_band, np.float64)
+        arrays["drift_relative"] = np.array(band.relative)
+        arrays["drift_allocation_band"] = _optional(band.allocation_band, np.float64)
+
+    universe = state.universe
+    arrays["universe_size"] = _optional(universe and universe.size, np.int64)
+    arrays["universe_buffer"] = _optional(universe and universe.buffer, np.int64)
+
+    cost_model = state.cost_model
+    arrays["cost_enabled"] = np.array(cost_model is not None)
+    if cost_model is not None:
+        arrays["cost_default_fee"] = np.array(cost_model.default_fee)
+        arrays["cost_tier_tokens"] = np.array(list(cost_model.fee_tiers), dtype=str)
+        arrays["cost_tier_rates"] = np.array(
+            list(cost_model.fee_tiers.values()), dtype=np.float64
+        )
+        arrays["cost_impact_coefficient"] = np.array(cost_model.impact_coefficient)
+        arrays["cost_impact_exponent"] = np.array(cost_model.impact_exponent)
+
+    rule = state.sentiment_rule
+    arrays["sentiment_enabled"] = np.array(rule is not None)
+    if rule is not None:
+        for name in SentimentRule.__slots__:
+            arrays[f"sentiment_{name}"] = _optional(getattr(rule, name), np.float64)
+
+    yield_curves = state.yield_curves
+    arrays["curves_enabled"] = np.array(yield_curves is not None)
+    if yield_curves is not None:
+        for name, value in yield_curves.to_dict().items():
+            arrays[f"curves_{name}"] = value
+
+    holdings = state.holdings
+    arrays["holdings_enabled"] = np.array(holdings is not None)
+    if holdings is not None:
+        for name, value in holdings.to_dict().items():
+            arrays[f"holdings_{name}"] = value
+
+    np.savez_compressed(path, **arrays)
+
+
+def load_simulation_state(path):
+    """
+    Load a simulation state saved with save_simulation_state.
+
+    Args:
+        path (str or file): Archive written by save_simulation_state
+
+    Returns:
+        SimulationState: Restored state
+    """
+    with np.load(path, allow_pickle=False) as archive:
+        version = int(archive["version"])
+        if version != STATE_FORMAT_VERSION:
+            raise ValueError(f"Unsupported simulation state version: {version}")
+
+        last_timestamp = _from_optional(archive["last_timestamp"], int)
+        portfolio = Portfolio(last_timestamp)
+        portfolio.set_tokens({str(symbol): {} for symbol in archive["symbols"]})
+        portfolio.quantities = archive["quantities"].copy()
+        portfolio.usd_values = archive["usd_values"].copy()
+        portfolio.target_weights = archive["target_weights"].copy()
+        for name in _PORTFOLIO_SCALARS:
+            setattr(portfolio, name, archive[f"portfolio_{name}"].item())
+        for name in _METADATA_DATES:
+            portfolio.metadata[name] = _from_optional(
+                archive[name], lambda seconds: datetime.fromtimestamp(float(seconds))
+            )
+
+        state = SimulationState(portfolio, str(archive["method"]))
+        state.rebalance_frequency = str(archive["rebalance_frequency"])
+        state.sentiment_frequency = str(archive["sentiment_frequency"])
+        for name in _STATE_SCALARS:
+            setattr(state, name, archive[name].item())
+        for name in _STATE_OPTIONAL_INTS:
+            setattr(state, name, _from_optional(archive[name], int))
+        for name in _STATE_OPTIONAL_FLOATS:
+            setattr(state, name, _from_optional(archive[name], float))
+        state.running_metrics = RunningPortfolioMetrics.from_dict(
+            {
+                name: archive[f"metrics_{name}"].item()
+                for name in RunningPortfolioMetrics.__slots__
+            }
+        )
+        if archive["drift_enabled"]:
+            state.drift_band = DriftBand(
+                _from_optional(archive["drift_token_band"], float),
+                bool(archive["drift_relative"]),
+                _from_optional(archive["drift_allocation_band"], float),
+            )
+        universe_size = _from_optional(archive["universe_size"], int)
+        if universe_size is not None:
+            state.universe = UniverseRule(
+                universe_size, _from_optional(archive["universe_buffer"], int)
+            )
+        if archive["cost_enabled"]:
+            state.cost_model = CostModel(
+                archive["cost_default_fee"].item(),
+                dict(
+                    zip(
+                        archive["cost_tier_tokens"].tolist(),
+                        archive["cost_tier_rates"].tolist(),
+                    )
+                ),
+                archive["cost_impact_coefficient"].item(),
+                archive["cost_impact_exponent"].item(),
+            )
+        if archive["sentiment_enabled"]:
+            state.sentiment_rule = SentimentRule(
+                **{
+                    name: _from_optional(archive[f"sentiment_{name}"], float)
+                    for name in SentimentRule.__slots__
+                }
+            )
+        if archive["curves_enabled"]:
+            state.yield_curves = YieldCurves.from_dict(
+                {
+                    name.removeprefix("curves_"): archive[name]
+                    for name in archive.files
+                    if name.startswith("curves_") and name != "curves_enabled"
+                }
+            )
+        if archive["holdings_enabled"]:
+            state.holdings = HoldingsHistory.from_dict(
+                {
+                    name.removeprefix("holdings_"): archive[name]
+                    for name in archive.files
+                    if name.startswith("holdings_") and name != "holdings_enabled"
+                }
+            )
+        state.history = [
+            [timestamp, value]
+            for timestamp, value in zip(
+                archive["history_timestamps"].tolist(),
+                archive["history_values"].tolist(),
+            )
+        ]
+
+    return state
+
+
+def resume_historical_index_prices(
+    state, historical_data, fear_greed_data=None, event_log=None
+):
+    """
+    Continue a simulation over the bars after the state's last processed bar.
+
+    Args:
+        state (SimulationState): State to continue, updated in place
+        historical_data (dict): Dictionary containing historical price and market cap data
+                              Format: {"token": [[timestamp, price, market_cap], ...]}
+        fear_greed_data (list): List of [timestamp, value, value_classification] entries
+        event_log (EventLog, optional): Log receiving rebalance and summary events
+
+    Returns:
+        tuple: (price_history, metrics) for the whole simulation so far, as
+               returned by calculate_historical_index_prices
+    """
+    processed_data = _preprocess_historical_data(historical_data, None)
+    panel = build_market_panel(processed_data)
+    advance_simulation(
+        state, panel, _prepare_fear_greed_data(fear_greed_data), event_log
+    )
+    return state.history, summarize_simulation(state, event_log)
+
+
+def advance(state, new_bars, fear_greed_data=None, event_log=None):
+    """
+    Extend a simulation with newly available bars.
+
+    Applies staking, the rebalance schedule and sentiment adjustments to the
+    bars after ``state.last_timestamp`` and updates the running metrics. For a
+    state created with ``keep_history=False`` the work is proportional to the
+    number of new bars; a state that keeps its history recomputes the summary
+    metrics over every bar so far on each call. Either way the resulting
+    values are identical to processing all bars in a single call.
+
+    Args:
+        state (SimulationState): State to advance, updated in place
+        new_bars (dict or MarketPanel): New market data in the historical data
+                                        format ({"token": [[timestamp, price, market_cap], ...]})
+        fear_greed_data (list): Fear and greed entries covering the new bars
+        event_log (EventLog, optional): Log receiving rebalance and summary events
+
+    Returns:
+        tuple: (new_values, metrics) where new_values is a list of
+               [timestamp, total_value] pairs for the new bars
+    """
+    panel = new_bars
+    if not isinstance(panel, MarketPanel):
+        panel = build_market_panel(new_bars)
+
+    new_values = advance_simulation(
+        state, panel, _prepare_fear_greed_data(fear_greed_data), event_log
+    )
+    return new_values, summarize_simulation(state, event_log)
+
+
+def stream_simulation(state, market_data, fear_greed_data=None, event_log=None):
+    """
+    Run a simulation over market data arriving from an iterator.
+
+    Each item is a block of bars, either a MarketPanel (e.g. from
+    iterate_panel_chunks over a memory-mapped panel) or a dictionary in the
+    historical data format (e.g. one bar from a live feed). Results are
+    yielded bar by bar and match calculate_historical_index_prices exactly;
+    with ``keep_history=False`` on the state, memory use stays constant.
+
+    Args:
+        state (SimulationState): State to advance, updated in place
+        market_data (iterable): Blocks of bars in time order
+        fear_greed_data (list): Fear and greed entries for the streamed period
+        event_log (EventLog, optional): Log receiving rebalance events
+
+    Yields:
+        tuple: (timestamp, total_value, event_flags) where event_flags combines
+               EVENT_FLAG_REBALANCE, EVENT_FLAG_SENTIMENT and EVENT_FLAG_DRIFT bits
+    """
+    fear_greed_map = _prepare_fear_greed_data(fear_greed_data)
+
+    for block in market_data:
+        panel = block
+        if not isinstance(panel, MarketPanel):
+            panel = build_market_panel(block)
+
+        values, flags = advance_simulation(
+            state, panel, fear_greed_map, event_log, with_flags=True
+        )
+        for (timestamp, total_value), event_flags in zip(values, flags.tolist()):
+            yield timestamp, total_value, event_flags
@@ -88,12 +88,15 @@ def calculate_strategy_performance(
     stablecoin_allocation=0.5,
     fear_greed_data=None,
     apply_staking=True,
+    yield_curves=None,
 ):
     """
     Calculate performance metrics for an index strategy.
 
     Args:
-        historical_data (dict): Dictionary of historical price data
+        historical_data (dict or MarketContext): Dictionary of historical price data,
+                                                or a context shared by every strategy
+                                                of a run (see build_market_context)
         method (str): Weighting method
         freq (str): Rebalancing frequency
         initial_investment (float): Initial investment amount
@@ -101,6 +104,8 @@ def calculate_strategy_performance(
         stablecoin_allocation (float): Percentage of portfolio to allocate to stablecoin (0.0-1.0)
         fear_greed_data (list): List of [timestamp, value, value_classification] entries for fear and greed index
         apply_staking (bool): Whether to apply staking rewards in the simulation
+        yield_curves (YieldCurves, optional): Time-varying staking APRs used
+                                              instead of STAKING_CONFIG
 
     Returns:
         tuple: (index_prices, metrics, investment_value)
@@ -114,6 +119,7 @@ def calculate_strategy_performance(
         start_date=start_date,
         stablecoin_allocation=stablecoin_allocation,
         fear_greed_data=fear_greed_data,
+        yield_curves=yield_curves,
     )
 
     # If no data available (possibly due to start date filtering), return early
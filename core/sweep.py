@@ -0,0 +1,390 @@
+"""
+Parameter sweep functions for the indexfund package.
+
+A sweep runs every combination of a declarative parameter grid. The parent
+process builds the market context once and passes it to each worker through
+the process pool's ``initargs``. Runs that share a start date share one slice
+of that context, and runs that differ only in their stablecoin allocation are
+simulated together as lanes of one batched simulation.
+
+Per-run metrics are appended to a CSV results table as they complete, so an
+interrupted sweep resumes where it stopped.
+"""
+
+import csv
+import hashlib
+import itertools
+import os
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import numpy as np
+
+from config import DEFAULT_SWAP_FEE
+from core.context import build_market_context
+from core.ledger import (
+    TradeLedger,
+    load_trade_ledger,
+    merge_trade_ledgers,
+    save_trade_ledger,
+)
+from core.sentiment import SentimentRule
+from core.simulation import calculate_historical_index_prices_batch
+from core.strategy import generate_strategy_key
+
+# Columns of the results table
+PARAMETER_COLUMNS = (
+    "key",
+    "method",
+    "rebalance_frequency",
+    "apply_staking",
+    "use_fear_greed",
+    "stablecoin_allocation",
+    "swap_fee",
+    "start_date",
+)
+
+METRIC_COLUMNS = (
+    "total_return",
+    "annualized_roi",
+    "max_drawdown",
+    "volatility",
+    "sharpe_ratio",
+    "sortino_ratio",
+    "final_value",
+    "rebalance_count",
+    "fear_greed_rebalance_count",
+    "total_fees_paid",
+    "final_stablecoin_pct",
+)
+
+# Market data and context held by each worker process
+_worker_context = None
+_worker_cost_model = None
+_worker_ledger_dir = None
+_worker_yield_curves = None
+
+
+def build_sweep_grid(
+    methods,
+    rebalance_frequencies,
+    staking=(True,),
+    fear_greed=(False,),
+    stablecoin_allocations=(0.5,),
+    swap_fees=(DEFAULT_SWAP_FEE,),
+    start_dates=(None,),
+):
+    """
+    Expand parameter lists into every sweep configuration.
+
+    Args:
+        methods (list): Weighting methods
+        rebalance_frequencies (list): Rebalancing frequencies
+        staking (list): Staking settings (True/False)
+        fear_greed (list): Fear and greed settings (True/False, or a SentimentRule
+                           to adjust by the numeric index value)
+        stablecoin_allocations (list): Stablecoin allocations (0.0-1.0)
+        swap_fees (list): Swap fee rates
+        start_dates (list): Start dates ("YYYY-MM-DD" or None)
+
+    Returns:
+        list: One configuration dictionary per combination
+    """
+    return [
+        {
+            "method": method,
+            "rebalance_frequency": frequency,
+            "apply_staking": apply_staking,
+            "use_fear_greed": use_fear_greed,
+            "stablecoin_allocation": allocation,
+            "swap_fee": swap_fee,
+            "start_date": start_date,
+        }
+        for (
+            start_date,
+            method,
+            frequency,
+            apply_staking,
+            use_fear_greed,
+            swap_fee,
+            allocation,
+        ) in itertools.product(
+            start_dates,
+            methods,
+            rebalance_frequencies,
+            staking,
+            fear_greed,
+            swap_fees,
+            stablecoin_allocations,
+        )
+    ]
+
+
+def sweep_key(config):
+    """
+    Return the unique results-table key of a sweep configuration.
+
+    Args:
+        config (dict): Configuration from build_sweep_grid
+
+    Returns:
+        str: Key identifying the configuration
+    """
+    strategy_key = generate_strategy_key(
+        config["method"],
+        config["rebalance_frequency"],
+        config["apply_staking"],
+        config["use_fear_greed"],
+        config["start_date"],
+    )
+    return (
+        f"{strategy_key}_stablecoin_{config['stablecoin_allocation']!r}"
+        f"_fee_{config['swap_fee']!r}"
+    )
+
+
+def _group_configs(configs):
+    """Group configurations that can run as lanes of one batched simulation."""
+    groups = {}
+    for config in configs:
+        group_key = (
+            config["start_date"],
+            config["method"],
+            config["rebalance_frequency"],
+            config["apply_staking"],
+            config["use_fear_greed"],
+            config["swap_fee"],
+        )
+        groups.setdefault(group_key, []).append(config)
+    return list(groups.values())
+
+
+def _initialize_worker(context, cost_model=None, ledger_dir=None, yield_curves=None):
+    """Store the market data shared by every task of a worker process."""
+    global _worker_context, _worker_cost_model, _worker_ledger_dir
+    global _worker_yield_curves
+    _worker_context = context
+    _worker_cost_model = cost_model
+    _worker_ledger_dir = ledger_dir
+    _worker_yield_curves = yield_curves
+
+
+def _run_config_group(configs):
+    """Simulate a group of configurations and return one result row per run."""
+    first = configs[0]
+    context = _worker_context.since(first["start_date"])
+
+    use_fear_greed = first["use_fear_greed"]
+    fear_greed_data = context.fear_greed_data if use_fear_greed else None
+    sentiment_rule = (
+        use_fear_greed if isinstance(use_fear_greed, SentimentRule) else None
+    )
+    keys = [sweep_key(config) for config in configs]
+    trade_ledger = None if _worker_ledger_dir is None else TradeLedger()
+    _, _, metrics = calculate_historical_index_prices_batch(
+        context,
+        first["method"],
+        [config["stablecoin_allocation"] for config in configs],
+        rebalance_frequency=first["rebalance_frequency"],
+        apply_staking=first["apply_staking"],
+        fear_greed_data=fear_greed_data,
+        swap_fee=first["swap_fee"],
+        cost_model=_worker_cost_model,
+        trade_ledger=trade_ledger,
+        sentiment_rule=sentiment_rule,
+        yield_curves=_worker_yield_curves,
+    )
+
+    # One ledger file per group, with runs labeled by sweep key
+    if trade_ledger is not None:
+        trade_ledger.run_labels = keys
+        group_name = hashlib.blake2b(keys[0].encode(), digest_size=8).hexdigest()
+        save_trade_ledger(
+            trade_ledger, os.path.join(_worker_ledger_dir, f"{group_name}.npz")
+        )
+
+    rows = []
+    for lane, config in enumerate(configs):
+        row = {"key": keys[lane], **config}
+        row.update({column: metrics[column][lane].item() for column in METRIC_COLUMNS})
+        rows.append(row)
+    return rows
+
+
+def _discard_partial_row(results_path):
+    """Cut a results table back to the end of its last complete line."""
+    with open(results_path, "rb+") as results_file:
+        content = results_file.read()
+        end = content.rfind(b"\n") + 1
+        if end < len(content):
+            results_file.truncate(end)
+
+
+def load_sweep_results(results_path):
+    """
+    Read a sweep results table.
+
+    Args:
+        results_path (str): CSV file written by run_parameter_sweep
+
+    Returns:
+        list: One dictionary per completed run (values as strings)
+    """
+    if not os.path.exists(results_path):
+        return []
+    with open(results_path, newline="", encoding="utf-8") as results_file:
+        return list(csv.DictReader(results_file))
+
+
+def load_sweep_ledger(ledger_dir):
+    """
+    Combine the trade ledgers written by a sweep.
+
+    Args:
+        ledger_dir (str): Directory passed as ``ledger_dir`` to run_parameter_sweep
+
+    Returns:
+        TradeLedger: Every recorded run, labeled by its sweep key
+    """
+    paths = sorted(
+        os.path.join(ledger_dir, name)
+        for name in os.listdir(ledger_dir)
+        if name.endswith(".npz")
+    )
+    return merge_trade_ledgers(load_trade_ledger(path) for path in paths)
+
+
+def run_parameter_sweep(
+    historical_data,
+    grid,
+    results_path,
+    fear_greed_data=None,
+    processes=None,
+    progress=None,
+    dtype=np.float64,
+    cost_model=None,
+    volume_data=None,
+    ledger_dir=None,
+    yield_curves=None,
+):
+    """
+    Run every configuration of a sweep grid and stream metrics to a CSV table.
+
+    Configurations already present in the results table are skipped, so a
+    sweep that was interrupted can simply be started again. Configurations
+    whose start date leaves no market data are reported and left out.
+
+    Args:
+        historical_data (dict, MarketPanel or MarketContext): Dictionary containing
+                              historical price and market cap data
+                              Format: {"token": [[timestamp, price, market_cap], ...]},
+                              or an already built panel or context
+        grid (list): Configurations from build_sweep_grid
+        results_path (str): CSV file receiving one row per completed run
+        fear_greed_data (list): Fear and greed entries used by runs with use_fear_greed
+                                (ignored when ``historical_data`` is a context)
+        processes (int): Worker processes (default: CPU count; 1 runs in-process)
+        progress (callable): Called as progress(completed_runs, total_runs) after
+                             each batch of runs (default: print a progress line)
+        dtype (numpy.dtype): Floating-point type of panels and batched state
+                             (float32 halves the memory per worker; see core.precision)
+        cost_model (CostModel, optional): Cost model replacing every run's flat
+                                          swap fee (results are keyed without it,
+                                          so use one results table per cost model)
+        volume_data (dict, optional): Traded volumes driving the cost model's impact
+                                      Format: {"token": [[timestamp, volume], ...]}
+        ledger_dir (str, optional): Directory receiving the trade ledger of every
+                                    batch of runs (see load_sweep_ledger)
+        yield_curves (YieldCurves, optional): Time-varying staking APRs used
+                                              instead of STAKING_CONFIG (results
+                                              are keyed without them)
+
+    Returns:
+        int: Number of runs computed by this call
+    """
+    context = build_market_context(
+        historical_data,
+        fear_greed_data=fear_greed_data,
+        volume_data=volume_data,
+        dtype=dtype,
+    )
+
+    if progress is None:
+
+        def progress(completed, total):
+            print(f"Sweep progress: {completed}/{total} runs")
+
+    # A row cut short by an interruption is discarded and its run is redone
+    if os.path.exists(results_path):
+        _discard_partial_row(results_path)
+    done = {
+        row["key"]
+        for row in load_sweep_results(results_path)
+        if row.get(METRIC_COLUMNS[-1])
+    }
+    pending = [config for config in grid if sweep_key(config) not in done]
+
+    # Start dates after the last bar have nothing to simulate
+    empty_dates = {
+        config["start_date"]
+        for config in pending
+        if not len(context.since(config["start_date"]))
+    }
+    if empty_dates:
+        skipped = [config for config in pending if config["start_date"] in empty_dates]
+        pending = [
+            config for config in pending if config["start_date"] not in empty_dates
+        ]
+        print(
+            f"Skipping {len(skipped)} runs without market data after start dates "
+            f"{sorted(empty_dates, key=str)}"
+        )
+        grid = [config for config in grid if config["start_date"] not in empty_dates]
+
+    if ledger_dir is not None:
+        os.makedirs(ledger_dir, exist_ok=True)
+    total = len(grid)
+    completed = total - len(pending)
+    groups = _group_configs(pending)
+
+    write_header = (
+        not os.path.exists(results_path) or os.path.getsize(results_path) == 0
+    )
+    with open(results_path, "a", newline="", encoding="utf-8") as results_file:
+        writer = csv.DictWriter(
+            results_file, fieldnames=PARAMETER_COLUMNS + METRIC_COLUMNS
+        )
+        if write_header:
+            writer.writeheader()
+            results_file.flush()
+
+        def record(rows, group_size):
+            nonlocal completed
+            writer.writerows(rows)
+            results_file.flush()
+            completed += group_size
+            progress(completed, total)
+
+        if processes is None:
+            processes = os.cpu_count() or 1
+
+        if processes <= 1:
+            _initialize_worker(context, cost_model, ledger_dir, yield_curves)
+            try:
+                for group in groups:
+                    record(_run_config_group(group), len(group))
+            finally:
+                _initialize_worker(None)
+        else:
+            with ProcessPoolExecutor(
+                max_workers=processes,
+                initializer=_initialize_worker,
+                initargs=(context, cost_model, ledger_dir, yield_curves),
+            ) as executor:
+                futures = {
+                    executor.submit(_run_config_group, group): len(group)
+                    for group in groups
+                }
+                for future in as_completed(futures):
+                    record(future.result(), futures[future])
+
+    return len(pending)
@@ -0,0 +1,108 @@
+"""
+Universe reconstitution functions for the indexfund package.
+
+At each rebalance the index is reconstituted to the top ``size`` eligible
+tokens by market cap. Only the best ``size + buffer`` candidates are ever
+ranked, using a partial selection over the market cap row, so the cost per
+rebalance is linear in the number of candidates. Buffer rules limit churn
+from tokens hovering around the cut-off: a current constituent only leaves
+once it ranks below ``size + buffer``, and an outsider is only guaranteed a
+place once it ranks within ``size - buffer``.
+"""
+
+import numpy as np
+
+
+class UniverseRule:
+    """
+    Top-N reconstitution rule.
+
+    Args:
+        size (int): Number of index constituents
+        buffer (int): Extra ranks within which current constituents are kept
+    """
+
+    __slots__ = ("size", "buffer")
+
+    def __init__(self, size, buffer=0):
+        if size < 1:
+            raise ValueError("Universe size must be at least 1")
+        if buffer < 0:
+            raise ValueError("Universe buffer cannot be negative")
+        self.size = size
+        self.buffer = buffer
+
+    def __repr__(self):
+        return f"UniverseRule(size={self.size!r}, buffer={self.buffer!r})"
+
+
+def rank_candidates(market_caps, eligible, count):
+    """
+    Return the ``count`` largest eligible tokens, largest first.
+
+    Args:
+        market_caps (numpy.ndarray): Market cap per token (NaN where unlisted)
+        eligible (numpy.ndarray): Boolean mask of tokens that may be selected
+        count (int): Number of candidates to return
+
+    Returns:
+        numpy.ndarray: Column indices of the top candidates, in rank order
+    """
+    candidates = np.flatnonzero(eligible)
+    caps = market_caps[candidates]
+    if count < len(candidates):
+        top = np.argpartition(-caps, count - 1)[:count]
+        candidates, caps = candidates[top], caps[top]
+    return candidates[np.argsort(-caps, kind="stable")]
+
+
+def select_constituents(market_caps, eligible, members, rule):
+    """
+    Select index constituents for one rebalance.
+
+    Non-members ranked within ``size - buffer`` enter and current members
+    ranked within ``size + buffer`` stay (the best ``size`` of these if there
+    are more); remaining slots go to the best-ranked other candidates.
+
+    Args:
+        market_caps (numpy.ndarray): Market cap per token (NaN where unlisted)
+        eligible (numpy.ndarray): Boolean mask of tokens that may be selected
+        members (numpy.ndarray, optional): Boolean mask of current constituents
+                                           (None for the initial selection)
+        rule (UniverseRule): Reconstitution rule
+
+    Returns:
+        numpy.ndarray: Boolean mask of the new constituents
+    """
+    ranked = rank_candidates(market_caps, eligible, rule.size + rule.buffer)
+    if members is None:
+        selected = ranked[: rule.size]
+    else:
+        keep = members[ranked] | (np.arange(len(ranked)) < rule.size - rule.buffer)
+        kept = ranked[keep][: rule.size]
+        selected = np.concatenate([kept, ranked[~keep][: rule.size - len(kept)]])
+
+    constituents = np.zeros(len(market_caps), dtype=bool)
+    constituents[selected] = True
+    return constituents
+
+
+def reconstitute_universe(market_caps, eligible, rows, rule, members=None):
+    """
+    Select constituents at a sequence of rebalance rows.
+
+    Args:
+        market_caps (numpy.ndarray): (time x tokens) market caps
+        eligible (numpy.ndarray): (time x tokens) eligibility mask
+        rows (numpy.ndarray): Rebalance rows, in time order
+        rule (UniverseRule): Reconstitution rule
+        members (numpy.ndarray, optional): Constituents before the first row
+
+    Returns:
+        numpy.ndarray: (rows x tokens) boolean constituent masks
+    """
+    constituents = np.zeros((len(rows), market_caps.shape[-1]), dtype=bool)
+    for position, row in enumerate(rows):
+        members = select_constituents(market_caps[row], eligible[row], members, rule)
+        constituents[position] = members
+    return constituents
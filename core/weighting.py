@@ -4,6 +4,22 @@ Contains implementations of different weighting strategies for creating crypto i
 """
 
 import math
+from collections import OrderedDict
+
+import numpy as np
+
+from config import DEFAULT_MAX_TOKEN_WEIGHT, DEFAULT_MIN_TOKEN_WEIGHT
+
+# Prefix of capped weighting methods, e.g. "capped_market_cap:0.3:0.01"
+CAPPED_METHOD_PREFIX = "capped_"
+
+# Convergence settings of the weight capping iteration
+_CAP_TOLERANCE = 1e-15
+_MAX_CAP_PASSES = 200
+
+# Whole-timeline weight matrices, keyed by (dataset fingerprint, method)
+_WEIGHT_MATRIX_CACHE = OrderedDict()
+_WEIGHT_MATRIX_CACHE_SIZE = 64
 
 
 def calculate_weight_market_cap(market_cap):
@@ -22,27 +38,187 @@ def normalize_weights(weights):
     return {asset: w / total for asset, w in weights.items()}
 
 
+def parse_weighting_method(method):
+    """
+    Split a weighting method name into its base method and weight limits.
+
+    Capped methods are written "capped_<method>[:<max weight>[:<min weight>]]",
+    e.g. "capped_market_cap" (default limits) or "capped_sqrt_market_cap:0.3:0.02".
+
+    Args:
+        method (str): Weighting method name
+
+    Returns:
+        tuple: (base_method, max_weight, min_weight), with None limits for
+               uncapped methods
+    """
+    if not method.startswith(CAPPED_METHOD_PREFIX):
+        return method, None, None
+
+    base_method, *limits = method.split("_", 1)[1].split(":")
+    if len(limits) > 2:
+        raise ValueError(f"Unknown weighting method: {method}")
+    try:
+        max_weight = float(limits[0]) if limits else DEFAULT_MAX_TOKEN_WEIGHT
+        min_weight = float(limits[1]) if len(limits) > 1 else DEFAULT_MIN_TOKEN_WEIGHT
+    except ValueError:
+        raise ValueError(f"Unknown weighting method: {method}") from None
+    if not 0 < max_weight <= 1 or not 0 <= min_weight <= max_weight:
+        raise ValueError(f"Invalid weight limits in weighting method: {method}")
+    return base_method, max_weight, min_weight
+
+
+def apply_weight_caps(weights, max_weight, min_weight=0.0):
+    """
+    Cap and floor normalized weights, redistributing the excess.
+
+    Iterative redistribution: each pass pins tokens outside the limits to
+    them and spreads the remaining weight over the free tokens in proportion
+    to their original weights, i.e. it finds the scale ``s`` for which
+    ``clip(s * weights, min_weight, max_weight)`` sums to 1. Passes are kept
+    within a bracket of that scale (halving it when a pass would overshoot),
+    so caps and floors binding in the same row cannot make the iteration
+    cycle. Every row is processed at once, so a whole (rebalance dates x
+    tokens) matrix costs a few vectorized passes. Tokens with a weight of 0
+    (unlisted) stay at 0, and limits that a row cannot satisfy (e.g. a 10% cap
+    on five tokens) fall back to equal weights.
+
+    Args:
+        weights (numpy.ndarray): Normalized weights with tokens on the last axis
+        max_weight (float): Maximum weight per token
+        min_weight (float): Minimum weight per held token
+
+    Returns:
+        numpy.ndarray: Capped weights, normalized like the input
+    """
+    weights = np.asarray(weights, dtype=float)
+    active = weights > 0
+    counts = active.sum(axis=-1, keepdims=True)
+    upper = np.maximum(max_weight, 1.0 / np.maximum(counts, 1))
+    lower = np.minimum(min_weight, 1.0 / np.maximum(counts, 1))
+
+    # Scales below ``low`` put every token at the floor, above ``high`` at the cap
+    largest = weights.max(axis=-1, keepdims=True, initial=0.0)
+    smallest = np.min(weights, axis=-1, keepdims=True, where=active, initial=np.inf)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        low = np.where(counts > 0, lower / largest, 1.0)
+        high = np.where(counts > 0, upper / smallest, 1.0)
+    scale = np.ones(counts.shape)
+
+    for _ in range(_MAX_CAP_PASSES):
+        scaled = scale * weights
+        capped = np.where(active, np.clip(scaled, lower, upper), 0.0)
+        total = capped.sum(axis=-1, keepdims=True)
+        pending = (counts > 0) & (np.abs(total - 1.0) > _CAP_TOLERANCE)
+        if not pending.any():
+            break
+
+        # Redistribute the residual over the free tokens
+        low = np.where(total < 1.0, scale, low)
+        high = np.where(total < 1.0, high, scale)
+        free = active & (scaled > lower) & (scaled < upper)
+        free_total = np.sum(weights, axis=-1, keepdims=True, where=free)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            redistributed = scale + (1.0 - total) / free_total
+        bracketed = (free_total > 0) & (redistributed > low) & (redistributed < high)
+        scale = np.where(
+            pending, np.where(bracketed, redistributed, (low + high) / 2), scale
+        )
+
+    return capped
+
+
 def calculate_index_weights(market_cap, method):
     """
     Calculate the weighted index allocation using different weighting methods.
 
     Args:
         market_cap (dict): Dictionary of asset market caps (in USD)
-        method (str): Weighting method ("market_cap", "sqrt_market_cap")
+        method (str): Weighting method ("market_cap", "sqrt_market_cap", or a
+                      capped variant such as "capped_market_cap:0.3")
 
     Returns:
         dict: Normalized weight distribution as percentages
     """
+    base_method, max_weight, min_weight = parse_weighting_method(method)
+
     # Calculate weights based on method
-    if method == "market_cap":
+    if base_method == "market_cap":
         weights = calculate_weight_market_cap(market_cap)
-    elif method == "sqrt_market_cap":
+    elif base_method == "sqrt_market_cap":
         weights = calculate_weight_sqrt_market_cap(market_cap)
     else:
         raise ValueError(f"Unknown weighting method: {method}")
 
     # Normalize weights
-    return normalize_weights(weights)
+    weights = normalize_weights(weights)
+    if max_weight is None:
+        return weights
+
+    capped = apply_weight_caps(list(weights.values()), max_weight, min_weight)
+    return dict(zip(weights, capped.tolist()))
+
+
+def _compute_weight_matrix(market_caps, listed, method):
+    """Compute normalized weights for every row of a market cap matrix."""
+    base_method, max_weight, min_weight = parse_weighting_method(method)
+    market_caps = np.where(listed, market_caps, 0.0)
+    if base_method == "market_cap":
+        weights = market_caps
+    elif base_method == "sqrt_market_cap":
+        weights = np.sqrt(market_caps)
+    else:
+        raise ValueError(f"Unknown weighting method: {method}")
+
+    totals = weights.sum(axis=-1, keepdims=True)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        weights = np.where(totals != 0, weights / totals, 0.0)
+    if max_weight is None:
+        return weights
+    return apply_weight_caps(weights, max_weight, min_weight)
+
+
+def calculate_weight_matrix(
+    market_caps, method, rows=None, listed=None, fingerprint=None
+):
+    """
+    Calculate index weights for a whole (time x tokens) market cap matrix.
+
+    Vectorized counterpart of calculate_index_weights: each row is normalized
+    over the tokens listed at that time, and unlisted tokens get a weight of 0.
+
+    Args:
+        market_caps (numpy.ndarray): (time x tokens) market caps, NaN where unlisted
+        method (str): Weighting method ("market_cap", "sqrt_market_cap")
+        rows (numpy.ndarray, optional): Row indices to return (e.g. rebalance events)
+        listed (numpy.ndarray, optional): Boolean listing mask (default: non-NaN caps)
+        fingerprint (str, optional): Dataset fingerprint; when given, the full
+                                     matrix is cached per (fingerprint, method)
+
+    Returns:
+        numpy.ndarray: Weight matrix for all rows, or only the requested rows
+    """
+    market_caps = np.asarray(market_caps, dtype=float)
+    if listed is None:
+        listed = ~np.isnan(market_caps)
+
+    if fingerprint is None:
+        if rows is None:
+            return _compute_weight_matrix(market_caps, listed, method)
+        return _compute_weight_matrix(market_caps[rows], listed[rows], method)
+
+    key = (fingerprint, method)
+    weights = _WEIGHT_MATRIX_CACHE.get(key)
+    if weights is None:
+        weights = _compute_weight_matrix(market_caps, listed, method)
+        weights.setflags(write=False)
+        _WEIGHT_MATRIX_CACHE[key] = weights
+        if len(_WEIGHT_MATRIX_CACHE) > _WEIGHT_MATRIX_CACHE_SIZE:
+            _WEIGHT_MATRIX_CACHE.popitem(last=False)
+    else:
+        _WEIGHT_MATRIX_CACHE.move_to_end(key)
+
+    return weights if rows is None else weights[rows]
 
 
 def print_portfolio_weights(weights):
@@ -13,8 +13,11 @@ from config import (
     DEFAULT_TOKENS,
 )
 
+# Import from context module
+from core.context import build_market_context
+
 # Import from data_loading module
-from core.data_loading import load_and_prepare_data
+from core.data_loading import load_and_prepare_data, load_yield_curves
 
 # Import from reporting module
 from core.reporting import (
@@ -47,6 +50,7 @@ def run_performance_analysis(
     fear_greed_file=None,
     stablecoin_allocation=0.5,  # Default to 50% stablecoin allocation
     generate_plots=True,
+    yield_dir=None,
 ):
     """
     Run a complete performance analysis for the specified tokens and strategies.
@@ -61,6 +65,9 @@ def run_performance_analysis(
         fear_greed_file (str): Path to the fear and greed index JSON file
         stablecoin_allocation (float): Percentage of portfolio to allocate to stablecoin (0.0-1.0)
         generate_plots (bool): Whether to generate performance plots
+        yield_dir (str, optional): Directory of "<symbol>.csv" staking APR series
+                                   (date,apr) replacing the constant STAKING_CONFIG
+                                   rates for those symbols
 
     Returns:
         dict: Dictionary containing analysis results:
@@ -76,6 +83,16 @@ def run_performance_analysis(
     if not historical_data:
         return {"error": "No data available"}
 
+    # Market data shared by every strategy, prepared once for the whole run
+    context = build_market_context(historical_data, fear_greed_data=fear_greed_data)
+
+    # Time-varying staking yields are turned into accrual indexes once
+    yield_curves = None
+    if yield_dir:
+        yield_curves = load_yield_curves(
+            list(historical_data) + ["stablecoin"], yield_dir
+        )
+
     # Display initial portfolio weights
     display_portfolio_weights(historical_data, methods, "initial")
 
@@ -99,14 +116,12 @@ def run_performance_analysis(
         for freq in rebalance_frequencies:
             for apply_staking, use_fear_greed in [(False, False), (True, True)]:
                 # Only use fear/greed data if it's available and we want to use it
-                current_fear_greed = (
-                    fear_greed_data if use_fear_greed and fear_greed_data else None
-                )
+                current_fear_greed = context.fear_greed_data if use_fear_greed else None
 
                 # Calculate strategy performance
                 index_prices, performance_metrics, investment_value = (
                     calculate_strategy_performance(
-                        historical_data,
+                        context,
                         method,
                         freq,
                         initial_investment,
@@ -114,6 +129,7 @@ def run_performance_analysis(
                         stablecoin_allocation=stablecoin_allocation,
                         fear_greed_data=current_fear_greed,
                         apply_staking=apply_staking,
+                        yield_curves=yield_curves,
                     )
                 )
 
@@ -206,14 +222,14 @@ def main():
         type=str,
         nargs="+",
         default=DEFAULT_METHODS,
-        help="Weighting methods to use",
+        help="Weighting methods to use (e.g. market_cap, capped_market_cap:0.3)",
     )
     parser.add_argument(
         "--rebalance",
         type=str,
         nargs="+",
         default=DEFAULT_REBALANCE_FREQUENCIES,
-        help="Rebalancing frequencies to test",
+        help="Rebalancing frequencies to test (e.g. quarterly, quarter_end, weekday:fri)",
     )
     parser.add_argument(
         "--investment",
@@ -238,6 +254,11 @@ def main():
         default=0.5,
         help="Percentage of portfolio to allocate to stablecoin (0.0-1.0)",
     )
+    parser.add_argument(
+        "--yield-dir",
+        type=str,
+        help="Directory containing per-asset staking APR CSV files (date,apr)",
+    )
     parser.add_argument(
         "--no-plots",
         action="store_true",
@@ -257,6 +278,7 @@ def main():
         fear_greed_file=args.fear_greed_file,
         stablecoin_allocation=args.stablecoin_allocation,
         generate_plots=not args.no_plots,
+        yield_dir=args.yield_dir,
     )
 
 
@@ -5,5 +5,56 @@ Pytest configuration file for the indexfund package.
 import os
 import sys
 
+import numpy as np
+import pytest
+
 # Add the parent directory to sys.path so we can import the package
 sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+DAY = 24 * 60 * 60 * 1000
+START = 1609459200000  # 2021-01-01, a Friday
+
+
+def build_random_walk_data(
+    seed,
+    tokens,
+    days,
+    listed=None,
+    volatility=0.03,
+    drift=0.0,
+    market_volatility=0.0,
+):
+    """
+    Build daily random-walk market data.
+
+    Args:
+        seed (int): Seed of the random generator
+        tokens (list): (token, initial price, supply) entries; the market cap
+                       is the price times the supply
+        days (int): Number of daily bars from START
+        listed (dict, optional): Token -> first listed day (default 0)
+        volatility (float): Daily volatility of each token's own returns
+        drift (float): Mean daily return
+        market_volatility (float): Daily volatility of a return shared by all
+                                   tokens (drawn first)
+
+    Returns:
+        dict: {"token": [[timestamp, price, market_cap], ...]}
+    """
+    rng = np.random.default_rng(seed)
+    listed = listed or {}
+    market = rng.normal(0, market_volatility, days) if market_volatility else 0.0
+    data = {}
+    for token, price, supply in tokens:
+        walk = price * np.cumprod(1 + market + rng.normal(drift, volatility, days))
+        data[token] = [
+            [START + i * DAY, float(walk[i]), float(supply * walk[i])]
+            for i in range(listed.get(token, 0), days)
+        ]
+    return data
+
+
+@pytest.fixture
+def make_market_data():
+    """Factory of random-walk market data (see build_random_walk_data)."""
+    return build_random_walk_data
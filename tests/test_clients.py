@@ -0,0 +1,154 @@
+"""
+Unit tests for the clients module.
+"""
+
+import numpy as np
+import pytest
+
+from core.clients import (
+    MILLISECONDS_PER_YEAR,
+    money_weighted_returns,
+    simulate_client_accounts,
+    summarize_client_accounts,
+)
+from core.context import build_market_context
+from core.simulation import calculate_historical_index_prices_batch
+from tests.conftest import DAY, START
+
+
+@pytest.fixture
+def market_context(make_market_data):
+    """Context over two random-walk tokens with daily bars for a year."""
+    return build_market_context(
+        make_market_data(
+            5, [("btc", 1.0, 800e9), ("eth", 1.0, 300e9)], 365, drift=0.001
+        )
+    )
+
+
+def _reference_account(unit_values, flows):
+    """Replay one account's (bar, amount) flows with a plain loop."""
+    units = 0.0
+    nav = np.full(len(unit_values), np.nan)
+    settled = []
+    flows = sorted(flows)
+    for bar in range(flows[0][0], len(unit_values)):
+        for flow_bar, amount in flows:
+            if flow_bar == bar:
+                held = units
+                units = max(units + amount / unit_values[bar], 0.0)
+                settled.append((bar, (units - held) * unit_values[bar]))
+        nav[bar] = units * unit_values[bar]
+    return nav, settled
+
+
+def test_accounts_match_reference(market_context):
+    """Test entries, contributions and one-off flows against a plain replay."""
+    entries = START + np.array([0, 40, 95, 200]) * DAY + 3600 * 1000
+    results = simulate_client_accounts(
+        market_context,
+        "market_cap",
+        entries,
+        [1000.0, 500.0, 2000.0, 100.0],
+        rebalance_frequency="monthly",
+        contributions=[100.0, 50.0, -150.0, 0.0],
+        contribution_frequency="month_start",
+        cash_flows=[[1, START + 110 * DAY, -10000.0], [3, START + 250 * DAY, 400.0]],
+        keep_nav=True,
+    )
+
+    _, values, _ = calculate_historical_index_prices_batch(
+        market_context, "market_cap", [0.5], rebalance_frequency="monthly"
+    )
+    unit_values = values[0] / values[0, 0]
+    np.testing.assert_allclose(results["unit_values"], unit_values)
+    assert (
+        results["entry_timestamps"].tolist()
+        == (START + np.array([1, 41, 96, 201]) * DAY).tolist()
+    )
+
+    month_starts = [
+        bar
+        for bar, timestamp in enumerate(results["timestamps"].tolist())
+        if (np.datetime64(timestamp, "ms").astype("datetime64[D]").item().day == 1)
+    ]
+    account_flows = [
+        [(1, 1000.0)] + [(bar, 100.0) for bar in month_starts if bar > 1],
+        [(41, 500.0)] + [(bar, 50.0) for bar in month_starts if bar > 41]
+        # The withdrawal on day 110 empties the account
+        + [(110, -10000.0)],
+        [(96, 2000.0)] + [(bar, -150.0) for bar in month_starts if bar > 96],
+        [(201, 100.0), (250, 400.0)],
+    ]
+    for account, flows in enumerate(account_flows):
+        nav, settled = _reference_account(unit_values, flows)
+        np.testing.assert_allclose(results["nav"][account], nav, atol=1e-9)
+        paid_in = sum(amount for _, amount in settled if amount > 0)
+        paid_out = -sum(amount for _, amount in settled if amount < 0)
+        assert results["contributions"][account] == pytest.approx(paid_in)
+        assert results["withdrawals"][account] == pytest.approx(paid_out)
+        assert results["final_value"][account] == pytest.approx(nav[-1])
+
+        # The money-weighted return balances the account's flows
+        rate = results["money_weighted_return"][account]
+        years = [(364 - bar) * DAY / MILLISECONDS_PER_YEAR for bar, _ in settled]
+        future_value = sum(
+            amount * (1 + rate) ** year for (_, amount), year in zip(settled, years)
+        )
+        assert future_value == pytest.approx(nav[-1], abs=1e-6)
+
+    assert results["nav"][1][110] == pytest.approx(0.0, abs=1e-9)
+    assert results["time_weighted_return"][0] == pytest.approx(
+        unit_values[-1] / unit_values[1] - 1
+    )
+    assert results["profit"][2] == pytest.approx(
+        results["final_value"][2]
+        + results["withdrawals"][2]
+        - results["contributions"][2]
+    )
+
+
+def test_money_weighted_returns():
+    """Test the vectorized internal rate of return on known cash flows."""
+    rates = money_weighted_returns(
+        np.array([0, 1, 1, 2]),
+        np.array([2.0, 1.0, 0.5, 0.0]),
+        np.array([100.0, 100.0, 100.0, 100.0]),
+        np.array([121.0, 100.0 * 1.1 + 100.0 * np.sqrt(1.1), 100.0]),
+    )
+    np.testing.assert_allclose(rates[:2], [0.1, 0.1])
+    assert np.isnan(rates[2])  # entered on the valuation date
+
+
+def test_client_book_validation_and_summary(market_context):
+    """Test rejected inputs and the summary of a large book."""
+    rng = np.random.default_rng(0)
+    entries = START + rng.integers(0, 300, size=2000) * DAY
+    results = simulate_client_accounts(
+        market_context,
+        "sqrt_market_cap",
+        entries,
+        rng.uniform(100, 10000, size=2000),
+        contributions=rng.uniform(-50, 200, size=2000),
+    )
+    summary = summarize_client_accounts(results)
+    assert summary["accounts"] == 2000
+    assert summary["assets"] == pytest.approx(np.sum(results["final_value"]))
+    assert "nav" not in results
+    assert not np.isnan(results["money_weighted_return"]).any()
+    assert set(summary["money_weighted_return"]) >= {"mean", "p50"}
+
+    with pytest.raises(ValueError, match="after the last bar"):
+        simulate_client_accounts(market_context, "market_cap", [START + 400 * DAY], 1)
+    with pytest.raises(ValueError, match="outside"):
+        simulate_client_accounts(
+            market_context,
+            "market_cap",
+            [START + 10 * DAY],
+            1,
+            cash_flows=[[0, START, 5.0]],
+        )
+    with pytest.raises(ValueError, match="unknown accounts"):
+        simulate_client_accounts(
+            market_context, "market_cap", [START], 1, cash_flows=[[3, START, 5.0]]
+        )
@@ -0,0 +1,127 @@
+"""
+Unit tests for the context module.
+"""
+
+import numpy as np
+import pytest
+
+from core.context import MarketContext, build_market_context
+from core.events import SILENT, EventLog
+from core.panel import build_market_panel
+from core.portfolio import (
+    advance_simulation,
+    calculate_historical_index_prices,
+    create_simulation_state,
+)
+from core.simulation import calculate_historical_index_prices_batch
+from tests.conftest import DAY, START
+
+
+@pytest.fixture
+def market_data(make_market_data):
+    """Three random-walk tokens with daily bars, one listed later."""
+    return make_market_data(
+        11,
+        [("btc", 1.0, 800e9), ("eth", 1.0, 300e9), ("sol", 1.0, 50e9)],
+        240,
+        listed={"sol": 60},
+    )
+
+
+@pytest.fixture
+def fear_greed_data():
+    """Sentiment entries cycling through the extremes every few days."""
+    labels = ["Extreme Fear", "Fear", "Neutral", "Greed", "Extreme Greed"]
+    return [
+        [START + i * DAY, 10 + 20 * (i % 5), labels[i % 5]] for i in range(0, 240, 3)
+    ]
+
+
+def test_context_matches_historical_data(market_data, fear_greed_data):
+    """Test that scalar and batched runs give the same results from a context."""
+    context = build_market_context(market_data, fear_greed_data=fear_greed_data)
+
+    for start_date in [None, "2021-03-15"]:
+        expected = calculate_historical_index_prices(
+            market_data,
+            "sqrt_market_cap",
+            "monthly",
+            start_date=start_date,
+            fear_greed_data=fear_greed_data,
+            event_log=EventLog(SILENT),
+        )
+        result = calculate_historical_index_prices(
+            context,
+            "sqrt_market_cap",
+            "monthly",
+            start_date=start_date,
+            fear_greed_data=context.fear_greed_data,
+            event_log=EventLog(SILENT),
+        )
+        assert result[0] == expected[0]
+        assert result[1]["rebalance_count"] == expected[1]["rebalance_count"]
+
+        timestamps, values, _ = calculate_historical_index_prices_batch(
+            context,
+            "sqrt_market_cap",
+            [0.2, 0.5],
+            rebalance_frequency="monthly",
+            fear_greed_data=context.fear_greed_data,
+            start_date=start_date,
+        )
+        _, expected_values, _ = calculate_historical_index_prices_batch(
+            market_data,
+            "sqrt_market_cap",
+            [0.2, 0.5],
+            rebalance_frequency="monthly",
+            fear_greed_data=fear_greed_data,
+            start_date=start_date,
+        )
+        assert timestamps.tolist() == [timestamp for timestamp, _ in expected[0]]
+        np.testing.assert_allclose(values, expected_values, rtol=1e-12)
+
+
+def test_since_slices_and_caches(market_data, fear_greed_data):
+    """Test that start-date slices share data and cached preparation."""
+    context = build_market_context(market_data, fear_greed_data=fear_greed_data)
+    later = context.since("2021-03-15")
+
+    assert context.since(None) is context
+    assert context.since("2020-06-01") is context
+    assert later is context.since("2021-03-15")
+    assert later.timestamps[0] == START + 73 * DAY
+    assert np.shares_memory(later.panel.prices, context.panel.prices)
+
+    # Weights are rows of the full matrix and schedules restart at the slice
+    weights = context.weight_matrix("market_cap")
+    assert weights is context.weight_matrix("market_cap")
+    assert not weights.flags.writeable
+    np.testing.assert_array_equal(later.weight_matrix("market_cap"), weights[73:])
+    assert later.rebalance_events("monthly") is later.rebalance_events("monthly")
+    assert later.rebalance_events("monthly")[0][0] == 0
+    np.testing.assert_array_equal(
+        later.fear_greed_values, context.fear_greed_values[73:]
+    )
+    assert later.fear_greed_map is context.fear_greed_map
+
+    # Other sentiment data is aligned on demand instead
+    values, _ = later.fear_greed(fear_greed_data[:10])
+    assert np.isnan(values).all()
+    assert repr(context).startswith("MarketContext(tokens=['btc', 'eth', 'sol']")
+
+
+def test_streaming_from_context(market_data, fear_greed_data):
+    """Test that a state advanced over a context matches the one-shot run."""
+    expected, _ = calculate_historical_index_prices(
+        market_data,
+        "market_cap",
+        "quarterly",
+        fear_greed_data=fear_greed_data,
+        event_log=EventLog(SILENT),
+    )
+
+    context = MarketContext(build_market_panel(market_data), fear_greed_data)
+    log = EventLog(SILENT)
+    state = create_simulation_state(context, "market_cap", "quarterly", event_log=log)
+    advance_simulation(state, context, context.fear_greed_map, event_log=log)
+    assert state.history == expected
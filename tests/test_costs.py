@@ -0,0 +1,181 @@
+"""
+Unit tests for the costs module.
+"""
+
+import numpy as np
+import pytest
+
+from core.costs import CostModel, bind_swap_costs, swap_cost_rates, token_fee_rates
+from core.data_loading import load_volume_data
+from core.events import SILENT, EventLog
+from core.panel import build_market_panel, iterate_panel_chunks
+from core.portfolio import (
+    advance_simulation,
+    calculate_historical_index_prices,
+    create_simulation_state,
+    rebalance_stablecoin_quantities,
+    rebalance_token_quantities,
+)
+from core.simulation import calculate_historical_index_prices_batch
+from core.state import load_simulation_state, save_simulation_state
+from tests.conftest import DAY, START
+
+
+@pytest.fixture
+def historical_data(make_market_data):
+    """Three hundred days for three tokens with a stablecoin series."""
+    data = make_market_data(
+        42, [("btc", 1.0, 800e9), ("eth", 1.0, 300e9), ("sol", 1.0, 50e9)], 300
+    )
+    data["stablecoin"] = [[START + i * DAY, 1.0, 1e11] for i in range(300)]
+    return data
+
+
+@pytest.fixture
+def volume_data():
+    """Daily volumes small enough for noticeable market impact."""
+    return {
+        token: [[START + i * DAY, volume] for i in range(300)]
+        for token, volume in [("btc", 5000.0), ("eth", 2000.0), ("sol", 100.0)]
+    }
+
+
+def test_cost_model_validation():
+    """Test that invalid cost parameters are rejected."""
+    with pytest.raises(ValueError):
+        CostModel(default_fee=1.0)
+    with pytest.raises(ValueError):
+        CostModel(fee_tiers={"btc": -0.01})
+    with pytest.raises(ValueError):
+        CostModel(impact_coefficient=-1)
+    with pytest.raises(ValueError):
+        CostModel(impact_exponent=0)
+
+
+def test_swap_cost_rates():
+    """Test fee tiers plus square-root impact, vectorized across lanes."""
+    model = CostModel(0.01, {"btc": 0.001}, impact_coefficient=0.1)
+    fee_rates = token_fee_rates(model, ["btc", "eth", "sol"])
+    np.testing.assert_allclose(fee_rates, [0.001, 0.01, 0.01])
+
+    volumes = np.array([1e6, np.nan, 0.0])
+    trades = np.array([[250_000.0, 10.0, 10.0], [0.0, 5.0, 1e9]])
+    rates = swap_cost_rates(model, fee_rates, volumes, trades)
+
+    # Unknown or zero volume only pays the fee tier
+    expected = np.array([[0.001 + 0.1 * 0.5, 0.01, 0.01], [0.001, 0.01, 0.01]])
+    np.testing.assert_allclose(rates, expected)
+
+    # Impact is capped so a swap never costs more than its size
+    capped = swap_cost_rates(model, fee_rates, np.array([1.0, 1.0, 1.0]), trades)
+    assert capped.max() == 1.0
+
+
+def test_flat_cost_function_matches_flat_fee():
+    """Test that a cost model without impact reproduces the flat fee kernels."""
+    rng = np.random.default_rng(3)
+    quantities = rng.random((4, 5)) * 10
+    prices = rng.random(5) * 100
+    weights = rng.dirichlet(np.ones(5))
+    costs = bind_swap_costs(
+        CostModel(0.01, impact_coefficient=0.0), np.full(5, 0.01), None
+    )
+
+    flat = quantities.copy()
+    _, flat_fees = rebalance_token_quantities(flat, prices, weights, 0.01)
+    modeled = quantities.copy()
+    _, modeled_fees = rebalance_token_quantities(modeled, prices, weights, costs)
+    np.testing.assert_array_equal(modeled, flat)
+    np.testing.assert_array_equal(modeled_fees, flat_fees)
+
+    stablecoin = np.full(4, 500.0)
+    flat_result = rebalance_stablecoin_quantities(
+        quantities.copy(), stablecoin, prices, 0.3, 0.01
+    )
+    modeled_result = rebalance_stablecoin_quantities(
+        quantities.copy(), stablecoin, prices, 0.3, costs
+    )
+    for flat_value, modeled_value in zip(flat_result, modeled_result):
+        np.testing.assert_allclose(modeled_value, flat_value, rtol=1e-12)
+
+
+def test_market_impact_raises_fees(historical_data, volume_data):
+    """Test that thin volume makes rebalancing more expensive."""
+    options = dict(rebalance_frequency="monthly", event_log=EventLog(SILENT))
+    _, flat = calculate_historical_index_prices(
+        historical_data, "market_cap", swap_fee=0.001, **options
+    )
+    _, modeled = calculate_historical_index_prices(
+        historical_data,
+        "market_cap",
+        cost_model=CostModel(0.001, impact_coefficient=0.1),
+        volume_data=volume_data,
+        **options,
+    )
+    assert modeled["total_fees_paid"] > flat["total_fees_paid"]
+    assert modeled["total_return"] < flat["total_return"]
+
+
+def test_batch_engine_matches_scalar_with_cost_model(historical_data, volume_data):
+    """Test that batched lanes price swaps like the scalar engine."""
+    model = CostModel(0.002, {"btc": 0.0005}, impact_coefficient=0.1)
+    allocations = [0.2, 0.5]
+    _, values, metrics = calculate_historical_index_prices_batch(
+        historical_data,
+        "market_cap",
+        allocations,
+        rebalance_frequency="monthly",
+        cost_model=model,
+        volume_data=volume_data,
+    )
+    for lane, allocation in enumerate(allocations):
+        history, scalar = calculate_historical_index_prices(
+            historical_data,
+            "market_cap",
+            rebalance_frequency="monthly",
+            stablecoin_allocation=allocation,
+            event_log=EventLog(SILENT),
+            cost_model=model,
+            volume_data=volume_data,
+        )
+        np.testing.assert_allclose(
+            values[lane], [value for _, value in history], rtol=1e-10
+        )
+        assert metrics["total_fees_paid"][lane] == pytest.approx(
+            scalar["total_fees_paid"], rel=1e-10
+        )
+
+
+def test_cost_model_survives_checkpoint(historical_data, volume_data, tmp_path):
+    """Test that a restored state keeps its cost model and volume-driven costs."""
+    model = CostModel(0.002, {"eth": 0.003}, impact_coefficient=0.2)
+    panel = build_market_panel(historical_data, volume_data=volume_data)
+    log = EventLog(SILENT)
+
+    reference = create_simulation_state(
+        panel, "market_cap", "monthly", cost_model=model, event_log=log
+    )
+    advance_simulation(reference, panel, event_log=log)
+
+    state = create_simulation_state(
+        panel, "market_cap", "monthly", cost_model=model, event_log=log
+    )
+    chunks = list(iterate_panel_chunks(panel, 120))
+    advance_simulation(state, chunks[0], event_log=log)
+    save_simulation_state(state, tmp_path / "state.npz")
+    restored = load_simulation_state(tmp_path / "state.npz")
+    for chunk in chunks[1:]:
+        advance_simulation(restored, chunk, event_log=log)
+
+    assert repr(restored.cost_model) == repr(model)
+    assert restored.total_fees_paid == reference.total_fees_paid
+    assert restored.history == reference.history
+
+
+def test_load_volume_data():
+    """Test that volumes load from the dataset CSVs, aligned with prices."""
+    volume_data = load_volume_data(["btc", "missing"], "dataset")
+    assert list(volume_data) == ["btc"]
+    timestamps = [timestamp for timestamp, _ in volume_data["btc"]]
+    assert timestamps == sorted(timestamps)
+    assert all(volume > 0 for _, volume in volume_data["btc"])
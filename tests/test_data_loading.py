@@ -15,6 +15,7 @@ from core.data_loading import (
     load_fear_greed_index,
     load_historical_data,
     load_token_data,
+    load_yield_curves,
     process_fear_greed_data,
 )
 
@@ -233,3 +234,20 @@ def test_process_fear_greed_data():
     # All timestamps in processed should be in historical_data
     historical_timestamps = {entry[0] for entry in historical_data["btc"]}
     assert all(ts in historical_timestamps for ts, _, _ in processed)
+
+
+def test_load_yield_curves(tmp_path):
+    """Test loading per-asset APR series into yield curves."""
+    (tmp_path / "eth.csv").write_text(
+        "date,apr\n2021-02-01,0.03\n2021-01-01,0.05\n", encoding="utf-8"
+    )
+    (tmp_path / "sol.csv").write_text("day,rate\n2021-01-01,0.1\n", encoding="utf-8")
+
+    curves = load_yield_curves(["eth", "sol", "btc"], str(tmp_path), {"btc": 0.01})
+
+    assert curves.symbols == ["eth"]
+    january, february = 1609459200000, 1612137600000
+    rates = curves.rates([january, february], ["eth", "btc", "sol"])
+    assert rates[:, 0].tolist() == [0.05, 0.03]
+    assert rates[:, 1].tolist() == [0.01, 0.01]
+    assert rates[:, 2].tolist() == [0.0, 0.0]
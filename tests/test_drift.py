@@ -0,0 +1,140 @@
+"""
+Unit tests for the drift module.
+"""
+
+import numpy as np
+import pytest
+
+from core.drift import DriftBand, drift_breaches, find_drift_trigger
+from core.events import EVENT_FLAG_DRIFT, SILENT, EventLog
+from core.panel import build_market_panel, iterate_panel_chunks
+from core.portfolio import calculate_historical_index_prices, create_simulation_state
+from core.state import load_simulation_state, save_simulation_state, stream_simulation
+
+
+@pytest.fixture
+def historical_data(make_market_data):
+    """Two hundred days of volatile data for three tokens."""
+    return make_market_data(
+        11,
+        [("btc", 30000, 1e7), ("eth", 800, 1e7), ("sol", 2, 1e7)],
+        200,
+        volatility=0.05,
+    )
+
+
+def test_find_drift_trigger_matches_bar_by_bar_check():
+    """Test that the block scan finds the same bar as a per-bar loop."""
+    rng = np.random.default_rng(5)
+    bars = 300
+    prices = np.cumprod(1 + rng.normal(0, 0.02, (bars, 3)), axis=0)
+    token_growth = np.full((bars, 3), 1.0001)
+    stablecoin_growth = np.full(bars, 1.0002)
+    quantities = np.array([1.0, 1.0, 1.0])
+    target_weights = np.array([1 / 3, 1 / 3, 1 / 3])
+    band = DriftBand(token_band=0.25, relative=True, allocation_band=0.1)
+
+    expected = None
+    quantity, stablecoin = quantities.copy(), 1.5
+    for bar in range(bars):
+        quantity = quantity * token_growth[bar]
+        stablecoin = stablecoin * stablecoin_growth[bar]
+        token_breach, allocation_breach = drift_breaches(
+            (quantity * prices[bar])[np.newaxis],
+            np.array([stablecoin]),
+            target_weights,
+            0.5,
+            band,
+        )
+        if token_breach[0] or allocation_breach[0]:
+            expected = (bar, bool(token_breach[0]), bool(allocation_breach[0]))
+            break
+
+    trigger = find_drift_trigger(
+        quantities,
+        1.5,
+        prices,
+        token_growth,
+        stablecoin_growth,
+        target_weights,
+        0.5,
+        band,
+    )
+
+    assert expected is not None
+    assert trigger == expected
+
+
+def test_find_drift_trigger_without_breach():
+    """Test that a portfolio that never drifts has no trigger."""
+    prices = np.ones((100, 2))
+    trigger = find_drift_trigger(
+        np.array([1.0, 1.0]),
+        2.0,
+        prices,
+        None,
+        None,
+        np.array([0.5, 0.5]),
+        0.5,
+        DriftBand(token_band=0.01, allocation_band=0.01),
+    )
+    assert trigger is None
+
+
+def test_drift_band_rebalancing(historical_data):
+    """Test that drift bands rebalance and keep holdings near their targets."""
+    _, calendar_metrics = calculate_historical_index_prices(
+        historical_data, "market_cap", "none", event_log=EventLog(SILENT)
+    )
+    _, drift_metrics = calculate_historical_index_prices(
+        historical_data,
+        "market_cap",
+        "none",
+        event_log=EventLog(SILENT),
+        drift_band=DriftBand(allocation_band=0.05),
+    )
+
+    assert "drift_rebalance_count" not in calendar_metrics
+    assert drift_metrics["drift_rebalance_count"] > 0
+    assert drift_metrics["total_fees_paid"] > calendar_metrics["total_fees_paid"]
+    assert abs(drift_metrics["final_stablecoin_pct"] - 50) <= 5
+
+
+@pytest.mark.parametrize("chunk_size", [1, 17, 64])
+def test_drift_band_streaming_matches_full_run(historical_data, tmp_path, chunk_size):
+    """Test that drift triggers do not depend on how the bars are delivered."""
+    band = DriftBand(token_band=0.3, relative=True, allocation_band=0.05)
+    price_history, metrics = calculate_historical_index_prices(
+        historical_data,
+        "sqrt_market_cap",
+        "monthly",
+        event_log=EventLog(SILENT),
+        drift_band=band,
+    )
+
+    panel = build_market_panel(historical_data)
+    state = create_simulation_state(
+        panel,
+        "sqrt_market_cap",
+        "monthly",
+        event_log=EventLog(SILENT),
+        drift_band=band,
+    )
+    chunks = iterate_panel_chunks(panel, chunk_size)
+    streamed = []
+    flags = 0
+    for timestamp, total_value, event_flags in stream_simulation(
+        state, chunks, event_log=EventLog(SILENT)
+    ):
+        streamed.append([timestamp, total_value])
+        flags |= event_flags
+        if len(streamed) == 100:
+            path = tmp_path / "state.npz"
+            save_simulation_state(state, path)
+            restored = load_simulation_state(path)
+            assert repr(restored.drift_band) == repr(band)
+            assert restored.drift_rebalance_count == state.drift_rebalance_count
+
+    assert streamed == price_history
+    assert flags & EVENT_FLAG_DRIFT
+    assert state.drift_rebalance_count == metrics["drift_rebalance_count"]
@@ -0,0 +1,118 @@
+"""
+Unit tests for the events module.
+"""
+
+import io
+import json
+from unittest.mock import patch
+
+import numpy as np
+
+from core.events import (
+    DETAIL,
+    PORTFOLIO_INITIALIZED,
+    SILENT,
+    SIMULATION_COMPLETE,
+    SUMMARY,
+    TOKEN_REBALANCE,
+    EventLog,
+    render_event,
+)
+from core.portfolio import calculate_historical_index_prices
+
+
+def _historical_data():
+    """Three months of daily data for two tokens."""
+    day = 24 * 60 * 60 * 1000
+    start = 1609459200000  # 2021-01-01
+    return {
+        "btc": [[start + i * day, 30000 + 100 * i, 6e11 + 1e9 * i] for i in range(90)],
+        "eth": [[start + i * day, 800 + 5 * i, 1e11 + 1e8 * i] for i in range(90)],
+    }
+
+
+def test_event_log_records_columns_and_grows():
+    """Test that events are stored column-wise beyond the initial capacity."""
+    log = EventLog(verbosity=DETAIL, capacity=2)
+
+    for i in range(5):
+        log.record(TOKEN_REBALANCE, 1000 * i, 100.0 + i, 0.5, 0.01)
+
+    assert log.size == 5
+    assert log.count(TOKEN_REBALANCE) == 5
+    events = log.events(TOKEN_REBALANCE)
+    np.testing.assert_array_equal(events["timestamp"], [0, 1000, 2000, 3000, 4000])
+    np.testing.assert_array_equal(events["volatile_value"], [100, 101, 102, 103, 104])
+    np.testing.assert_array_equal(events["fees_paid"], [0.5] * 5)
+
+
+def test_event_log_verbosity_filters_without_rendering():
+    """Test that filtered events are dropped before any formatting."""
+    log = EventLog(verbosity=SUMMARY, echo=True)
+
+    with patch("core.events.render_event") as mock_render:
+        log.record(TOKEN_REBALANCE, 0, 100.0, 0.0, 0.01)
+        assert mock_render.call_count == 0
+
+    silent = EventLog(verbosity=SILENT, echo=True)
+    with patch("sys.stdout", new=io.StringIO()) as fake_stdout:
+        silent.record(PORTFOLIO_INITIALIZED, 0, 100.0, 50.0, 50.0, 0.5)
+    assert silent.size == 0
+    assert fake_stdout.getvalue() == ""
+
+
+def test_event_log_jsonl_sink():
+    """Test that recorded events are written as JSON lines."""
+    sink = io.StringIO()
+    log = EventLog(verbosity=DETAIL, sink=sink, retain=False)
+
+    log.record(TOKEN_REBALANCE, 1609459200000, 100.0, 1.5, 0.01)
+
+    event = json.loads(sink.getvalue().splitlines()[0])
+    assert event == {
+        "event": "token_rebalance",
+        "timestamp": 1609459200000,
+        "volatile_value": 100.0,
+        "fees_paid": 1.5,
+        "swap_fee_rate": 0.01,
+    }
+    assert log.size == 0
+
+
+def test_render_event_matches_legacy_output():
+    """Test that rendering reproduces the messages the simulation printed."""
+    text = render_event(PORTFOLIO_INITIALIZED, 0, (10000.0, 4000.0, 6000.0, 0.4))
+
+    assert text.splitlines() == [
+        "Initialized portfolio with 10000.00 USD",
+        "  Stablecoin: 4000.00 USD (40.0%)",
+        "  Volatile assets: 6000.00 USD (60.0%)",
+        "Portfolio initialized with 40.0% stablecoin allocation",
+    ]
+
+
+def test_simulation_summary_rendered_from_events():
+    """Test that a recorded run matches its metrics and prints nothing."""
+    log = EventLog(verbosity=DETAIL)
+
+    with patch("sys.stdout", new=io.StringIO()) as fake_stdout:
+        _, metrics = calculate_historical_index_prices(
+            _historical_data(), "market_cap", "monthly", event_log=log
+        )
+    assert fake_stdout.getvalue() == ""
+
+    rebalances = log.events(TOKEN_REBALANCE)
+    assert len(rebalances["timestamp"]) == metrics["rebalance_count"]
+    assert rebalances["fees_paid"].sum() == metrics["total_fees_paid"]
+
+    summary = log.events(SIMULATION_COMPLETE)
+    assert summary["final_value"][0] == metrics["final_value"]
+    assert np.isnan(summary["fear_greed_rebalance_count"][0])
+
+    lines = log.render()
+    assert lines[0].startswith("Initialized portfolio with 100.00 USD")
+    assert lines[0].splitlines()[-1] == (
+        "Portfolio initialized with 50.0% stablecoin allocation"
+    )
+    assert lines[-1].startswith("Simulation complete: market_cap with monthly")
+    assert "Fear & Greed adjustments" not in lines[-1]
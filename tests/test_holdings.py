@@ -0,0 +1,157 @@
+"""
+Unit tests for the holdings module.
+"""
+
+import numpy as np
+import pytest
+
+from core.events import SILENT, EventLog
+from core.holdings import HoldingsHistory
+from core.panel import build_market_panel, iterate_panel_chunks
+from core.portfolio import (
+    advance_simulation,
+    calculate_historical_index_prices,
+    create_simulation_state,
+)
+from core.simulation import calculate_historical_index_prices_batch
+from core.state import load_simulation_state, save_simulation_state
+from tests.conftest import DAY, START
+
+
+@pytest.fixture
+def historical_data(make_market_data):
+    """Two hundred and fifty days for three staked tokens."""
+    return make_market_data(
+        5, [("eth", 1.0, 300e9), ("sol", 1.0, 50e9), ("btc", 1.0, 800e9)], 250
+    )
+
+
+@pytest.fixture
+def fear_greed_data():
+    """Alternating extreme sentiment."""
+    classes = ["Extreme Fear", "Extreme Greed"]
+    return [[START + i * DAY, 50, classes[(i // 25) % 2]] for i in range(250)]
+
+
+def test_holdings_history_reconstructs_scalar_run(historical_data, fear_greed_data):
+    """Test that reconstructed holdings value to the simulated portfolio values."""
+    holdings = HoldingsHistory()
+    history, metrics = calculate_historical_index_prices(
+        historical_data,
+        "market_cap",
+        rebalance_frequency="monthly",
+        fear_greed_data=fear_greed_data,
+        event_log=EventLog(SILENT),
+        holdings_history=holdings,
+    )
+
+    # Only event points are stored
+    assert len(holdings) == len(history)
+    assert holdings.event_count <= metrics["rebalance_count"] + 1
+    assert holdings.event_count < len(history) / 10
+
+    panel = build_market_panel(historical_data)
+    token_values, stablecoin_values = holdings.values(panel)
+    np.testing.assert_allclose(
+        token_values.sum(axis=1) + stablecoin_values,
+        [value for _, value in history],
+        rtol=1e-12,
+    )
+    assert token_values.shape == (len(history), 3)
+
+    # A window matches the same rows of the full reconstruction
+    quantities, stablecoin = holdings.quantities()
+    window, window_stablecoin = holdings.quantities(100, 140)
+    np.testing.assert_allclose(window, quantities[100:140], rtol=1e-12)
+    np.testing.assert_allclose(window_stablecoin, stablecoin[100:140], rtol=1e-12)
+
+
+def test_holdings_history_matches_final_portfolio(historical_data):
+    """Test that the last reconstructed row equals the final quantities."""
+    panel = build_market_panel(historical_data)
+    log = EventLog(SILENT)
+    holdings = HoldingsHistory()
+    state = create_simulation_state(
+        panel, "market_cap", "quarterly", event_log=log, holdings_history=holdings
+    )
+    advance_simulation(state, panel, event_log=log)
+
+    quantities, stablecoin = holdings.quantities()
+    np.testing.assert_allclose(quantities[-1], state.portfolio.quantities, rtol=1e-12)
+    assert stablecoin[-1] == pytest.approx(state.portfolio.stablecoin_quantity)
+
+
+def test_holdings_history_survives_checkpoint(historical_data, tmp_path):
+    """Test that chunked runs with a checkpoint record the same history."""
+    panel = build_market_panel(historical_data)
+    log = EventLog(SILENT)
+
+    reference = HoldingsHistory()
+    state = create_simulation_state(
+        panel, "market_cap", "monthly", event_log=log, holdings_history=reference
+    )
+    advance_simulation(state, panel, event_log=log)
+
+    state = create_simulation_state(
+        panel,
+        "market_cap",
+        "monthly",
+        event_log=log,
+        holdings_history=HoldingsHistory(),
+    )
+    chunks = list(iterate_panel_chunks(panel, 90))
+    advance_simulation(state, chunks[0], event_log=log)
+    save_simulation_state(state, tmp_path / "state.npz")
+    restored = load_simulation_state(tmp_path / "state.npz")
+    for chunk in chunks[1:]:
+        advance_simulation(restored, chunk, event_log=log)
+
+    np.testing.assert_array_equal(restored.holdings.event_rows, reference.event_rows)
+    for chunked, whole in zip(restored.holdings.quantities(), reference.quantities()):
+        np.testing.assert_allclose(chunked, whole, rtol=1e-12)
+
+
+def test_holdings_history_batch_lanes(historical_data, fear_greed_data):
+    """Test that batched lanes record per-lane holdings."""
+    allocations = [0.2, 0.7]
+    holdings = HoldingsHistory()
+    _, values, _ = calculate_historical_index_prices_batch(
+        historical_data,
+        "market_cap",
+        allocations,
+        rebalance_frequency="monthly",
+        fear_greed_data=fear_greed_data,
+        holdings_history=holdings,
+    )
+    panel = build_market_panel(historical_data)
+
+    all_tokens, all_stablecoin = holdings.values(panel)
+    assert all_tokens.shape == (values.shape[1], 2, 3)
+    for lane in range(len(allocations)):
+        token_values, stablecoin_values = holdings.values(panel, lane=lane)
+        np.testing.assert_allclose(
+            token_values.sum(axis=1) + stablecoin_values, values[lane], rtol=1e-10
+        )
+        np.testing.assert_array_equal(token_values, all_tokens[:, lane])
+
+
+def test_snapshot_at_same_row_replaces():
+    """Test that several trades at one bar keep a single snapshot."""
+    holdings = HoldingsHistory()
+    holdings.start(["a"], np.zeros(2))
+    holdings.extend(np.array([START, START + DAY]))
+    holdings.snapshot(0, np.array([1.0]), 5.0)
+    holdings.snapshot(1, np.array([2.0]), 4.0)
+    holdings.snapshot(1, np.array([3.0]), 3.0)
+
+    quantities, stablecoin = holdings.quantities()
+    assert holdings.event_count == 2
+    np.testing.assert_array_equal(quantities[:, 0], [1.0, 3.0])
+    np.testing.assert_array_equal(stablecoin, [5.0, 3.0])
+
+    late = HoldingsHistory()
+    late.start(["a"], np.zeros(2))
+    late.extend(np.array([START, START + DAY]))
+    late.snapshot(1, np.array([1.0]), 1.0)
+    with pytest.raises(ValueError):
+        late.quantities()
@@ -0,0 +1,203 @@
+"""
+Unit tests for the ledger module.
+"""
+
+import csv
+import sqlite3
+
+import numpy as np
+import pytest
+
+from core.drift import DriftBand
+from core.events import SILENT, EventLog
+from core.ledger import (
+    REASON_DRIFT,
+    REASON_PERIODIC,
+    REASON_RECONSTITUTION,
+    REASON_SENTIMENT,
+    SIDE_BUY,
+    TradeLedger,
+    attribute_costs,
+    export_trade_ledger_csv,
+    export_trade_ledger_sqlite,
+    load_trade_ledger,
+    merge_trade_ledgers,
+    run_turnover,
+    save_trade_ledger,
+)
+from core.portfolio import calculate_historical_index_prices
+from core.simulation import calculate_historical_index_prices_batch
+from core.sweep import (
+    build_sweep_grid,
+    load_sweep_ledger,
+    load_sweep_results,
+    run_parameter_sweep,
+)
+from core.universe import UniverseRule
+from tests.conftest import DAY, START
+
+
+@pytest.fixture
+def historical_data(make_market_data):
+    """Two hundred days for four tokens; "new" is listed after sixty days."""
+    return make_market_data(
+        11,
+        [
+            ("btc", 1.0, 800e9),
+            ("eth", 1.0, 300e9),
+            ("sol", 1.0, 50e9),
+            ("new", 1.0, 900e9),
+        ],
+        200,
+        listed={"new": 60},
+        volatility=0.04,
+    )
+
+
+@pytest.fixture
+def fear_greed_data():
+    """Alternating extreme sentiment."""
+    classes = ["Extreme Fear", "Extreme Greed"]
+    return [[START + i * DAY, 50, classes[(i // 20) % 2]] for i in range(200)]
+
+
+def run_with_ledger(historical_data, **options):
+    """Run a silent simulation that records into a new ledger."""
+    ledger = TradeLedger(capacity=4)
+    _, metrics = calculate_historical_index_prices(
+        historical_data,
+        "market_cap",
+        event_log=EventLog(SILENT),
+        trade_ledger=ledger,
+        **options,
+    )
+    return ledger, metrics
+
+
+def test_ledger_fees_match_metrics(historical_data, fear_greed_data):
+    """Test that recorded fees add up to the simulation's fees by reason."""
+    ledger, metrics = run_with_ledger(
+        historical_data, rebalance_frequency="monthly", fear_greed_data=fear_greed_data
+    )
+    trades = ledger.trades()
+
+    assert len(ledger) > 4  # grown past the initial capacity
+    assert trades["fee"].sum() == pytest.approx(metrics["total_fees_paid"])
+    assert set(trades["reason"].tolist()) == {REASON_PERIODIC, REASON_SENTIMENT}
+    assert np.all(trades["notional"] > 0)
+    assert np.all(trades["timestamp"] >= START)
+
+    by_reason = attribute_costs(ledger, by="reason")
+    assert sum(group["fees"] for group in by_reason.values()) == pytest.approx(
+        metrics["total_fees_paid"]
+    )
+
+
+def test_ledger_reasons_for_drift_and_reconstitution(historical_data):
+    """Test that drift and universe changes are attributed to their reasons."""
+    ledger, _ = run_with_ledger(
+        historical_data,
+        rebalance_frequency="monthly",
+        drift_band=DriftBand(token_band=0.3, relative=True),
+        universe=UniverseRule(2),
+    )
+    trades = ledger.trades()
+    reasons = set(trades["reason"].tolist())
+    assert {REASON_DRIFT, REASON_RECONSTITUTION} <= reasons
+
+    # The listed token enters the index through a reconstitution buy
+    new = ledger.token_ids(["new"])[0]
+    entry = (trades["token"] == new) & (trades["reason"] == REASON_RECONSTITUTION)
+    assert trades["side"][entry][0] == SIDE_BUY
+
+
+def test_batch_ledger_matches_scalar_runs(historical_data, fear_greed_data):
+    """Test that batched lanes record the trades of the matching single runs."""
+    allocations = [0.3, 0.6]
+    ledger = TradeLedger()
+    _, _, metrics = calculate_historical_index_prices_batch(
+        historical_data,
+        "market_cap",
+        allocations,
+        rebalance_frequency="monthly",
+        fear_greed_data=fear_greed_data,
+        trade_ledger=ledger,
+    )
+    _, fees = run_turnover(ledger)
+    np.testing.assert_allclose(fees, metrics["total_fees_paid"])
+
+    batch = ledger.trades()
+    for lane, allocation in enumerate(allocations):
+        single, _ = run_with_ledger(
+            historical_data,
+            rebalance_frequency="monthly",
+            fear_greed_data=fear_greed_data,
+            stablecoin_allocation=allocation,
+        )
+        lane_rows = batch["run"] == lane
+        single_trades = single.trades()
+        assert lane_rows.sum() == len(single)
+        np.testing.assert_allclose(
+            batch["notional"][lane_rows], single_trades["notional"], rtol=1e-9
+        )
+        np.testing.assert_array_equal(
+            batch["reason"][lane_rows], single_trades["reason"]
+        )
+
+
+def test_ledger_exports(historical_data, tmp_path):
+    """Test NPZ round trips, CSV and SQLite exports and merging."""
+    ledger, _ = run_with_ledger(historical_data, rebalance_frequency="monthly")
+
+    save_trade_ledger(ledger, tmp_path / "trades.npz")
+    restored = load_trade_ledger(tmp_path / "trades.npz")
+    assert restored.symbols == ledger.symbols
+    for name, column in ledger.trades().items():
+        np.testing.assert_array_equal(restored.trades()[name], column)
+
+    export_trade_ledger_csv(ledger, tmp_path / "trades.csv")
+    with open(tmp_path / "trades.csv", newline="") as csv_file:
+        rows = list(csv.DictReader(csv_file))
+    assert len(rows) == len(ledger)
+    assert rows[0]["reason"] == "periodic"
+    assert rows[0]["token"] in ledger.symbols
+
+    export_trade_ledger_sqlite(ledger, str(tmp_path / "trades.db"))
+    connection = sqlite3.connect(tmp_path / "trades.db")
+    (fees,) = connection.execute("SELECT SUM(fee) FROM trades").fetchone()
+    connection.close()
+    assert fees == pytest.approx(ledger.trades()["fee"].sum())
+    with pytest.raises(ValueError, match="Invalid table name"):
+        export_trade_ledger_sqlite(
+            ledger, str(tmp_path / "trades.db"), "trades; DROP TABLE trades"
+        )
+
+    merged = merge_trade_ledgers([ledger, restored])
+    assert len(merged) == 2 * len(ledger)
+    assert merged.run_labels == ["0", "0"]
+    assert set(merged.trades()["run"].tolist()) == {0, 1}
+
+
+def test_sweep_writes_ledgers(historical_data, tmp_path):
+    """Test that sweep ledgers are labeled by sweep key and match the results."""
+    grid = build_sweep_grid(
+        ["market_cap", "sqrt_market_cap"],
+        ["monthly"],
+        stablecoin_allocations=(0.2, 0.5),
+    )
+    results_path = tmp_path / "sweep.csv"
+    run_parameter_sweep(
+        historical_data,
+        grid,
+        results_path,
+        processes=1,
+        progress=lambda *_: None,
+        ledger_dir=tmp_path / "ledgers",
+    )
+
+    ledger = load_sweep_ledger(tmp_path / "ledgers")
+    by_run = attribute_costs(ledger, by="run")
+    for row in load_sweep_results(results_path):
+        assert by_run[row["key"]]["fees"] == pytest.approx(
+            float(row["total_fees_paid"])
+        )
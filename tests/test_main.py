@@ -163,9 +163,10 @@ def test_calculate_strategy_performance(
         apply_staking=True,
     )
 
-    # Verify the results
-    assert index_prices == sample_index_prices
-    assert metrics == sample_performance_metrics
+    # Verify the results (staking accrues through a cumulative index, so values
+    # match the reference to within floating point rounding)
+    np.testing.assert_allclose(index_prices, sample_index_prices, rtol=1e-12)
+    assert metrics == pytest.approx(sample_performance_metrics, rel=1e-9)
     assert len(investment_values) == len(sample_index_prices)
 
     # Test empty result case
@@ -173,19 +174,26 @@ def test_calculate_strategy_performance(
     result = calculate_strategy_performance(
         sample_historical_data, "market_cap", "monthly", 1000.0
     )
-    assert result == (
+    np.testing.assert_allclose(
+        result[0],
         [
             [1609459200000, 100.0],
             [1609545600000, 101.9020694506869],
             [1609632000000, 103.80432726510048],
         ],
+        rtol=1e-12,
+    )
+    assert result[1] == pytest.approx(
         {
             "max_drawdown": np.float64(0.0),
             "volatility": np.float64(0.2803321820974809),
             "sharpe_ratio": np.float64(1676.5534155291866),
             "sortino_ratio": 0,
         },
-        [1000.0, 1019.020694506869, 1038.0432726510048],
+        rel=1e-9,
+    )
+    assert result[2] == pytest.approx(
+        [1000.0, 1019.020694506869, 1038.0432726510048], rel=1e-12
     )
 
 
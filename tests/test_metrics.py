@@ -4,11 +4,13 @@ import numpy as np
 import pytest
 
 from core.metrics import (
+    RunningPortfolioMetrics,
     calculate_annualized_ROI,
     calculate_benchmark_performance,
     calculate_financial_metrics,
     calculate_max_drawdown,
     calculate_portfolio_metrics,
+    calculate_portfolio_metrics_batch,
     calculate_returns,
     calculate_sharpe_ratio,
     calculate_sortino_ratio,
@@ -196,6 +198,51 @@ def test_calculate_portfolio_metrics(value_history):
     assert metrics["total_return"] == pytest.approx(expected_total_return)
 
 
+def test_calculate_portfolio_metrics_batch(drawdown_prices, simple_prices):
+    """Test that batched metrics match the per-series calculation"""
+    values = np.vstack([drawdown_prices, simple_prices])
+    batch = calculate_portfolio_metrics_batch(values)
+
+    for lane, prices in enumerate(values):
+        expected = calculate_portfolio_metrics(list(enumerate(prices)))
+        for key, value in expected.items():
+            assert batch[key][lane] == pytest.approx(value, rel=1e-12)
+
+
+def test_riskless_series_ratios():
+    """Test that returns varying only by rounding give zero Sharpe and Sortino ratios"""
+    values = 100 * (1 + 0.05 / 365) ** np.arange(400)
+    noisy = (values * (1 + np.float32(1e-7) * np.sin(np.arange(400)))).astype(
+        np.float32
+    )
+
+    running = RunningPortfolioMetrics()
+    running.update(values)
+    for metrics in [
+        calculate_portfolio_metrics(list(enumerate(values))),
+        calculate_portfolio_metrics_batch(np.vstack([values, noisy])),
+        running.metrics(),
+    ]:
+        np.testing.assert_array_equal(metrics["sharpe_ratio"], 0.0)
+        np.testing.assert_array_equal(metrics["sortino_ratio"], 0.0)
+
+
+def test_running_portfolio_metrics(drawdown_prices):
+    """Test that running metrics are chunk-invariant and match the full calculation"""
+    values = np.concatenate([drawdown_prices, drawdown_prices[::-1] * 1.1])
+
+    whole = RunningPortfolioMetrics()
+    whole.update(values)
+    pieces = RunningPortfolioMetrics()
+    for chunk in np.array_split(values, 4):
+        pieces.update(chunk)
+
+    assert pieces.to_dict() == whole.to_dict()
+    expected = calculate_portfolio_metrics(list(enumerate(values)))
+    for key, value in expected.items():
+        assert whole.metrics()[key] == pytest.approx(value, rel=1e-12)
+
+
 def test_calculate_annualized_ROI():
     """Test the calculate_annualized_ROI function"""
     # Test basic calculation
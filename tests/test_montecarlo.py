@@ -0,0 +1,104 @@
+"""
+Unit tests for the montecarlo module.
+"""
+
+import numpy as np
+import pytest
+
+from core.montecarlo import (
+    MONTE_CARLO_METRICS,
+    bootstrap_market_paths,
+    run_monte_carlo,
+    simulate_index_paths,
+    stationary_bootstrap_indices,
+    summarize_distribution,
+)
+from core.panel import build_market_panel
+from core.simulation import calculate_historical_index_prices_batch
+
+
+@pytest.fixture
+def historical_data(make_market_data):
+    """Two hundred days of correlated data for three tokens."""
+    return make_market_data(
+        17,
+        [("btc", 30000, 1e7), ("eth", 800, 1e7), ("sol", 2, 1e7)],
+        200,
+        volatility=0.01,
+        market_volatility=0.03,
+    )
+
+
+def test_stationary_bootstrap_indices():
+    """Test that indices form wrapping blocks with the expected mean length."""
+    indices = stationary_bootstrap_indices(50, 400, 300, 10, rng=1)
+
+    assert indices.shape == (400, 300)
+    assert indices.min() >= 0 and indices.max() < 50
+    continues = np.diff(indices, axis=1) % 50 == 1
+    assert 1 / (1 - continues.mean()) == pytest.approx(10, rel=0.1)
+
+    # A block length of one is the iid bootstrap
+    iid = stationary_bootstrap_indices(50, 400, 300, 1, rng=1)
+    assert (np.diff(iid, axis=1) % 50 == 1).mean() == pytest.approx(1 / 50, abs=0.01)
+
+
+def test_bootstrap_paths_preserve_correlation(historical_data):
+    """Test that paths start at the first bar and keep cross-token correlation."""
+    panel = build_market_panel(historical_data)
+    held, prices, market_caps = bootstrap_market_paths(panel, 64, 150, rng=2)
+
+    assert list(held) == [0, 1, 2]
+    assert prices.shape == market_caps.shape == (64, 150, 3)
+    np.testing.assert_allclose(prices[:, 0], np.broadcast_to(panel.prices[0], (64, 3)))
+
+    returns = np.diff(np.log(prices), axis=1).reshape(-1, 3)
+    historical = np.diff(np.log(panel.prices), axis=0)
+    np.testing.assert_allclose(
+        np.corrcoef(returns.T), np.corrcoef(historical.T), atol=0.05
+    )
+
+
+@pytest.mark.parametrize("rebalance_frequency", ["none", "monthly"])
+def test_simulate_index_paths_matches_batch_engine(
+    historical_data, rebalance_frequency
+):
+    """Test that the historical path itself reproduces the batch engine."""
+    panel = build_market_panel(historical_data)
+    values, fees = simulate_index_paths(
+        panel.timestamps,
+        panel.prices[np.newaxis],
+        panel.market_caps[np.newaxis],
+        panel.tokens,
+        "sqrt_market_cap",
+        rebalance_frequency,
+        stablecoin_allocation=0.3,
+    )
+    _, expected, metrics = calculate_historical_index_prices_batch(
+        panel, "sqrt_market_cap", [0.3], rebalance_frequency
+    )
+
+    np.testing.assert_allclose(values, expected, rtol=1e-12)
+    np.testing.assert_allclose(fees, metrics["total_fees_paid"], rtol=1e-12)
+
+
+def test_run_monte_carlo(historical_data):
+    """Test that seeded runs are reproducible and distributions are reported."""
+    results = run_monte_carlo(
+        historical_data, "market_cap", paths=50, length=120, chunk_size=16, seed=4
+    )
+    repeated = run_monte_carlo(
+        historical_data, "market_cap", paths=50, length=120, chunk_size=16, seed=4
+    )
+
+    assert set(results) == set(MONTE_CARLO_METRICS)
+    assert all(len(results[name]) == 50 for name in MONTE_CARLO_METRICS)
+    for name in MONTE_CARLO_METRICS:
+        np.testing.assert_array_equal(results[name], repeated[name])
+        assert np.all(np.isfinite(results[name]))
+    assert np.all(results["max_drawdown"] <= 0)
+    assert np.std(results["final_value"]) > 0
+
+    summary = summarize_distribution(results["final_value"])
+    assert summary["p5"] <= summary["p50"] <= summary["p95"]
+    assert summary["mean"] == pytest.approx(np.mean(results["final_value"]))
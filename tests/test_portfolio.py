@@ -6,9 +6,11 @@ import io
 from datetime import datetime
 from unittest.mock import patch
 
+import numpy as np
 import pytest
 
 from core.portfolio import (
+    Portfolio,
     apply_staking_to_portfolio,
     calculate_historical_index_prices,
     calculate_portfolio_total_value,
@@ -188,6 +190,42 @@ def test_update_portfolio_values(sample_portfolio, sample_token_prices):
     assert updated["total_usd_value"] == 40000
 
 
+def test_portfolio_dict_view_writes_through_to_arrays(sample_portfolio):
+    """Test that the dict-compatible view reads and writes the backing arrays."""
+    assert isinstance(sample_portfolio, Portfolio)
+    assert not hasattr(sample_portfolio, "__dict__")
+    assert sample_portfolio.symbols == ["btc", "eth", "sol"]
+    np.testing.assert_array_equal(sample_portfolio.quantities, [0.5, 5.0, 100.0])
+
+    sample_portfolio["tokens"]["eth"]["quantity"] = 6.0
+    sample_portfolio["stablecoin"]["quantity"] = 15000
+    assert sample_portfolio.quantities[1] == 6.0
+    assert sample_portfolio.stablecoin_quantity == 15000
+
+    sample_portfolio["tokens"]["link"] = {
+        "quantity": 10.0,
+        "usd_value": 100.0,
+        "target_weight": 0.0,
+    }
+    assert "link" in sample_portfolio["tokens"]
+    assert sample_portfolio.positions["link"] == 3
+    assert sample_portfolio.to_dict()["tokens"]["link"]["usd_value"] == 100.0
+
+    del sample_portfolio["tokens"]["btc"]
+    assert list(sample_portfolio["tokens"]) == ["eth", "sol", "link"]
+    assert sample_portfolio["tokens"]["eth"]["quantity"] == 6.0
+
+
+def test_update_portfolio_values_accepts_price_vector(sample_portfolio):
+    """Test updating portfolio values from a price vector aligned with positions."""
+    prices = np.array([20000.0, np.nan, 20.0])
+    update_portfolio_values(sample_portfolio, prices)
+
+    # ETH has no price: its USD value is kept but excluded from the total
+    np.testing.assert_array_equal(sample_portfolio.usd_values, [10000, 4000, 2000])
+    assert sample_portfolio["total_usd_value"] == 10000 + 2000 + 20000
+
+
 def test_calculate_portfolio_total_value(sample_portfolio):
     """Test calculating the total portfolio value."""
     total = calculate_portfolio_total_value(sample_portfolio)
@@ -503,16 +541,14 @@ def test_validate_data_length_consistency():
     assert is_valid is True
 
 
-@patch("core.portfolio.extract_current_data")
-@patch("core.portfolio.calculate_index_weights")
+@patch("core.context.calculate_weight_matrix")
 @patch("core.portfolio.calculate_portfolio_metrics")
 def test_calculate_historical_index_prices_minimal(
-    mock_metrics, mock_weights, mock_extract, sample_historical_data
+    mock_metrics, mock_weights, sample_historical_data
 ):
     """Test the historical index price calculation with minimal mocking."""
     # Mock the dependencies
-    mock_extract.return_value = ({"btc": 600000000000}, {"btc": 30000})
-    mock_weights.return_value = {"btc": 1.0}
+    mock_weights.return_value = np.array([[1.0, 0.0, 0.0]] * 3)
     mock_metrics.return_value = {
         "total_return": 10.0,
         "annualized_roi": 5.0,
@@ -529,10 +565,12 @@ def test_calculate_historical_index_prices_minimal(
         )
 
     # Should have results and metrics
-    assert len(result) > 0
+    assert len(result) == 3
     assert metrics["total_return"] == 10.0
 
-    # Assertions to verify correct function calls
-    assert mock_extract.call_count > 0
-    assert mock_weights.call_count > 0
+    # Weights are computed once for the whole timeline, not per timestamp
+    assert mock_weights.call_count == 1
     assert mock_metrics.call_count == 1
+
+    # Only BTC is weighted: 50 USD of BTC at 30000 revalued at 32000 plus 50 USD stablecoin
+    assert result[-1][1] == pytest.approx(50 / 30000 * 32000 + 50)
@@ -0,0 +1,114 @@
+"""
+Unit tests for the precision module.
+"""
+
+import io
+import os
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+
+from core.data_loading import load_historical_data, process_fear_greed_data
+from core.montecarlo import run_monte_carlo
+from core.panel import build_market_panel
+from core.precision import FLOAT32_TOLERANCES, check_precision, compare_precision
+from core.simulation import calculate_historical_index_prices_batch
+
+DATASET_DIR = os.path.join(os.path.dirname(os.path.dirname(__file__)), "dataset")
+TOKENS = ["btc", "eth", "sol", "aave", "uni", "link", "pendle"]
+
+
+@pytest.fixture(scope="module")
+def dataset():
+    """The bundled token and sentiment data."""
+    with patch("sys.stdout", new=io.StringIO()):
+        historical_data = load_historical_data(TOKENS, DATASET_DIR)
+        fear_greed_data = process_fear_greed_data(
+            os.path.join(DATASET_DIR, "fear_and_greed.json")
+        )
+    return build_market_panel(historical_data), fear_greed_data
+
+
+@pytest.mark.parametrize("method", ["market_cap", "capped_sqrt_market_cap:0.3"])
+@pytest.mark.parametrize("rebalance_frequency", ["none", "monthly", "quarterly"])
+def test_float32_batch_within_tolerance(dataset, method, rebalance_frequency):
+    """Test that float32 runs on the bundled data stay within the documented bounds."""
+    panel, fear_greed_data = dataset
+
+    violations = check_precision(
+        panel,
+        method,
+        np.linspace(0.0, 0.9, 10),
+        rebalance_frequency=rebalance_frequency,
+        fear_greed_data=fear_greed_data,
+    )
+
+    assert violations == {}
+
+
+@pytest.mark.parametrize("method", ["market_cap", "capped_market_cap:0.3"])
+@pytest.mark.parametrize("rebalance_frequency", ["none", "monthly", "weekday:mon"])
+@pytest.mark.parametrize("use_fear_greed", [False, True])
+def test_float32_full_allocation_range(
+    dataset, method, rebalance_frequency, use_fear_greed
+):
+    """Test all-token to all-stablecoin lanes, scaling bounds by rebalances."""
+    panel, fear_greed_data = dataset
+
+    violations = check_precision(
+        panel,
+        method,
+        np.linspace(0.0, 1.0, 11),
+        rebalance_frequency=rebalance_frequency,
+        fear_greed_data=fear_greed_data if use_fear_greed else None,
+    )
+
+    assert violations == {}
+
+
+def test_float32_panel_and_values(dataset):
+    """Test that float32 panels and lane state halve the working set."""
+    panel, _ = dataset
+    historical_data = {
+        token: [
+            [int(timestamp), float(price), float(cap)]
+            for timestamp, price, cap in zip(
+                panel.timestamps, panel.prices[:, column], panel.market_caps[:, column]
+            )
+            if not np.isnan(price)
+        ]
+        for column, token in enumerate(panel.tokens)
+    }
+    panel32 = build_market_panel(historical_data, dtype=np.float32)
+
+    assert panel32.prices.nbytes * 2 == panel.prices.nbytes
+    assert panel32.fingerprint != panel.fingerprint
+    _, values, _ = calculate_historical_index_prices_batch(
+        panel32, "market_cap", [0.2, 0.5], "monthly"
+    )
+    assert values.dtype == np.float32
+
+
+def test_float32_monte_carlo_within_tolerance(dataset):
+    """Test that float32 Monte Carlo paths track the float64 paths."""
+    panel, _ = dataset
+    options = dict(paths=32, length=400, rebalance_frequency="monthly", seed=8)
+
+    reference = run_monte_carlo(panel, "sqrt_market_cap", **options)
+    reduced = run_monte_carlo(panel, "sqrt_market_cap", dtype=np.float32, **options)
+
+    assert compare_precision(reference, reduced) == {}
+
+
+def test_compare_precision_reports_violations():
+    """Test that errors beyond the tolerance are reported with their bound."""
+    reference = {"final_value": np.array([100.0, 200.0]), "sharpe_ratio": [1.0, 2.0]}
+    candidate = {"final_value": np.array([100.0, 200.1]), "sharpe_ratio": [1.0, 2.0]}
+
+    violations = compare_precision(reference, candidate)
+
+    assert set(violations) == {"final_value"}
+    error, allowed = violations["final_value"]
+    assert error == pytest.approx(0.1)
+    assert allowed == pytest.approx(200 * FLOAT32_TOLERANCES["final_value"][0])
@@ -0,0 +1,94 @@
+"""
+Unit tests for the rolling module.
+"""
+
+import numpy as np
+import pytest
+
+from core.metrics import calculate_portfolio_metrics_batch
+from core.panel import build_market_panel
+from core.rolling import (
+    ROLLING_METRICS,
+    run_rolling_entry_analysis,
+    summarize_rolling_entries,
+)
+from core.simulation import calculate_historical_index_prices_batch
+from tests.conftest import DAY, START
+
+
+@pytest.fixture
+def historical_data(make_market_data):
+    """Two hundred and forty days of data; SOL is listed after fifty days."""
+    return make_market_data(
+        23,
+        [("btc", 30000, 1e7), ("eth", 800, 1e7), ("sol", 2, 1e7)],
+        240,
+        listed={"sol": 50},
+    )
+
+
+@pytest.fixture
+def fear_greed_data():
+    """Alternating extreme sentiment every fifteen days."""
+    classes = ["Extreme Fear", "Extreme Greed"]
+    return [[START + i * DAY, 50, classes[(i // 15) % 2]] for i in range(240)]
+
+
+def _entry_data(historical_data, entry):
+    """Historical data as seen by a run starting at an entry bar."""
+    cutoff = START + entry * DAY
+    return {
+        token: [point for point in series if point[0] >= cutoff]
+        for token, series in historical_data.items()
+    }
+
+
+@pytest.mark.parametrize("rebalance_frequency", ["none", "monthly"])
+def test_rolling_entries_match_individual_runs(
+    historical_data, fear_greed_data, rebalance_frequency
+):
+    """Test that every entry matches a run started on that date."""
+    horizons = (30, 120)
+    results = run_rolling_entry_analysis(
+        historical_data,
+        "sqrt_market_cap",
+        rebalance_frequency,
+        fear_greed_data=fear_greed_data,
+        horizons=horizons,
+        step=7,
+        chunk_size=5,
+    )
+
+    entries = np.arange(0, 240 - 30, 7)
+    np.testing.assert_array_equal(results["entry_timestamps"], START + entries * DAY)
+
+    for row, entry in enumerate(entries.tolist()):
+        panel = build_market_panel(_entry_data(historical_data, entry))
+        _, values, _ = calculate_historical_index_prices_batch(
+            panel,
+            "sqrt_market_cap",
+            [0.5],
+            rebalance_frequency,
+            fear_greed_data=fear_greed_data,
+        )
+        for column, horizon in enumerate(horizons):
+            if entry + horizon >= 240:
+                assert np.isnan(results["total_return"][row, column])
+                continue
+            expected = calculate_portfolio_metrics_batch(values[:, : horizon + 1])
+            for name in ROLLING_METRICS:
+                assert results[name][row, column] == pytest.approx(
+                    expected[name][0], rel=1e-9
+                )
+
+
+def test_summarize_rolling_entries(historical_data):
+    """Test that summaries count the entries with a complete horizon."""
+    results = run_rolling_entry_analysis(
+        historical_data, "market_cap", "quarterly", horizons=(60, 200)
+    )
+    summary = summarize_rolling_entries(results, "max_drawdown")
+
+    assert summary[60]["entries"] == 240 - 60
+    assert summary[200]["entries"] == 240 - 200
+    assert summary[60]["p5"] <= summary[60]["p50"] <= 0
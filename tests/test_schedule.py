@@ -0,0 +1,200 @@
+"""
+Unit tests for the schedule module.
+"""
+
+import time
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+from core.events import SILENT, EventLog
+from core.panel import build_market_panel, iterate_panel_chunks
+from core.portfolio import (
+    advance_simulation,
+    calculate_historical_index_prices,
+    create_simulation_state,
+    should_rebalance,
+)
+from core.schedule import (
+    compile_rebalance_schedule,
+    continue_rebalance_events,
+    parse_calendar_frequency,
+    rebalance_event_indices,
+    rebalance_successors,
+)
+from core.simulation import calculate_historical_index_prices_batch
+from tests.conftest import DAY, START
+
+
+def _event_dates(timestamps, events):
+    """ISO dates of the event bars."""
+    days = (timestamps[events] // DAY).astype("datetime64[D]")
+    return [str(day) for day in days]
+
+
+def _reference_schedule(timestamps, frequency):
+    """Evaluate should_rebalance step by step, as the simulation used to."""
+    schedule = []
+    last_rebalance_date = None
+    for timestamp in timestamps:
+        current_date = datetime.fromtimestamp(timestamp / 1000)
+        rebalance = should_rebalance(current_date, last_rebalance_date, frequency)
+        if rebalance:
+            last_rebalance_date = current_date
+        schedule.append(rebalance)
+    return schedule
+
+
+@pytest.fixture
+def irregular_timestamps():
+    """Sorted timestamps with uneven gaps over roughly three years."""
+    rng = np.random.default_rng(7)
+    gaps = rng.integers(1, 6, size=400) * DAY + rng.integers(0, DAY, size=400)
+    return START + np.cumsum(gaps)
+
+
+@pytest.mark.parametrize(
+    "frequency", ["none", "monthly", "quarterly", "yearly", "weekly"]
+)
+def test_schedule_matches_should_rebalance(irregular_timestamps, frequency):
+    """Test that the compiled schedule reproduces should_rebalance exactly."""
+    schedule = compile_rebalance_schedule(irregular_timestamps, frequency)
+
+    assert schedule.tolist() == _reference_schedule(irregular_timestamps, frequency)
+
+
+def test_rebalance_event_indices_are_cached(irregular_timestamps):
+    """Test that schedules are shared per timeline and frequency."""
+    events = rebalance_event_indices(irregular_timestamps, "monthly")
+
+    assert events is rebalance_event_indices(irregular_timestamps.copy(), "monthly")
+    assert events is not rebalance_event_indices(irregular_timestamps, "quarterly")
+    assert not events.flags.writeable
+    assert events[0] == 0
+
+
+@pytest.mark.parametrize(
+    "frequency, expected",
+    [
+        ("quarter_end", ["2021-01-01", "2021-03-31", "2021-06-30", "2021-09-30"]),
+        ("quarter_start", ["2021-01-01", "2021-04-01", "2021-07-01", "2021-10-01"]),
+        ("quarter_end-2b", ["2021-01-01", "2021-03-29", "2021-06-28", "2021-09-28"]),
+        ("month_start+14d", ["2021-01-01", "2021-01-15", "2021-02-15", "2021-03-15"]),
+        ("weekday:mon,thu", ["2021-01-01", "2021-01-04", "2021-01-07", "2021-01-11"]),
+        ("dates:2021-05-20,2021-02-10", ["2021-01-01", "2021-02-10", "2021-05-20"]),
+    ],
+)
+def test_calendar_schedules(frequency, expected):
+    """Test that calendar schedules rebalance on their calendar days."""
+    timestamps = START + np.arange(300) * DAY + 9 * 60 * 60 * 1000
+
+    events = rebalance_event_indices(timestamps, frequency)
+    assert _event_dates(timestamps, events)[:4] == expected
+
+
+def test_calendar_schedule_gaps_and_blocks(irregular_timestamps):
+    """Test missed target days and compiling a timeline in blocks."""
+    # Without a bar on a target day the first bar after it rebalances, once
+    timestamps = START + np.array([0, 85, 91, 95, 200]) * DAY
+    events = rebalance_event_indices(timestamps, "month_end")
+    assert _event_dates(timestamps, events) == [
+        "2021-01-01",
+        "2021-03-27",  # January and February ends
+        "2021-04-02",
+        "2021-07-20",
+    ]
+    events = rebalance_event_indices(timestamps, "dates:2021-04-05")
+    assert events.tolist() == [0, 3]
+
+    # Block by block, carrying the anchor and floor forward
+    whole = rebalance_event_indices(irregular_timestamps, "month_end")
+    anchor = floor = None
+    pieces = []
+    offset = 0
+    for block in np.array_split(irregular_timestamps, 11):
+        events, anchor, floor = continue_rebalance_events(
+            block, "month_end", anchor, floor
+        )
+        pieces.append(offset + events)
+        offset += len(block)
+    np.testing.assert_array_equal(np.concatenate(pieces), whole)
+    assert len(whole) > 30
+
+
+def _chained_events(successors, start, bars):
+    """Follow rebalance successors from an entry bar."""
+    entry_next, following = successors
+    events = [start]
+    current = entry_next[start]
+    while current < bars:
+        events.append(int(current))
+        current = following[current]
+    return events
+
+
+@pytest.mark.parametrize(
+    "frequency",
+    ["none", "monthly", "quarterly", "weekly", "month_end", "quarter_end-2b"],
+)
+def test_rebalance_successors_match_entry_schedules(
+    irregular_timestamps, frequency, monkeypatch
+):
+    """Test that successor chains match compiling each entry's own timeline."""
+    # Half-hourly bars across a daylight saving fall-back, where the local
+    # clock runs back by an hour
+    monkeypatch.setenv("TZ", "America/New_York")
+    time.tzset()
+    try:
+        fall_back = 1636264800000  # 2021-11-07 06:00 UTC, 01:00 EST
+        half_hourly = fall_back + np.arange(-96, 96 * 48) * 30 * 60 * 1000
+        for timestamps in [irregular_timestamps, half_hourly]:
+            successors = rebalance_successors(timestamps, frequency)
+            starts = list(range(0, len(timestamps), 97)) + list(range(90, 100))
+            for start in starts:
+                events, _, _ = continue_rebalance_events(timestamps[start:], frequency)
+                expected = (start + events).tolist()
+                if successors is None:
+                    assert expected == []
+                else:
+                    assert _chained_events(successors, start, len(timestamps)) == (
+                        expected
+                    )
+    finally:
+        monkeypatch.undo()
+        time.tzset()
+
+
+def test_parse_calendar_frequency():
+    """Test calendar frequency parsing and rejection of malformed schedules."""
+    rule = parse_calendar_frequency("quarter_end-2b")
+    assert (rule.anchor, rule.offset, rule.business_days) == ("quarter_end", -2, True)
+    assert parse_calendar_frequency("weekday:fri").weekdays == (4,)
+    assert parse_calendar_frequency("quarterly") is None
+    assert parse_calendar_frequency("weekly") is None
+
+    with pytest.raises(ValueError):
+        parse_calendar_frequency("weekday:friday")
+    with pytest.raises(ValueError):
+        parse_calendar_frequency("dates:2021-13-01")
+
+
+def test_calendar_schedule_in_simulations(make_market_data):
+    """Test that batched, scalar and streamed runs share calendar schedules."""
+    data = make_market_data(3, [("btc", 1.0, 800e9), ("eth", 1.0, 300e9)], 200)
+
+    _, values, _ = calculate_historical_index_prices_batch(
+        data, "market_cap", [0.5], rebalance_frequency="quarter_end"
+    )
+    history, scalar = calculate_historical_index_prices(
+        data, "market_cap", "quarter_end", event_log=EventLog(SILENT)
+    )
+    np.testing.assert_allclose(values[0], [value for _, value in history], rtol=1e-10)
+    assert scalar["rebalance_count"] == 3  # first bar, March 31 and June 30
+
+    panel = build_market_panel(data)
+    log = EventLog(SILENT)
+    state = create_simulation_state(panel, "market_cap", "quarter_end", event_log=log)
+    for chunk in iterate_panel_chunks(panel, 45):
+        advance_simulation(state, chunk, event_log=log)
+    assert state.history == history
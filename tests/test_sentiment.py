@@ -0,0 +1,295 @@
+"""
+Unit tests for the sentiment module.
+"""
+
+import numpy as np
+import pytest
+
+from core.events import EVENT_FLAG_SENTIMENT, SILENT, EventLog
+from core.panel import build_market_panel, iterate_panel_chunks
+from core.portfolio import (
+    _prepare_fear_greed_data,
+    advance_simulation,
+    calculate_historical_index_prices,
+    create_simulation_state,
+)
+from core.sentiment import (
+    SIGNAL_FEAR,
+    SIGNAL_GREED,
+    SentimentRule,
+    compile_allocation_path,
+    sentiment_evaluation_rows,
+    sentiment_signals,
+    smooth_sentiment,
+)
+from core.simulation import calculate_historical_index_prices_batch
+from core.state import (
+    load_simulation_state,
+    save_simulation_state,
+    stream_simulation,
+)
+from core.sweep import build_sweep_grid, load_sweep_results, run_parameter_sweep
+from tests.conftest import DAY, START
+
+
+@pytest.fixture
+def historical_data(make_market_data):
+    """Three hundred days for three tokens."""
+    return make_market_data(
+        8, [("btc", 1.0, 800e9), ("eth", 1.0, 300e9), ("sol", 1.0, 50e9)], 300
+    )
+
+
+@pytest.fixture
+def fear_greed_data():
+    """A slow sentiment cycle with labels that disagree with the values."""
+    values = 50 + 45 * np.sin(np.arange(300) / 15)
+    return [[START + i * DAY, float(values[i]), "Neutral"] for i in range(300)]
+
+
+def test_sentiment_rule_validation():
+    """Test that inconsistent rule parameters are rejected."""
+    with pytest.raises(ValueError):
+        SentimentRule(fear_threshold=60, greed_threshold=40)
+    with pytest.raises(ValueError):
+        SentimentRule(step=0)
+    with pytest.raises(ValueError):
+        SentimentRule(min_allocation=0.8, max_allocation=0.2)
+    with pytest.raises(ValueError):
+        SentimentRule(cooldown_days=-1)
+    with pytest.raises(ValueError):
+        SentimentRule(smoothing=0)
+
+
+def test_sentiment_signals_and_smoothing():
+    """Test numeric thresholds, label classification and carried smoothing."""
+    values = np.array([10.0, np.nan, 50.0, 90.0])
+    classes = np.array([1, 0, 2, 3], dtype=np.int8)
+
+    signals, _ = sentiment_signals(values, classes)
+    np.testing.assert_array_equal(signals, [SIGNAL_FEAR, 0, SIGNAL_GREED, 0])
+    signals, _ = sentiment_signals(values, classes, SentimentRule())
+    np.testing.assert_array_equal(signals, [SIGNAL_FEAR, 0, 0, SIGNAL_GREED])
+
+    smoothed, level = smooth_sentiment(values, 3)
+    np.testing.assert_allclose(smoothed, [10.0, np.nan, 30.0, 60.0])
+    head, carried = smooth_sentiment(values[:2], 3)
+    tail, _ = smooth_sentiment(values[2:], 3, carried)
+    np.testing.assert_array_equal(np.concatenate([head, tail]), smoothed)
+    assert level == 60.0
+
+
+def test_compile_allocation_path_bounds_and_cooldown():
+    """Test that lanes saturate at their bounds and respect the cooldown."""
+    timestamps = START + np.arange(6) * DAY
+    signals = np.array([-1, -1, -1, 0, 1, 1], dtype=np.int8)
+    rule = SentimentRule(step=0.2, min_allocation=0.1, max_allocation=0.6)
+
+    rows, path, _ = compile_allocation_path(
+        timestamps, signals, np.arange(6), np.array([0.5, 0.1]), rule
+    )
+    np.testing.assert_array_equal(rows, [0, 1, 4, 5])
+    np.testing.assert_allclose(
+        path, [[0.3, 0.1], [0.1, 0.1], [0.3, 0.3], [0.5, 0.5]], atol=1e-12
+    )
+
+    # Only every second day may adjust; rows that are not evaluated are ignored
+    cooled = SentimentRule(step=0.2, min_allocation=0.1, cooldown_days=2)
+    rows, path, last = compile_allocation_path(
+        timestamps, signals, np.array([0, 1, 2, 5]), 0.5, cooled
+    )
+    np.testing.assert_array_equal(rows, [0, 2, 5])
+    np.testing.assert_allclose(path, [0.3, 0.1, 0.3])
+    assert last == timestamps[5]
+
+
+def test_numeric_rule_batch_matches_scalar(historical_data, fear_greed_data):
+    """Test that batched lanes follow the same numeric sentiment path."""
+    rule = SentimentRule(
+        fear_threshold=30, greed_threshold=70, step=0.05, cooldown_days=10, smoothing=5
+    )
+    allocations = [0.1, 0.5]
+    _, values, metrics = calculate_historical_index_prices_batch(
+        historical_data,
+        "market_cap",
+        allocations,
+        rebalance_frequency="monthly",
+        fear_greed_data=fear_greed_data,
+        sentiment_rule=rule,
+    )
+    assert metrics["fear_greed_rebalance_count"].min() > 0
+
+    for lane, allocation in enumerate(allocations):
+        history, scalar = calculate_historical_index_prices(
+            historical_data,
+            "market_cap",
+            rebalance_frequency="monthly",
+            stablecoin_allocation=allocation,
+            fear_greed_data=fear_greed_data,
+            event_log=EventLog(SILENT),
+            sentiment_rule=rule,
+        )
+        np.testing.assert_allclose(
+            values[lane], [value for _, value in history], rtol=1e-10
+        )
+        assert scalar["fear_greed_rebalance_count"] == (
+            metrics["fear_greed_rebalance_count"][lane]
+        )
+
+    # The labels alone never trigger an adjustment
+    _, _, unlabeled = calculate_historical_index_prices_batch(
+        historical_data,
+        "market_cap",
+        allocations,
+        rebalance_frequency="monthly",
+        fear_greed_data=fear_greed_data,
+    )
+    assert unlabeled["fear_greed_rebalance_count"].max() == 0
+
+
+def test_numeric_rule_survives_checkpoint(historical_data, fear_greed_data, tmp_path):
+    """Test that smoothing and cooldown carry over a saved and restored state."""
+    rule = SentimentRule(step=0.05, cooldown_days=20, smoothing=3)
+    panel = build_market_panel(historical_data)
+    fear_greed_map = _prepare_fear_greed_data(fear_greed_data)
+    log = EventLog(SILENT)
+
+    reference = create_simulation_state(
+        panel, "market_cap", "monthly", event_log=log, sentiment_rule=rule
+    )
+    advance_simulation(reference, panel, fear_greed_map, log)
+
+    state = create_simulation_state(
+        panel, "market_cap", "monthly", event_log=log, sentiment_rule=rule
+    )
+    for position, chunk in enumerate(iterate_panel_chunks(panel, 45)):
+        advance_simulation(state, chunk, fear_greed_map, log)
+        save_simulation_state(state, tmp_path / f"state_{position}.npz")
+        state = load_simulation_state(tmp_path / f"state_{position}.npz")
+
+    assert reference.fear_greed_rebalance_count > 0
+    assert state.fear_greed_rebalance_count == reference.fear_greed_rebalance_count
+    assert state.sentiment_level == reference.sentiment_level
+    assert state.history == reference.history
+
+
+def test_sweep_over_sentiment_rules(historical_data, fear_greed_data, tmp_path):
+    """Test that sweep grids accept sentiment rules as fear and greed settings."""
+    rules = [SentimentRule(step=0.05), SentimentRule(step=0.2, cooldown_days=60)]
+    grid = build_sweep_grid(["market_cap"], ["monthly"], fear_greed=rules)
+    results_path = tmp_path / "sweep.csv"
+    run_parameter_sweep(
+        historical_data,
+        grid,
+        results_path,
+        fear_greed_data=fear_greed_data,
+        processes=1,
+        progress=lambda *_: None,
+    )
+
+    rows = load_sweep_results(results_path)
+    assert len({row["key"] for row in rows}) == 2
+    for row, rule in zip(rows, rules):
+        _, metrics = calculate_historical_index_prices(
+            historical_data,
+            "market_cap",
+            rebalance_frequency="monthly",
+            fear_greed_data=fear_greed_data,
+            event_log=EventLog(SILENT),
+            sentiment_rule=rule,
+        )
+        assert float(row["total_return"]) == pytest.approx(metrics["total_return"])
+
+
+def test_sentiment_evaluation_rows():
+    """Test the daily, weekly and crossing cadences and their carry-over."""
+    timestamps = START + np.arange(10) * DAY  # Friday 2021-01-01 onwards
+    signals = np.array([0, -1, -1, 0, 1, 1, -1, 0, 0, -1], dtype=np.int8)
+    rebalances = np.array([0, 5])
+
+    rows, _ = sentiment_evaluation_rows(timestamps, signals, "rebalance", rebalances)
+    np.testing.assert_array_equal(rows, rebalances)
+    rows, _ = sentiment_evaluation_rows(timestamps, signals, "daily", rebalances)
+    np.testing.assert_array_equal(rows, np.arange(10))
+    rows, _ = sentiment_evaluation_rows(timestamps, signals, "weekly", rebalances)
+    np.testing.assert_array_equal(rows, [0, 3])  # first bar, then Monday 01-04
+    rows, last = sentiment_evaluation_rows(timestamps, signals, "crossing", rebalances)
+    np.testing.assert_array_equal(rows, [1, 4, 6, 9])
+    assert last == SIGNAL_FEAR
+
+    # Continuing a series needs only the previous bar's timestamp and signal
+    rows, _ = sentiment_evaluation_rows(
+        timestamps[4:], signals[4:], "weekly", rebalances, timestamps[3]
+    )
+    assert len(rows) == 0
+    rows, _ = sentiment_evaluation_rows(
+        timestamps[5:], signals[5:], "crossing", rebalances, None, signals[4]
+    )
+    np.testing.assert_array_equal(rows, [1, 4])
+
+    with pytest.raises(ValueError):
+        sentiment_evaluation_rows(timestamps, signals, "hourly", rebalances)
+
+
+def test_sentiment_cadence_between_rebalances(historical_data, fear_greed_data):
+    """Test that daily sentiment trades between quarterly rebalances."""
+    rule = SentimentRule(step=0.05, cooldown_days=7)
+    counts = {}
+    for frequency in ("rebalance", "daily", "crossing"):
+        _, values, metrics = calculate_historical_index_prices_batch(
+            historical_data,
+            "market_cap",
+            [0.3, 0.6],
+            rebalance_frequency="quarterly",
+            fear_greed_data=fear_greed_data,
+            sentiment_rule=rule,
+            sentiment_frequency=frequency,
+        )
+        counts[frequency] = metrics["fear_greed_rebalance_count"]
+
+        history, scalar = calculate_historical_index_prices(
+            historical_data,
+            "market_cap",
+            rebalance_frequency="quarterly",
+            stablecoin_allocation=0.6,
+            fear_greed_data=fear_greed_data,
+            event_log=EventLog(SILENT),
+            sentiment_rule=rule,
+            sentiment_frequency=frequency,
+        )
+        np.testing.assert_allclose(
+            values[1], [value for _, value in history], rtol=1e-10
+        )
+        assert scalar["rebalance_count"] == 3
+        assert scalar["fear_greed_rebalance_count"] == counts[frequency][1]
+
+    assert np.all(counts["daily"] > counts["rebalance"])
+    assert np.all(counts["crossing"] > 0)
+
+
+def test_sentiment_cadence_streams_in_blocks(historical_data, fear_greed_data):
+    """Test that crossing and weekly cadences continue across streamed blocks."""
+    panel = build_market_panel(historical_data)
+    log = EventLog(SILENT)
+    rule = SentimentRule(fear_threshold=35, greed_threshold=65)
+
+    for frequency in ("crossing", "weekly"):
+        options = dict(sentiment_rule=rule, sentiment_frequency=frequency)
+        whole = create_simulation_state(
+            panel, "market_cap", "quarterly", event_log=log, **options
+        )
+        advance_simulation(whole, panel, _prepare_fear_greed_data(fear_greed_data), log)
+
+        streamed = create_simulation_state(
+            panel, "market_cap", "quarterly", event_log=log, **options
+        )
+        flags = [
+            event_flags
+            for _, _, event_flags in stream_simulation(
+                streamed, iterate_panel_chunks(panel, 17), fear_greed_data, log
+            )
+        ]
+        assert streamed.history == whole.history
+        assert sum(bool(flag & EVENT_FLAG_SENTIMENT) for flag in flags) == (
+            whole.fear_greed_rebalance_count
+        )
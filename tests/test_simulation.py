@@ -0,0 +1,107 @@
+"""
+Unit tests for the simulation module.
+"""
+
+import io
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+
+from core.portfolio import calculate_historical_index_prices
+from core.simulation import (
+    apply_fear_greed_adjustment,
+    calculate_historical_index_prices_batch,
+)
+
+
+@pytest.fixture
+def sample_historical_data():
+    """Sample historical data spanning two monthly rebalances."""
+    start = 1609459200000  # 2021-01-01
+    day = 24 * 60 * 60 * 1000
+    btc_prices = [30000, 31000, 29000, 33000, 35000, 34000]
+    eth_prices = [800, 850, 700, 900, 1000, 950]
+    sol_prices = [10, 11, 9, 14, 16, 15]
+    timestamps = [start + i * 20 * day for i in range(len(btc_prices))]
+
+    return {
+        "btc": [[ts, p, p * 19e6] for ts, p in zip(timestamps, btc_prices)],
+        "eth": [[ts, p, p * 115e6] for ts, p in zip(timestamps, eth_prices)],
+        "sol": [[ts, p, p * 300e6] for ts, p in zip(timestamps, sol_prices)],
+    }
+
+
+@pytest.fixture
+def sample_fear_greed_data(sample_historical_data):
+    """Alternating extreme sentiment on every timestamp."""
+    timestamps = [ts for ts, _, _ in sample_historical_data["btc"]]
+    labels = ["Extreme Fear", "Neutral", "Extreme Greed"]
+    return [[ts, 50, labels[i % len(labels)]] for i, ts in enumerate(timestamps)]
+
+
+def test_batch_matches_single_allocation_runs(
+    sample_historical_data, sample_fear_greed_data
+):
+    """Test that every lane reproduces the single-allocation simulation."""
+    allocations = [0.0, 0.05, 0.5, 0.95]
+
+    timestamps, values, metrics = calculate_historical_index_prices_batch(
+        sample_historical_data,
+        "sqrt_market_cap",
+        allocations,
+        rebalance_frequency="monthly",
+        fear_greed_data=sample_fear_greed_data,
+    )
+
+    assert values.shape == (len(allocations), len(timestamps))
+    for lane, allocation in enumerate(allocations):
+        with patch("sys.stdout", new=io.StringIO()):
+            result, expected = calculate_historical_index_prices(
+                sample_historical_data,
+                "sqrt_market_cap",
+                rebalance_frequency="monthly",
+                stablecoin_allocation=allocation,
+                fear_greed_data=sample_fear_greed_data,
+            )
+
+        np.testing.assert_allclose(
+            values[lane], [value for _, value in result], rtol=1e-12
+        )
+        for key in (
+            "total_return",
+            "max_drawdown",
+            "sharpe_ratio",
+            "rebalance_count",
+            "fear_greed_rebalance_count",
+            "total_fees_paid",
+        ):
+            assert metrics[key][lane] == pytest.approx(expected[key], rel=1e-12)
+
+
+def test_batch_empty_data():
+    """Test that empty data yields empty outputs."""
+    timestamps, values, metrics = calculate_historical_index_prices_batch(
+        {}, "market_cap", [0.2, 0.8]
+    )
+
+    assert len(timestamps) == 0
+    assert values.shape == (2, 0)
+    assert metrics == {}
+
+
+def test_apply_fear_greed_adjustment_respects_bounds():
+    """Test that lanes at the allocation bound are left untouched."""
+    quantities = np.array([[1.0, 2.0], [1.0, 2.0]])
+    stablecoin = np.array([50.0, 1.0])
+    allocations = np.array([0.5, 0.01])
+    prices = np.array([10.0, 20.0])
+
+    adjusted, fees = apply_fear_greed_adjustment(
+        quantities, stablecoin, allocations, 1, prices, 0.01
+    )
+
+    np.testing.assert_array_equal(adjusted, [True, False])
+    np.testing.assert_array_equal(allocations, [0.4, 0.01])
+    np.testing.assert_array_equal(quantities[1], [1.0, 2.0])
+    assert fees[0] > 0 and fees[1] == 0
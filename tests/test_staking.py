@@ -0,0 +1,232 @@
+"""
+Unit tests for the staking module.
+"""
+
+import numpy as np
+import pytest
+
+from core.events import SILENT, EventLog
+from core.holdings import HoldingsHistory
+from core.panel import build_market_panel, iterate_panel_chunks
+from core.portfolio import (
+    advance_simulation,
+    calculate_historical_index_prices,
+    calculate_staking_rewards,
+    create_simulation_state,
+)
+from core.simulation import calculate_historical_index_prices_batch
+from core.staking import (
+    YieldCurves,
+    accrued_growth,
+    build_accrual_index,
+    build_growth_factors,
+    build_staking_accrual,
+    build_staking_growth,
+    staking_rates,
+)
+from core.state import load_simulation_state, save_simulation_state
+from tests.conftest import DAY, START
+
+
+@pytest.fixture
+def timestamps():
+    """Irregularly spaced daily timestamps."""
+    return START + np.array([0, 1, 3, 4, 10, 40]) * DAY
+
+
+@pytest.fixture
+def historical_data(make_market_data):
+    """One hundred and twenty days for two staked tokens."""
+    return make_market_data(11, [("eth", 1.0, 300e9), ("sol", 1.0, 50e9)], 120)
+
+
+@pytest.fixture
+def yield_curves():
+    """ETH yields that fall and recover; a stablecoin yield that halves."""
+    return YieldCurves(
+        {
+            "eth": [[START, 0.06], [START + 30 * DAY, 0.02], [START + 70 * DAY, 0.05]],
+            "stablecoin": [[START + 45 * DAY, 0.15], [START + 60 * DAY, 0.075]],
+        },
+        {"sol": 0.1},
+    )
+
+
+def test_accrual_index_matches_stepwise_compounding(timestamps):
+    """Test that index ratios reproduce step-by-step staking rewards."""
+    aprs = np.array([0.04, 0.15, 0.0])
+    index = build_accrual_index(timestamps, aprs)
+
+    quantities = np.ones(3)
+    for row in range(1, len(timestamps)):
+        days = (timestamps[row] - timestamps[row - 1]) / DAY
+        quantities = quantities + calculate_staking_rewards(quantities, aprs, days)
+
+    np.testing.assert_allclose(index[-1], quantities, rtol=1e-13)
+    np.testing.assert_array_equal(index[0], [1.0, 1.0, 1.0])
+    np.testing.assert_array_equal(index[:, 2], 1.0)
+
+
+def test_accrual_index_time_varying_rates(timestamps):
+    """Test that each interval uses the APR in effect at its start."""
+    aprs = np.array([[0.10], [0.20], [0.20], [0.0], [0.05], [0.30]])
+    index = build_accrual_index(timestamps, aprs)
+
+    expected = (
+        (1 + 0.10 / 365) ** 1
+        * (1 + 0.20 / 365) ** 2
+        * (1 + 0.20 / 365) ** 1
+        * (1 + 0.05 / 365) ** 30
+    )
+    assert index[-1, 0] == pytest.approx(expected, rel=1e-13)
+
+    # Accrual between any two indices is one division
+    assert accrued_growth(index, 2, 3)[0] == pytest.approx(1 + 0.20 / 365)
+    assert accrued_growth(index, 3, 4)[0] == pytest.approx(1.0)
+
+
+def test_build_staking_accrual_uses_config(timestamps):
+    """Test token and stablecoin indexes built from a staking config."""
+    config = {"eth": 0.04, "stablecoin": 0.15}
+    token_index, stablecoin_index = build_staking_accrual(
+        timestamps, ["btc", "eth"], config
+    )
+
+    np.testing.assert_array_equal(staking_rates(["btc", "eth"], config), [0.0, 0.04])
+    assert token_index.shape == (len(timestamps), 2)
+    np.testing.assert_array_equal(token_index[:, 0], 1.0)
+    assert stablecoin_index[-1] == pytest.approx((1 + 0.15 / 365) ** 40, rel=1e-13)
+
+
+def test_constant_yield_curves_match_config(timestamps):
+    """Test that flat curves give the indexes of the constant-APR path."""
+    config = {"eth": 0.04, "stablecoin": 0.15}
+    curves = YieldCurves({"eth": [[timestamps[2], 0.04]]}, {"stablecoin": 0.15})
+    symbols = ["btc", "eth", "stablecoin"]
+
+    for expected, actual in zip(
+        build_staking_accrual(timestamps, ["btc", "eth"], config),
+        build_staking_accrual(timestamps, ["btc", "eth"], curves),
+    ):
+        np.testing.assert_allclose(actual, expected, rtol=1e-13)
+    np.testing.assert_allclose(
+        build_staking_growth(timestamps, symbols, curves),
+        build_growth_factors(timestamps, staking_rates(symbols, config)),
+        rtol=1e-13,
+    )
+
+
+def test_yield_curves_piecewise_rates(timestamps):
+    """Test that rate changes inside an interval split its compounding."""
+    start = timestamps[0]
+    curves = YieldCurves({"eth": [[start + 2 * DAY, 0.10], [start + 7 * DAY, 0.0]]})
+    index, _ = build_staking_accrual(timestamps, ["eth"], curves)
+
+    # The first APR also applies before its timestamp; zero after day 7
+    expected = (1 + 0.10 / 365) ** 7
+    assert index[-1, 0] == pytest.approx(expected, rel=1e-13)
+    assert accrued_growth(index, 4, 5)[0] == pytest.approx(1.0)
+    np.testing.assert_allclose(
+        curves.rates(timestamps, ["eth", "btc"])[:, 0], [0.1, 0.1, 0.1, 0.1, 0, 0]
+    )
+
+    # Growth factors over any split of the timeline multiply to the index
+    growth = build_staking_growth(timestamps, ["eth"], curves)
+    np.testing.assert_allclose(np.cumprod(growth[:, 0]), index[1:, 0], rtol=1e-13)
+
+    restored = YieldCurves.from_dict(curves.to_dict())
+    np.testing.assert_array_equal(
+        build_staking_accrual(timestamps, ["eth"], restored)[0], index
+    )
+
+    with pytest.raises(ValueError):
+        YieldCurves({"eth": [[start + DAY, 0.1], [start, 0.2]]})
+    with pytest.raises(ValueError):
+        YieldCurves({"eth": [[start, -0.1]]})
+
+
+def test_yield_curve_growth_is_independent_of_blocks(yield_curves):
+    """Test that a bar's growth does not depend on the block it is built in."""
+    rng = np.random.default_rng(2)
+    timestamps = START + np.cumsum(rng.integers(1, 3 * DAY, size=200))
+    symbols = ["eth", "sol", "stablecoin"]
+
+    whole = build_staking_growth(timestamps, symbols, yield_curves)
+    blocks = [slice(0, 38), slice(37, 121), slice(120, None)]
+    np.testing.assert_array_equal(
+        np.vstack(
+            [
+                build_staking_growth(timestamps[rows], symbols, yield_curves)
+                for rows in blocks
+            ]
+        ),
+        whole,
+    )
+
+    # Symbols without a curve grow exactly as with the constant config
+    np.testing.assert_array_equal(
+        build_staking_growth(timestamps, symbols, YieldCurves({})),
+        build_growth_factors(timestamps, staking_rates(symbols)),
+    )
+
+
+def test_yield_curves_batch_matches_scalar(historical_data, yield_curves):
+    """Test that every simulation mode accrues along the same curves."""
+    holdings = HoldingsHistory()
+    history, _ = calculate_historical_index_prices(
+        historical_data,
+        "market_cap",
+        rebalance_frequency="monthly",
+        stablecoin_allocation=0.4,
+        event_log=EventLog(SILENT),
+        holdings_history=holdings,
+        yield_curves=yield_curves,
+    )
+    _, values, _ = calculate_historical_index_prices_batch(
+        historical_data,
+        "market_cap",
+        [0.4],
+        rebalance_frequency="monthly",
+        yield_curves=yield_curves,
+    )
+    scalar_values = [value for _, value in history]
+    np.testing.assert_allclose(values[0], scalar_values, rtol=1e-10)
+
+    token_values, stablecoin_values = holdings.values(
+        build_market_panel(historical_data)
+    )
+    np.testing.assert_allclose(
+        token_values.sum(axis=1) + stablecoin_values, scalar_values, rtol=1e-12
+    )
+
+    # The curves change the outcome compared to the constant rates
+    _, constant = calculate_historical_index_prices_batch(
+        historical_data, "market_cap", [0.4], rebalance_frequency="monthly"
+    )[:2]
+    assert constant[0, -1] != pytest.approx(values[0, -1], rel=1e-6)
+
+
+def test_yield_curves_survive_checkpoint(historical_data, yield_curves, tmp_path):
+    """Test that a restored state keeps accruing along its curves."""
+    panel = build_market_panel(historical_data)
+    log = EventLog(SILENT)
+    options = dict(event_log=log, yield_curves=yield_curves)
+
+    reference = create_simulation_state(panel, "market_cap", "monthly", **options)
+    advance_simulation(reference, panel, event_log=log)
+
+    state = create_simulation_state(
+        panel, "market_cap", "monthly", holdings_history=HoldingsHistory(), **options
+    )
+    for position, chunk in enumerate(iterate_panel_chunks(panel, 50)):
+        advance_simulation(state, chunk, event_log=log)
+        save_simulation_state(state, tmp_path / f"state_{position}.npz")
+        state = load_simulation_state(tmp_path / f"state_{position}.npz")
+
+    np.testing.assert_array_equal(
+        [value for _, value in state.history],
+        [value for _, value in reference.history],
+    )
+    quantities, stablecoin = state.holdings.quantities()
+    np.testing.assert_allclose(quantities[-1], state.portfolio.quantities, rtol=1e-12)
+    assert stablecoin[-1] == pytest.approx(state.portfolio.stablecoin_quantity)
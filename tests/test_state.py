@@ -0,0 +1,206 @@
+"""
+Unit tests for the state module.
+"""
+
+import io
+
+import numpy as np
+import pytest
+
+from core.events import (
+    DETAIL,
+    EVENT_FLAG_REBALANCE,
+    EVENT_FLAG_SENTIMENT,
+    SENTIMENT_ADJUSTMENT,
+    SILENT,
+    TOKEN_REBALANCE,
+    EventLog,
+)
+from core.panel import build_market_panel, iterate_panel_chunks
+from core.portfolio import (
+    advance_simulation,
+    calculate_historical_index_prices,
+    create_simulation_state,
+)
+from core.state import (
+    advance,
+    load_simulation_state,
+    resume_historical_index_prices,
+    save_simulation_state,
+    stream_simulation,
+)
+from tests.conftest import DAY, START
+
+
+@pytest.fixture
+def historical_data(make_market_data):
+    """Two hundred days of data; SOL is listed after two months."""
+    return make_market_data(
+        7,
+        [("btc", 30000, 1e7), ("eth", 800, 1e7), ("sol", 2, 1e7)],
+        200,
+        listed={"sol": 60},
+    )
+
+
+@pytest.fixture
+def fear_greed_data():
+    """Alternating extreme sentiment every ten days."""
+    classes = ["Extreme Fear", "Neutral", "Extreme Greed"]
+    return [[START + i * DAY, 50, classes[(i // 10) % 3]] for i in range(200)]
+
+
+@pytest.mark.parametrize("checkpoint", [1, 45, 120, 199])
+def test_checkpoint_resume_matches_uninterrupted_run(
+    historical_data, fear_greed_data, checkpoint
+):
+    """Test that a saved and restored state resumes bit-for-bit."""
+    options = dict(
+        method="sqrt_market_cap",
+        rebalance_frequency="monthly",
+        stablecoin_allocation=0.4,
+        swap_fee=0.005,
+    )
+    expected_result, expected_metrics = calculate_historical_index_prices(
+        historical_data,
+        fear_greed_data=fear_greed_data,
+        event_log=EventLog(SILENT),
+        **options,
+    )
+
+    # Run up to the checkpoint on the data available at that time
+    cutoff = START + checkpoint * DAY
+    partial_data = {
+        token: [entry for entry in entries if entry[0] < cutoff]
+        for token, entries in historical_data.items()
+    }
+    partial_data = {
+        token: entries for token, entries in partial_data.items() if entries
+    }
+    panel = build_market_panel(partial_data)
+    log = EventLog(SILENT)
+    state = create_simulation_state(
+        panel,
+        options["method"],
+        options["rebalance_frequency"],
+        True,
+        options["stablecoin_allocation"],
+        options["swap_fee"],
+        log,
+    )
+    fear_greed_map = {
+        timestamp: {"value": value, "classification": classification}
+        for timestamp, value, classification in fear_greed_data
+    }
+    advance_simulation(state, panel, fear_greed_map, log)
+
+    buffer = io.BytesIO()
+    save_simulation_state(state, buffer)
+    buffer.seek(0)
+    restored = load_simulation_state(buffer)
+    assert restored.portfolio.metadata == state.portfolio.metadata
+    assert (
+        restored.portfolio.quantities.tobytes() == state.portfolio.quantities.tobytes()
+    )
+
+    result, metrics = resume_historical_index_prices(
+        restored, historical_data, fear_greed_data, log
+    )
+
+    assert result == expected_result
+    assert metrics == expected_metrics
+
+
+def test_load_simulation_state_rejects_unknown_version(historical_data, tmp_path):
+    """Test that archives from another format version are refused."""
+    panel = build_market_panel(historical_data)
+    state = create_simulation_state(panel, "market_cap", event_log=EventLog(SILENT))
+    path = tmp_path / "state.npz"
+    save_simulation_state(state, path)
+
+    with np.load(path) as archive:
+        arrays = dict(archive)
+    arrays["version"] = np.array(99)
+    np.savez_compressed(path, **arrays)
+
+    with pytest.raises(ValueError, match="Unsupported simulation state version"):
+        load_simulation_state(path)
+
+
+def test_advance_day_by_day_matches_single_update(historical_data, fear_greed_data):
+    """Test that nightly one-bar updates equal one update over all bars."""
+    log = EventLog(SILENT)
+    panel = build_market_panel(historical_data)
+
+    def new_state():
+        return create_simulation_state(
+            panel, "market_cap", "monthly", True, 0.3, 0.01, log, keep_history=False
+        )
+
+    full_state = new_state()
+    full_values, full_metrics = advance(full_state, panel, fear_greed_data, log)
+
+    state = new_state()
+    values = []
+    for day in range(200):
+        bars = {
+            token: [entry for entry in entries if entry[0] == START + day * DAY]
+            for token, entries in historical_data.items()
+        }
+        bars = {token: entries for token, entries in bars.items() if entries}
+        new_values, metrics = advance(state, bars, fear_greed_data, log)
+        values.extend(new_values)
+
+        # Checkpoint and restore halfway through
+        if day == 100:
+            buffer = io.BytesIO()
+            save_simulation_state(state, buffer)
+            buffer.seek(0)
+            state = load_simulation_state(buffer)
+
+    assert values == full_values
+    assert metrics == full_metrics
+    assert state.history == []
+
+    # Running metrics agree with the history-based metrics of the standard run
+    expected_result, expected_metrics = calculate_historical_index_prices(
+        historical_data,
+        "market_cap",
+        "monthly",
+        stablecoin_allocation=0.3,
+        fear_greed_data=fear_greed_data,
+        event_log=log,
+    )
+    assert values == expected_result
+    for key, expected in expected_metrics.items():
+        if key != "token_values":
+            assert metrics[key] == pytest.approx(expected, rel=1e-12)
+
+
+def test_stream_simulation_matches_batch_run(historical_data, fear_greed_data):
+    """Test that streamed bars and flags match the standard simulation."""
+    log = EventLog(DETAIL)
+    expected_result, _ = calculate_historical_index_prices(
+        historical_data,
+        "market_cap",
+        "monthly",
+        fear_greed_data=fear_greed_data,
+        event_log=log,
+    )
+    rebalance_days = set(log.events(TOKEN_REBALANCE)["timestamp"].tolist())
+    sentiment_days = set(log.events(SENTIMENT_ADJUSTMENT)["timestamp"].tolist())
+
+    panel = build_market_panel(historical_data)
+    state = create_simulation_state(
+        panel, "market_cap", "monthly", event_log=log, keep_history=False
+    )
+    stream = stream_simulation(
+        state, iterate_panel_chunks(panel, 17), fear_greed_data, EventLog(SILENT)
+    )
+
+    streamed = list(stream)
+    assert [[ts, value] for ts, value, _ in streamed] == expected_result
+    for timestamp, _, flags in streamed:
+        assert bool(flags & EVENT_FLAG_REBALANCE) == (timestamp in rebalance_days)
+        assert bool(flags & EVENT_FLAG_SENTIMENT) == (timestamp in sentiment_days)
+    assert sentiment_days
@@ -0,0 +1,174 @@
+"""
+Unit tests for the sweep module.
+"""
+
+import io
+from unittest.mock import patch
+
+import pytest
+
+from core.events import SILENT, EventLog
+from core.portfolio import calculate_historical_index_prices
+from core.sweep import (
+    build_sweep_grid,
+    load_sweep_results,
+    run_parameter_sweep,
+    sweep_key,
+)
+from tests.conftest import DAY, START
+
+
+@pytest.fixture
+def historical_data(make_market_data):
+    """One hundred and fifty days of data for three tokens."""
+    return make_market_data(
+        3, [("btc", 30000, 1e7), ("eth", 800, 1e7), ("sol", 2, 1e7)], 150
+    )
+
+
+@pytest.fixture
+def fear_greed_data():
+    """Alternating extreme sentiment."""
+    classes = ["Extreme Fear", "Extreme Greed"]
+    return [[START + i * DAY, 50, classes[(i // 20) % 2]] for i in range(150)]
+
+
+def test_build_sweep_grid():
+    """Test that the grid covers every combination with unique keys."""
+    grid = build_sweep_grid(
+        ["market_cap", "sqrt_market_cap"],
+        ["monthly", "quarterly"],
+        staking=(False, True),
+        stablecoin_allocations=(0.2, 0.5),
+        start_dates=(None, "2021-02-01"),
+    )
+
+    assert len(grid) == 2 * 2 * 2 * 2 * 2
+    assert len({sweep_key(config) for config in grid}) == len(grid)
+
+
+def test_run_parameter_sweep_matches_single_runs(
+    historical_data, fear_greed_data, tmp_path
+):
+    """Test that sweep rows match individual simulations and resume after interruption."""
+    grid = build_sweep_grid(
+        ["market_cap", "sqrt_market_cap"],
+        ["none", "monthly"],
+        staking=(False, True),
+        fear_greed=(False, True),
+        stablecoin_allocations=(0.3, 0.6),
+        start_dates=(None, "2021-02-15"),
+    )
+    results_path = str(tmp_path / "sweep.csv")
+    calls = []
+
+    computed = run_parameter_sweep(
+        historical_data,
+        grid,
+        results_path,
+        fear_greed_data,
+        processes=1,
+        progress=lambda done, total: calls.append((done, total)),
+    )
+
+    assert computed == len(grid)
+    assert calls[-1] == (len(grid), len(grid))
+    rows = {row["key"]: row for row in load_sweep_results(results_path)}
+    assert len(rows) == len(grid)
+
+    for config in grid[::5]:
+        _, metrics = calculate_historical_index_prices(
+            historical_data,
+            config["method"],
+            config["rebalance_frequency"],
+            config["apply_staking"],
+            config["start_date"],
+            config["stablecoin_allocation"],
+            fear_greed_data if config["use_fear_greed"] else None,
+            config["swap_fee"],
+            event_log=EventLog(SILENT),
+        )
+        row = rows[sweep_key(config)]
+        assert float(row["total_return"]) == pytest.approx(metrics["total_return"])
+        assert float(row["total_fees_paid"]) == pytest.approx(
+            metrics["total_fees_paid"]
+        )
+        assert int(row["fear_greed_rebalance_count"]) == (
+            metrics["fear_greed_rebalance_count"]
+        )
+
+    # Drop the last rows as if the sweep had been interrupted while writing
+    # one of them, then resume
+    with open(results_path) as results_file:
+        lines = results_file.readlines()
+    with open(results_path, "w") as results_file:
+        results_file.writelines(lines[:-5])
+        results_file.write(lines[-5][:30])
+
+    computed = run_parameter_sweep(
+        historical_data,
+        grid,
+        results_path,
+        fear_greed_data,
+        processes=1,
+        progress=lambda *_: None,
+    )
+    assert computed == 5
+    resumed_rows = load_sweep_results(results_path)
+    assert len(resumed_rows) == len(grid)
+    resumed = {row["key"]: row for row in resumed_rows}
+    assert resumed.keys() == rows.keys()
+    for key, row in resumed.items():
+        assert float(row["final_value"]) == pytest.approx(
+            float(rows[key]["final_value"]), rel=1e-12
+        )
+
+
+def test_run_parameter_sweep_process_pool(historical_data, tmp_path):
+    """Test that pooled workers produce the same table as an in-process run."""
+    grid = build_sweep_grid(
+        ["market_cap", "sqrt_market_cap"],
+        ["monthly"],
+        stablecoin_allocations=(0.1, 0.4, 0.7),
+    )
+
+    serial_path = str(tmp_path / "serial.csv")
+    pooled_path = str(tmp_path / "pooled.csv")
+    run_parameter_sweep(
+        historical_data, grid, serial_path, processes=1, progress=lambda *_: None
+    )
+    run_parameter_sweep(
+        historical_data, grid, pooled_path, processes=2, progress=lambda *_: None
+    )
+
+    serial = {row["key"]: row for row in load_sweep_results(serial_path)}
+    pooled = {row["key"]: row for row in load_sweep_results(pooled_path)}
+    assert pooled == serial
+
+
+def test_run_parameter_sweep_skips_empty_start_dates(historical_data, tmp_path):
+    """Test that start dates without data are reported once, not rerun forever."""
+    grid = build_sweep_grid(
+        ["market_cap"],
+        ["monthly"],
+        stablecoin_allocations=(0.2, 0.6),
+        start_dates=(None, "2030-01-01"),
+    )
+    results_path = str(tmp_path / "results.csv")
+    progress = []
+
+    with patch("sys.stdout", new=io.StringIO()) as output:
+        computed = run_parameter_sweep(
+            historical_data,
+            grid,
+            results_path,
+            processes=1,
+            progress=lambda *counts: progress.append(counts),
+        )
+    assert computed == 2
+    assert progress[-1] == (2, 2)
+    assert "Skipping 2 runs" in output.getvalue()
+    assert len(load_sweep_results(results_path)) == 2
+
+    with patch("sys.stdout", new=io.StringIO()):
+        assert run_parameter_sweep(historical_data, grid, results_path) == 0
@@ -0,0 +1,155 @@
+"""
+Unit tests for the universe module.
+"""
+
+import numpy as np
+import pytest
+
+from core.events import SILENT, EventLog
+from core.panel import build_market_panel
+from core.portfolio import (
+    advance_simulation,
+    calculate_historical_index_prices,
+    create_simulation_state,
+)
+from core.state import load_simulation_state, save_simulation_state
+from core.universe import (
+    UniverseRule,
+    rank_candidates,
+    reconstitute_universe,
+    select_constituents,
+)
+from tests.conftest import DAY, START
+
+
+@pytest.fixture
+def historical_data(make_market_data):
+    """Two hundred days for six tokens; "new" is listed after ninety days."""
+    return make_market_data(
+        29,
+        [
+            ("a", 1.0, 10e9),
+            ("b", 1.0, 8e9),
+            ("c", 1.0, 6e9),
+            ("d", 1.0, 5e9),
+            ("e", 1.0, 4e9),
+            ("new", 1.0, 50e9),
+        ],
+        200,
+        listed={"new": 90},
+        volatility=0.04,
+    )
+
+
+def test_rank_candidates_matches_full_sort():
+    """Test that partial selection returns the same top ranks as a full sort."""
+    rng = np.random.default_rng(1)
+    market_caps = rng.lognormal(20, 2, 600)
+    eligible = rng.random(600) < 0.9
+
+    ranked = rank_candidates(market_caps, eligible, 25)
+
+    order = np.argsort(-np.where(eligible, market_caps, -np.inf))
+    np.testing.assert_array_equal(ranked, order[:25])
+    assert len(rank_candidates(market_caps[:5], eligible[:5], 25)) == eligible[:5].sum()
+
+
+def test_select_constituents_buffer():
+    """Test that current members are kept within the buffer."""
+    market_caps = np.array([100.0, 90.0, 80.0, 70.0, 60.0, np.nan])
+    eligible = ~np.isnan(market_caps)
+    members = np.array([False, False, False, True, True, True])
+
+    without_buffer = select_constituents(
+        market_caps, eligible, members, UniverseRule(3)
+    )
+    with_buffer = select_constituents(
+        market_caps, eligible, members, UniverseRule(3, buffer=1)
+    )
+    initial = select_constituents(market_caps, eligible, None, UniverseRule(3, 2))
+
+    assert list(np.flatnonzero(without_buffer)) == [0, 1, 2]
+    assert list(np.flatnonzero(with_buffer)) == [0, 1, 3]
+    assert list(np.flatnonzero(initial)) == [0, 1, 2]
+
+
+def test_reconstitute_universe_limits_churn():
+    """Test that a buffer reduces turnover across rebalances."""
+    rng = np.random.default_rng(2)
+    market_caps = np.cumprod(1 + rng.normal(0, 0.2, (40, 30)), axis=0)
+    eligible = np.ones(market_caps.shape, dtype=bool)
+    rows = np.arange(40)
+
+    def turnover(rule):
+        constituents = reconstitute_universe(market_caps, eligible, rows, rule)
+        assert np.all(constituents.sum(axis=1) == rule.size)
+        return np.sum(constituents[1:] != constituents[:-1])
+
+    assert turnover(UniverseRule(10, buffer=5)) < turnover(UniverseRule(10))
+
+
+def test_reconstituted_simulation(historical_data):
+    """Test that only constituents are held and entrants join at rebalances."""
+    event_log = EventLog(SILENT)
+    rule = UniverseRule(3, buffer=1)
+    panel = build_market_panel(historical_data)
+    state = create_simulation_state(
+        panel, "market_cap", "monthly", event_log=event_log, universe=rule
+    )
+    assert state.portfolio.symbols == panel.tokens
+    assert np.count_nonzero(state.portfolio.quantities) == 3
+
+    advance_simulation(state, panel, event_log=event_log)
+
+    quantities = dict(zip(state.portfolio.symbols, state.portfolio.quantities))
+    assert np.count_nonzero(state.portfolio.quantities) == 3
+    assert quantities["new"] > 0
+    assert state.total_fees_paid > 0
+
+    _, metrics = calculate_historical_index_prices(
+        historical_data,
+        "market_cap",
+        "monthly",
+        event_log=EventLog(SILENT),
+        universe=rule,
+    )
+    assert metrics["final_value"] == pytest.approx(state.history[-1][1])
+
+
+def test_universe_survives_checkpoint(historical_data, tmp_path):
+    """Test that a restored state keeps reconstituting like the original."""
+    panel = build_market_panel(historical_data)
+    first, rest = {}, {}
+    for token, series in historical_data.items():
+        first[token] = [point for point in series if point[0] < START + 100 * DAY]
+        rest[token] = [point for point in series if point[0] >= START + 100 * DAY]
+
+    event_log = EventLog(SILENT)
+    state = create_simulation_state(
+        panel,
+        "sqrt_market_cap",
+        "monthly",
+        event_log=event_log,
+        universe=UniverseRule(2),
+    )
+    advance_simulation(state, build_market_panel(first), event_log=event_log)
+    save_simulation_state(state, tmp_path / "state.npz")
+    restored = load_simulation_state(tmp_path / "state.npz")
+    assert repr(restored.universe) == repr(state.universe)
+
+    advance_simulation(state, build_market_panel(rest), event_log=event_log)
+    advance_simulation(restored, build_market_panel(rest), event_log=event_log)
+    assert restored.history == state.history
+
+
+def test_select_constituents_admits_leaders():
+    """Test that outsiders ranked above the buffer displace members."""
+    market_caps = np.array([500.0, 100.0, 90.0, 80.0])
+    eligible = np.ones(4, dtype=bool)
+    members = np.array([False, True, True, True])
+
+    constituents = select_constituents(
+        market_caps, eligible, members, UniverseRule(3, buffer=1)
+    )
+
+    assert list(np.flatnonzero(constituents)) == [0, 1, 2]
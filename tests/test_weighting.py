@@ -6,14 +6,18 @@ import math
 from io import StringIO
 from unittest.mock import patch
 
+import numpy as np
 import pytest
 
 from core.weighting import (
+    apply_weight_caps,
     calculate_index_weights,
     calculate_weight_market_cap,
+    calculate_weight_matrix,
     calculate_weight_sqrt_market_cap,
     display_portfolio_weights,
     normalize_weights,
+    parse_weighting_method,
     print_portfolio_weights,
 )
 
@@ -231,3 +235,105 @@ def test_display_portfolio_weights_with_timestamps():
 
             # Check that calculate_index_weights was called with the right market caps
             mock_calculate.assert_called_with(expected_market_caps, "market_cap")
+
+
+@pytest.mark.parametrize("method", ["market_cap", "sqrt_market_cap"])
+def test_calculate_weight_matrix_matches_per_row_weights(method):
+    """Test that the weight matrix matches calculate_index_weights row by row."""
+    tokens = ["btc", "eth", "sol"]
+    market_caps = np.array(
+        [
+            [6e11, 1e11, np.nan],  # SOL not listed yet
+            [6.2e11, 1.06e11, 1.1e9],
+            [6.4e11, 1.1e11, 1.2e9],
+        ]
+    )
+
+    matrix = calculate_weight_matrix(market_caps, method)
+
+    for row, caps in enumerate(market_caps):
+        listed = {t: mc for t, mc in zip(tokens, caps) if not np.isnan(mc)}
+        expected = calculate_index_weights(listed, method)
+        assert matrix[row].tolist() == [expected.get(t, 0.0) for t in tokens]
+
+    # Requesting only some rows returns exactly those rows
+    np.testing.assert_array_equal(
+        calculate_weight_matrix(market_caps, method, rows=[0, 2]), matrix[[0, 2]]
+    )
+
+
+def test_calculate_weight_matrix_cache():
+    """Test that weight matrices are cached per fingerprint and method."""
+    market_caps = np.array([[4.0, 1.0], [9.0, 16.0]])
+
+    first = calculate_weight_matrix(market_caps, "sqrt_market_cap", fingerprint="x")
+    again = calculate_weight_matrix(market_caps, "sqrt_market_cap", fingerprint="x")
+
+    assert first is again
+    assert not first.flags.writeable
+    np.testing.assert_allclose(first, [[2 / 3, 1 / 3], [3 / 7, 4 / 7]])
+
+    with pytest.raises(ValueError):
+        calculate_weight_matrix(market_caps, "equal")
+
+
+def _capped_weights_reference(weights, max_weight, min_weight):
+    """Solve sum(clip(scale * weights)) == 1 for one row by bisection."""
+    active = weights > 0
+    upper = max(max_weight, 1 / active.sum())
+    lower = min(min_weight, 1 / active.sum())
+    low, high = 0.0, 1e40
+    for _ in range(400):
+        scale = (low + high) / 2
+        if np.clip(scale * weights[active], lower, upper).sum() < 1:
+            low = scale
+        else:
+            high = scale
+    return np.where(active, np.clip(high * weights, lower, upper), 0.0)
+
+
+@pytest.mark.parametrize(
+    "max_weight, min_weight", [(0.3, 0.0), (0.15, 0.02), (0.5, 0.05), (0.2, 0.1)]
+)
+def test_apply_weight_caps_matches_reference(max_weight, min_weight):
+    """Test that vectorized capping matches per-row redistribution."""
+    rng = np.random.default_rng(5)
+    market_caps = rng.lognormal(20, 2, (50, 12))
+    market_caps[rng.random(market_caps.shape) < 0.2] = np.nan
+    weights = calculate_weight_matrix(market_caps, "market_cap")
+
+    capped = apply_weight_caps(weights, max_weight, min_weight)
+
+    for row in range(len(weights)):
+        expected = _capped_weights_reference(weights[row], max_weight, min_weight)
+        np.testing.assert_allclose(capped[row], expected, atol=1e-12)
+    np.testing.assert_allclose(capped.sum(axis=1), 1.0)
+    assert np.all(capped[np.isnan(market_caps)] == 0)
+
+
+def test_capped_weighting_methods(sample_market_caps):
+    """Test capped method names, default limits and infeasible caps."""
+    assert parse_weighting_method("market_cap") == ("market_cap", None, None)
+    assert parse_weighting_method("capped_sqrt_market_cap:0.4:0.1") == (
+        "sqrt_market_cap",
+        0.4,
+        0.1,
+    )
+
+    weights = calculate_index_weights(sample_market_caps, "capped_market_cap:0.5")
+    assert weights["btc"] == pytest.approx(0.5)
+    assert sum(weights.values()) == pytest.approx(1.0)
+    assert weights["eth"] / weights["sol"] == pytest.approx(100)
+
+    # Three tokens cannot all stay below 25%: fall back to equal weights
+    weights = calculate_index_weights(sample_market_caps, "capped_market_cap")
+    assert list(weights.values()) == pytest.approx([1 / 3] * 3)
+
+    matrix = calculate_weight_matrix(
+        np.array([[600e9, 100e9, 1e9, np.nan]]), "capped_market_cap:0.5:0.1"
+    )
+    np.testing.assert_allclose(matrix, [[0.5, 0.4, 0.1, 0.0]])
+
+    for method in ["capped_market_cap:x", "capped_market_cap:1.5", "capped_foo"]:
+        with pytest.raises(ValueError):
+            calculate_index_weights(sample_market_caps, method)